@@ -14,6 +14,8 @@ import logging
 from datetime import datetime, timedelta
 from scipy import stats
 from risk_assessment import RiskAssessment
+from config.config import AnalysisConfig
+from analysis.factor_index import INDEX_LABELS
 
 class AdvancedMetricsAnalyzer:
     """İleri finansal metrikler için analiz sınıfı - Risk Kontrolü ve MV İle"""
@@ -28,6 +30,12 @@ class AdvancedMetricsAnalyzer:
         self.benchmark_funds = ['TI2', 'TKF', 'GAF']  # Örnek index fonlar
         self.risk_free_rate = 0.15  # %15 risksiz faiz oranı (Türkiye için)
         
+        # Adlandırılmış benchmark'lar (bist100, gold, usd) ve veri sürümü bazlı önbellek
+        config = getattr(coordinator, 'config', None)
+        self.analysis_config = config.analysis if config is not None else AnalysisConfig()
+        self._benchmark_cache = {}
+        self.factor_indices = coordinator.db.get_factor_index_store()
+        
     def handle_beta_analysis(self, question):
         """Beta katsayısı analizi - MV tabanlı hızlı analiz + RİSK KONTROLÜ"""
         print("📊 Beta katsayısı analiz ediliyor (MV + risk kontrolü ile)...")
@@ -97,18 +105,16 @@ class AdvancedMetricsAnalyzer:
             if not result.empty:
                 print(f"   ✅ MV'den {len(result)} aday fon yüklendi")
                 
-                # Her fon için detaylı beta hesabı ve risk değerlendirmesi
+                # Tüm adaylar için gerçek beta tek geçişte
                 benchmark_data = self._get_benchmark_data()
+                metrics = self._calculate_benchmark_metrics_batch(result['fcode'].tolist(), benchmark_data)
                 
                 for _, fund in result.iterrows():
                     fcode = fund['fcode']
                     
-                    # Gerçek beta hesabı için fiyat verisi çek
-                    fund_data = self.coordinator.db.get_fund_price_history(fcode, 120)
-                    
-                    if len(fund_data) >= 30 and benchmark_data is not None:
-                        # Gerçek beta hesapla
-                        real_beta = self._calculate_beta(fund_data, benchmark_data)
+                    if fcode in metrics.index:
+                        beta_value = metrics.at[fcode, 'beta']
+                        real_beta = float(beta_value) if pd.notna(beta_value) else None
                         
                         if real_beta is not None and self._check_beta_condition(real_beta, beta_threshold, comparison):
                             # Risk değerlendirmesi - MV'den gelen verilerle
@@ -350,8 +356,9 @@ class AdvancedMetricsAnalyzer:
             if not result.empty:
                 print(f"   ✅ MV'den {len(result)} aday fon yüklendi")
                 
-                # Benchmark verilerini al
+                # Benchmark verilerini al, tüm adaylar için gerçek alpha tek geçişte
                 benchmark_data = self._get_benchmark_data()
+                metrics = self._calculate_benchmark_metrics_batch(result['fcode'].tolist(), benchmark_data)
                 
                 for _, fund in result.iterrows():
                     fcode = fund['fcode']
@@ -369,17 +376,9 @@ class AdvancedMetricsAnalyzer:
                     risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
                     risk_level = risk_assessment['risk_level']
                     
-                    # Detaylı alpha hesabı için fiyat verisi çek (opsiyonel)
                     real_alpha = None
-                    if benchmark_data is not None and len(alpha_results) < 20:  # İlk 20 fon için
-                        try:
-                            fund_data = self.coordinator.db.get_fund_price_history(fcode, 120)
-                            if len(fund_data) >= 30:
-                                alpha_data = self._calculate_alpha(fund_data, benchmark_data)
-                                if alpha_data:
-                                    real_alpha = alpha_data['alpha']
-                        except:
-                            pass
+                    if fcode in metrics.index and pd.notna(metrics.at[fcode, 'alpha']):
+                        real_alpha = float(metrics.at[fcode, 'alpha'])
                     
                     fund_result = {
                         'fcode': fcode,
@@ -543,8 +542,9 @@ class AdvancedMetricsAnalyzer:
             if not result.empty:
                 print(f"   ✅ MV'den {len(result)} index fonu adayı yüklendi")
                 
-                # Benchmark verilerini al
+                # Benchmark verilerini al, tüm adaylar için tracking error tek geçişte
                 benchmark_data = self._get_benchmark_data()
+                metrics = self._calculate_benchmark_metrics_batch(result['fcode'].tolist(), benchmark_data)
                 
                 for _, fund in result.iterrows():
                     fcode = fund['fcode']
@@ -562,19 +562,11 @@ class AdvancedMetricsAnalyzer:
                     risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
                     risk_level = risk_assessment['risk_level']
                     
-                    # Gerçek tracking error hesabı (opsiyonel)
                     real_tracking_error = None
                     correlation = None
-                    if benchmark_data is not None and len(tracking_error_results) < 10:
-                        try:
-                            fund_data = self.coordinator.db.get_fund_price_history(fcode, 120)
-                            if len(fund_data) >= 30:
-                                te_data = self._calculate_tracking_error(fund_data, benchmark_data)
-                                if te_data:
-                                    real_tracking_error = te_data['tracking_error']
-                                    correlation = te_data['correlation']
-                        except:
-                            pass
+                    if fcode in metrics.index and pd.notna(metrics.at[fcode, 'tracking_error']):
+                        real_tracking_error = float(metrics.at[fcode, 'tracking_error'])
+                        correlation = float(metrics.at[fcode, 'correlation'])
                     
                     fund_result = {
                         'fcode': fcode,
@@ -736,6 +728,10 @@ class AdvancedMetricsAnalyzer:
             if not result.empty:
                 print(f"   ✅ MV'den {len(result)} aktif fon adayı yüklendi")
                 
+                # Benchmark'a göre gerçek IR tüm adaylar için tek geçişte
+                benchmark_data = self._get_benchmark_data()
+                metrics = self._calculate_benchmark_metrics_batch(result['fcode'].tolist(), benchmark_data)
+                
                 for _, fund in result.iterrows():
                     fcode = fund['fcode']
                     
@@ -755,11 +751,22 @@ class AdvancedMetricsAnalyzer:
                     # Tracking error tahmini (aktif fonlar için genelde %5-20 arası)
                     tracking_error_estimate = max(5, min(20, float(fund['annual_volatility_pct']) * 0.7))
                     
+                    information_ratio = float(fund['ir_proxy'])
+                    active_return = float(fund['active_return_estimate'])
+                    tracking_error = tracking_error_estimate
+                    is_estimate = True
+                    if fcode in metrics.index and pd.notna(metrics.at[fcode, 'information_ratio']):
+                        information_ratio = float(metrics.at[fcode, 'information_ratio'])
+                        active_return = float(metrics.at[fcode, 'active_return'])
+                        tracking_error = float(metrics.at[fcode, 'tracking_error'])
+                        is_estimate = False
+                    
                     fund_result = {
                         'fcode': fcode,
-                        'information_ratio': float(fund['ir_proxy']),
-                        'active_return': float(fund['active_return_estimate']),
-                        'tracking_error': tracking_error_estimate,
+                        'information_ratio': information_ratio,
+                        'active_return': active_return,
+                        'tracking_error': tracking_error,
+                        'is_estimate': is_estimate,
                         'annual_return': float(fund['annual_return_pct']),
                         'volatility': float(fund['annual_volatility_pct']),
                         'sharpe_ratio': float(fund['sharpe_ratio']),
@@ -821,7 +828,10 @@ class AdvancedMetricsAnalyzer:
             response += f"{i:2d}. {fund['fcode']} - {quality} {risk_indicator}\n"
             response += f"    📊 Information Ratio: {ir:.3f}\n"
             response += f"    📈 Aktif Getiri: %{fund['active_return']:.2f} (yıllık)\n"
-            response += f"    📉 Tracking Error: %{fund['tracking_error']:.2f} (tahmini)\n"
+            response += f"    📉 Tracking Error: %{fund['tracking_error']:.2f}"
+            if fund.get('is_estimate'):
+                response += " (tahmini)"
+            response += f"\n"
             response += f"    💰 Toplam Getiri: %{fund['annual_return']:.1f}\n"
             response += f"    ⚡ Sharpe: {fund['sharpe_ratio']:.3f}\n"
             if fund['calmar_ratio'] > 0:
@@ -1092,56 +1102,102 @@ class AdvancedMetricsAnalyzer:
             return beta == threshold
     
     # Mevcut yardımcı metodlar aynen kalacak...
-    def _get_benchmark_data(self) -> Optional[pd.DataFrame]:
-        """Benchmark verilerini al (BIST100 proxy olarak)"""
+    def _get_benchmark_data(self, benchmark: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Benchmark fiyat serisi (varsayılan BIST100 proxy) - veri sürümü başına bir kez çözülür"""
+        entry = self._resolve_benchmark(benchmark)
+        return entry['prices'] if entry else None
+    
+    def _resolve_benchmark(self, benchmark: Optional[str] = None) -> Optional[Dict]:
+        """
+        AnalysisConfig.benchmarks içindeki adlandırılmış benchmark'ı çöz ve önbelleğe al.
+        Öncelik büyüklük ağırlıklı faktör endeksidir (factor_index); endeks yoksa aday
+        fonlar önbellekteki fiyat panelinden kontrol edilir, fon başına sorgu yapılmaz.
+        """
+        name = benchmark or self.analysis_config.default_benchmark
+        spec = self.analysis_config.benchmarks.get(name)
+        if spec is None:
+            self.logger.warning(f"Tanımsız benchmark: {name}")
+            return None
+        
         try:
-            # Önce TI2 (BIST100 index fonu) dene
-            benchmark_data = self.coordinator.db.get_fund_price_history('TI2', 252)
-            if not benchmark_data.empty and len(benchmark_data) > 60:
-                return benchmark_data
-            
-            # Alternatif benchmark fonları dene
-            for fund in ['TKF', 'GAF', 'GEH', 'TYH']:
-                benchmark_data = self.coordinator.db.get_fund_price_history(fund, 252)
-                if not benchmark_data.empty and len(benchmark_data) > 60:
-                    return benchmark_data
-            
-            # Son çare: En büyük hisse senedi fonunu benchmark olarak kullan
-            print("   ⚠️ Index fon bulunamadı, alternatif benchmark aranıyor...")
-            query = """
-            SELECT DISTINCT f.fcode 
-            FROM tefasfunds f
-            JOIN tefasfunddetails d ON f.fcode = d.fcode
-            WHERE d.stock > 80  -- %80+ hisse senedi
-            GROUP BY f.fcode 
-            ORDER BY AVG(f.fcapacity) DESC 
-            LIMIT 1
-            """
-            result = self.coordinator.db.execute_query(query)
-            if not result.empty:
-                benchmark_data = self.coordinator.db.get_fund_price_history(result.iloc[0]['fcode'], 252)
-                if not benchmark_data.empty:
-                    print(f"   ✅ Alternatif benchmark: {result.iloc[0]['fcode']}")
-                    return benchmark_data
-                    
+            db = self.coordinator.db
+            version = db.get_data_version()
+            cached = self._benchmark_cache.get(name)
+            if cached is not None and cached['version'] == version:
+                return cached
+            
+            entry = self._resolve_index_benchmark(name, spec, version)
+            if entry is not None:
+                self._benchmark_cache[name] = entry
+                return entry
+            
+            panel = db.get_price_panel(days=252)
+            observations = panel.count()
+            fcode = next((code for code in spec['fund_codes']
+                          if code in panel.columns and observations[code] > 60), None)
+            
+            if fcode is None:
+                # Son çare: varlık dağılımı uyan en büyük fon
+                print(f"   ⚠️ {name} için index fon bulunamadı, alternatif benchmark aranıyor...")
+                fcode = self._find_benchmark_proxy(spec, observations)
+                if fcode is None:
+                    return None
+                print(f"   ✅ Alternatif benchmark: {fcode}")
+            
+            prices = panel[fcode].dropna()
+            entry = {
+                'version': version,
+                'name': name,
+                'fcode': fcode,
+                'prices': pd.DataFrame({'pdate': prices.index, 'price': prices.values, 'fcode': fcode})
+            }
+            self._benchmark_cache[name] = entry
+            return entry
+            
         except Exception as e:
-            self.logger.error(f"Benchmark verisi alınamadı: {e}")
+            self.logger.error(f"Benchmark verisi alınamadı ({name}): {e}")
         
         return None
     
-    def _calculate_returns(self, price_data: pd.DataFrame) -> pd.Series:
-        """Günlük getirileri hesapla"""
-        prices = price_data.set_index('pdate')['price'].sort_index()
-        return prices.pct_change().dropna()
+    def _resolve_index_benchmark(self, name: str, spec: Dict, version) -> Optional[Dict]:
+        """Benchmark'ın faktör endeksi serisi (son 252 işlem günü); yetersizse None"""
+        index_name = spec.get('factor_index')
+        if not index_name:
+            return None
+        try:
+            levels = self.factor_indices.get_levels(index_name)
+        except Exception as e:
+            self.logger.warning(f"Faktör endeksi okunamadı ({index_name}): {e}")
+            return None
+        if levels is None:
+            return None
+        
+        prices = levels.dropna().tail(252)
+        if len(prices) <= 60:
+            return None
+        label = INDEX_LABELS.get(index_name, index_name)
+        return {
+            'version': version,
+            'name': name,
+            'fcode': label,
+            'prices': pd.DataFrame({'pdate': prices.index, 'price': prices.values, 'fcode': label})
+        }
     
-    def _annualized_return(self, returns: pd.Series) -> float:
-        """Yıllık getiri hesapla"""
-        if len(returns) == 0:
-            return 0
-        # Compound annual return
-        total_return = (1 + returns).prod() - 1
-        n_days = len(returns)
-        return ((1 + total_return) ** (252 / n_days) - 1) * 100
+    def _find_benchmark_proxy(self, spec: Dict, observations: pd.Series) -> Optional[str]:
+        """Varlık sınıfı oranı eşiği geçen, yeterli geçmişe sahip en büyük fon"""
+        ratio_sum = ' + '.join(f"COALESCE({column}, 0)" for column in spec['asset_columns'])
+        query = f"""
+        SELECT fcode
+        FROM mv_fund_details_latest
+        WHERE {ratio_sum} >= {float(spec['min_ratio'])}
+        ORDER BY fcapacity DESC NULLS LAST
+        LIMIT 20
+        """
+        result = self.coordinator.db.execute_query(query)
+        for fcode in result['fcode']:
+            if observations.get(fcode, 0) > 60:
+                return fcode
+        return None
     
     def _calculate_beta(self, fund_data: pd.DataFrame, benchmark_data: pd.DataFrame) -> Optional[float]:
         """Beta katsayısını hesapla"""
@@ -1206,111 +1262,95 @@ class AdvancedMetricsAnalyzer:
         
         return None
     
-    def _calculate_alpha(self, fund_data: pd.DataFrame, benchmark_data: pd.DataFrame) -> Optional[Dict]:
-        """Alpha değerini hesapla (Jensen's Alpha)"""
-        try:
-            # Beta hesapla
-            beta = self._calculate_beta(fund_data, benchmark_data)
-            if beta is None:
-                return None
-            
-            # Getiriler
-            fund_returns = self._calculate_returns(fund_data)
-            benchmark_returns = self._calculate_returns(benchmark_data)
-            
-            # Ortak tarihler
-            common_dates = fund_returns.index.intersection(benchmark_returns.index)
-            fund_returns = fund_returns[common_dates]
-            benchmark_returns = benchmark_returns[common_dates]
-            
-            # Yıllık getiriler
-            fund_annual_return = self._annualized_return(fund_returns)
-            benchmark_annual_return = self._annualized_return(benchmark_returns)
-            
-            # Alpha = Fund Return - (Risk Free Rate + Beta * (Market Return - Risk Free Rate))
-            alpha = fund_annual_return - (self.risk_free_rate * 100 + beta * (benchmark_annual_return - self.risk_free_rate * 100))
-            
-            # R-squared hesapla
-            correlation = fund_returns.corr(benchmark_returns)
-            r_squared = correlation ** 2
-            
-            return {
-                'alpha': alpha,
-                'beta': beta,
-                'fund_return': fund_annual_return,
-                'benchmark_return': benchmark_annual_return,
-                'r_squared': r_squared
-            }
-            
-        except Exception as e:
-            self.logger.error(f"Alpha hesaplama hatası: {e}")
+    def _calculate_benchmark_metrics_batch(self, fcodes: List[str], benchmark_data: pd.DataFrame,
+                                           days: int = 120, min_observations: int = 20) -> pd.DataFrame:
+        """
+        Beta, alpha, tracking error ve information ratio'yu tüm fonlar için tek geçişte hesapla.
         
-        return None
-    
-    def _calculate_tracking_error(self, fund_data: pd.DataFrame, benchmark_data: pd.DataFrame) -> Optional[Dict]:
-        """Tracking Error hesapla"""
-        try:
-            # Getiriler
-            fund_returns = self._calculate_returns(fund_data)
-            benchmark_returns = self._calculate_returns(benchmark_data)
-            
-            # Ortak tarihler
-            common_dates = fund_returns.index.intersection(benchmark_returns.index)
-            fund_returns = fund_returns[common_dates]
-            benchmark_returns = benchmark_returns[common_dates]
-            
-            # Tracking error = Std(Fund Return - Benchmark Return)
-            active_returns = fund_returns - benchmark_returns
-            tracking_error = active_returns.std() * np.sqrt(252) * 100  # Yıllık %
-            
-            # Diğer metrikler
-            correlation = fund_returns.corr(benchmark_returns)
-            beta = self._calculate_beta(fund_data, benchmark_data)
-            
-            return {
-                'tracking_error': tracking_error,
-                'correlation': correlation,
-                'beta': beta if beta else 1.0,
-                'fund_return': self._annualized_return(fund_returns),
-                'benchmark_return': self._annualized_return(benchmark_returns)
-            }
-            
-        except Exception as e:
-            self.logger.error(f"Tracking error hesaplama hatası: {e}")
+        Fiyatlar tek bir tarih x fon panelinden gelir ve benchmark tarihlerine hizalanır.
+        Her fonun getirisi kendi bir önceki fiyatından, benchmark getirisi de aynı aralıktan
+        hesaplanır; kovaryans ve varyans maskelenmiş kapalı formüllerle bulunur.
+        """
+        columns = ['beta', 'alpha', 'fund_return', 'benchmark_return', 'r_squared', 'correlation',
+                   'tracking_error', 'information_ratio', 'active_return', 'sharpe_ratio', 'observations']
+        empty = pd.DataFrame(columns=columns)
+        
+        if benchmark_data is None or benchmark_data.empty or not fcodes:
+            return empty
         
-        return None
-    
-    def _calculate_information_ratio(self, fund_data: pd.DataFrame, benchmark_data: pd.DataFrame) -> Optional[Dict]:
-        """Information Ratio hesapla"""
         try:
-            # Tracking error hesapla
-            te_data = self._calculate_tracking_error(fund_data, benchmark_data)
-            if te_data is None or te_data['tracking_error'] == 0:
-                return None
-            
-            # Active return
-            active_return = te_data['fund_return'] - te_data['benchmark_return']
-            
-            # Information Ratio = Active Return / Tracking Error
-            information_ratio = active_return / te_data['tracking_error']
-            
-            # Sharpe ratio da hesapla
-            fund_returns = self._calculate_returns(fund_data)
-            fund_volatility = fund_returns.std() * np.sqrt(252)
-            sharpe_ratio = (te_data['fund_return'] - self.risk_free_rate * 100) / (fund_volatility * 100)
-            
-            return {
+            price_panel = self.coordinator.db.get_price_panel(fcodes, days)
+            if price_panel.empty:
+                return empty
+            
+            benchmark = (benchmark_data.assign(pdate=pd.to_datetime(benchmark_data['pdate']))
+                         .drop_duplicates('pdate').set_index('pdate')['price'].astype(float).sort_index())
+            common_dates = price_panel.index.intersection(benchmark.index)
+            if len(common_dates) <= min_observations:
+                return empty
+            
+            prices = price_panel.loc[common_dates].to_numpy(dtype=float)
+            bench_prices = benchmark.loc[common_dates].to_numpy()
+            n_dates, n_funds = prices.shape
+            fund_cols = np.arange(n_funds)
+            
+            # Fonun bir önceki geçerli fiyatının satırı; eksik günler aralığı uzatır
+            valid = np.isfinite(prices) & (prices > 0)
+            rows = np.where(valid, np.arange(n_dates)[:, None], -1)
+            previous = np.vstack([np.full((1, n_funds), -1), np.maximum.accumulate(rows, axis=0)[:-1]])
+            mask = valid & (previous >= 0)
+            previous = np.maximum(previous, 0)
+            
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fund_ret = np.where(mask, prices / prices[previous, fund_cols] - 1, 0.0)
+                bench_ret = np.where(mask, bench_prices[:, None] / bench_prices[previous] - 1, 0.0)
+                
+                n = mask.sum(axis=0)
+                fund_dev = np.where(mask, fund_ret - fund_ret.sum(axis=0) / n, 0.0)
+                bench_dev = np.where(mask, bench_ret - bench_ret.sum(axis=0) / n, 0.0)
+                
+                covariance = (fund_dev * bench_dev).sum(axis=0) / (n - 1)
+                fund_var = (fund_dev ** 2).sum(axis=0) / (n - 1)
+                bench_var = (bench_dev ** 2).sum(axis=0) / (n - 1)
+                
+                beta = np.where(bench_var > 0, covariance / bench_var, np.nan)
+                beta[~((beta > -5) & (beta < 5))] = np.nan  # Makul beta aralığı
+                correlation = covariance / np.sqrt(fund_var * bench_var)
+                
+                # Yıllık bileşik getiriler (%)
+                fund_return = (np.exp(np.log1p(fund_ret).sum(axis=0) * 252 / n) - 1) * 100
+                benchmark_return = (np.exp(np.log1p(bench_ret).sum(axis=0) * 252 / n) - 1) * 100
+                
+                rf = self.risk_free_rate * 100
+                alpha = fund_return - (rf + beta * (benchmark_return - rf))
+                
+                # Tracking error = Std(Fon - Benchmark) yıllık %
+                active = np.where(mask, fund_ret - bench_ret, 0.0)
+                active_dev = np.where(mask, active - active.sum(axis=0) / n, 0.0)
+                tracking_error = np.sqrt((active_dev ** 2).sum(axis=0) / (n - 1)) * np.sqrt(252) * 100
+                active_return = fund_return - benchmark_return
+                information_ratio = np.where(tracking_error > 0, active_return / tracking_error, np.nan)
+                sharpe_ratio = (fund_return - rf) / (np.sqrt(fund_var) * np.sqrt(252) * 100)
+            
+            metrics = pd.DataFrame({
+                'beta': beta,
+                'alpha': alpha,
+                'fund_return': fund_return,
+                'benchmark_return': benchmark_return,
+                'r_squared': correlation ** 2,
+                'correlation': correlation,
+                'tracking_error': tracking_error,
                 'information_ratio': information_ratio,
                 'active_return': active_return,
-                'tracking_error': te_data['tracking_error'],
-                'fund_return': te_data['fund_return'],
-                'sharpe_ratio': sharpe_ratio
-            }
+                'sharpe_ratio': sharpe_ratio,
+                'observations': n
+            }, index=price_panel.columns)
+            
+            return metrics[n >= min_observations]
             
         except Exception as e:
-            self.logger.error(f"Information ratio hesaplama hatası: {e}")
-        
-        return None
+            self.logger.error(f"Toplu benchmark metrik hesaplama hatası: {e}")
+            return empty
     
     def _identify_index_funds(self) -> List[str]:
         """Index fonları tespit et"""
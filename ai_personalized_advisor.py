@@ -10,6 +10,9 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import numpy as np
+from analysis.advisor_candidates import SleeveCandidateIndex, horizon_bucket, risk_aversion
+
+HORIZON_LABELS = {'short': 'Kısa (≤3 yıl)', 'medium': 'Orta (3-10 yıl)', 'long': 'Uzun (10+ yıl)'}
 
 @dataclass
 class UserProfile:
@@ -33,6 +36,9 @@ class AIPersonalizedAdvisor:
         self.coordinator = coordinator
         self.ai_provider = ai_provider
         self.db = coordinator.db
+        self.candidates = SleeveCandidateIndex(self.db)
+        self._advice_cache = {}
+        self._advice_version = None
         
         # Risk profilleri ve yaş grupları
         self.risk_profiles = {
@@ -73,7 +79,9 @@ class AIPersonalizedAdvisor:
             'adjusted_risk_profile': self._adjust_risk_profile(profile),
             'investment_horizon': profile.years_to_goal,
             'liquidity_needs': self._assess_liquidity_needs(profile),
-            'tax_considerations': self._get_tax_considerations(profile)
+            'tax_considerations': self._get_tax_considerations(profile),
+            'horizon_bucket': horizon_bucket(profile.years_to_goal),
+            'special_sleeves': self._get_special_sleeves(profile)
         }
         
         return analysis
@@ -179,230 +187,124 @@ class AIPersonalizedAdvisor:
         return considerations
     
     def _get_suitable_funds(self, profile: UserProfile, analysis: Dict) -> Dict:
-        """Profile uygun fonları bul"""
-        risk_profile = analysis['adjusted_risk_profile']
-        
-        # Risk profiline göre varlık dağılımı
-        allocation = self.risk_profiles[risk_profile]
+        """Profile uygun fonları bul - önbellekteki aday kümeleri, profil faydasıyla sıralı"""
+        aversion = risk_aversion(analysis['adjusted_risk_profile'], analysis['horizon_bucket'])
         
         suitable_funds = {
-            'equity_funds': self._get_equity_funds(allocation['equity'], profile),
-            'bond_funds': self._get_bond_funds(allocation['bond'], profile),
-            'money_market_funds': self._get_money_market_funds(allocation['money_market'], profile),
-            'special_funds': self._get_special_situation_funds(profile, analysis)
+            'equity_funds': self._get_equity_funds(aversion),
+            'bond_funds': self._get_bond_funds(aversion),
+            'money_market_funds': self._get_money_market_funds(aversion),
+            'special_funds': self._get_special_situation_funds(analysis, aversion)
         }
         
         return suitable_funds
     
-    def _get_equity_funds(self, allocation_pct: int, profile: UserProfile) -> List[Dict]:
-        """Hisse senedi fonlarını getir"""
+    def _rank_sleeve(self, sleeve: str, aversion: float, error_label: str) -> List[Dict]:
+        """Dilim adaylarını fayda fonksiyonuyla sırala - yeni SQL yok"""
         try:
-            query = """
-            SELECT 
-                pm.fcode,
-                lf.ftitle as fund_name,
-                pm.annual_return * 100 as annual_return,
-                pm.annual_volatility * 100 as volatility,
-                pm.sharpe_ratio,
-                lf.totalfundsize / 1000000 as size_million_tl,
-                lf.investorcount
-            FROM mv_fund_performance_metrics pm
-            JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
-            JOIN tefasfunddetails fd ON pm.fcode = fd.fcode
-            WHERE fd.stock > 50
-            AND lf.investorcount > 1000
-            AND pm.sharpe_ratio > 0.5
-            ORDER BY pm.sharpe_ratio DESC
-            LIMIT 10
-            """
-            
-            result = self.db.execute_query(query)
-            if not result.empty:
-                return result.to_dict('records')[:5]
-            return []
-            
+            return self.candidates.rank(sleeve, aversion)
         except Exception as e:
-            print(f"Hisse fonu sorgulama hatası: {e}")
+            print(f"{error_label}: {e}")
             return []
     
-    def _get_bond_funds(self, allocation_pct: int, profile: UserProfile) -> List[Dict]:
+    def _get_equity_funds(self, aversion: float) -> List[Dict]:
+        """Hisse senedi fonlarını getir"""
+        return self._rank_sleeve('equity_funds', aversion, "Hisse fonu sorgulama hatası")
+    
+    def _get_bond_funds(self, aversion: float) -> List[Dict]:
         """Borçlanma araçları fonlarını getir"""
-        try:
-            query = """
-            SELECT 
-                pm.fcode,
-                lf.ftitle as fund_name,
-                pm.annual_return * 100 as annual_return,
-                pm.annual_volatility * 100 as volatility,
-                pm.sharpe_ratio,
-                lf.totalfundsize / 1000000 as size_million_tl
-            FROM mv_fund_performance_metrics pm
-            JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
-            JOIN tefasfunddetails fd ON pm.fcode = fd.fcode
-            WHERE (fd.governmentbond > 30 OR fd.eurobonds > 30)
-            AND pm.annual_volatility < 0.15
-            ORDER BY pm.sharpe_ratio DESC
-            LIMIT 10
-            """
-            
-            result = self.db.execute_query(query)
-            if not result.empty:
-                return result.to_dict('records')[:5]
-            return []
-            
-        except Exception as e:
-            print(f"Tahvil fonu sorgulama hatası: {e}")
-            return []
+        return self._rank_sleeve('bond_funds', aversion, "Tahvil fonu sorgulama hatası")
     
-    def _get_money_market_funds(self, allocation_pct: int, profile: UserProfile) -> List[Dict]:
+    def _get_money_market_funds(self, aversion: float) -> List[Dict]:
         """Para piyasası fonlarını getir"""
-        try:
-            query = """
-            SELECT 
-                pm.fcode,
-                lf.ftitle as fund_name,
-                pm.annual_return * 100 as annual_return,
-                pm.annual_volatility * 100 as volatility,
-                lf.totalfundsize / 1000000 as size_million_tl
-            FROM mv_fund_performance_metrics pm
-            JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
-            WHERE lf.ftitle LIKE '%PARA PIYASASI%'
-            AND pm.annual_volatility < 0.05
-            ORDER BY pm.annual_return DESC
-            LIMIT 5
-            """
-            
-            result = self.db.execute_query(query)
-            if not result.empty:
-                return result.to_dict('records')
-            return []
-            
-        except Exception as e:
-            print(f"Para piyasası fonu sorgulama hatası: {e}")
-            return []
+        return self._rank_sleeve('money_market_funds', aversion, "Para piyasası fonu sorgulama hatası")
     
-    def _get_special_situation_funds(self, profile: UserProfile, analysis: Dict) -> List[Dict]:
-        """Özel durum fonları (altın, döviz, sektörel)"""
+    def _get_special_situation_funds(self, analysis: Dict, aversion: float) -> List[Dict]:
+        """Özel durum fonları (enflasyon koruması, emekliliğe yakın muhafazakar fonlar)"""
         special_funds = []
         
+        if 'inflation_protection' in analysis['special_sleeves']:
+            special_funds.extend(self._get_inflation_protection_funds(aversion))
+        
+        if 'conservative' in analysis['special_sleeves']:
+            special_funds.extend(self._get_conservative_funds(aversion))
+        
+        return special_funds
+    
+    def _get_special_sleeves(self, profile: UserProfile) -> Tuple[str, ...]:
+        """Profile eklenecek özel dilimler"""
+        sleeves = []
         # Enflasyon koruması
         if profile.years_to_goal > 5:
-            special_funds.extend(self._get_inflation_protection_funds())
-        
+            sleeves.append('inflation_protection')
         # Emeklilik yakınsa güvenli fonlar
         if profile.financial_goal == 'retirement' and profile.years_to_goal < 5:
-            special_funds.extend(self._get_conservative_funds())
-        
-        return special_funds
+            sleeves.append('conservative')
+        return tuple(sleeves)
     
-    def _get_inflation_protection_funds(self) -> List[Dict]:
+    def _get_inflation_protection_funds(self, aversion: float) -> List[Dict]:
         """Enflasyon korumalı fonlar"""
-        try:
-            query = """
-            SELECT 
-                pm.fcode,
-                lf.ftitle as fund_name,
-                pm.annual_return * 100 as annual_return
-            FROM mv_fund_performance_metrics pm
-            JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
-            WHERE (lf.ftitle LIKE '%ALTIN%' OR lf.ftitle LIKE '%EURO%' OR lf.ftitle LIKE '%DOLAR%')
-            AND pm.annual_return > 20
-            ORDER BY pm.annual_return DESC
-            LIMIT 3
-            """
-            
-            result = self.db.execute_query(query)
-            if not result.empty:
-                return result.to_dict('records')
-            return []
-            
-        except:
-            return []
+        return self._rank_sleeve('inflation_protection', aversion, "Enflasyon koruma fonu sorgulama hatası")
     
-    def _get_conservative_funds(self) -> List[Dict]:
+    def _get_conservative_funds(self, aversion: float) -> List[Dict]:
         """Muhafazakar fonlar"""
-        try:
-            query = """
-            SELECT 
-                pm.fcode,
-                lf.ftitle as fund_name,
-                pm.annual_return * 100 as annual_return,
-                pm.annual_volatility * 100 as volatility
-            FROM mv_fund_performance_metrics pm
-            JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
-            WHERE pm.annual_volatility < 0.10
-            AND pm.annual_return > 15
-            ORDER BY pm.sharpe_ratio DESC
-            LIMIT 3
-            """
-            
-            result = self.db.execute_query(query)
-            if not result.empty:
-                return result.to_dict('records')
-            return []
-            
-        except:
-            return []
+        return self._rank_sleeve('conservative', aversion, "Muhafazakar fon sorgulama hatası")
     
     def _get_ai_personalized_advice(self, profile: UserProfile, analysis: Dict, suitable_funds: Dict) -> str:
-        """AI'dan kişiselleştirilmiş tavsiye al"""
+        """
+        AI açıklaması. Prompt yalnızca (risk profili, dağılım kovası) ve seçilen fonlara
+        bağlıdır; yanıt veri sürümü boyunca bu anahtarla önbellekte tutulur. Kişiye özel
+        tutarlar _format_plan_details ile yerelde hesaplanır.
+        """
+        risk_profile = analysis['adjusted_risk_profile']
+        bucket = (analysis['horizon_bucket'], analysis['special_sleeves'])
+        version = self.candidates.version
+        if version != self._advice_version:
+            self._advice_cache = {}
+            self._advice_version = version
+        
+        cache_key = (risk_profile, bucket)
+        if cache_key in self._advice_cache:
+            return self._advice_cache[cache_key]
         
         # Fon önerilerini formatla
         fund_recommendations = self._format_fund_recommendations(suitable_funds)
+        allocation = self.risk_profiles[risk_profile]
         
         prompt = f"""
         TEFAS Yatırımcı Profili Analizi:
         
-        KİŞİSEL BİLGİLER:
-        - Yaş: {profile.age} ({analysis['life_stage']} dönem)
-        - Aylık Gelir: {profile.monthly_income:,.0f} TL
-        - Risk Toleransı: {profile.risk_tolerance}
-        - Düzeltilmiş Risk Profili: {analysis['adjusted_risk_profile']}
-        - Hedef: {profile.financial_goal} ({profile.years_to_goal} yıl)
-        - Mevcut Birikim: {profile.current_savings:,.0f} TL
-        - Aile Durumu: {profile.family_status}
-        - Yatırım Deneyimi: {profile.investment_experience}
-        
-        ANALİZ SONUÇLARI:
-        - Tasarruf Oranı: %{analysis['savings_rate']:.1f}
-        - Risk Kapasitesi: {analysis['risk_capacity']}
-        - Likidite İhtiyacı: {analysis['liquidity_needs']}
-        - Vergi Avantajları: {', '.join(analysis['tax_considerations'])}
-        
-        ÖNERİLEN FONLAR:
-        {fund_recommendations}
+        PROFİL SINIFI:
+        - Risk Profili: {risk_profile}
+        - Vade: {HORIZON_LABELS[analysis['horizon_bucket']]}
+        - Varlık Dağılımı: Hisse %{allocation['equity']}, Tahvil/Bono %{allocation['bond']}, Para Piyasası %{allocation['money_market']}
         
-        Lütfen bu kişiye özel:
+        ÖNERİLEN FONLAR (ortalama-varyans faydasına göre seçildi):
+        {fund_recommendations}
         
-        1. UYGUN RİSK PROFİLİ DEĞERLENDİRMESİ
-        - Neden bu risk profili uygun?
-        - Yaşam evresine göre düzeltmeler
+        Lütfen bu profil sınıfı için:
         
-        2. AYLIK BİRİKİM ÖNERİSİ
-        - Hedefine ulaşması için aylık ne kadar biriktirmeli?
-        - Gelir/gider dengesine göre makul mu?
+        1. RİSK PROFİLİ DEĞERLENDİRMESİ
+        - Bu dağılım bu vade ve risk profili için neden uygun?
         
-        3. DETAYLI PORTFÖY DAĞILIMI
-        - Yukarıdaki fonlardan spesifik öneriler
-        - Her fon için yatırım miktarı/yüzdesi
-        - Neden bu fonlar seçildi?
+        2. FON SEÇİMİNİN GEREKÇESİ
+        - Yukarıdaki fonlar neden seçildi, dilimler birbirini nasıl tamamlıyor?
         
-        4. ALTERNATİF SENARYOLAR
+        3. ALTERNATİF SENARYOLAR
         - Daha agresif yaklaşım
         - Daha muhafazakar yaklaşım
-        - Farklı birikim tutarları
         
-        5. KRİTİK UYARILAR VE RİSKLER
+        4. KRİTİK UYARILAR VE RİSKLER
         - Bu profil için özel riskler
         - Kaçınılması gereken hatalar
         - Periyodik gözden geçirme önerileri
         
-        6. TÜRK EKONOMİSİ BAĞLAMINDA DEĞERLENDİRME
+        5. TÜRK EKONOMİSİ BAĞLAMINDA DEĞERLENDİRME
         - Enflasyon etkisi
         - Döviz riski
         - Faiz ortamı
         
-        Tavsiyeler somut, uygulanabilir ve kişiye özel olmalı.
+        Kişisel tutarlar ayrıca hesaplanıyor; açıklama somut ve uygulanabilir olmalı.
         """
         
         try:
@@ -410,6 +312,7 @@ class AIPersonalizedAdvisor:
                 prompt,
                 "Sen uzman bir finansal danışmansın. Kişiye özel, uygulanabilir tavsiyeler veriyorsun."
             )
+            self._advice_cache[cache_key] = ai_response
             return ai_response
         except Exception as e:
             print(f"AI danışmanlık hatası: {e}")
@@ -445,6 +348,8 @@ class AIPersonalizedAdvisor:
         response += f"   • Risk Profili: {analysis['adjusted_risk_profile'].upper()}\n"
         response += f"   • Mevcut Birikim: {profile.current_savings:,.0f} TL\n\n"
         
+        response += self._format_plan_details(profile, analysis, suitable_funds)
+        
         # AI tavsiyesi
         response += f"🤖 KİŞİYE ÖZEL AI TAVSİYELERİ:\n"
         response += f"{'='*60}\n"
@@ -464,6 +369,36 @@ class AIPersonalizedAdvisor:
         
         return response
     
+    def _format_plan_details(self, profile: UserProfile, analysis: Dict, suitable_funds: Dict) -> str:
+        """Kişiye özel aylık birikim ve fon başına tutarlar (LLM'e gönderilmez)"""
+        monthly_savings = max(profile.monthly_income * analysis['savings_rate'] / 100, 0)
+        allocation = self.risk_profiles[analysis['adjusted_risk_profile']]
+        sleeves = {
+            'equity': ('Hisse Senedi', suitable_funds.get('equity_funds', [])),
+            'bond': ('Tahvil/Bono', suitable_funds.get('bond_funds', [])),
+            'money_market': ('Para Piyasası', suitable_funds.get('money_market_funds', []))
+        }
+        
+        text = f"💰 AYLIK BİRİKİM PLANI:\n"
+        text += f"   • Tasarruf oranı: %{analysis['savings_rate']:.1f}\n"
+        text += f"   • Önerilen aylık birikim: {monthly_savings:,.0f} TL\n"
+        for sleeve, (label, funds) in sleeves.items():
+            amount = monthly_savings * allocation[sleeve] / 100
+            text += f"   • {label} (%{allocation[sleeve]}): {amount:,.0f} TL/ay\n"
+            chosen = funds[:3]
+            for fund in chosen:
+                text += (f"      - {fund['fcode']}: {amount / len(chosen):,.0f} TL "
+                         f"(Yıllık: %{fund['annual_return']:.1f}, Risk: %{fund['volatility']:.1f})\n")
+        
+        special = suitable_funds.get('special_funds', [])
+        if special:
+            text += f"   • Özel durum fonları: {', '.join(fund['fcode'] for fund in special)}\n"
+        if analysis['liquidity_needs'] == 'high':
+            text += f"   ⚠️ Likidite ihtiyacınız yüksek - önce acil durum fonunu tamamlayın\n"
+        if analysis['tax_considerations']:
+            text += f"   🧾 Vergi avantajları: {', '.join(analysis['tax_considerations'])}\n"
+        return text + "\n"
+    
     def _get_fallback_advice(self, profile: UserProfile, analysis: Dict) -> str:
         """AI kullanılamadığında fallback tavsiye"""
         return f"""
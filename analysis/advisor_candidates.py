@@ -0,0 +1,177 @@
+# analysis/advisor_candidates.py
+"""
+Kişisel danışman dilim adayları
+Performans metrikleri, son fon verisi ve güncel portföy oranları veri sürümü
+başına tek sorguyla okunur; her dilimin (hisse, tahvil, para piyasası, enflasyon
+koruması, muhafazakar) aday kümesi bildirimsel kurallarla bir kez çıkarılır ve
+bellekte tutulur. Profil başına sıralama ortalama-varyans fayda fonksiyonuyla
+(getiri - ½·λ·volatilite²) tüm adaylar için vektörel yapılır.
+"""
+
+import logging
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Dilim -> aday kuralları. Oranlar mv_fund_details_latest (%); volatilite ve min_return
+# mv_fund_performance_metrics ile aynı birimde (ondalık, 0.20 = %20).
+SLEEVES: Dict[str, Dict] = {
+    'equity_funds': {
+        'ratio_min': {'stock': 50}, 'min_investors': 1000, 'min_sharpe': 0.5, 'limit': 5
+    },
+    'bond_funds': {
+        'ratio_min': {'governmentbond': 30, 'eurobonds': 30}, 'max_volatility': 0.15, 'limit': 5
+    },
+    'money_market_funds': {
+        'title_any': ['PARA PIYASASI'], 'max_volatility': 0.05, 'limit': 5
+    },
+    'inflation_protection': {
+        'title_any': ['ALTIN', 'EURO', 'DOLAR'], 'min_return': 0.20, 'limit': 3
+    },
+    'conservative': {
+        'max_volatility': 0.10, 'min_return': 0.15, 'limit': 3
+    }
+}
+RATIO_COLUMNS = sorted({column for spec in SLEEVES.values() for column in spec.get('ratio_min', {})})
+
+# Risk profili -> risk kaçınma katsayısı (λ); vade kısaldıkça λ büyür
+RISK_AVERSION = {'low': 8.0, 'medium': 4.0, 'high': 2.0, 'very_high': 1.0}
+HORIZON_BUCKETS = [  # (üst sınır yıl, kova, λ çarpanı)
+    (3, 'short', 2.0),
+    (10, 'medium', 1.0),
+    (float('inf'), 'long', 0.75)
+]
+
+OUTPUT_COLUMNS = ['fcode', 'fund_name', 'annual_return', 'volatility', 'sharpe_ratio',
+                  'size_million_tl', 'investorcount', 'utility']
+
+
+def candidate_query() -> str:
+    """Tüm dilimlerin ortak aday sorgusu (performans + son fon verisi + portföy oranları)"""
+    ratios = ', '.join(f"fd.{column}" for column in RATIO_COLUMNS)
+    return f"""
+    SELECT
+        pm.fcode,
+        lf.ftitle as fund_name,
+        pm.annual_return,
+        pm.annual_volatility,
+        pm.sharpe_ratio,
+        lf.fcapacity,
+        lf.investorcount,
+        {ratios}
+    FROM mv_fund_performance_metrics pm
+    JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
+    LEFT JOIN mv_fund_details_latest fd ON pm.fcode = fd.fcode
+    """
+
+
+def horizon_bucket(years_to_goal: float) -> str:
+    """Hedef süresini vade kovasına çevir"""
+    for upper, bucket, _ in HORIZON_BUCKETS:
+        if years_to_goal <= upper:
+            return bucket
+    return HORIZON_BUCKETS[-1][1]
+
+
+def risk_aversion(risk_profile: str, bucket: str) -> float:
+    """Profil ve vade kovası için λ"""
+    multiplier = {name: factor for _, name, factor in HORIZON_BUCKETS}[bucket]
+    return RISK_AVERSION.get(risk_profile, RISK_AVERSION['medium']) * multiplier
+
+
+class SleeveCandidateIndex:
+    """Dilim -> aday fon kümesi (veri sürümü başına) ve vektörel fayda sıralaması"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._candidates: Dict[str, pd.DataFrame] = {}
+
+    def _ensure_candidates(self, force_refresh: bool = False):
+        version = (self.db.get_data_version(force_refresh), self.db.get_portfolio_version(force_refresh))
+        if self._candidates and not force_refresh and version == self._version:
+            return
+
+        funds = self.db.execute_query(candidate_query()).drop_duplicates('fcode')
+        numeric = ['annual_return', 'annual_volatility', 'sharpe_ratio', 'fcapacity',
+                   'investorcount'] + RATIO_COLUMNS
+        funds[numeric] = funds[numeric].apply(pd.to_numeric, errors='coerce')
+        funds['fund_name'] = funds['fund_name'].fillna('')
+
+        self._candidates = {name: self._select(funds, spec) for name, spec in SLEEVES.items()}
+        self._version = version
+        self.logger.info(
+            "Danışman dilim adayları yüklendi: "
+            + ", ".join(f"{name}={len(frame)}" for name, frame in self._candidates.items())
+        )
+
+    @staticmethod
+    def _select(funds: pd.DataFrame, spec: Dict) -> pd.DataFrame:
+        """Dilim kurallarını tüm fonlara tek seferde uygula (NaN koşulu sağlamaz)"""
+        mask = np.ones(len(funds), dtype=bool)
+        if 'ratio_min' in spec:
+            # Oran koşullarından herhangi biri yeterli
+            mask &= np.logical_or.reduce([(funds[c] > v).to_numpy() for c, v in spec['ratio_min'].items()])
+        if 'title_any' in spec:
+            mask &= np.logical_or.reduce(
+                [funds['fund_name'].str.contains(word, regex=False).to_numpy() for word in spec['title_any']]
+            )
+        if 'min_investors' in spec:
+            mask &= (funds['investorcount'] > spec['min_investors']).to_numpy()
+        if 'min_sharpe' in spec:
+            mask &= (funds['sharpe_ratio'] > spec['min_sharpe']).to_numpy()
+        if 'max_volatility' in spec:
+            mask &= (funds['annual_volatility'] < spec['max_volatility']).to_numpy()
+        if 'min_return' in spec:
+            mask &= (funds['annual_return'] > spec['min_return']).to_numpy()
+
+        selected = funds[mask]
+        return pd.DataFrame({
+            'fcode': selected['fcode'].to_numpy(),
+            'fund_name': selected['fund_name'].to_numpy(),
+            'annual_return': selected['annual_return'].to_numpy() * 100,
+            'volatility': selected['annual_volatility'].to_numpy() * 100,
+            'sharpe_ratio': selected['sharpe_ratio'].to_numpy(),
+            'size_million_tl': selected['fcapacity'].to_numpy() / 1000000,
+            'investorcount': selected['investorcount'].to_numpy()
+        })
+
+    @property
+    def version(self):
+        """Aday kümelerinin ait olduğu (fiyat, portföy) veri sürümü"""
+        self._ensure_candidates()
+        return self._version
+
+    def get_candidates(self, sleeve: str) -> pd.DataFrame:
+        """Dilimin önbellekteki aday kümesi"""
+        if sleeve not in SLEEVES:
+            raise ValueError(f"Bilinmeyen dilim: {sleeve}")
+        self._ensure_candidates()
+        return self._candidates[sleeve]
+
+    def utility_matrix(self, sleeve: str, aversions: Union[float, Sequence[float]]) -> np.ndarray:
+        """
+        Aday x λ fayda matrisi (% birim): getiri - ½·λ·volatilite².
+        Getirisi veya volatilitesi eksik adayların faydası -inf.
+        """
+        candidates = self.get_candidates(sleeve)
+        returns = candidates['annual_return'].to_numpy(dtype=np.float64) / 100
+        variance = (candidates['volatility'].to_numpy(dtype=np.float64) / 100) ** 2
+        lam = np.atleast_1d(np.asarray(aversions, dtype=np.float64))
+        utility = (returns[:, None] - 0.5 * lam[None, :] * variance[:, None]) * 100
+        return np.where(np.isnan(utility), -np.inf, utility)
+
+    def rank(self, sleeve: str, aversion: float, limit: int = None) -> List[Dict]:
+        """Dilimin en yüksek faydalı `limit` adayı (kayıt listesi)"""
+        candidates = self.get_candidates(sleeve)
+        if candidates.empty:
+            return []
+        utility = self.utility_matrix(sleeve, aversion)[:, 0]
+        limit = limit or SLEEVES[sleeve]['limit']
+        # Eşit faydada sharpe oranı yüksek olan önce
+        order = np.lexsort((-np.nan_to_num(candidates['sharpe_ratio'].to_numpy(dtype=np.float64)), -utility))
+        order = order[np.isfinite(utility[order])][:limit]
+        ranked = candidates.iloc[order].assign(utility=utility[order])
+        return ranked[OUTPUT_COLUMNS].to_dict('records')
@@ -0,0 +1,151 @@
+# analysis/currency_exposure.py
+"""
+Döviz exposure matrisi
+mv_fund_details_latest portföy tarihi başına bir kez fon x varlık sınıfı (float32)
+matrisine alınır. USD/EUR/TL/altın/enflasyon/hedge exposure'ları tüm fonlar için
+tek bir matris çarpımıyla (oranlar @ kova ağırlıkları) hesaplanır; kova veya
+döviz sınıfı sıralaması dizi argsort'udur.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.fund_classification import PORTFOLIO_COLUMNS
+
+# Kova -> {portföy kolonu: ağırlık}; calculate_currency_exposure ile aynı tanımlar
+EXPOSURE_BUCKETS: Dict[str, Dict[str, float]] = {
+    'usd_exposure': {
+        'foreignequity': 1.0, 'foreigndebtinstruments': 1.0,
+        'foreigncurrencybills': 0.7  # USD payı tahmini
+    },
+    'eur_exposure': {
+        'foreigncurrencybills': 0.3  # EUR payı tahmini
+    },
+    'tl_exposure': {
+        'stock': 1.0, 'governmentbond': 1.0, 'treasurybill': 1.0,
+        'termdeposittl': 1.0, 'participationaccounttl': 1.0
+    },
+    'precious_metals_exposure': {
+        'preciousmetals': 1.0, 'preciousmetalsbyf': 1.0,
+        'preciousmetalskba': 1.0, 'preciousmetalskks': 1.0
+    },
+    'inflation_exposure': {
+        'governmentleasecertificates': 1.0, 'privatesectorleasecertificates': 1.0,
+        'governmentbond': 1.0
+    },
+    'hedge_exposure': {
+        'derivatives': 1.0, 'futurescashcollateral': 1.0
+    },
+}
+EXPOSURE_BUCKETS['total_foreign'] = {
+    column: EXPOSURE_BUCKETS['usd_exposure'].get(column, 0) + EXPOSURE_BUCKETS['eur_exposure'].get(column, 0)
+    for column in set(EXPOSURE_BUCKETS['usd_exposure']) | set(EXPOSURE_BUCKETS['eur_exposure'])
+}
+
+# Döviz sınıfı portföy skoru: alternatif kovaların en büyüğü (CurrencyInflationAnalyzer kuralları)
+_FOREIGN_ASSETS = {'eurobonds': 1.0, 'foreigncurrencybills': 1.0, 'foreigndebtinstruments': 1.0}
+_TL_ASSETS = {'governmentbond': 1.0, 'treasurybill': 1.0, 'termdeposittl': 1.0}
+
+
+def build_weight_matrix(buckets: Dict[str, Dict[str, float]],
+                        columns: List[str] = PORTFOLIO_COLUMNS) -> np.ndarray:
+    """Varlık sınıfı x kova ağırlık matrisi"""
+    position = {column: i for i, column in enumerate(columns)}
+    weights = np.zeros((len(columns), len(buckets)), dtype=np.float32)
+    for j, bucket in enumerate(buckets.values()):
+        for column, weight in bucket.items():
+            weights[position[column], j] = weight
+    return weights
+
+
+def score_buckets(currency_keywords: Dict[str, dict]) -> Dict[str, List[Dict[str, float]]]:
+    """
+    Döviz sınıfı -> alternatif kova listesi. Skor, alternatiflerden en büyüğüdür.
+    Altın sınıfı yalnızca preciousmetals kolonuna bakar.
+    """
+    alternatives = {}
+    for currency_type, data in currency_keywords.items():
+        fields = {field: 1.0 for field in data.get('portfolio_fields', [])}
+        if currency_type in ('usd', 'eur'):
+            alternatives[currency_type] = [fields, _FOREIGN_ASSETS]
+        elif currency_type == 'tl_based':
+            alternatives[currency_type] = [fields, _TL_ASSETS]
+        elif currency_type == 'precious_metals':
+            alternatives[currency_type] = [{'preciousmetals': 1.0}]
+        else:
+            alternatives[currency_type] = [fields]
+    return alternatives
+
+
+class CurrencyExposureMatrix:
+    """Fon x varlık sınıfı oran matrisi ve kova exposure'ları"""
+
+    def __init__(self, db_manager, currency_keywords: Optional[Dict[str, dict]] = None):
+        self.db = db_manager
+        self.logger = logging.getLogger(__name__)
+        self._exposure_weights = build_weight_matrix(EXPOSURE_BUCKETS)
+        self.score_alternatives = score_buckets(currency_keywords or {})
+        self._score_weights = [
+            build_weight_matrix({f"{currency_type}_{i}": bucket for i, bucket in enumerate(alternatives)})
+            for currency_type, alternatives in self.score_alternatives.items()
+        ]
+        self._version = None
+        self._fcodes = None
+        self._positions = None
+        self._ratios = None
+        self._exposures = None
+        self._scores = None
+
+    def _ensure_matrix(self, force_refresh: bool = False):
+        """Portföy tarihi değiştiyse matrisi ve türetilmiş kovaları yeniden kur"""
+        version = self.db.get_portfolio_version(force_refresh)
+        if self._ratios is not None and not force_refresh and version == self._version:
+            return
+
+        columns = ', '.join(PORTFOLIO_COLUMNS)
+        details = self.db.execute_query(f"SELECT fcode, {columns} FROM mv_fund_details_latest")
+        details = details.drop_duplicates('fcode')
+        ratios = details.reindex(columns=PORTFOLIO_COLUMNS).apply(pd.to_numeric, errors='coerce')
+
+        self._fcodes = details['fcode'].to_numpy()
+        self._positions = pd.Index(self._fcodes)
+        self._ratios = np.nan_to_num(ratios.to_numpy(dtype=np.float32), nan=0.0)
+        self._exposures = self._ratios @ self._exposure_weights
+
+        scores = np.zeros((len(self._fcodes), len(self._score_weights)), dtype=np.float32)
+        for j, weights in enumerate(self._score_weights):
+            scores[:, j] = (self._ratios @ weights).max(axis=1)
+        self._scores = np.minimum(scores / 100, 1.0)  # 0-1 arası normalize
+
+        self._version = version
+        self.logger.info(f"Döviz exposure matrisi yüklendi: {self._ratios.shape} ({version})")
+
+    def _rows(self, fcodes: Optional[Iterable[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """İstenen fonların matris satırları; portföy verisi olmayanlar -1"""
+        if fcodes is None:
+            return self._fcodes, np.arange(len(self._fcodes))
+        fcodes = np.asarray(list(fcodes), dtype=object)
+        return fcodes, self._positions.get_indexer(fcodes)
+
+    def rank(self, bucket: str, top_n: Optional[int] = None,
+             fcodes: Optional[Iterable[str]] = None) -> pd.Series:
+        """Bir kovaya (exposure veya döviz sınıfı skoru) göre azalan sıralı fonlar"""
+        self._ensure_matrix()
+        if bucket in EXPOSURE_BUCKETS:
+            values = self._exposures[:, list(EXPOSURE_BUCKETS).index(bucket)]
+        elif bucket in self.score_alternatives:
+            values = self._scores[:, list(self.score_alternatives).index(bucket)]
+        else:
+            raise ValueError(f"Bilinmeyen döviz kovası: {bucket}")
+
+        codes, rows = self._rows(fcodes)
+        keep = rows >= 0
+        codes, values = codes[keep], values[rows[keep]]
+
+        order = np.argsort(-values, kind='stable')
+        if top_n is not None:
+            order = order[:top_n]
+        return pd.Series(values[order], index=pd.Index(codes[order], name='fcode'), name=bucket)
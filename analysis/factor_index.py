@@ -0,0 +1,98 @@
+# analysis/factor_index.py
+"""
+Faktör endeksi deposu
+factor_index_levels (büyüklük ağırlıklı hisse, altın, döviz, tahvil, para
+piyasası ve katılım endeksleri) veri sürümü başına bir kez okunup endeks adı ->
+tarih indeksli seri sözlüğüne alınır; analizler benchmark serisini tek sözlük
+aramasıyla alır. Tablo yoksa veya son veri yüklemesinden geride kaldıysa eksik
+günler job ile aynı hesapla bellekte tamamlanır. Hiç üyesi olmamış (getirisi
+tamamen NaN/sıfır) endeksler depoda yer almaz; analizler vekil fona düşer.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from database.factor_index_job import FACTOR_INDEX_TABLE, INDEX_NAMES, build_factor_indexes
+
+INDEX_LABELS = {
+    'equity': 'Hisse Endeksi', 'gold': 'Altın Endeksi', 'fx': 'Döviz Endeksi',
+    'bond': 'Tahvil Endeksi', 'money_market': 'Para Piyasası Endeksi', 'participation': 'Katılım Endeksi'
+}
+
+
+class FactorIndexStore:
+    """Endeks adı -> seviye ve günlük getiri serileri"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._levels: Dict[str, pd.Series] = {}
+        self._returns: Dict[str, pd.Series] = {}
+
+    def _load_rows(self, version) -> pd.DataFrame:
+        try:
+            rows = self.db.execute_query(
+                f"SELECT index_name, pdate, level, daily_return, n_members FROM {FACTOR_INDEX_TABLE}"
+            )
+        except Exception as e:
+            self.logger.warning(f"{FACTOR_INDEX_TABLE} okunamadı, endeksler fiyat tablosundan kurulacak: {e}")
+            rows = pd.DataFrame()
+
+        if rows.empty:
+            return build_factor_indexes(self.db)
+
+        rows['pdate'] = pd.to_datetime(rows['pdate'])
+        last = rows.sort_values('pdate').groupby('index_name').tail(1)
+        base_levels = {row.index_name: (row.pdate, float(row.level)) for row in last.itertuples()}
+        if min(d for d, _ in base_levels.values()) >= pd.Timestamp(version):
+            return rows
+
+        fresh = build_factor_indexes(self.db, base_levels)
+        self.logger.info(f"{FACTOR_INDEX_TABLE} güncel değil, eksik günler bellekte tamamlandı ({len(fresh)} satır)")
+        return pd.concat([rows, fresh], ignore_index=True)
+
+    def _ensure_indexes(self, force_refresh: bool = False):
+        version = self.db.get_data_version(force_refresh)
+        if self._levels and not force_refresh and version == self._version:
+            return
+
+        rows = self._load_rows(version)
+        self._levels, self._returns = {}, {}
+        skipped = []
+        for name, group in rows.groupby('index_name'):
+            group = group.assign(pdate=pd.to_datetime(group['pdate'])).sort_values('pdate').set_index('pdate')
+            returns = pd.to_numeric(group['daily_return'], errors='coerce')
+            members = pd.to_numeric(group['n_members'], errors='coerce').fillna(0)
+            # Üyesiz endeksin seviyesi 100'de düz kalır; benchmark olarak sıfır varyans verir
+            if not ((members > 0) & returns.notna() & (returns != 0)).any():
+                skipped.append(name)
+                continue
+            self._levels[name] = pd.to_numeric(group['level'], errors='coerce').rename(name)
+            self._returns[name] = returns.rename(name)
+        if skipped:
+            self.logger.warning(f"Üyesi olmayan faktör endeksleri atlandı: {', '.join(skipped)}")
+        self._version = version
+        self.logger.info(f"Faktör endeksleri yüklendi: {', '.join(self._levels)} ({version})")
+
+    def names(self) -> List[str]:
+        """Serisi olan endeksler (INDEX_NAMES sırasıyla)"""
+        self._ensure_indexes()
+        return [name for name in INDEX_NAMES if name in self._levels]
+
+    def get_levels(self, name: str) -> Optional[pd.Series]:
+        """Endeks seviye serisi (100 tabanlı); endeks yoksa veya üyesizse None"""
+        self._ensure_indexes()
+        return self._levels.get(name)
+
+    def get_returns(self, name: str) -> Optional[pd.Series]:
+        """Endeks günlük getiri serisi (ondalık); endeks yoksa veya üyesizse None"""
+        self._ensure_indexes()
+        return self._returns.get(name)
+
+    def get_return_frame(self) -> pd.DataFrame:
+        """Tarih x endeks günlük getiri matrisi"""
+        self._ensure_indexes()
+        return pd.DataFrame(self._returns)
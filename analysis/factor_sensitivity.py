@@ -0,0 +1,91 @@
+# analysis/factor_sensitivity.py
+"""
+Makro duyarlılık indeksi
+fund_factor_betas (gecelik faktör betaları) veri sürümü başına bir kez okunur.
+Faiz, seçim ve jeopolitik soruları fon başlığı aramak yerine saklı betalar
+üzerinde olay -> faktör eğilim vektörüyle (skor = betalar @ eğilim) vektörel
+sıralanır. Tablo henüz kurulmadıysa aynı hesap fiyat matrisinden bellekte yapılır.
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from database.factor_beta_job import BETA_TABLE, FACTORS, estimate_factor_betas
+
+FACTOR_LABELS = {'gold': 'Altın', 'usd': 'USD', 'equity': 'Hisse', 'money_market': 'Para Piyasası'}
+FACTOR_FUND_TYPES = {
+    'gold': 'Altın Fonu', 'usd': 'Döviz Fonu', 'equity': 'Hisse Fonu', 'money_market': 'Para Piyasası Fonu'
+}
+
+# Olay -> faktör eğilimleri ve filtreler. Skor pozitif eğilimli faktörlere duyarlılıkla artar.
+# Skor yalnızca betalardan gelir; fonun ortalama getiri farkı (alpha) skora girmez. Faiz
+# taramalarındaki money_market betası örtük nakit payıdır (1 - riskli betalar toplamı).
+MACRO_SCREENS: Dict[str, Dict] = {
+    'rate_hike': {'tilt': {'money_market': 1.0, 'equity': -0.5}, 'limit': 10},
+    'rate_cut': {'tilt': {'equity': 1.0, 'money_market': -0.5}, 'limit': 10},
+    'rate': {'tilt': {'money_market': 1.0}, 'limit': 10},
+    'election': {'tilt': {'equity': -1.0, 'gold': 0.25, 'usd': 0.25}, 'max_volatility': 5, 'limit': 15},
+    'geopolitical': {'tilt': {'gold': 1.0, 'usd': 1.0}, 'min_score': 0.5, 'limit': 20}
+}
+MIN_R_SQUARED = 0.2
+
+
+class FactorSensitivityIndex:
+    """Fon x faktör beta tablosu ve olay bazlı sıralama"""
+
+    def __init__(self, db_manager, benchmarks: Dict):
+        self.db = db_manager
+        self.benchmarks = benchmarks
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._frame = None
+
+    def get_frame(self, force_refresh: bool = False) -> pd.DataFrame:
+        """fcode indeksli beta tablosu (veri sürümü başına bir kez)"""
+        version = self.db.get_data_version(force_refresh)
+        if self._frame is not None and not force_refresh and version == self._version:
+            return self._frame
+
+        try:
+            betas = self.db.execute_query(f"SELECT * FROM {BETA_TABLE}")
+        except Exception as e:
+            self.logger.warning(f"{BETA_TABLE} okunamadı, betalar fiyat matrisinden hesaplanacak: {e}")
+            betas = pd.DataFrame()
+        if betas.empty:
+            betas = estimate_factor_betas(self.db, self.benchmarks)
+
+        self._frame = betas.set_index('fcode')
+        self._version = version
+        self.logger.info(f"Faktör beta tablosu yüklendi: {len(self._frame)} fon ({version})")
+        return self._frame
+
+    def screen(self, name: str) -> pd.DataFrame:
+        """
+        MACRO_SCREENS tanımına göre skorlanmış fonlar (skor azalan).
+        Faktörlerle zayıf açıklanan fonlar (R² < MIN_R_SQUARED) sıralamaya girmez.
+        """
+        spec = MACRO_SCREENS.get(name)
+        if spec is None:
+            raise ValueError(f"Bilinmeyen makro tarama: {name}")
+        frame = self.get_frame()
+        if frame.empty:
+            return frame
+
+        betas = frame[[f"beta_{factor}" for factor in FACTORS]].to_numpy(dtype=np.float64)
+        tilt = np.array([spec['tilt'].get(factor, 0.0) for factor in FACTORS])
+        score = betas @ tilt
+
+        mask = np.isfinite(score) & (frame['r_squared'].to_numpy(dtype=np.float64) >= MIN_R_SQUARED)
+        if 'max_volatility' in spec:
+            mask &= frame['volatility'].to_numpy(dtype=np.float64) < spec['max_volatility']
+        if 'min_score' in spec:
+            mask &= score >= spec['min_score']
+
+        result = frame[mask].assign(score=score[mask])
+        # Baskın faktör: en büyük pozitif beta
+        dominant = np.argmax(betas[mask], axis=1) if mask.any() else np.array([], dtype=int)
+        result['dominant_factor'] = np.asarray(FACTORS)[dominant]
+        return result.sort_values('score', ascending=False).head(spec['limit'])
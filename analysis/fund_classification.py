@@ -0,0 +1,131 @@
+# analysis/fund_classification.py
+"""
+Fon sınıflandırma indeksi
+mv_fund_details_latest portföy tarihi başına bir kez okunur, fon tipi/kategori
+kuralları tüm fonlara tek seferde (NumPy) uygulanır ve sonuç bellekten sunulur.
+"""
+
+import logging
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# mv_fund_details_latest içindeki varlık sınıfı oranı kolonları (% cinsinden)
+PORTFOLIO_COLUMNS = [
+    'bankbills', 'exchangetradedfund', 'other', 'fxpayablebills', 'governmentbond',
+    'foreigncurrencybills', 'eurobonds', 'commercialpaper', 'fundparticipationcertificate',
+    'realestatecertificate', 'venturecapitalinvestmentfundparticipation',
+    'realestateinvestmentfundparticipation', 'treasurybill', 'stock',
+    'governmentbondsandbillsfx', 'participationaccount', 'participationaccountau',
+    'participationaccountd', 'participationaccounttl', 'governmentleasecertificates',
+    'governmentleasecertificatesd', 'governmentleasecertificatestl',
+    'governmentleasecertificatesforeign', 'preciousmetals', 'preciousmetalsbyf',
+    'preciousmetalskba', 'preciousmetalskks', 'publicdomesticdebtinstruments',
+    'privatesectorleasecertificates', 'privatesectorbond', 'repo', 'derivatives', 'tmm',
+    'reverserepo', 'assetbackedsecurities', 'termdeposit', 'termdepositau', 'termdepositd',
+    'termdeposittl', 'futurescashcollateral', 'foreigndebtinstruments',
+    'foreigndomesticdebtinstruments', 'foreignprivatesectordebtinstruments',
+    'foreignexchangetradedfunds', 'foreignequity', 'foreignsecurities',
+    'foreigninvestmentfundparticipationshares', 'privatesectorinternationalleasecertificate',
+    'privatesectorforeigndebtinstruments'
+]
+
+UNKNOWN_CLASSIFICATION = ("Bilinmeyen", "Genel")
+
+
+class FundClassificationIndex:
+    """Fon kodu -> (fon tipi, kategori, portföy oranları) bellek içi indeksi"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._frame = None
+
+    def get_frame(self, force_refresh: bool = False) -> pd.DataFrame:
+        """
+        fcode indeksli sınıflandırma tablosu. Portföy verisi tarihi değişmedikçe
+        veritabanına tekrar gidilmez.
+        """
+        version = self.db.get_portfolio_version(force_refresh)
+        if self._frame is None or force_refresh or version != self._version:
+            columns = ', '.join(PORTFOLIO_COLUMNS)
+            query = f"""
+            SELECT fcode, fdate, ftitle, fcapacity, investorcount, {columns}
+            FROM mv_fund_details_latest
+            """
+            details = self.db.execute_query(query)
+            self._frame = self.classify(details)
+            self._version = version
+            self.logger.info(f"Fon sınıflandırma indeksi yüklendi: {len(self._frame)} fon ({version})")
+        return self._frame
+
+    @staticmethod
+    def classify(details: pd.DataFrame) -> pd.DataFrame:
+        """Portföy dağılımlarından fon tipi ve kategorisini vektörel olarak belirle"""
+        details = details.drop_duplicates('fcode')
+        ratios = details.reindex(columns=PORTFOLIO_COLUMNS).apply(pd.to_numeric, errors='coerce')
+        ratios = ratios.fillna(0).astype('float64')
+        r = {column: ratios[column].to_numpy() for column in PORTFOLIO_COLUMNS}
+
+        stock = r['stock']
+        foreign_equity = r['foreignequity']
+        gov_bond = r['governmentbond']
+        private_bond = r['privatesectorbond']
+        total_equity = stock + foreign_equity
+        total_bonds = gov_bond + private_bond
+
+        # Kurallar ThematicFundAnalyzer.determine_fund_type_from_portfolio ile aynı öncelikte
+        is_equity = total_equity > 80
+        is_mixed = ~is_equity & (total_equity > 40)
+        is_bond = ~is_equity & ~is_mixed & (total_bonds > 60)
+        rest = ~is_equity & ~is_mixed & ~is_bond
+        is_gold = rest & (r['preciousmetals'] > 50)
+        is_etf = rest & ~is_gold & (r['exchangetradedfund'] > 50)
+        is_real_estate = rest & ~is_gold & ~is_etf & (r['realestatecertificate'] > 50)
+        is_fund_of_funds = (rest & ~is_gold & ~is_etf & ~is_real_estate
+                            & (r['fundparticipationcertificate'] > 50))
+
+        fund_type = np.select(
+            [is_equity, is_mixed, is_bond, is_gold, is_etf, is_real_estate, is_fund_of_funds],
+            ["Hisse Senedi Fonu", "Karma Fon", "Borçlanma Araçları Fonu", "Kıymetli Madenler Fonu",
+             "Fon Sepeti Fonu", "Gayrimenkul Fonu", "Fon Sepeti Fonu"],
+            default="Para Piyasası Fonu"
+        )
+        fund_category = np.select(
+            [is_equity & (foreign_equity > stock), is_equity, is_mixed,
+             is_bond & (gov_bond > private_bond), is_bond,
+             is_gold, is_etf, is_real_estate, is_fund_of_funds],
+            ["Yabancı Hisse Senedi", "Yerli Hisse Senedi", "Esnek Karma",
+             "Devlet Tahvili", "Karma Borçlanma",
+             "Altın Fonu", "ETF Fonu", "Emlak Sertifikası", "Fon Portföyü"],
+            default="Kısa Vadeli"
+        )
+
+        meta_columns = [c for c in ['fdate', 'ftitle', 'fcapacity', 'investorcount'] if c in details.columns]
+        frame = pd.concat([details[meta_columns], ratios], axis=1).set_axis(details['fcode'].to_numpy())
+        frame.index.name = 'fcode'
+        frame.insert(0, 'fund_category', fund_category)
+        frame.insert(0, 'fund_type', fund_type)
+        frame['total_equity'] = total_equity
+        frame['total_bonds'] = total_bonds
+        return frame
+
+    def get(self, fcode: str) -> Tuple[str, str]:
+        """Tek fon için (fon tipi, kategori); portföy verisi yoksa ("Bilinmeyen", "Genel")"""
+        frame = self.get_frame()
+        if fcode not in frame.index:
+            return UNKNOWN_CLASSIFICATION
+        row = frame.loc[fcode]
+        return row['fund_type'], row['fund_category']
+
+    def get_many(self, fcodes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Birden çok fon için sınıflandırma; bilinmeyen fonlar varsayılan değerlerle döner"""
+        frame = self.get_frame()
+        if fcodes is None:
+            return frame
+        result = frame.reindex(list(fcodes))
+        result['fund_type'] = result['fund_type'].fillna(UNKNOWN_CLASSIFICATION[0])
+        result['fund_category'] = result['fund_category'].fillna(UNKNOWN_CLASSIFICATION[1])
+        return result
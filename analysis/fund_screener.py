@@ -0,0 +1,298 @@
+# analysis/fund_screener.py
+"""
+Bildirimsel fon tarayıcı
+Kişisel finans planlayıcılarının fon listeleri filtre tanımlarından (SCREENS)
+üretilir. Fiyat/yatırımcı matrisi veri sürümü başına bir kez okunur; pencere
+özellikleri, teknik göstergeler, performans metrikleri ve portföy oranları tek
+bir fon-özellik tablosunda birleştirilir ve filtreler NumPy maskeleriyle uygulanır.
+Planlama sorusu başına yeni SQL çalışmaz.
+"""
+
+import logging
+import warnings
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.fund_classification import FundClassificationIndex, PORTFOLIO_COLUMNS
+from risk_assessment import RiskAssessment
+
+# Risk toleransı -> kabul edilen risk seviyeleri
+TOLERANCE_RISK_LEVELS = {
+    'conservative': ['LOW', 'MEDIUM'],
+    'moderate': ['LOW', 'MEDIUM', 'HIGH'],
+    'aggressive': ['LOW', 'MEDIUM', 'HIGH']  # EXTREME hariç her şey
+}
+
+# Filtre tanımları
+#   source: 'window' (fiyat penceresi özellikleri), 'metrics' (mv_fund_performance_metrics)
+#           veya 'technical' (mv_fund_technical_indicators)
+#   window_days / row_min_investors / min_days: pencere ve satır bazlı yatırımcı eşiği
+#   asset_min: {portföy kolonu: alt sınır %}; bounds: {kolon: (alt, üst)} açık aralık
+#   sort: [(kolon, artan mı)], limit: risk kontrolünden önceki aday sayısı
+#   risk_levels: kabul edilen risk seviyeleri; risk_overrides: risk girdilerinde sabit değerler
+SCREENS: Dict[str, dict] = {
+    'by_type': {
+        'source': 'metrics',
+        'asset_min': {},
+        'bounds': {'performance': (5, None), 'annual_volatility': (None, 0.5)},
+        'sort': [('performance', False)],
+        'limit': 20,
+        'risk_levels': TOLERANCE_RISK_LEVELS['moderate']
+    },
+    'low_risk': {
+        'source': 'window', 'window_days': 90, 'row_min_investors': 500, 'min_days': 60,
+        'bounds': {'volatility': (0, 5)},
+        'sort': [('performance', False)],
+        'limit': 15,
+        'risk_levels': ['LOW', 'MEDIUM']
+    },
+    'education': {
+        'source': 'window', 'window_days': 365, 'row_min_investors': 200, 'min_days': 200,
+        'bounds': {'volatility': (0, 15), 'performance': (10, None)},
+        'sort': [('sharpe', False)],
+        'limit': 15,
+        'risk_levels': ['LOW', 'MEDIUM', 'HIGH']
+    },
+    'home_purchase': {
+        'source': 'window', 'window_days': 180, 'row_min_investors': 300, 'min_days': 1,
+        'bounds': {'volatility': (0, 15), 'performance': (5, None)},
+        'sort': [('volatility', True), ('performance', False)],
+        'limit': 15,
+        'risk_levels': ['LOW', 'MEDIUM']
+    },
+    'child_savings': {
+        'source': 'window', 'window_days': 1825, 'row_min_investors': 500, 'min_days': 1000,
+        'bounds': {'performance': (0, None)},
+        'sort': [('score', False), ('sharpe', False)],
+        'limit': 15,
+        'risk_levels': ['LOW', 'MEDIUM', 'HIGH']
+    },
+    'versatile': {
+        'source': 'window', 'window_days': 365, 'row_min_investors': 1000, 'min_days': 200,
+        'bounds': {'volatility': (5, 20), 'performance': (15, None)},
+        'sort': [('sharpe', False)],
+        'limit': 15,
+        'risk_levels': ['LOW', 'MEDIUM', 'HIGH']
+    },
+    'blocked_high_risk': {
+        'source': 'technical',
+        'bounds': {'investorcount': (100, None)},
+        'sort': [('rsi_14', False)],
+        'limit': 50,
+        'risk_levels': ['HIGH', 'EXTREME'],
+        'risk_overrides': {'stochastic_14': 50}
+    }
+}
+
+RISK_INPUT_DEFAULTS = {
+    'price_vs_sma20': 0, 'rsi_14': 50, 'stochastic_14': 50, 'days_since_last_trade': 0
+}
+
+
+class FundScreener:
+    """Bellek içi fon-özellik tablosu üzerinde bildirimsel filtreleme"""
+
+    def __init__(self, db_manager, history_days: Optional[int] = None):
+        self.db = db_manager
+        self.logger = logging.getLogger(__name__)
+        self.history_days = history_days or max(
+            spec.get('window_days', 0) for spec in SCREENS.values()
+        )
+        self.classification = FundClassificationIndex(db_manager)
+        self._version = None
+        self._panel = None
+        self._features = {}
+        self._tables = {}
+
+    # --- Önbellek ---
+
+    def _ensure_data(self, force_refresh: bool = False):
+        """Veri sürümü değiştiyse fiyat/yatırımcı matrisini ve türetilmiş tabloları sıfırla"""
+        version = self.db.get_data_version(force_refresh)
+        if self._panel is not None and not force_refresh and version == self._version:
+            return
+
+        query = """
+        SELECT pdate, fcode, price, investorcount
+        FROM tefasfunds
+        WHERE pdate >= (SELECT MAX(pdate) FROM tefasfunds) - :days * INTERVAL '1 day'
+          AND price > 0
+        """
+        rows = self.db.execute_query(query, {'days': self.history_days})
+        if rows.empty:
+            self._panel = {'dates': pd.DatetimeIndex([]), 'fcodes': pd.Index([]),
+                           'prices': np.empty((0, 0)), 'investors': np.empty((0, 0))}
+        else:
+            rows['pdate'] = pd.to_datetime(rows['pdate'])
+            rows = rows.drop_duplicates(['pdate', 'fcode'], keep='last')
+            prices = rows.pivot(index='pdate', columns='fcode', values='price').sort_index()
+            investors = rows.pivot(index='pdate', columns='fcode', values='investorcount')
+            investors = investors.reindex(index=prices.index, columns=prices.columns)
+            self._panel = {
+                'dates': prices.index,
+                'fcodes': prices.columns,
+                'prices': prices.to_numpy(dtype=float),
+                'investors': pd.DataFrame(investors).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+            }
+
+        self._features = {}
+        self._tables = {}
+        self._version = version
+        self.logger.info(f"Fon tarayıcı verisi yüklendi: {self._panel['prices'].shape} ({version})")
+
+    def _table(self, name: str) -> pd.DataFrame:
+        """Teknik gösterge / performans metriği tabloları (fcode indeksli, sürüm başına bir kez)"""
+        self._ensure_data()
+        if name not in self._tables:
+            if name == 'technical':
+                query = """
+                SELECT fcode, price_vs_sma20, rsi_14, stochastic_14, days_since_last_trade, investorcount
+                FROM mv_fund_technical_indicators
+                """
+            else:
+                query = """
+                SELECT pm.fcode, pm.annual_return, pm.annual_volatility, pm.current_price,
+                       lf.ftitle AS fund_name, lf.investorcount AS investors
+                FROM mv_fund_performance_metrics pm
+                JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
+                """
+            table = self.db.execute_query(query).drop_duplicates('fcode').set_index('fcode')
+            self._tables[name] = table
+        return self._tables[name]
+
+    def window_features(self, window_days: int, row_min_investors: int = 0) -> pd.DataFrame:
+        """
+        Son window_days takvim gününde, yatırımcı sayısı eşiği geçen gözlemlerden fon özellikleri:
+        performance = (max-min)/min %, volatility = std/ortalama fiyat %, sharpe = performance/volatility,
+        investors = penceredeki en yüksek yatırımcı sayısı, score = uzun vade skoru.
+        """
+        self._ensure_data()
+        key = (window_days, row_min_investors)
+        if key in self._features:
+            return self._features[key]
+
+        panel = self._panel
+        if not len(panel['dates']):
+            return pd.DataFrame()
+        rows = panel['dates'] >= panel['dates'].max() - pd.Timedelta(days=window_days)
+        prices = panel['prices'][rows]
+        investors = panel['investors'][rows]
+        valid = ~np.isnan(prices) & (np.nan_to_num(investors) > row_min_investors)
+        masked = np.where(valid, prices, np.nan)
+        n_obs = valid.sum(axis=0)
+
+        with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            low = np.nanmin(masked, axis=0)
+            high = np.nanmax(masked, axis=0)
+            mean = np.nanmean(masked, axis=0)
+            std = np.nanstd(masked, axis=0, ddof=1)
+            max_investors = np.nanmax(np.where(valid, investors, np.nan), axis=0)
+
+            performance = np.where(low > 0, (high - low) / low * 100, 0.0)
+            volatility = np.where(mean > 0, std / mean * 100, 0.0)
+            volatility = np.where(n_obs > 1, volatility, np.nan)
+            sharpe = np.where((volatility > 0) & (low > 0), performance / volatility, 0.0)
+
+        last_row = len(masked) - 1 - np.argmax(valid[::-1], axis=0)
+        current_price = masked[last_row, np.arange(masked.shape[1])]
+        score = np.select(
+            [(performance > 100) & (volatility > 0) & (volatility < 25),
+             (performance > 50) & (volatility > 0) & (volatility < 20),
+             (performance > 30) & (volatility > 0) & (volatility < 15)],
+            [90, 80, 70], default=50
+        )
+
+        features = pd.DataFrame({
+            'performance': performance,
+            'volatility': volatility,
+            'sharpe': sharpe,
+            'current_price': current_price,
+            'investors': np.nan_to_num(max_investors).astype(np.int64),
+            'trading_days': n_obs,
+            'score': score
+        }, index=pd.Index(panel['fcodes'], name='fcode'))
+        features = features[n_obs > 0]
+        self._features[key] = features
+        return features
+
+    def _frame(self, spec: dict) -> pd.DataFrame:
+        """Filtre kaynağına göre birleşik fon-özellik tablosu"""
+        technical = self._table('technical')
+
+        if spec['source'] == 'technical':
+            frame = technical.copy()
+        elif spec['source'] == 'metrics':
+            metrics = self._table('metrics')
+            frame = metrics.assign(
+                performance=pd.to_numeric(metrics['annual_return'], errors='coerce'),
+                volatility=pd.to_numeric(metrics['annual_volatility'], errors='coerce') * 100
+            ).join(technical.drop(columns='investorcount'), how='inner')
+        else:
+            features = self.window_features(spec['window_days'], spec.get('row_min_investors', 0))
+            features = features[features['trading_days'] >= spec.get('min_days', 1)]
+            frame = features.join(technical.drop(columns='investorcount'), how='inner')
+
+        if spec.get('asset_min'):
+            ratios = self.classification.get_frame()
+            columns = list(spec['asset_min'])
+            unknown = [column for column in columns if column not in PORTFOLIO_COLUMNS]
+            if unknown:
+                raise ValueError(f"Bilinmeyen portföy kolonu: {unknown}")
+            frame = frame.join(ratios[columns], how='left')
+            frame[columns] = frame[columns].fillna(0)
+        return frame
+
+    def screen(self, name: str, **overrides) -> pd.DataFrame:
+        """
+        Tanımlı bir filtreyi çalıştır. overrides ile spec alanları (ör. asset_min,
+        risk_levels) değiştirilebilir. Sonuç sıralı, risk seviyesi kolonlu tablodur.
+        """
+        if name not in SCREENS:
+            raise ValueError(f"Tanımsız tarama: {name}")
+        spec = {**SCREENS[name], **overrides}
+        frame = self._frame(spec)
+        if frame.empty:
+            return frame
+
+        # Eşikler: hepsi açık aralık (SQL > / <), NaN değerler elenir
+        mask = np.ones(len(frame), dtype=bool)
+        for column, threshold in spec.get('asset_min', {}).items():
+            mask &= frame[column].to_numpy(dtype=float) > threshold
+        for column, (low, high) in spec.get('bounds', {}).items():
+            values = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+            with np.errstate(invalid='ignore'):
+                if low is not None:
+                    mask &= values > low
+                if high is not None:
+                    mask &= values < high
+        frame = frame[mask]
+
+        # Çoklu anahtarlı sıralama (lexsort son anahtarı birincil kabul eder)
+        keys = []
+        for column, ascending in reversed(spec.get('sort', [])):
+            values = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+            keys.append(np.nan_to_num(values if ascending else -values, nan=np.inf))
+        if keys:
+            frame = frame.iloc[np.lexsort(keys)]
+        frame = frame.head(spec.get('limit', len(frame)))
+
+        # Risk: planlayıcıların kullandığı yatırımcı sayısı + teknik göstergeler
+        risk_inputs = frame.fillna(RISK_INPUT_DEFAULTS)
+        if 'investors' in risk_inputs.columns:
+            risk_inputs = risk_inputs.assign(investorcount=risk_inputs['investors'])
+        for column, value in spec.get('risk_overrides', {}).items():
+            risk_inputs = risk_inputs.assign(**{column: value})
+        risk = RiskAssessment.assess_risk_frame(risk_inputs.drop(columns='volatility', errors='ignore'))
+
+        frame = frame.assign(risk_level=risk['risk_level'], risk_score=risk['risk_score'])
+        frame = frame[frame['risk_level'].isin(spec['risk_levels'])]
+
+        if 'fund_name' not in frame.columns:
+            meta = self.db.get_fund_meta(frame.index)
+            frame = frame.assign(fund_name=[
+                meta.get(fcode, {}).get('fund_name') or f'Fon {fcode}' for fcode in frame.index
+            ])
+        return frame.reset_index()
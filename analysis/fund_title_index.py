@@ -0,0 +1,109 @@
+# analysis/fund_title_index.py
+"""
+Fon başlığı arama indeksi
+Fon başlıkları Türkçe karakterleri sadeleştirilmiş büyük harfe çevrilir ve
+trigram -> satır listesi şeklinde ters indekse alınır. Anahtar kelime aramaları
+önce fon kodlarına çözülür; fiyat tablosu sonra yalnızca bu kodlar için sorgulanır.
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+_TURKISH_FOLD = str.maketrans({
+    'ı': 'I', 'i': 'I', 'İ': 'I',
+    'ş': 'S', 'Ş': 'S',
+    'ğ': 'G', 'Ğ': 'G',
+    'ü': 'U', 'Ü': 'U',
+    'ö': 'O', 'Ö': 'O',
+    'ç': 'C', 'Ç': 'C',
+})
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_title(text) -> str:
+    """'Altın Katılım', 'ALTIN KATILIM' ve 'ALTİN KATİLİM' aynı metne indirgenir"""
+    if not isinstance(text, str):
+        return ''
+    return _WHITESPACE.sub(' ', text.translate(_TURKISH_FOLD).upper()).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FundTitleIndex:
+    """Anahtar kelime -> fon kodu araması (LIKE '%KW%' ile aynı alt dizi eşleşmesi)"""
+
+    def __init__(self, db_manager, catalog_days: int = 30):
+        self.db = db_manager
+        self.catalog_days = catalog_days
+        self.logger = logging.getLogger(__name__)
+        self._catalog = None
+        self._titles: List[str] = []
+        self._postings: Dict[str, Set[int]] = {}
+
+    def _ensure_index(self) -> pd.DataFrame:
+        """Katalog değiştiyse (yeni veri sürümü) indeksi yeniden kur"""
+        catalog = self.db.get_fund_titles(self.catalog_days)
+        if catalog is not self._catalog:
+            self._titles = [normalize_title(title) for title in catalog['ftitle']]
+            postings: Dict[str, Set[int]] = {}
+            for row, title in enumerate(self._titles):
+                for gram in _trigrams(title):
+                    postings.setdefault(gram, set()).add(row)
+            self._postings = postings
+            self._catalog = catalog
+            self.logger.info(f"Fon başlık indeksi kuruldu: {len(self._titles)} fon, {len(postings)} trigram")
+        return catalog
+
+    def _match_rows(self, keyword: str) -> Set[int]:
+        """Normalize edilmiş başlığında anahtar kelimeyi içeren satırlar"""
+        needle = normalize_title(keyword)
+        if not needle:
+            return set()
+
+        grams = sorted(_trigrams(needle), key=lambda g: len(self._postings.get(g, ())))
+        if grams:
+            candidates = set(self._postings.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= self._postings.get(gram, set())
+        else:
+            # 3 karakterden kısa anahtar kelimeler ('AI' gibi) tüm katalogda aranır
+            candidates = range(len(self._titles))
+
+        return {row for row in candidates if needle in self._titles[row]}
+
+    def search(self, keywords: Iterable[str], days: Optional[int] = None) -> List[str]:
+        """
+        Başlığı anahtar kelimelerden herhangi birini içeren fon kodları.
+        days verilirse yalnızca son `days` günde fiyatı olan fonlar döner.
+        """
+        catalog = self._ensure_index()
+        rows: Set[int] = set()
+        for keyword in keywords:
+            rows |= self._match_rows(keyword)
+
+        if not rows:
+            return []
+
+        rows = np.fromiter(sorted(rows), dtype=np.int64)
+        if days is not None and days < self.catalog_days:
+            last_seen = pd.to_datetime(catalog['pdate']).to_numpy()[rows]
+            cutoff = pd.to_datetime(catalog['pdate']).max() - pd.Timedelta(days=days)
+            rows = rows[last_seen >= cutoff.to_datetime64()]
+
+        return catalog['fcode'].to_numpy()[rows].tolist()
+
+    def get_titles(self, fcodes: Optional[Iterable[str]] = None) -> pd.Series:
+        """fcode -> orijinal fon başlığı"""
+        catalog = self._ensure_index()
+        titles = catalog.set_index('fcode')['ftitle']
+        if fcodes is None:
+            return titles
+        return titles.reindex(list(fcodes))
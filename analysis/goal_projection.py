@@ -0,0 +1,209 @@
+# analysis/goal_projection.py
+"""
+Hedef bazlı birikim projeksiyonu
+Günlük fiyat matrisi veri sürümü başına bir kez ay sonu fiyatlarına ve aylık
+getiri matrisine (ay x fon) indirgenir. Bir aday dağılım (fcode -> ağırlık) ve
+aylık katkı planı için ortak aylık getiri satırları durağan blok bootstrap ile
+örneklenir; (senaryo x ay) servet matrisi tek vektörel hesapla kurulur ve hedefe
+ulaşma olasılığı ile yüzdelik bantlar raporlanır. Tutarlar nominal TL'dir.
+"""
+
+import logging
+import warnings
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.monte_carlo import MonteCarloAnalyzer
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+# Ortak pencereye girmek için ayda gözlemi olan fonların dağılım ağırlığındaki asgari payı
+MIN_OBSERVED_WEIGHT = 0.5
+
+
+class GoalProjectionEngine:
+    """Katkı planı + aday dağılım -> olasılıksal servet projeksiyonu"""
+
+    def __init__(self, db_manager, history_days: int = 1260, n_scenarios: int = 5000,
+                 mean_block_months: float = 3.0, min_months: int = 12):
+        self.db = db_manager
+        self.history_days = history_days
+        self.n_scenarios = n_scenarios
+        self.mean_block_months = mean_block_months
+        self.min_months = min_months
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._monthly = None
+        self._market = None
+
+    def _ensure_returns(self, force_refresh: bool = False):
+        """Veri sürümü değiştiyse ay x fon getiri matrisini yeniden kur"""
+        version = self.db.get_data_version(force_refresh)
+        if self._monthly is not None and not force_refresh and version == self._version:
+            return
+
+        panel = self.db.get_price_panel(days=self.history_days)
+        if panel.empty:
+            self._monthly = pd.DataFrame()
+        else:
+            # Ay sonu fiyatı: ayın son gözlemi; fonun ilk ayından önceki getiriler NaN kalır
+            month_end = panel.ffill().groupby(panel.index.to_period('M')).last()
+            self._monthly = month_end.pct_change().iloc[1:]
+        # Ay başına piyasa medyanı: geçmişi kısa fonların eksik aylarını doldurur
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self._market = (pd.Series(np.nanmedian(self._monthly.to_numpy(dtype=np.float64), axis=1),
+                                      index=self._monthly.index)
+                            if not self._monthly.empty else pd.Series(dtype=np.float64))
+        self._version = version
+        self.logger.info(f"Aylık getiri matrisi kuruldu: {self._monthly.shape} ({version})")
+
+    def monthly_returns(self, fcodes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Ay x fon aylık getiri matrisi (ondalık)"""
+        self._ensure_returns()
+        if fcodes is None or self._monthly.empty:
+            return self._monthly
+        return self._monthly[[fcode for fcode in fcodes if fcode in self._monthly.columns]]
+
+    @staticmethod
+    def build_allocation(sleeves: Dict[str, Tuple[float, Sequence[str]]], per_sleeve: int = 3) -> Dict[str, float]:
+        """
+        Dilim -> (yüzde, fcode listesi) sözlüğünden fon ağırlıkları.
+        Dilim ağırlığı ilk per_sleeve fona eşit bölünür; fonu olmayan dilimler düşer.
+        """
+        allocation: Dict[str, float] = {}
+        for weight, fcodes in sleeves.values():
+            chosen = list(dict.fromkeys(fcodes))[:per_sleeve]
+            if weight <= 0 or not chosen:
+                continue
+            for fcode in chosen:
+                allocation[fcode] = allocation.get(fcode, 0.0) + weight / len(chosen)
+        return allocation
+
+    def _history(self, allocation: Dict[str, float]):
+        """
+        Dağılımdaki fonların ortak aylık getiri satırları ve normalize ağırlıklar.
+        min_months'tan kısa geçmişli fonlar düşer. Pencere, gözlemi olan fonların
+        ağırlık payının MIN_OBSERVED_WEIGHT'i geçtiği aylardır; kalan fonların
+        eksik ayları o ayın piyasa medyanıyla doldurulur, böylece tek bir kısa
+        geçmişli fon ortak pencereyi kendi uzunluğuna indirmez.
+        """
+        returns = self.monthly_returns(allocation)
+        if returns.empty:
+            return None, None, 0.0
+
+        returns = returns.loc[:, returns.notna().sum() >= self.min_months]
+        if returns.shape[1] == 0:
+            return None, None, 0.0
+
+        weights = np.array([allocation[fcode] for fcode in returns.columns], dtype=np.float64)
+        weights = weights / weights.sum()
+        observed = returns.notna().to_numpy()
+        rows = observed @ weights >= MIN_OBSERVED_WEIGHT
+        if rows.sum() < self.min_months:
+            return None, None, 0.0
+
+        returns = returns[rows]
+        market = self._market.reindex(returns.index).to_numpy()
+        history = np.where(observed[rows], returns.to_numpy(dtype=np.float64), market[:, None])
+        # Piyasa medyanı da yoksa (tek fonlu ay) satır kullanılamaz
+        history = history[np.isfinite(history).all(axis=1)]
+        if len(history) < self.min_months:
+            return None, None, 0.0
+
+        total = sum(w for w in allocation.values() if w > 0)
+        kept = sum(allocation[fcode] for fcode in returns.columns)
+        coverage = float(kept / total) if total > 0 else 0.0
+        return history, weights, coverage
+
+    def _simulate(self, allocation: Dict[str, float], months: int, n_scenarios: int = None):
+        history, weights, coverage = self._history(allocation)
+        if history is None:
+            return None, 0.0
+        portfolio = history @ weights
+        idx = MonteCarloAnalyzer.stationary_bootstrap_indices(
+            len(portfolio), n_scenarios or self.n_scenarios, months, self.mean_block_months
+        )
+        return portfolio[idx], coverage
+
+    def simulate_returns(self, allocation: Dict[str, float], months: int,
+                         n_scenarios: int = None) -> Optional[np.ndarray]:
+        """Portföyün (senaryo x ay) aylık getiri matrisi; yeterli geçmiş yoksa None"""
+        return self._simulate(allocation, months, n_scenarios)[0]
+
+    @staticmethod
+    def wealth_matrix(returns: np.ndarray, contributions, initial: float = 0.0) -> np.ndarray:
+        """
+        W_t = W_{t-1} x (1 + r_t) + c_t (katkı ay sonunda) kapalı formda:
+        W_t = G_t x (W_0 + Σ_{s<=t} c_s / G_s), G_t = Π_{k<=t} (1 + r_k).
+        """
+        growth = np.cumprod(1 + returns, axis=1)
+        schedule = np.broadcast_to(np.asarray(contributions, dtype=np.float64), (returns.shape[1],))
+        return growth * (initial + np.cumsum(schedule / growth, axis=1))
+
+    def project(self, allocation: Dict[str, float], contributions, months: int = None,
+                initial: float = 0.0, targets: Sequence[float] = (),
+                percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> Dict:
+        """
+        Katkı planı (sabit aylık tutar veya ay başına dizi) için servet projeksiyonu.
+        'bands' ay x yüzdelik DataFrame; 'success' hedef -> P(son servet >= hedef).
+        """
+        schedule = np.atleast_1d(np.asarray(contributions, dtype=np.float64))
+        if months is None:
+            if len(schedule) == 1:
+                raise ValueError("Sabit katkı için months verilmelidir")
+            months = len(schedule)
+        elif len(schedule) not in (1, months):
+            raise ValueError(f"Katkı planı uzunluğu {len(schedule)} != {months} ay")
+
+        returns, coverage = self._simulate(allocation, months)
+        if returns is None:
+            return {}
+
+        wealth = self.wealth_matrix(returns, schedule if len(schedule) > 1 else schedule[0], initial)
+        final = wealth[:, -1]
+        bands = pd.DataFrame(
+            np.percentile(wealth, percentiles, axis=0).T,
+            index=pd.RangeIndex(1, months + 1, name='month'),
+            columns=[f"p{p}" for p in percentiles]
+        )
+        growth = np.prod(1 + returns, axis=1)
+        return {
+            'months': months,
+            'n_scenarios': len(final),
+            'coverage': coverage,
+            'total_contributed': float(initial + np.broadcast_to(schedule, (months,)).sum()),
+            'final': {f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(final, percentiles))},
+            'mean_final': float(final.mean()),
+            'median_annual_return': float(np.median(growth) ** (12 / months) - 1),
+            'success': {float(t): float((final >= t).mean()) for t in targets},
+            'bands': bands
+        }
+
+    def contribution_grid(self, allocation: Dict[str, float], amounts: Sequence[float], months: int,
+                          initial: float = 0.0, targets: Sequence[float] = (),
+                          percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> pd.DataFrame:
+        """
+        Birden fazla sabit aylık tutar aynı senaryolar üzerinde: servet katkıya
+        doğrusal olduğundan birim katkı matrisi bir kez kurulur (tutar x senaryo).
+        """
+        returns, coverage = self._simulate(allocation, months)
+        if returns is None:
+            return pd.DataFrame()
+
+        amounts = np.asarray(amounts, dtype=np.float64)
+        growth = np.cumprod(1 + returns, axis=1)
+        unit_final = growth[:, -1] * np.sum(1 / growth, axis=1)
+        finals = amounts[:, None] * unit_final[None, :] + initial * growth[:, -1][None, :]
+
+        grid = pd.DataFrame(
+            np.percentile(finals, percentiles, axis=1).T,
+            index=pd.Index(amounts, name='monthly'),
+            columns=[f"p{p}" for p in percentiles]
+        )
+        grid['total_contributed'] = initial + amounts * months
+        for target in targets:
+            grid[f"success_{target:.0f}"] = (finals >= target).mean(axis=1)
+        grid.attrs['coverage'] = coverage
+        return grid
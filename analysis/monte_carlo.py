@@ -1,8 +1,9 @@
 # analysis/monte_carlo.py
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
+import warnings
 from scipy import stats
 from database.connection import DatabaseManager
 from config.config import Config
@@ -13,23 +14,98 @@ class MonteCarloAnalyzer:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.n_simulations = config.analysis.monte_carlo_simulations
+        self.stress_history_days = config.analysis.stress_history_days
+        self.simulation_method = config.analysis.simulation_method
+        self.bootstrap_block_days = config.analysis.bootstrap_block_days
+        self._stress_cache = {}
+        self.factor_indices = db_manager.get_factor_index_store()
+    
+    @staticmethod
+    def stationary_bootstrap_indices(n_obs: int,
+                                     n_paths: int,
+                                     horizon: int,
+                                     mean_block: float = 10.0) -> np.ndarray:
+        """
+        Durağan blok bootstrap (Politis-Romano) satır indeksleri, (n_paths, horizon).
+        Her adımda 1/mean_block olasılıkla rastgele yeni blok başlar, aksi halde
+        bir önceki günün ardından devam edilir (sona gelince başa sarar).
+        """
+        steps = np.arange(horizon)
+        new_block = np.random.random((n_paths, horizon)) < 1.0 / max(mean_block, 1.0)
+        new_block[:, 0] = True
+        starts = np.random.randint(0, n_obs, (n_paths, horizon))
+        
+        # Her adımın ait olduğu bloğun başladığı adım
+        block_step = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+        block_start = np.take_along_axis(starts, block_step, axis=1)
+        return (block_start + (steps - block_step)) % n_obs
+    
+    def block_bootstrap_returns(self,
+                                returns: np.ndarray,
+                                days: int,
+                                n_simulations: int = None,
+                                weights: np.ndarray = None,
+                                mean_block: float = None) -> np.ndarray:
+        """
+        Tarihsel ortak günlük getirilerden (gün x fon) blok bootstrap yolları.
+        Tüm yollar tek indeks dizisi + fancy indexing ile üretilir:
+        weights verilirse (n_simulations, days) portföy getirisi, aksi halde
+        (n_simulations, days, fon) float32 getiri küpü döner.
+        """
+        if n_simulations is None:
+            n_simulations = self.n_simulations
+        if mean_block is None:
+            mean_block = self.bootstrap_block_days
+        
+        returns = np.asarray(returns, dtype=float)
+        if returns.ndim == 1:
+            returns = returns[:, None]
+        if weights is not None:
+            # Önce portföy serisine indir: küp yerine (yol x gün) matris
+            returns = (returns @ np.asarray(weights, dtype=float))[:, None]
+        
+        idx = self.stationary_bootstrap_indices(len(returns), n_simulations, days, mean_block)
+        paths = returns.astype(np.float32)[idx]
+        return paths[:, :, 0] if paths.shape[2] == 1 else paths
+    
+    def _use_bootstrap(self, historical_returns) -> bool:
+        return (self.simulation_method == 'block_bootstrap'
+                and historical_returns is not None and len(historical_returns) > 1)
+    
+    def _bootstrap_shocks(self, historical_returns, days: int, n_simulations: int) -> np.ndarray:
+        """Standartlaştırılmış tarihsel getirilerin blok bootstrap'ı (ortalama 0, std 1 civarı)"""
+        values = np.asarray(historical_returns, dtype=float)
+        values = values[~np.isnan(values)]
+        std = values.std(ddof=1)
+        standardized = (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+        return self.block_bootstrap_returns(standardized, days, n_simulations).astype(float)
         
     def simulate_price_paths(self, 
                            initial_price: float,
                            daily_return: float,
                            daily_volatility: float,
                            days: int,
-                           n_simulations: int = None) -> np.ndarray:
-        """Monte Carlo fiyat yolu simülasyonu"""
+                           n_simulations: int = None,
+                           historical_returns: pd.Series = None) -> np.ndarray:
+        """
+        Monte Carlo fiyat yolu simülasyonu.
+        simulation_method='block_bootstrap' ve historical_returns verilmişse şoklar normal
+        dağılım yerine tarihsel getirilerin blok bootstrap'ından gelir (kalın kuyruklar korunur);
+        ortalama/volatilite parametreleri aynen uygulanır.
+        """
         if n_simulations is None:
             n_simulations = self.n_simulations
-            
-        # Rastgele sayı üretimi (normal dağılım)
-        random_returns = np.random.normal(
-            daily_return, 
-            daily_volatility, 
-            (n_simulations, days)
-        )
+        
+        if self._use_bootstrap(historical_returns):
+            shocks = self._bootstrap_shocks(historical_returns, days, n_simulations)
+            random_returns = daily_return + daily_volatility * shocks
+        else:
+            # Rastgele sayı üretimi (normal dağılım)
+            random_returns = np.random.normal(
+                daily_return, 
+                daily_volatility, 
+                (n_simulations, days)
+            )
         
         # Kümülatif getiriler
         cumulative_returns = np.cumprod(1 + random_returns, axis=1)
@@ -45,15 +121,19 @@ class MonteCarloAnalyzer:
                                 sigma: float,  # Volatilite
                                 T: float,  # Zaman (yıl)
                                 dt: float = 1/252,  # Zaman adımı (günlük)
-                                n_simulations: int = None) -> np.ndarray:
-        """Geometrik Brownian Motion simülasyonu"""
+                                n_simulations: int = None,
+                                historical_returns: pd.Series = None) -> np.ndarray:
+        """Geometrik Brownian Motion simülasyonu (block_bootstrap modunda artımlar tarihsel bloklardan)"""
         if n_simulations is None:
             n_simulations = self.n_simulations
             
         n_steps = int(T / dt)
         
         # Wiener process (Brownian motion)
-        dW = np.random.normal(0, np.sqrt(dt), (n_simulations, n_steps))
+        if self._use_bootstrap(historical_returns):
+            dW = np.sqrt(dt) * self._bootstrap_shocks(historical_returns, n_steps, n_simulations)
+        else:
+            dW = np.random.normal(0, np.sqrt(dt), (n_simulations, n_steps))
         
         # GBM formula: dS = μS dt + σS dW
         # Solution: S(t) = S0 * exp((μ - σ²/2)t + σW(t))
@@ -120,7 +200,8 @@ class MonteCarloAnalyzer:
                 daily_return=stressed_return,
                 daily_volatility=stressed_volatility,
                 days=30,
-                n_simulations=1000
+                n_simulations=1000,
+                historical_returns=historical_returns
             )
             
             # Final fiyatlar
@@ -191,20 +272,28 @@ class MonteCarloAnalyzer:
         cov_matrix = np.outer(volatilities, volatilities) * correlation_matrix.values
         
         # Monte Carlo simülasyonu
-        portfolio_returns = []
-        
-        for _ in range(n_simulations):
-            # Rastgele getiriler (çok değişkenli normal)
-            random_returns = np.random.multivariate_normal(mean_returns, cov_matrix, days)
+        if self.simulation_method == 'block_bootstrap' and len(returns_matrix) > 1:
+            # Ortak günlük getiri bloklarını yeniden örnekle (fonlar arası eş hareket korunur)
+            aligned_weights = [weights[fund_codes.index(fcode)] for fcode in returns_matrix.columns]
+            daily_portfolio_returns = self.block_bootstrap_returns(
+                returns_matrix.to_numpy(), days, n_simulations, weights=aligned_weights
+            )
+            portfolio_returns = np.prod(1 + daily_portfolio_returns.astype(float), axis=1) - 1
+        else:
+            portfolio_returns = []
             
-            # Günlük portföy getirileri
-            daily_portfolio_returns = np.dot(random_returns, weights)
+            for _ in range(n_simulations):
+                # Rastgele getiriler (çok değişkenli normal)
+                random_returns = np.random.multivariate_normal(mean_returns, cov_matrix, days)
+                
+                # Günlük portföy getirileri
+                daily_portfolio_returns = np.dot(random_returns, weights)
+                
+                # Kümülatif getiri
+                cumulative_return = np.prod(1 + daily_portfolio_returns) - 1
+                portfolio_returns.append(cumulative_return)
             
-            # Kümülatif getiri
-            cumulative_return = np.prod(1 + daily_portfolio_returns) - 1
-            portfolio_returns.append(cumulative_return)
-        
-        portfolio_returns = np.array(portfolio_returns)
+            portfolio_returns = np.array(portfolio_returns)
         
         # VaR ve CVaR hesapla
         var_cvar = self.calculate_var_cvar(portfolio_returns)
@@ -360,7 +449,8 @@ class MonteCarloAnalyzer:
                 daily_return=shocked_return,
                 daily_volatility=shocked_volatility,
                 days=30,
-                n_simulations=1000
+                n_simulations=1000,
+                historical_returns=historical_returns
             )
             
             final_returns = (paths[:, -1] / initial_price) - 1
@@ -387,6 +477,207 @@ class MonteCarloAnalyzer:
             }
         }
     
+    def _stress_windows(self, window_days: int) -> Optional[Dict]:
+        """
+        Tüm fonların ardışık window_days işlem günlük getirileri (pencere x fon).
+        Fiyat paneli ve pencere matrisi veri sürümü başına bir kez kurulur.
+        """
+        version = self.db.get_data_version()
+        key = (version, window_days)
+        cached = self._stress_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        panel = self.db.get_price_panel(days=self.stress_history_days)
+        if panel.empty or len(panel) <= window_days:
+            return None
+        
+        # Eksik günlerde son fiyat; fon pencere başında yoksa getiri NaN
+        prices = panel.ffill().to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            window_returns = prices[window_days:] / prices[:-window_days] - 1
+        
+        entry = {
+            'returns': window_returns,
+            'fcodes': panel.columns,
+            'start_dates': panel.index[:-window_days],
+            'end_dates': panel.index[window_days:],
+            'observations': panel.count()
+        }
+        self._stress_cache = {k: v for k, v in self._stress_cache.items() if k[0] == version}
+        self._stress_cache[key] = entry
+        return entry
+    
+    def _stress_driver_series(self, windows: Dict, driver: str) -> Optional[np.ndarray]:
+        """
+        Kriz pencerelerini seçen sürücü serisi.
+        'market' tüm fonların pencere medyanı; diğerleri AnalysisConfig.benchmarks
+        içindeki faktör endeksi, yoksa proxy fon (bist100 -> borsa düşüşü, usd -> TL
+        değer kaybı).
+        """
+        returns = windows['returns']
+        if driver == 'market':
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                return np.nanmedian(returns, axis=1)
+        
+        spec = self.config.analysis.benchmarks.get(driver)
+        if spec is None:
+            raise ValueError(f"Tanımsız stres sürücüsü: {driver}")
+        
+        series = self._index_driver_series(windows, spec.get('factor_index'))
+        if series is not None:
+            return series
+        
+        # Geçmişin en az %80'ini kapsayan ilk proxy fon
+        observations = windows['observations']
+        min_obs = 0.8 * observations.max()
+        candidates = list(spec['fund_codes'])
+        if spec.get('asset_columns'):
+            ratio_sum = ' + '.join(f"COALESCE({column}, 0)" for column in spec['asset_columns'])
+            query = f"""
+            SELECT fcode
+            FROM mv_fund_details_latest
+            WHERE {ratio_sum} >= {float(spec['min_ratio'])}
+            ORDER BY fcapacity DESC NULLS LAST
+            LIMIT 20
+            """
+            candidates += list(self.db.execute_query(query).get('fcode', []))
+        
+        fcode = next((code for code in candidates if observations.get(code, 0) >= min_obs), None)
+        if fcode is None:
+            self.logger.warning(f"{driver} için stres proxy fonu bulunamadı")
+            return None
+        return returns[:, windows['fcodes'].get_loc(fcode)]
+    
+    def _index_driver_series(self, windows: Dict, index_name: Optional[str]) -> Optional[np.ndarray]:
+        """Faktör endeksinin pencere getirileri; pencerelerin %80'ini kapsamıyorsa None"""
+        if not index_name:
+            return None
+        try:
+            levels = self.factor_indices.get_levels(index_name)
+        except Exception as e:
+            self.logger.warning(f"Faktör endeksi okunamadı ({index_name}): {e}")
+            return None
+        if levels is None or levels.empty:
+            return None
+        
+        # Pencere sınırlarında endeksin o güne kadarki son seviyesi
+        dates = windows['start_dates'].union(windows['end_dates'])
+        aligned = levels.reindex(levels.index.union(dates)).ffill().reindex(dates)
+        start = aligned.reindex(windows['start_dates']).to_numpy(dtype=float)
+        end = aligned.reindex(windows['end_dates']).to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            series = end / start - 1
+        if np.isfinite(series).sum() < 0.8 * len(series):
+            return None
+        return series
+    
+    def find_stress_windows(self,
+                            driver: str = 'bist100',
+                            window_days: int = 20,
+                            n_windows: int = 5) -> pd.DataFrame:
+        """
+        Sürücü serisine göre en kötü window_days günlük, birbiriyle çakışmayan pencereler.
+        bist100/market için en büyük düşüş, usd için en büyük TL değer kaybı (kur artışı).
+        """
+        windows = self._stress_windows(window_days)
+        if windows is None:
+            return pd.DataFrame()
+        series = self._stress_driver_series(windows, driver)
+        if series is None:
+            return pd.DataFrame()
+        
+        valid = np.flatnonzero(~np.isnan(series))
+        worst_first = -series[valid] if driver == 'usd' else series[valid]
+        order = valid[np.argsort(worst_first, kind='stable')]
+        
+        # Açgözlü seçim: seçilen pencereyle örtüşenler atlanır
+        taken = np.zeros(len(series), dtype=bool)
+        picked = []
+        for row in order:
+            if taken[row]:
+                continue
+            picked.append(row)
+            taken[max(0, row - window_days + 1):row + window_days] = True
+            if len(picked) >= n_windows:
+                break
+        
+        return pd.DataFrame({
+            'row': picked,
+            'start_date': windows['start_dates'][picked],
+            'end_date': windows['end_dates'][picked],
+            'driver_return': series[picked]
+        })
+    
+    def historical_stress_replay(self,
+                                 fund_codes: Optional[List[str]] = None,
+                                 weights: Optional[List[float]] = None,
+                                 driver: str = 'bist100',
+                                 window_days: int = 20,
+                                 n_windows: int = 5) -> Dict:
+        """
+        Tarihsel stres tekrarı: en kötü pencerelerin gerçek kesitsel getiri vektörleri
+        fonlara/portföye aynen uygulanır. Fon o pencerede yoksa pencerenin piyasa
+        medyanı kullanılır. Portföy için tüm pencerelerin dağılımından tarihsel VaR
+        da tek matris çarpımıyla hesaplanır.
+        """
+        windows = self._stress_windows(window_days)
+        worst = self.find_stress_windows(driver, window_days, n_windows)
+        if windows is None or worst.empty:
+            return {}
+        
+        returns = windows['returns']
+        if fund_codes is None:
+            columns = np.arange(len(windows['fcodes']))
+            fund_codes = list(windows['fcodes'])
+        else:
+            missing = [fcode for fcode in fund_codes if fcode not in windows['fcodes']]
+            if missing:
+                self.logger.warning(f"Stres tekrarı için fiyat geçmişi yok: {missing}")
+            columns = windows['fcodes'].get_indexer(fund_codes)
+        
+        # Pencere x fon; geçmişi olmayan fonlar pencere medyanıyla doldurulur
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            market = np.nanmedian(returns, axis=1)
+        selected = np.where(columns >= 0, returns[:, np.maximum(columns, 0)], np.nan)
+        covered = ~np.isnan(selected)
+        selected = np.where(covered, selected, market[:, None])
+        
+        labels = [f"{start:%Y-%m-%d}→{end:%Y-%m-%d}" for start, end in zip(worst['start_date'], worst['end_date'])]
+        replay = selected[worst['row'].to_numpy()]
+        fund_replay = pd.DataFrame(replay.T, index=pd.Index(fund_codes, name='fcode'), columns=labels)
+        
+        result = {
+            'driver': driver,
+            'window_days': window_days,
+            'windows': worst.drop(columns='row').assign(label=labels),
+            'fund_replay': fund_replay,
+            'coverage': pd.Series(covered[worst['row'].to_numpy()].mean(axis=0), index=fund_replay.index)
+        }
+        
+        if weights is not None:
+            if len(weights) != len(fund_codes):
+                raise ValueError("Fon sayısı ve ağırlık sayısı eşit olmalı")
+            w = np.asarray(weights, dtype=float)
+            w = w / w.sum()
+            
+            # Tüm pencereler x portföy: tek matris çarpımı
+            all_windows = selected @ w
+            all_windows = all_windows[~np.isnan(all_windows)]
+            stressed = replay @ w
+            result['portfolio'] = {
+                'stress_returns': pd.Series(stressed, index=labels),
+                'worst_return': float(np.min(stressed)),
+                'mean_stress_return': float(np.mean(stressed)),
+                'historical_var': self.calculate_var_cvar(all_windows) if len(all_windows) else {},
+                'probability_loss': float(np.mean(all_windows < 0)) if len(all_windows) else None,
+                'n_windows': int(len(all_windows))
+            }
+        
+        return result
+    
     def tail_risk_analysis(self, returns: pd.Series) -> Dict:
         """Kuyruk riski analizi"""
         
@@ -557,7 +848,8 @@ class RiskAnalyzer:
                 initial_price=current_price,
                 daily_return=returns.mean(),
                 daily_volatility=returns.std(),
-                days=30
+                days=30,
+                historical_returns=returns
             )
             
             mc_returns = (mc_results[:, -1] / current_price) - 1
@@ -572,6 +864,9 @@ class RiskAnalyzer:
             # Kara kuğu analizi
             black_swan = self.monte_carlo.black_swan_analysis(current_price, returns)
             
+            # Tarihsel kriz pencerelerinin aynen tekrarı
+            historical_stress = self.monte_carlo.historical_stress_replay([fcode], [1.0])
+            
             return {
                 'fcode': fcode,
                 'current_price': current_price,
@@ -592,6 +887,7 @@ class RiskAnalyzer:
                 'stress_test_results': stress_results,
                 'tail_risk_analysis': tail_risk,
                 'black_swan_analysis': black_swan,
+                'historical_stress_replay': historical_stress,
                 'risk_score': self._calculate_risk_score(returns, var_cvar)
             }
             
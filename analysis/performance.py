@@ -189,6 +189,77 @@ class PerformanceAnalyzer:
             self.logger.error(f"Gelişmiş oran hesaplama hatası: {e}")
             return {}
     
+    @staticmethod
+    def calculate_panel_metrics(price_panel: pd.DataFrame, risk_free_rate: float = 15) -> pd.DataFrame:
+        """
+        Tarih x fon fiyat matrisinden tüm fonlar için yüzde bazlı performans metrikleri.
+        Her fon kendi geçerli gözlemleri üzerinden değerlendirilir (eksik günler atlanır);
+        sonuçlar fon başına prices.pct_change().dropna() ile hesaplananlarla aynıdır.
+        """
+        prices = price_panel.to_numpy(dtype=float)
+        n_dates, n_funds = prices.shape
+        fund_cols = np.arange(n_funds)
+        dates = np.arange(n_dates)[:, None]
+        
+        valid = np.isfinite(prices) & (prices > 0)
+        data_points = valid.sum(axis=0)
+        first_row = np.where(valid, dates, n_dates).min(axis=0)
+        last_row = np.where(valid, dates, -1).max(axis=0)
+        
+        # Günlük getiri: fonun bir önceki geçerli fiyatına göre
+        rows = np.where(valid, dates, -1)
+        previous = np.vstack([np.full((1, n_funds), -1), np.maximum.accumulate(rows, axis=0)[:-1]])
+        has_return = valid & (previous >= 0)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.where(has_return, prices / prices[np.maximum(previous, 0), fund_cols] - 1, np.nan)
+            return_count = has_return.sum(axis=0)
+            
+            first_price = prices[np.minimum(first_row, n_dates - 1), fund_cols]
+            last_price = prices[np.maximum(last_row, 0), fund_cols]
+            total_return = (last_price / first_price - 1) * 100
+            annual_return = total_return * (252 / np.maximum(data_points, 1))
+            
+            mean = np.nansum(returns, axis=0) / return_count
+            variance = np.nansum((returns - mean) ** 2, axis=0) / (return_count - 1)
+            volatility = np.sqrt(variance) * np.sqrt(252) * 100
+            sharpe = np.where(volatility > 0, (annual_return - risk_free_rate) / volatility, 0.0)
+            win_rate = (returns > 0).sum(axis=0) / return_count * 100
+            
+            # Max drawdown: kümülatif getiri ilk getiri gününden başlar
+            cumulative = np.where(has_return, prices / first_price, np.nan)
+            running_max = np.fmax.accumulate(cumulative, axis=0)
+            drawdown = (cumulative - running_max) / running_max
+            max_drawdown = np.abs(np.nanmin(np.where(has_return, drawdown, np.inf), axis=0)) * 100
+            max_drawdown = np.where(np.isfinite(max_drawdown), max_drawdown, np.nan)
+            calmar = np.where(max_drawdown > 0, np.abs(annual_return / max_drawdown), 0.0)
+            
+            # Sortino: negatif getirilerin örneklem standart sapması
+            negative = has_return & (returns < 0)
+            negative_count = negative.sum(axis=0)
+            negative_returns = np.where(negative, returns, np.nan)
+            negative_mean = np.nansum(negative_returns, axis=0) / negative_count
+            downside_std = np.sqrt(
+                np.nansum((negative_returns - negative_mean) ** 2, axis=0) / (negative_count - 1)
+            )
+            downside_deviation = downside_std * np.sqrt(252) * 100
+            sortino = np.where(negative_count > 0,
+                               np.where(downside_std > 0, (annual_return - risk_free_rate) / downside_deviation, 0.0),
+                               sharpe * 1.5)
+        
+        return pd.DataFrame({
+            'total_return': total_return,
+            'annual_return': annual_return,
+            'volatility': volatility,
+            'sharpe_ratio': sharpe,
+            'sortino_ratio': sortino,
+            'calmar_ratio': calmar,
+            'win_rate': win_rate,
+            'max_drawdown': max_drawdown,
+            'data_points': data_points,
+            'current_price': last_price
+        }, index=price_panel.columns)
+    
     def analyze_fund_performance(self, fcode: str, days: int = 252) -> Dict:
         """Tek fon için kapsamlı performans analizi"""
         try:
@@ -0,0 +1,277 @@
+# analysis/period_return_index.py
+"""
+Dönem getirisi indeksi
+fund_period_prices (hafta/ay sonu fiyatları) veri sürümü başına bir kez
+dönem x fon dizilerine alınır. "Son N gün/ay, en çok yükselen/düşen K fon"
+soruları vektörel bir arama ve np.argpartition ile cevaplanır.
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from database.period_price_job import (
+    PERIOD_TABLE, PERIOD_TYPES, aggregate_period_prices, fetch_prices, refresh_starts
+)
+
+_GRID_COLUMNS = ['first_price', 'last_price', 'obs_count', 'investorcount', 'fcapacity']
+_DATE_COLUMNS = ['first_pdate', 'last_pdate']
+
+
+class PeriodReturnIndex:
+    """Hafta ve ay sonu fiyatlarından dönem getirileri"""
+
+    def __init__(self, db_manager, lookback_days: int = 3 * 365):
+        self.db = db_manager
+        self.lookback_days = lookback_days
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._grids: Dict[str, dict] = {}
+        self._latest = None
+
+    # --- YÜKLEME ---
+
+    def _load_rows(self, version) -> pd.DataFrame:
+        """
+        Tablodaki dönem satırları. Tablo yoksa veya son veri yüklemesinden geride
+        kaldıysa eksik kısım tefasfunds'tan aynı toplama ile tamamlanır.
+        """
+        since = pd.Timestamp(version) - pd.Timedelta(days=self.lookback_days)
+        try:
+            rows = self.db.execute_query(
+                f"SELECT * FROM {PERIOD_TABLE} WHERE period_start >= :since", {'since': since.date()}
+            )
+        except Exception as e:
+            self.logger.warning(f"{PERIOD_TABLE} okunamadı, fiyat tablosundan toplanacak: {e}")
+            rows = pd.DataFrame()
+
+        stored_last = pd.to_datetime(rows['last_pdate']).max() if not rows.empty else None
+        if stored_last is not None and stored_last >= pd.Timestamp(version):
+            return rows
+
+        if stored_last is None:
+            return aggregate_period_prices(fetch_prices(self.db, since.date()))
+
+        # Açık hafta/ay dönemleri yeniden toplanır, kapanmış dönemler tablodan gelir
+        starts = refresh_starts(stored_last)
+        fresh = aggregate_period_prices(fetch_prices(self.db, min(starts.values()).date()), starts)
+        self.logger.info(f"{PERIOD_TABLE} güncel değil ({stored_last.date()}), açık dönemler bellekte tamamlandı")
+        key = ['fcode', 'period_type', 'period_start']
+        rows = rows.assign(period_start=pd.to_datetime(rows['period_start']).dt.date)
+        return pd.concat([rows, fresh], ignore_index=True).drop_duplicates(key, keep='last')
+
+    @staticmethod
+    def _build_grid(rows: pd.DataFrame) -> dict:
+        """Dönem satırlarını dönem x fon dizilerine çevir"""
+        periods = pd.Index(np.sort(pd.to_datetime(rows['period_start']).unique()))
+        fcodes = pd.Index(np.sort(rows['fcode'].unique()))
+        r = periods.get_indexer(pd.to_datetime(rows['period_start']))
+        c = fcodes.get_indexer(rows['fcode'])
+
+        grid = {'periods': periods, 'fcodes': fcodes}
+        for column in _GRID_COLUMNS:
+            values = np.full((len(periods), len(fcodes)), np.nan)
+            values[r, c] = pd.to_numeric(rows[column], errors='coerce').to_numpy(dtype=float)
+            grid[column] = values
+        for column in _DATE_COLUMNS:
+            values = np.full((len(periods), len(fcodes)), np.datetime64('NaT'), dtype='datetime64[ns]')
+            values[r, c] = pd.to_datetime(rows[column]).to_numpy()
+            grid[column] = values
+        return grid
+
+    def _ensure_index(self, force_refresh: bool = False):
+        version = self.db.get_data_version(force_refresh)
+        if self._grids and not force_refresh and version == self._version:
+            return
+
+        rows = self._load_rows(version)
+        self._grids = {}
+        for period_type in PERIOD_TYPES:
+            subset = rows[rows['period_type'] == period_type] if not rows.empty else rows
+            if not subset.empty:
+                self._grids[period_type] = self._build_grid(subset)
+
+        # Fon başına son gözlem: son dolu haftalık satır
+        weekly = self._grids.get('W')
+        if weekly is not None:
+            observed = ~np.isnat(weekly['last_pdate'])
+            last_row = len(weekly['periods']) - 1 - np.argmax(observed[::-1], axis=0)
+            cols = np.arange(len(weekly['fcodes']))
+            self._latest = pd.DataFrame({
+                'fcode': weekly['fcodes'],
+                'price': weekly['last_price'][last_row, cols],
+                'pdate': weekly['last_pdate'][last_row, cols],
+                'investorcount': weekly['investorcount'][last_row, cols],
+                'fcapacity': weekly['fcapacity'][last_row, cols]
+            })
+            self._latest = self._latest[observed.any(axis=0)].reset_index(drop=True)
+        else:
+            self._latest = pd.DataFrame(columns=['fcode', 'price', 'pdate', 'investorcount', 'fcapacity'])
+
+        self._version = version
+        shapes = {period_type: grid['last_price'].shape for period_type, grid in self._grids.items()}
+        self.logger.info(f"Dönem getirisi indeksi yüklendi: {shapes} ({version})")
+
+    # --- SORGULAR ---
+
+    @staticmethod
+    def top_k(frame: pd.DataFrame, column: str, k: int, largest: bool = True) -> pd.DataFrame:
+        """Kolona göre ilk k satır - tam sıralama yerine np.argpartition"""
+        if frame.empty or k <= 0:
+            return frame.head(0)
+        values = frame[column].to_numpy(dtype=float)
+        keys = -values if largest else values
+        if len(values) > k:
+            candidates = np.argpartition(keys, k - 1)[:k]
+        else:
+            candidates = np.arange(len(values))
+        order = candidates[np.argsort(keys[candidates], kind='stable')]
+        return frame.iloc[order].reset_index(drop=True)
+
+    def latest(self, max_age_days: int = 7) -> pd.DataFrame:
+        """Son `max_age_days` günde fiyatı olan fonların son fiyatı, yatırımcı sayısı ve büyüklüğü"""
+        self._ensure_index()
+        if self._latest.empty:
+            return self._latest
+        as_of = self._latest['pdate'].max()
+        return self._latest[self._latest['pdate'] >= as_of - pd.Timedelta(days=max_age_days)].reset_index(drop=True)
+
+    def period_returns(self, days: int, min_investors: int = 50,
+                       window_days: int = 7, min_coverage: float = 0.8) -> pd.DataFrame:
+        """
+        Son `days` günlük getiri: son fiyat ile (son tarih - days) ± window_days
+        içindeki ilk hafta sonu fiyatı. Gerçekleşen süre days * min_coverage altındaysa fon atlanır.
+        """
+        self._ensure_index()
+        weekly = self._grids.get('W')
+        end = self.latest(window_days)
+        if weekly is None or end.empty:
+            return pd.DataFrame()
+
+        end = end[end['investorcount'] > min_investors]
+        if end.empty:
+            return pd.DataFrame()
+        cols = weekly['fcodes'].get_indexer(end['fcode'])
+        target = end['pdate'].max() - pd.Timedelta(days=days)
+
+        last_pdate = weekly['last_pdate'][:, cols]
+        in_window = (
+            (last_pdate >= (target - pd.Timedelta(days=window_days)).to_datetime64())
+            & (last_pdate <= (target + pd.Timedelta(days=window_days)).to_datetime64())
+            & (weekly['investorcount'][:, cols] > min_investors)
+            & (weekly['last_price'][:, cols] > 0)
+        )
+        has_start = in_window.any(axis=0)
+        start_row = np.argmax(in_window, axis=0)  # Penceredeki ilk hafta sonu
+
+        result = pd.DataFrame({
+            'fcode': end['fcode'].to_numpy(),
+            'end_price': end['price'].to_numpy(dtype=float),
+            'start_price': weekly['last_price'][start_row, cols],
+            'end_date': end['pdate'].to_numpy(),
+            'start_date': weekly['last_pdate'][start_row, cols],
+            'investorcount': end['investorcount'].to_numpy(),
+            'fcapacity': end['fcapacity'].to_numpy()
+        })[has_start]
+        result['return_pct'] = (result['end_price'] / result['start_price'] - 1) * 100
+        result['actual_days'] = (result['end_date'] - result['start_date']).dt.days
+        result = result[(result['end_price'] > 0) & (result['actual_days'] >= days * min_coverage)]
+        return result.reset_index(drop=True)
+
+    def monthly_returns(self, months: int = 12, min_days: int = 15,
+                        min_investors: int = 100) -> pd.DataFrame:
+        """
+        Son `months` ayın aylık getiri matrisi (index=ay başı, columns=fcode).
+        Ay içinde min_days'ten az gözlemi olan fon-ay hücreleri NaN.
+        """
+        self._ensure_index()
+        monthly = self._grids.get('M')
+        if monthly is None:
+            return pd.DataFrame()
+
+        # Eski sorgu (pdate >= CURRENT_DATE - 12 ay) başlangıç ayını yalnızca kısmen görüyor,
+        # min_days filtresiyle de pratikte dışarıda bırakıyordu: içinde bulunulan ay dahil son `months` ay
+        periods = monthly['periods']
+        cutoff = periods.max() - pd.DateOffset(months=months)
+        rows = np.flatnonzero(periods > cutoff)
+
+        first = monthly['first_price'][rows]
+        last = monthly['last_price'][rows]
+        valid = (
+            (monthly['obs_count'][rows] >= min_days)
+            & (monthly['investorcount'][rows] > min_investors)
+            & (first > 0) & (last > 0)
+        )
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.where(valid, (last / first - 1) * 100, np.nan)
+        return pd.DataFrame(returns, index=periods[rows], columns=monthly['fcodes'])
+
+    def monthly_leaders(self, months: int = 12, top_n: int = 3, bottom_n: int = 1, **kwargs) -> pd.DataFrame:
+        """Her ay için en iyi top_n ve en kötü bottom_n fon (month, fcode, monthly_return, rank_desc, rank_asc)"""
+        returns = self.monthly_returns(months, **kwargs)
+        records = []
+        for month, row in returns.iterrows():
+            values = row.to_numpy()
+            valid = np.flatnonzero(~np.isnan(values))
+            n = len(valid)
+            if n == 0:
+                continue
+
+            ranks = {}
+            for k, sign in ((min(top_n, n), -1), (min(bottom_n, n), 1)):
+                keys = sign * values[valid]
+                part = np.argpartition(keys, k - 1)[:k]
+                part = part[np.argsort(keys[part], kind='stable')]
+                for rank, i in enumerate(part, 1):
+                    rank_desc = rank if sign < 0 else n - rank + 1
+                    ranks[valid[i]] = rank_desc
+
+            for i, rank_desc in ranks.items():
+                records.append({
+                    'month': month,
+                    'fcode': row.index[i],
+                    'monthly_return': float(values[i]),
+                    'rank_desc': rank_desc,
+                    'rank_asc': n - rank_desc + 1
+                })
+
+        result = pd.DataFrame(records, columns=['month', 'fcode', 'monthly_return', 'rank_desc', 'rank_asc'])
+        return result.sort_values(['month', 'rank_desc'], ascending=[False, True]).reset_index(drop=True)
+
+    def ytd_returns(self, year: int, min_investors: int = 50, window_days: int = 7) -> pd.DataFrame:
+        """Yıl başından bu yana getiri: ocak ayının ilk window_days günündeki ilk fiyattan son fiyata"""
+        self._ensure_index()
+        monthly = self._grids.get('M')
+        end = self.latest(window_days)
+        year_start = pd.Timestamp(year=year, month=1, day=1)
+        if monthly is None or end.empty or year_start not in monthly['periods']:
+            return pd.DataFrame()
+
+        row = monthly['periods'].get_loc(year_start)
+        cols = monthly['fcodes'].get_indexer(end['fcode'])
+        known = cols >= 0
+        end, cols = end[known], cols[known]
+
+        start_date = monthly['first_pdate'][row, cols]
+        start_price = monthly['first_price'][row, cols]
+        valid = (
+            (start_date <= (year_start + pd.Timedelta(days=window_days)).to_datetime64())
+            & (monthly['investorcount'][row, cols] > min_investors)
+            & (start_price > 0)
+        )
+
+        result = pd.DataFrame({
+            'fcode': end['fcode'].to_numpy(),
+            'start_price': start_price,
+            'current_price': end['price'].to_numpy(dtype=float),
+            'start_date': start_date,
+            'current_date': end['pdate'].to_numpy(),
+            'investorcount': end['investorcount'].to_numpy(),
+            'fcapacity': end['fcapacity'].to_numpy()
+        })[valid]
+        result = result[result['current_price'] > 0]
+        result['ytd_return'] = (result['current_price'] / result['start_price'] - 1) * 100
+        result['days_elapsed'] = (result['current_date'] - result['start_date']).dt.days
+        return result.reset_index(drop=True)
@@ -0,0 +1,195 @@
+# analysis/scenario_engine.py
+"""
+Faktör exposure senaryo motoru
+mv_fund_details_latest portföy tarihi başına bir kez fon x faktör (altın, hisse,
+döviz, tahvil, para piyasası, diğer) exposure matrisine indirgenir. Bir şok
+vektörü (enflasyon %, borsa düşüşü %, USD/TRY değişimi %) faktör getirilerine
+çevrilir ve tüm fonların projeksiyonu tek bir matris çarpımıyla hesaplanır.
+Birden fazla şok büyüklüğü (sweep) aynı çarpımda fon x büyüklük matrisi verir.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from analysis.currency_exposure import build_weight_matrix
+from analysis.fund_classification import PORTFOLIO_COLUMNS
+
+# Faktör -> mv_fund_details_latest kolonları (ScenarioAnalyzer yatırım alanları)
+FACTOR_COLUMNS: Dict[str, list] = {
+    'gold': ['preciousmetals', 'preciousmetalskba', 'preciousmetalskks'],
+    'equity': ['stock', 'foreignequity'],
+    'fx': ['foreigncurrencybills', 'eurobonds', 'foreigndebtinstruments',
+           'foreigndomesticdebtinstruments', 'foreignprivatesectordebtinstruments'],
+    'bond': ['governmentbond', 'governmentbondsandbillsfx', 'treasurybill',
+             'governmentleasecertificates', 'privatesectorbond'],
+    'money_market': ['reverserepo', 'repo', 'termdeposit', 'termdeposittl']
+}
+# Sınıflandırılmayan portföy payı (100 - faktörler toplamı)
+OTHER_FACTOR = 'other'
+FACTORS = list(FACTOR_COLUMNS) + [OTHER_FACTOR]
+FACTOR_LABELS = {
+    'gold': 'Altın', 'equity': 'Hisse', 'fx': 'Döviz', 'bond': 'Tahvil',
+    'money_market': 'Para Piyasası', OTHER_FACTOR: 'Diğer'
+}
+
+# Senaryo -> faktör -> (sabit getiri %, şok başına getiri). Faktör getirisi = sabit + eğim x şok.
+# Enflasyon/kriz kuralları _estimate_portfolio_return ve kriz portföyü beklenen kayıplarıyla aynı;
+# kur senaryosunda şok USD/TRY yüzde değişimidir.
+FACTOR_RESPONSES: Dict[str, Dict[str, tuple]] = {
+    'inflation': {
+        'gold': (0.0, 0.9), 'equity': (5.0, 1.0), 'fx': (0.0, 0.8),
+        'bond': (10.0, 0.0), 'money_market': (10.0, 0.0), OTHER_FACTOR: (10.0, 0.0)
+    },
+    'stock_crash': {
+        'gold': (5.0, 0.0), 'equity': (0.0, -1.0), 'fx': (0.0, 0.0),
+        'bond': (-2.0, 0.0), 'money_market': (0.0, 0.0), OTHER_FACTOR: (-2.0, 0.0)
+    },
+    'currency': {
+        'gold': (0.0, 1.0), 'equity': (0.0, 0.3), 'fx': (0.0, 1.0),
+        'bond': (0.0, 0.0), 'money_market': (0.0, 0.0), OTHER_FACTOR: (0.0, 0.0)
+    }
+}
+SCENARIOS = list(FACTOR_RESPONSES)
+
+
+def currency_shock(level: float, base_rate: float) -> float:
+    """USD/TRY seviyesini baz kura göre yüzde değişime çevir"""
+    if not base_rate or base_rate <= 0:
+        raise ValueError(f"Geçersiz baz kur: {base_rate}")
+    return (float(level) / base_rate - 1) * 100
+
+
+class FactorScenarioEngine:
+    """Fon x faktör exposure matrisi ve şok projeksiyonları"""
+
+    def __init__(self, db_manager, base_usd_try: float = 40.0):
+        self.db = db_manager
+        self.base_usd_try = base_usd_try
+        self.logger = logging.getLogger(__name__)
+        self._factor_weights = build_weight_matrix(
+            {factor: {column: 1.0 for column in columns} for factor, columns in FACTOR_COLUMNS.items()}
+        )
+        # Faktör x senaryo sabit ve eğim matrisleri
+        self._base = np.array([[FACTOR_RESPONSES[s][f][0] for s in SCENARIOS] for f in FACTORS], dtype=np.float64)
+        self._slope = np.array([[FACTOR_RESPONSES[s][f][1] for s in SCENARIOS] for f in FACTORS], dtype=np.float64)
+        self._version = None
+        self._fcodes = None
+        self._positions = None
+        self._exposures = None
+
+    def _ensure_matrix(self, force_refresh: bool = False):
+        """Portföy tarihi değiştiyse fon x faktör matrisini yeniden kur"""
+        version = self.db.get_portfolio_version(force_refresh)
+        if self._exposures is not None and not force_refresh and version == self._version:
+            return
+
+        columns = ', '.join(PORTFOLIO_COLUMNS)
+        details = self.db.execute_query(f"SELECT fcode, {columns} FROM mv_fund_details_latest")
+        details = details.drop_duplicates('fcode')
+        ratios = details.reindex(columns=PORTFOLIO_COLUMNS).apply(pd.to_numeric, errors='coerce')
+        ratios = np.clip(np.nan_to_num(ratios.to_numpy(dtype=np.float64), nan=0.0), 0, 100)
+
+        factors = ratios @ self._factor_weights
+        # Oran toplamı 100'ü aşarsa faktörler ölçeklenir; kalan pay "diğer"
+        total = factors.sum(axis=1, keepdims=True)
+        factors = np.where(total > 100, factors * 100 / np.maximum(total, 1e-9), factors)
+        other = 100 - factors.sum(axis=1, keepdims=True)
+
+        self._exposures = np.hstack([factors, other]) / 100   # 0-1 ağırlık
+        self._fcodes = details['fcode'].to_numpy()
+        self._positions = pd.Index(self._fcodes)
+        self._version = version
+        self.logger.info(f"Faktör exposure matrisi yüklendi: {self._exposures.shape} ({version})")
+
+    def _rows(self, fcodes: Optional[Iterable[str]]):
+        if fcodes is None:
+            return self._fcodes, np.arange(len(self._fcodes))
+        codes = np.asarray(list(fcodes), dtype=object)
+        rows = self._positions.get_indexer(codes)
+        return codes[rows >= 0], rows[rows >= 0]
+
+    def get_exposures(self, fcodes: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """fcode x faktör ağırlıkları (0-1); portföy verisi olmayan fonlar dönmez"""
+        self._ensure_matrix()
+        codes, rows = self._rows(fcodes)
+        return pd.DataFrame(self._exposures[rows], index=pd.Index(codes, name='fcode'), columns=FACTORS)
+
+    def shock_vector(self, inflation: Optional[float] = None, stock_crash: Optional[float] = None,
+                     usd_try: Optional[float] = None) -> Dict[str, float]:
+        """Sorudan çıkan değerleri senaryo -> şok sözlüğüne çevir (crash pozitif düşüş %)"""
+        shocks = {}
+        if inflation is not None:
+            shocks['inflation'] = float(inflation)
+        if stock_crash is not None:
+            shocks['stock_crash'] = float(stock_crash)
+        if usd_try is not None:
+            shocks['currency'] = currency_shock(usd_try, self.base_usd_try)
+        return shocks
+
+    def factor_returns(self, shocks: Dict[str, float]) -> pd.Series:
+        """Aktif senaryoların faktör getirileri (%); senaryo katkıları toplanır"""
+        unknown = set(shocks) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"Bilinmeyen senaryo: {sorted(unknown)}")
+        active = np.array([s in shocks for s in SCENARIOS])
+        magnitudes = np.array([shocks.get(s, 0.0) for s in SCENARIOS], dtype=np.float64)
+        returns = self._base[:, active].sum(axis=1) + self._slope @ magnitudes
+        return pd.Series(returns, index=FACTORS, name='factor_return')
+
+    def project(self, shocks: Dict[str, float], fcodes: Optional[Iterable[str]] = None) -> pd.Series:
+        """Şok vektörü altında fon başına projekte getiri (%)"""
+        self._ensure_matrix()
+        codes, rows = self._rows(fcodes)
+        returns = self._exposures[rows] @ self.factor_returns(shocks).to_numpy()
+        return pd.Series(returns, index=pd.Index(codes, name='fcode'), name='projected_return')
+
+    def sweep(self, scenario: str, magnitudes: Sequence[float],
+              fcodes: Optional[Iterable[str]] = None,
+              fixed: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+        """
+        Bir senaryonun birden fazla şok büyüklüğü için fon x büyüklük projeksiyonu.
+        fixed verilirse diğer senaryolar o değerlerde sabit tutulur.
+        """
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Bilinmeyen senaryo: {scenario}")
+        self._ensure_matrix()
+        codes, rows = self._rows(fcodes)
+
+        j = SCENARIOS.index(scenario)
+        fixed = {k: v for k, v in (fixed or {}).items() if k != scenario}
+        background = self.factor_returns(fixed).to_numpy() if fixed else np.zeros(len(FACTORS))
+        grid = np.asarray(magnitudes, dtype=np.float64)
+
+        # faktör x büyüklük getiri ızgarası -> tek matris çarpımı
+        factor_grid = (background + self._base[:, j])[:, None] + self._slope[:, j][:, None] * grid[None, :]
+        projected = self._exposures[rows] @ factor_grid
+        return pd.DataFrame(projected, index=pd.Index(codes, name='fcode'), columns=list(magnitudes))
+
+    def top_funds(self, shocks: Dict[str, float], n: int = 10, largest: bool = True,
+                  fcodes: Optional[Iterable[str]] = None) -> pd.Series:
+        """Projeksiyona göre en iyi (veya en kötü) n fon"""
+        projected = self.project(shocks, fcodes)
+        return projected.nlargest(n) if largest else projected.nsmallest(n)
+
+    def portfolio_return(self, weights: Dict[str, float], shocks: Dict[str, float]) -> Dict:
+        """
+        Ağırlıklı portföy projeksiyonu (%). Portföy verisi olmayan kalemler
+        'unmatched' olarak döner; projeksiyon eşleşen ağırlıklar üzerinden hesaplanır.
+        """
+        self._ensure_matrix()
+        codes, rows = self._rows(weights)
+        matched = dict(zip(codes, rows))
+        unmatched = {fcode: w for fcode, w in weights.items() if fcode not in matched}
+        if not matched:
+            return {'projected': None, 'matched_weight': 0.0, 'unmatched': unmatched}
+
+        w = np.array([weights[fcode] for fcode in matched], dtype=np.float64)
+        fund_returns = self._exposures[list(matched.values())] @ self.factor_returns(shocks).to_numpy()
+        return {
+            'projected': float(w @ fund_returns / w.sum()),
+            'matched_weight': float(w.sum()),
+            'unmatched': unmatched
+        }
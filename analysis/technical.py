@@ -1,7 +1,7 @@
 # analysis/technical.py
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import logging
 from database.connection import DatabaseManager
 from config.config import Config
@@ -153,49 +153,125 @@ class TechnicalAnalyzer:
         
         return cci
     
+    def _count_level_touches(self, sorted_prices: np.ndarray, levels: np.ndarray,
+                             tolerance: float = 0.02) -> np.ndarray:
+        """Sıralı fiyat dizisinde her seviyenin ±tolerans bandına düşen fiyat sayısı"""
+        upper = np.searchsorted(sorted_prices, levels * (1 + tolerance), side='left')
+        lower = np.searchsorted(sorted_prices, levels * (1 - tolerance), side='right')
+        return upper - lower
+    
+    def _rank_levels(self, levels: np.ndarray, touches: np.ndarray, n_prices: int,
+                     min_touches: int, top_n: int = 5) -> List[Dict]:
+        """Eşiği geçen seviyeleri güce göre sırala (eşitlikte orijinal sıra korunur)"""
+        keep = touches >= min_touches
+        levels, touches = levels[keep], touches[keep]
+        strength = touches / n_prices * 100
+        order = np.argsort(-strength, kind='stable')[:top_n]
+        
+        return [{
+            'level': float(levels[i]),
+            'touches': int(touches[i]),
+            'strength': float(strength[i])
+        } for i in order]
+    
+    def _support_resistance_result(self, resistance_levels: List[Dict], support_levels: List[Dict],
+                                   current_price: float) -> Dict:
+        return {
+            'resistance_levels': resistance_levels,
+            'support_levels': support_levels,
+            'current_price': current_price,
+            'nearest_resistance': min(resistance_levels, key=lambda x: abs(x['level'] - current_price)) if resistance_levels else None,
+            'nearest_support': min(support_levels, key=lambda x: abs(x['level'] - current_price)) if support_levels else None
+        }
+    
     def detect_support_resistance(self, prices: pd.Series, window: int = 10, min_touches: int = 2) -> Dict:
         """Destek ve direnç seviyelerini tespit et"""
         # Local maxima ve minima bul
         highs = prices.rolling(window=window*2+1, center=True).max() == prices
         lows = prices.rolling(window=window*2+1, center=True).min() == prices
         
+        # Tüm ekstremumlar için temas sayısı tek sıralı dizi üzerinde (O(n log n))
+        sorted_prices = np.sort(prices.dropna().to_numpy(dtype=float))
+        
         # Direnç seviyeleri (local maxima)
-        resistance_points = prices[highs].dropna()
-        resistance_levels = []
-        
-        for level in resistance_points:
-            touches = sum(abs(prices - level) / level < 0.02)  # %2 tolerans
-            if touches >= min_touches:
-                resistance_levels.append({
-                    'level': level,
-                    'touches': touches,
-                    'strength': touches / len(prices) * 100
-                })
+        resistance_points = prices[highs].dropna().to_numpy(dtype=float)
+        resistance_levels = self._rank_levels(
+            resistance_points, self._count_level_touches(sorted_prices, resistance_points),
+            len(prices), min_touches
+        )
         
         # Destek seviyeleri (local minima)
-        support_points = prices[lows].dropna()
-        support_levels = []
-        
-        for level in support_points:
-            touches = sum(abs(prices - level) / level < 0.02)  # %2 tolerans
-            if touches >= min_touches:
-                support_levels.append({
-                    'level': level,
-                    'touches': touches,
-                    'strength': touches / len(prices) * 100
-                })
-        
-        # En güçlü seviyeleri sırala
-        resistance_levels = sorted(resistance_levels, key=lambda x: x['strength'], reverse=True)[:5]
-        support_levels = sorted(support_levels, key=lambda x: x['strength'], reverse=True)[:5]
+        support_points = prices[lows].dropna().to_numpy(dtype=float)
+        support_levels = self._rank_levels(
+            support_points, self._count_level_touches(sorted_prices, support_points),
+            len(prices), min_touches
+        )
         
-        return {
-            'resistance_levels': resistance_levels,
-            'support_levels': support_levels,
-            'current_price': prices.iloc[-1],
-            'nearest_resistance': min(resistance_levels, key=lambda x: abs(x['level'] - prices.iloc[-1])) if resistance_levels else None,
-            'nearest_support': min(support_levels, key=lambda x: abs(x['level'] - prices.iloc[-1])) if support_levels else None
-        }
+        return self._support_resistance_result(resistance_levels, support_levels, prices.iloc[-1])
+    
+    def detect_support_resistance_panel(self, price_panel: pd.DataFrame, window: int = 10,
+                                        min_touches: int = 2, tolerance: float = 0.02) -> Dict[str, Dict]:
+        """
+        Tarih x fon fiyat panelinde (index=pdate, columns=fcode) tüm fonların
+        destek/direnç seviyelerini tek geçişte tespit et.
+        
+        Her sütun log-fiyat uzayında kendi ofsetine kaydırılıp tek bir sıralı diziye
+        düzleştirilir; böylece tüm fonların tüm ekstremumları tek bir
+        np.searchsorted çağrısıyla sayılır.
+        """
+        if price_panel.empty:
+            return {}
+        
+        panel = price_panel.sort_index().astype(float)
+        values = panel.to_numpy()
+        n_dates, n_funds = values.shape
+        valid = np.isfinite(values) & (values > 0)
+        
+        rolling = panel.rolling(window=window*2+1, center=True)
+        highs = (rolling.max().to_numpy() == values) & valid
+        lows = (rolling.min().to_numpy() == values) & valid
+        
+        # Sütun başına log-fiyat ofseti: fon j'nin anahtarları [j*K, j*K + span]
+        log_prices = np.log(np.where(valid, values, 1.0))
+        log_min = log_prices[valid].min() if valid.any() else 0.0
+        span = (log_prices[valid].max() - log_min) if valid.any() else 0.0
+        band = np.log1p(tolerance)
+        stride = span + 4 * band + 1.0
+        offsets = np.arange(n_funds) * stride
+        
+        # Geçersiz fiyatlar sütunun bandının dışına, en sona yerleşir
+        keys = np.where(valid, log_prices - log_min, span + 2 * band) + offsets
+        sorted_keys = np.sort(keys, axis=0).ravel(order='F')
+        
+        def touches_for(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            fund_idx, date_idx = np.nonzero(mask.T)  # fon sırasına göre, fon içinde tarih sırası
+            level_keys = keys[date_idx, fund_idx]
+            # log(L*(1-t)) < log(p) < log(L*(1+t)) ile orijinal |p-L|/L < t aynı
+            upper = np.searchsorted(sorted_keys, level_keys + band, side='left')
+            lower = np.searchsorted(sorted_keys, level_keys + np.log1p(-tolerance), side='right')
+            return fund_idx, values[date_idx, fund_idx], upper - lower
+        
+        res_funds, res_levels, res_touches = touches_for(highs)
+        sup_funds, sup_levels, sup_touches = touches_for(lows)
+        
+        n_valid = valid.sum(axis=0)
+        last_idx = np.where(valid.any(axis=0), n_dates - 1 - np.argmax(valid[::-1], axis=0), -1)
+        res_bounds = np.searchsorted(res_funds, np.arange(n_funds + 1))
+        sup_bounds = np.searchsorted(sup_funds, np.arange(n_funds + 1))
+        
+        results = {}
+        for j, fcode in enumerate(panel.columns):
+            if last_idx[j] < 0:
+                continue
+            r_slice = slice(res_bounds[j], res_bounds[j + 1])
+            s_slice = slice(sup_bounds[j], sup_bounds[j + 1])
+            results[fcode] = self._support_resistance_result(
+                self._rank_levels(res_levels[r_slice], res_touches[r_slice], n_valid[j], min_touches),
+                self._rank_levels(sup_levels[s_slice], sup_touches[s_slice], n_valid[j], min_touches),
+                values[last_idx[j], j]
+            )
+        
+        return results
     
     def generate_trading_signals(self, technical_data: pd.DataFrame) -> pd.DataFrame:
         """Teknik analize dayalı alım-satım sinyalleri üret"""
@@ -448,6 +524,260 @@ class TechnicalAnalyzer:
             'total_funds_analyzed': len(results)
         }
     
+    # --- PANEL (TARİH x FON) İNDİKATÖR MOTORU ---
+    
+    def _panel_rolling_sum(self, values: np.ndarray, period: int) -> np.ndarray:
+        """Kümülatif toplam ile sütun bazlı kayan toplam; pencerede NaN varsa NaN"""
+        valid = np.isfinite(values)
+        csum = np.cumsum(np.where(valid, values, 0.0), axis=0)
+        ccount = np.cumsum(valid, axis=0)
+        
+        window_sum = csum.copy()
+        window_sum[period:] -= csum[:-period]
+        window_count = ccount.copy()
+        window_count[period:] -= ccount[:-period]
+        
+        window_sum[window_count < period] = np.nan
+        window_sum[:period - 1] = np.nan
+        return window_sum
+    
+    def _panel_sma(self, values: np.ndarray, period: int) -> np.ndarray:
+        return self._panel_rolling_sum(values, period) / period
+    
+    def _panel_rolling_std(self, values: np.ndarray, period: int) -> np.ndarray:
+        """Örneklem standart sapması (ddof=1); sayısal kararlılık için sütunlar ilk değere göre kaydırılır"""
+        first_valid = np.argmax(np.isfinite(values), axis=0)
+        shifted = values - values[first_valid, np.arange(values.shape[1])]
+        
+        s1 = self._panel_rolling_sum(shifted, period)
+        s2 = self._panel_rolling_sum(shifted ** 2, period)
+        variance = (s2 - s1 ** 2 / period) / (period - 1)
+        return np.sqrt(np.clip(variance, 0.0, None))
+    
+    def _panel_rolling_extreme(self, values: np.ndarray, period: int, func) -> np.ndarray:
+        """Sütun bazlı kayan max/min (pandas rolling ile aynı NaN davranışı)"""
+        result = np.full_like(values, np.nan)
+        if len(values) >= period:
+            windows = np.lib.stride_tricks.sliding_window_view(values, period, axis=0)
+            result[period - 1:] = func(windows, axis=-1)
+        return result
+    
+    def _panel_ema(self, values: np.ndarray, span: int) -> np.ndarray:
+        """
+        pandas ewm(span=span).mean() (adjust=True) ile aynı özyinelemeli EMA;
+        zaman ekseninde döngü, fonlar üzerinde vektörel.
+        """
+        decay = 1.0 - 2.0 / (span + 1.0)
+        numerator = np.zeros(values.shape[1])
+        weight = np.zeros(values.shape[1])
+        result = np.empty_like(values)
+        
+        for t in range(values.shape[0]):
+            row = values[t]
+            valid = np.isfinite(row)
+            numerator = decay * numerator + np.where(valid, row, 0.0)
+            weight = decay * weight + valid
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[t] = numerator / weight
+        
+        return result
+    
+    def _panel_shift(self, values: np.ndarray, periods: int = 1) -> np.ndarray:
+        shifted = np.full_like(values, np.nan)
+        shifted[periods:] = values[:-periods]
+        return shifted
+    
+    def calculate_panel_indicators(self, price_panel: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Tarih x fon fiyat matrisi için tüm teknik indikatörleri tek geçişte hesapla.
+        Sonuç, analyze_fund_technical'daki sütun adlarıyla anahtarlanmış
+        (index=pdate, columns=fcode) DataFrame sözlüğüdür.
+        """
+        panel = price_panel.sort_index().astype(float)
+        prices = panel.to_numpy()
+        cfg = self.indicators_config
+        out = {'price': prices}
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Moving Averages
+            for period in cfg['sma_periods']:
+                out[f'SMA_{period}'] = self._panel_sma(prices, period)
+            emas = {}
+            for period in set(cfg['ema_periods']) | {cfg['macd_fast'], cfg['macd_slow'], 12, 26}:
+                emas[period] = self._panel_ema(prices, period)
+            for period in cfg['ema_periods']:
+                out[f'EMA_{period}'] = emas[period]
+            
+            # RSI (calculate_rsi ile aynı: basit ortalama, ilk fark 0 sayılır)
+            delta = prices - self._panel_shift(prices)
+            listed = np.isfinite(prices)
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+            gain[~listed] = np.nan
+            loss[~listed] = np.nan
+            rsi_period = cfg['rsi_period']
+            rs = self._panel_sma(gain, rsi_period) / self._panel_sma(loss, rsi_period)
+            out['RSI'] = 100 - (100 / (1 + rs))
+            
+            # MACD
+            macd_line = emas[cfg['macd_fast']] - emas[cfg['macd_slow']]
+            signal_line = self._panel_ema(macd_line, cfg['macd_signal'])
+            out['MACD'] = macd_line
+            out['MACD_Signal'] = signal_line
+            out['MACD_Histogram'] = macd_line - signal_line
+            
+            # Bollinger Bands
+            bb_period = cfg['bollinger_period']
+            sma = self._panel_sma(prices, bb_period)
+            std = self._panel_rolling_std(prices, bb_period)
+            upper = sma + std * cfg['bollinger_std']
+            lower = sma - std * cfg['bollinger_std']
+            out['BB_Upper'] = upper
+            out['BB_Middle'] = sma
+            out['BB_Lower'] = lower
+            out['BB_Width'] = (upper - lower) / sma
+            out['BB_Percent'] = (prices - lower) / (upper - lower)
+            
+            # Stochastic ve Williams %R (fonlar için high = low = close = price)
+            lowest_14 = self._panel_rolling_extreme(prices, 14, np.min)
+            highest_14 = self._panel_rolling_extreme(prices, 14, np.max)
+            stoch_k = 100 * (prices - lowest_14) / (highest_14 - lowest_14)
+            out['Stoch_K'] = stoch_k
+            out['Stoch_D'] = self._panel_sma(stoch_k, 3)
+            out['Williams_R'] = -100 * (highest_14 - prices) / (highest_14 - lowest_14)
+            
+            # CCI - ortalama mutlak sapma pencere ofsetleri üzerinden toplanır
+            cci_period = 20
+            sma_tp = self._panel_sma(prices, cci_period)
+            abs_dev = np.abs(prices - sma_tp)
+            for k in range(1, cci_period):
+                abs_dev += np.abs(self._panel_shift(prices, k) - sma_tp)
+            out['CCI'] = (prices - sma_tp) / (0.015 * abs_dev / cci_period)
+            
+            # ATR - true range = |fiyat değişimi|, ilk gün 0
+            true_range = np.fmax(prices - prices, np.abs(delta))
+            out['ATR'] = self._panel_sma(true_range, 14)
+            
+            # Momentum
+            for period in [5, 10, 20]:
+                lagged = self._panel_shift(prices, period)
+                out[f'ROC_{period}'] = (prices / lagged - 1) * 100
+                out[f'Momentum_{period}'] = prices - lagged
+            out['Price_Oscillator'] = (emas[12] - emas[26]) / emas[26] * 100
+        
+        return {name: pd.DataFrame(values, index=panel.index, columns=panel.columns)
+                for name, values in out.items()}
+    
+    def generate_panel_signals(self, indicators: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """generate_trading_signals'ın panel karşılığı (tüm fonlar için aynı kurallar)"""
+        def crossed_up(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+            return (a > b) & (self._panel_shift(a) <= self._panel_shift(b))
+        
+        rsi = indicators['RSI'].to_numpy()
+        macd = indicators['MACD'].to_numpy()
+        macd_signal = indicators['MACD_Signal'].to_numpy()
+        bb_percent = indicators['BB_Percent'].to_numpy()
+        
+        signals = {
+            'RSI_Signal': np.where(rsi < 30, 1, np.where(rsi > 70, -1, 0)),
+            'MACD_Signal': np.where(crossed_up(macd, macd_signal), 1,
+                                    np.where(crossed_up(macd_signal, macd), -1, 0)),
+            'BB_Signal': np.where(bb_percent < 0, 1, np.where(bb_percent > 1, -1, 0)),
+            'MA_Signal': np.zeros(rsi.shape, dtype=int)
+        }
+        if 'SMA_20' in indicators and 'SMA_50' in indicators:
+            sma20 = indicators['SMA_20'].to_numpy()
+            sma50 = indicators['SMA_50'].to_numpy()
+            signals['MA_Signal'] = np.where(crossed_up(sma20, sma50), 1,
+                                            np.where(crossed_up(sma50, sma20), -1, 0))
+        
+        combined = (signals['RSI_Signal'] * 0.25 + signals['MACD_Signal'] * 0.30 +
+                    signals['BB_Signal'] * 0.25 + signals['MA_Signal'] * 0.20)
+        signals['Combined_Signal'] = combined
+        signals['Signal_Strength'] = combined
+        signals['Final_Signal'] = np.where(combined > 0.5, 1, np.where(combined < -0.5, -1, 0))
+        
+        template = indicators['RSI']
+        return {name: pd.DataFrame(values, index=template.index, columns=template.columns)
+                for name, values in signals.items()}
+    
+    def _analyze_panel_trend(self, latest: pd.DataFrame) -> pd.DataFrame:
+        """_analyze_trend kurallarının son satır üzerinde vektörel karşılığı"""
+        def direction(a: pd.Series, b) -> np.ndarray:
+            return np.select([a > b, a < b], ['Yükseliş', 'Düşüş'], default='Yatay')
+        
+        if 'SMA_20' in latest.columns and 'SMA_50' in latest.columns:
+            ma_trend = direction(latest['SMA_20'], latest['SMA_50'])
+        else:
+            ma_trend = np.full(len(latest), 'Belirsiz', dtype=object)
+        rsi_trend = direction(latest['RSI'], 50)
+        macd_trend = direction(latest['MACD'], latest['MACD_Signal'])
+        
+        trends = np.stack([ma_trend, rsi_trend, macd_trend])
+        up_count = (trends == 'Yükseliş').sum(axis=0)
+        down_count = (trends == 'Düşüş').sum(axis=0)
+        
+        return pd.DataFrame({
+            'trend': np.select([up_count >= 2, down_count >= 2], ['Yükseliş', 'Düşüş'], default='Yatay'),
+            'trend_strength': np.select([up_count >= 2, down_count >= 2], [up_count / 3, down_count / 3], default=0.5),
+            'ma_trend': ma_trend,
+            'rsi_trend': rsi_trend,
+            'macd_trend': macd_trend
+        }, index=latest.index)
+    
+    def batch_technical_scan(self, fund_codes: List[str] = None, days: int = 252) -> Dict:
+        """
+        Tüm evren (veya verilen fonlar) için tek panel sorgusu ve tek geçişte teknik tarama.
+        batch_technical_analysis ile aynı özet raporu döndürür; fon başına sorgu yapılmaz.
+        """
+        try:
+            price_panel = self.db.get_price_panel(fund_codes, days)
+            if price_panel.empty:
+                return {}
+            
+            indicators = self.calculate_panel_indicators(price_panel)
+            signals = self.generate_panel_signals(indicators)
+            
+            # Fon başına son geçerli satır (kısa geçmişli fonlar dahil)
+            last_valid = price_panel.notna()[::-1].idxmax()
+            row_idx = price_panel.index.get_indexer(last_valid.values)
+            col_idx = np.arange(price_panel.shape[1])
+            latest_frames = {**indicators,
+                             'Signal_Strength': signals['Signal_Strength'],
+                             'Final_Signal': signals['Final_Signal']}
+            latest = pd.DataFrame({
+                name: frame.to_numpy()[row_idx, col_idx]
+                for name, frame in latest_frames.items()
+            }, index=price_panel.columns)
+            
+            trend = self._analyze_panel_trend(latest)
+            support_resistance = self.detect_support_resistance_panel(price_panel)
+            
+            summary_df = pd.DataFrame({
+                'fcode': latest.index,
+                'current_price': latest['price'].values,
+                'rsi': latest['RSI'].values,
+                'signal_strength': latest['Signal_Strength'].values,
+                'final_signal': latest['Final_Signal'].astype(int).values,
+                'trend': trend['trend'].values,
+                'trend_strength': trend['trend_strength'].values
+            })
+            
+            return {
+                'indicators': indicators,
+                'signals': signals,
+                'latest_values': latest,
+                'trend_analysis': trend,
+                'support_resistance': support_resistance,
+                'summary_report': self._summarize_technical_table(summary_df),
+                'analysis_date': pd.Timestamp.now(),
+                'total_funds_analyzed': len(summary_df)
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Panel teknik tarama hatası: {e}")
+            return {}
+    
     def _create_technical_summary(self, analyses: Dict) -> Dict:
         """Teknik analiz özet raporu oluştur"""
         if not analyses:
@@ -468,8 +798,10 @@ class TechnicalAnalyzer:
                 'trend_strength': trend.get('trend_strength', 0)
             })
         
-        summary_df = pd.DataFrame(summary_data)
-        
+        return self._summarize_technical_table(pd.DataFrame(summary_data))
+    
+    def _summarize_technical_table(self, summary_df: pd.DataFrame) -> Dict:
+        """Fon başına özet tablosundan sinyal/trend dağılımı raporu"""
         # İstatistikler
         buy_signals = len(summary_df[summary_df['final_signal'] == 1])
         sell_signals = len(summary_df[summary_df['final_signal'] == -1])
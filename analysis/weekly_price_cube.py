@@ -0,0 +1,146 @@
+# analysis/weekly_price_cube.py
+"""
+Haftalık fiyat küpü
+Günlük fiyat matrisi veri sürümü başına bir kez hafta x fon açılış/yüksek/düşük/
+kapanış/ortalama/gözlem sayısı dizilerine indirgenir. Haftalık momentum, seri
+(art arda yükselen hafta) ve trend tutarlılığı tüm fonlar için vektörel hesaplanır.
+"""
+
+import logging
+import warnings
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+CUBE_FIELDS = ['open', 'high', 'low', 'close', 'mean', 'count']
+
+
+class WeeklyPriceCube:
+    """Hafta x fon OHLC küpü ve haftalık trend metrikleri"""
+
+    def __init__(self, db_manager, max_weeks: int = 26):
+        self.db = db_manager
+        self.max_weeks = max_weeks
+        self.logger = logging.getLogger(__name__)
+        self._version = None
+        self._cube: Dict[str, np.ndarray] = {}
+        self._weeks = None
+        self._fcodes = None
+        self._last_price = None
+
+    def _ensure_cube(self, force_refresh: bool = False):
+        version = self.db.get_data_version(force_refresh)
+        if self._cube and not force_refresh and version == self._version:
+            return
+
+        # Haftada 5 işlem günü + kısmi ilk/son hafta payı
+        panel = self.db.get_price_panel(days=self.max_weeks * 5 + 10)
+        self._cube = {}
+        if panel.empty:
+            self._weeks, self._fcodes = pd.DatetimeIndex([]), pd.Index([])
+            self._last_price = np.array([])
+            self._version = version
+            return
+
+        # DATE_TRUNC('week') ile aynı: pazartesi başlangıçlı haftalar
+        week_start = panel.index.normalize() - pd.to_timedelta(panel.index.weekday, unit='D')
+        grouped = panel.groupby(week_start)
+        self._cube = {
+            'open': grouped.first().to_numpy(),
+            'high': grouped.max().to_numpy(),
+            'low': grouped.min().to_numpy(),
+            'close': grouped.last().to_numpy(),
+            'mean': grouped.mean().to_numpy(),
+            'count': grouped.count().to_numpy()
+        }
+        self._weeks = pd.DatetimeIndex(grouped.first().index)
+        self._fcodes = panel.columns
+        self._last_price = panel.ffill().iloc[-1].to_numpy()
+        self._version = version
+        self.logger.info(f"Haftalık fiyat küpü kuruldu: {len(self._weeks)} hafta x {len(self._fcodes)} fon ({version})")
+
+    def get_cube(self, field: str = 'close', weeks: int = None) -> pd.DataFrame:
+        """Bir küp alanı (hafta x fon); weeks verilirse son `weeks` hafta"""
+        self._ensure_cube()
+        if not self._cube:
+            return pd.DataFrame()
+        frame = pd.DataFrame(self._cube[field], index=self._weeks, columns=self._fcodes)
+        return frame.tail(weeks) if weeks else frame
+
+    def trend_metrics(self, weeks: int = 8, min_days: int = 3) -> pd.DataFrame:
+        """
+        Son `weeks` haftada haftalık ortalama fiyat üzerinden trend metrikleri.
+        Haftada min_days'ten az gözlemi olan haftalar atlanır; değişimler fonun
+        bir önceki geçerli haftasına göredir.
+        """
+        self._ensure_cube()
+        if not self._cube:
+            return pd.DataFrame()
+
+        # Pencere başlangıcı dahil tüm haftalar (son hafta kısmi olabilir)
+        rows = self._weeks >= self._weeks.max() - pd.Timedelta(weeks=weeks)
+        avg = self._cube['mean'][rows]
+        valid = self._cube['count'][rows] >= min_days
+        avg = np.where(valid, avg, np.nan)
+        n_weeks = valid.sum(axis=0)
+
+        # Önceki geçerli haftanın ortalaması (ileri doldurma + bir hafta kaydırma)
+        filled = pd.DataFrame(avg).ffill().to_numpy()
+        previous = np.vstack([np.full((1, avg.shape[1]), np.nan), filled[:-1]])
+        has_prev = valid & ~np.isnan(previous)
+        up = has_prev & (avg > previous)
+
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            change = np.where(has_prev & (previous > 0), (avg - previous) / previous * 100, np.nan)
+            avg_weekly_change = np.nanmean(change, axis=0)
+
+            # REGR_SLOPE(avg_price, week_num): week_num fonun geçerli haftaları içindeki sıra
+            week_num = np.where(valid, np.cumsum(valid, axis=0), np.nan)
+            x_mean = np.nanmean(week_num, axis=0)
+            y_mean = np.nanmean(avg, axis=0)
+            sxy = np.nansum((week_num - x_mean) * (avg - y_mean), axis=0)
+            sxx = np.nansum((week_num - x_mean) ** 2, axis=0)
+            trend_slope = np.where((n_weeks >= 2) & (sxx > 0), sxy / sxx, np.nan)
+
+            weekly_volatility = np.nanstd(avg, axis=0, ddof=1) / y_mean * 100
+
+        first_row = np.argmax(valid, axis=0)
+        last_row = len(avg) - 1 - np.argmax(valid[::-1], axis=0)
+        cols = np.arange(avg.shape[1])
+        first_week_price = avg[first_row, cols]
+        last_week_price = avg[last_row, cols]
+
+        # Son haftadan geriye art arda yükselen hafta sayısı (geçersiz haftalar seriyi bozmaz)
+        up_streak = np.zeros(avg.shape[1], dtype=np.int64)
+        broken = np.zeros(avg.shape[1], dtype=bool)
+        for t in range(len(avg) - 1, -1, -1):
+            broken |= has_prev[t] & ~up[t]
+            up_streak += (up[t] & ~broken)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total_change = np.where(first_week_price > 0, (last_week_price - first_week_price) / first_week_price * 100, 0.0)
+            comparisons = has_prev.sum(axis=0)
+            consistency = np.where(comparisons > 0, up.sum(axis=0) / comparisons, np.nan)
+
+        result = pd.DataFrame({
+            'fcode': self._fcodes,
+            'weeks_with_data': n_weeks,
+            'positive_weeks': up.sum(axis=0),
+            'trend_slope': trend_slope,
+            'avg_weekly_change': avg_weekly_change,
+            'weekly_volatility': weekly_volatility,
+            'first_week_price': first_week_price,
+            'last_week_price': last_week_price,
+            'total_change_pct': total_change,
+            'up_streak': up_streak,
+            'trend_consistency': consistency,
+            'current_price': self._last_price
+        })
+        return result[n_weeks > 0].reset_index(drop=True)
+
+    def consecutive_up_weeks(self, n: int, weeks: int = 8, **kwargs) -> pd.DataFrame:
+        """Son `n` geçerli haftadır art arda yükselen fonlar"""
+        metrics = self.trend_metrics(weeks, **kwargs)
+        return metrics[metrics['up_streak'] >= n].sort_values('up_streak', ascending=False).reset_index(drop=True)
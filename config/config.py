@@ -30,6 +30,12 @@ class AnalysisConfig:
     monte_carlo_simulations: int = 10000
     backtesting_period: int = 252  # 1 year
     technical_indicators: dict = None
+    benchmarks: dict = None
+    default_benchmark: str = 'bist100'
+    usd_try_rate: float = float(os.getenv('USD_TRY_RATE', '40.0'))  # Kur senaryoları için baz USD/TRY
+    stress_history_days: int = 1260  # Tarihsel stres tekrarı için ~5 yıl
+    simulation_method: str = 'gaussian'  # 'gaussian' veya 'block_bootstrap' (durağan blok bootstrap)
+    bootstrap_block_days: float = 10.0  # Bootstrap ortalama blok uzunluğu (işlem günü)
     
     def __post_init__(self):
         if self.confidence_levels is None:
@@ -45,6 +51,30 @@ class AnalysisConfig:
                 'bollinger_period': 20,
                 'bollinger_std': 2
             }
+        if self.benchmarks is None:
+            # factor_index: factor_index_levels içindeki büyüklük ağırlıklı endeks (öncelikli).
+            # Endeks yoksa fund_codes sırayla denenir; hiçbiri yeterli veriye sahip değilse
+            # asset_columns toplamı min_ratio üstündeki en büyük fon kullanılır
+            self.benchmarks = {
+                'bist100': {
+                    'factor_index': 'equity',
+                    'fund_codes': ['TI2', 'TKF', 'GAF', 'GEH', 'TYH'],
+                    'asset_columns': ['stock'],
+                    'min_ratio': 80
+                },
+                'gold': {
+                    'factor_index': 'gold',
+                    'fund_codes': [],
+                    'asset_columns': ['preciousmetals', 'preciousmetalsbyf', 'preciousmetalskba', 'preciousmetalskks'],
+                    'min_ratio': 80
+                },
+                'usd': {
+                    'factor_index': 'fx',
+                    'fund_codes': [],
+                    'asset_columns': ['foreigncurrencybills', 'eurobonds', 'governmentbondsandbillsfx', 'fxpayablebills'],
+                    'min_ratio': 60
+                }
+            }
 
 class Config:
     def __init__(self):
@@ -69,7 +99,13 @@ class Config:
                 'confidence_levels': self.analysis.confidence_levels,
                 'monte_carlo_simulations': self.analysis.monte_carlo_simulations,
                 'backtesting_period': self.analysis.backtesting_period,
-                'technical_indicators': self.analysis.technical_indicators
+                'technical_indicators': self.analysis.technical_indicators,
+                'benchmarks': self.analysis.benchmarks,
+                'default_benchmark': self.analysis.default_benchmark,
+                'usd_try_rate': self.analysis.usd_try_rate,
+                'stress_history_days': self.analysis.stress_history_days,
+                'simulation_method': self.analysis.simulation_method,
+                'bootstrap_block_days': self.analysis.bootstrap_block_days
             }
         }
         
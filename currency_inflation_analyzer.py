@@ -13,6 +13,9 @@ import time
 from database.connection import DatabaseManager
 from config.config import Config
 from risk_assessment import RiskAssessment
+from analysis.fund_title_index import FundTitleIndex
+from analysis.performance import PerformanceAnalyzer
+from analysis.currency_exposure import CurrencyExposureMatrix, EXPOSURE_BUCKETS
 
 class CurrencyInflationAnalyzer:
     """Döviz ve Enflasyon analiz sistemi - MV + Risk Assessment"""
@@ -21,6 +24,7 @@ class CurrencyInflationAnalyzer:
         self.db = db_manager
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.title_index = FundTitleIndex(db_manager)
         
         # 💱 DÖVIZ VE ENFLASYON KEYWORD MAPPING
         self.currency_keywords = {
@@ -87,6 +91,9 @@ class CurrencyInflationAnalyzer:
                 'portfolio_fields': ['preciousmetals', 'preciousmetalsbyf', 'preciousmetalskba', 'preciousmetalskks']
             }
         }
+        
+        # Fon x varlık sınıfı matrisi - portföy skorları tüm fonlar için tek seferde
+        self.exposure_matrix = CurrencyExposureMatrix(db_manager, self.currency_keywords)
     
     @staticmethod
     def is_currency_inflation_question(question):
@@ -551,95 +558,92 @@ class CurrencyInflationAnalyzer:
         # 3. Sonuçları formatla
         return self.format_currency_analysis_results(currency_type, performance_results, elapsed)
 
+    def _load_currency_universe(self, currency_types):
+        """
+        Birden çok döviz sınıfının aday fonlarını tek sorguda yükle.
+        
+        Returns:
+            tuple: (fcode indeksli fon tablosu - büyüklüğe göre sıralı,
+                    {currency_type: [fcode, ...]} sınıf üyelikleri)
+        """
+        members = {}
+        for currency_type in currency_types:
+            keywords = self.currency_keywords.get(currency_type, {}).get('keywords', [])
+            # İlk 5 keyword başlık indeksinden fon kodlarına çözülür
+            members[currency_type] = self.title_index.search(keywords[:5], days=7) if keywords else []
+        
+        fcodes = sorted({fcode for codes in members.values() for fcode in codes})
+        if not fcodes:
+            return pd.DataFrame(), members
+        
+        query = f"""
+            SELECT 
+                lf.fcode,
+                lf.ftitle as fund_name,
+                lf.fcapacity,
+                lf.investorcount,
+                lf.price as current_price,
+                pm.annual_return,
+                pm.annual_volatility,
+                pm.sharpe_ratio,
+                pm.win_rate,
+                ti.rsi_14,
+                ti.stochastic_14,
+                ti.price_vs_sma20,
+                ti.days_since_last_trade
+            FROM mv_latest_fund_data lf
+            LEFT JOIN mv_fund_performance_metrics pm ON lf.fcode = pm.fcode
+            LEFT JOIN mv_fund_technical_indicators ti ON lf.fcode = ti.fcode
+            WHERE lf.fcode = ANY(:fcodes)
+            AND lf.investorcount > 50
+            ORDER BY lf.fcapacity DESC NULLS LAST
+        """
+        
+        frame = self.db.execute_query(query, {'fcodes': fcodes})
+        frame = frame.drop_duplicates('fcode').set_index('fcode', drop=False)
+        return frame, members
+    
+    def _currency_funds_from_frame(self, frame, fcodes, currency_type, limit=50):
+        """Sınıf üyelerinden en büyük `limit` fonu al, portföy skoruna göre filtrele ve sırala"""
+        rows = frame[frame['fcode'].isin(fcodes)].head(limit)
+        # Portföy skoruna göre azalan sıra exposure matrisinden (portföy verisi olmayan fonlar düşer)
+        ranked = self.exposure_matrix.rank(currency_type, fcodes=rows['fcode'])
+        ranked = ranked[ranked > 0.1]  # %10+ ilgili varlık
+        
+        funds_list = []
+        for fcode, portfolio_score in ranked.items():
+            row = rows.loc[fcode]
+            
+            funds_list.append({
+                'fcode': row['fcode'],
+                'fund_name': row['fund_name'],
+                'capacity': float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0,
+                'investors': int(row['investorcount']) if pd.notna(row['investorcount']) else 0,
+                'current_price': float(row['current_price']) if pd.notna(row['current_price']) else 0,
+                'portfolio_score': float(portfolio_score),
+                'currency_type': currency_type,
+                # MV'den gelen performans verileri
+                'annual_return': float(row['annual_return']) * 100 if pd.notna(row['annual_return']) else None,
+                'volatility': float(row['annual_volatility']) * 100 if pd.notna(row['annual_volatility']) else None,
+                'sharpe_ratio': float(row['sharpe_ratio']) if pd.notna(row['sharpe_ratio']) else None,
+                'win_rate': float(row['win_rate']) * 100 if pd.notna(row['win_rate']) else None,
+                # Risk verileri
+                'rsi_14': float(row['rsi_14']) if pd.notna(row['rsi_14']) else 50,
+                'stochastic_14': float(row['stochastic_14']) if pd.notna(row['stochastic_14']) else 50,
+                'price_vs_sma20': float(row['price_vs_sma20']) if pd.notna(row['price_vs_sma20']) else 0,
+                'days_since_last_trade': int(row['days_since_last_trade']) if pd.notna(row['days_since_last_trade']) else 0
+            })
+        
+        return funds_list
+
     def _find_currency_funds_mv(self, currency_type):
         """MV'den döviz fonlarını bul"""
         try:
-            currency_data = self.currency_keywords.get(currency_type, {})
-            keywords = currency_data.get('keywords', [])
-            
-            if not keywords:
-                return []
-            
-            # SQL LIKE koşulları oluştur
-            like_conditions = []
-            for keyword in keywords[:5]:  # İlk 5 keyword kullan
-                like_conditions.append(f"UPPER(lf.ftitle) LIKE '%{keyword}%'")
-            
-            where_clause = " OR ".join(like_conditions)
-            
-            # MV sorgusu
-            query = f"""
-            WITH currency_funds AS (
-                SELECT 
-                    lf.fcode,
-                    lf.ftitle as fund_name,
-                    lf.fcapacity,
-                    lf.investorcount,
-                    lf.price as current_price,
-                    pm.annual_return,
-                    pm.annual_volatility,
-                    pm.sharpe_ratio,
-                    pm.win_rate,
-                    ti.rsi_14,
-                    ti.stochastic_14,
-                    ti.price_vs_sma20,
-                    ti.days_since_last_trade,
-                    -- Portföy detayları
-                    fd.eurobonds,
-                    fd.foreigncurrencybills,
-                    fd.foreigndebtinstruments,
-                    fd.preciousmetals,
-                    fd.stock,
-                    fd.governmentbond,
-                    fd.treasurybill,
-                    fd.termdeposittl,
-                    fd.governmentleasecertificates,
-                    fd.derivatives
-                FROM mv_latest_fund_data lf
-                LEFT JOIN mv_fund_performance_metrics pm ON lf.fcode = pm.fcode
-                LEFT JOIN mv_fund_technical_indicators ti ON lf.fcode = ti.fcode
-                LEFT JOIN mv_fund_details_latest fd ON lf.fcode = fd.fcode
-                WHERE ({where_clause})
-                AND lf.investorcount > 50
-            )
-            SELECT * FROM currency_funds
-            ORDER BY fcapacity DESC NULLS LAST
-            LIMIT 50
-            """
-            
-            result = self.db.execute_query(query)
-            
-            if result.empty:
+            frame, members = self._load_currency_universe([currency_type])
+            if frame.empty:
                 return []
             
-            funds_list = []
-            for _, row in result.iterrows():
-                # Portföy skorunu hesapla
-                portfolio_score = self._calculate_currency_portfolio_score_mv(row, currency_type)
-                
-                funds_list.append({
-                    'fcode': row['fcode'],
-                    'fund_name': row['fund_name'],
-                    'capacity': float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0,
-                    'investors': int(row['investorcount']) if pd.notna(row['investorcount']) else 0,
-                    'current_price': float(row['current_price']) if pd.notna(row['current_price']) else 0,
-                    'portfolio_score': portfolio_score,
-                    'currency_type': currency_type,
-                    # MV'den gelen performans verileri
-                    'annual_return': float(row['annual_return']) * 100 if pd.notna(row['annual_return']) else None,
-                    'volatility': float(row['annual_volatility']) * 100 if pd.notna(row['annual_volatility']) else None,
-                    'sharpe_ratio': float(row['sharpe_ratio']) if pd.notna(row['sharpe_ratio']) else None,
-                    'win_rate': float(row['win_rate']) * 100 if pd.notna(row['win_rate']) else None,
-                    # Risk verileri
-                    'rsi_14': float(row['rsi_14']) if pd.notna(row['rsi_14']) else 50,
-                    'stochastic_14': float(row['stochastic_14']) if pd.notna(row['stochastic_14']) else 50,
-                    'price_vs_sma20': float(row['price_vs_sma20']) if pd.notna(row['price_vs_sma20']) else 0,
-                    'days_since_last_trade': int(row['days_since_last_trade']) if pd.notna(row['days_since_last_trade']) else 0
-                })
-            
-            # Portföy skoruna göre filtrele ve sırala
-            filtered_funds = [f for f in funds_list if f['portfolio_score'] > 0.1]  # %10+ ilgili varlık
-            filtered_funds.sort(key=lambda x: x['portfolio_score'], reverse=True)
+            filtered_funds = self._currency_funds_from_frame(frame, members[currency_type], currency_type)
             
             print(f"   ✅ MV'den {len(filtered_funds)} uygun fon yüklendi")
             return filtered_funds
@@ -648,63 +652,31 @@ class CurrencyInflationAnalyzer:
             print(f"   ❌ MV sorgu hatası: {e}")
             return []
 
-    def _calculate_currency_portfolio_score_mv(self, row, currency_type):
-        """MV verisinden portföy skoru hesapla"""
-        try:
-            currency_data = self.currency_keywords.get(currency_type, {})
-            portfolio_fields = currency_data.get('portfolio_fields', [])
-            
-            total_score = 0
-            
-            # İlgili portföy alanlarından skor hesapla
-            for field in portfolio_fields:
-                if field in row and pd.notna(row[field]):
-                    value = float(row[field])
-                    total_score += value
-            
-            # Özel hesaplamalar
-            if currency_type == 'usd' or currency_type == 'eur':
-                # Dolar/Euro için: yabancı varlıklar
-                foreign_assets = (
-                    float(row.get('eurobonds', 0) or 0) +
-                    float(row.get('foreigncurrencybills', 0) or 0) +
-                    float(row.get('foreigndebtinstruments', 0) or 0)
-                )
-                total_score = max(total_score, foreign_assets)
-                
-            elif currency_type == 'tl_based':
-                # TL için: yerli borçlanma araçları
-                tl_assets = (
-                    float(row.get('governmentbond', 0) or 0) +
-                    float(row.get('treasurybill', 0) or 0) +
-                    float(row.get('termdeposittl', 0) or 0)
-                )
-                total_score = max(total_score, tl_assets)
-                
-            elif currency_type == 'precious_metals':
-                # Altın için
-                total_score = float(row.get('preciousmetals', 0) or 0)
-            
-            return min(total_score / 100, 1.0)  # 0-1 arası normalize et
-            
-        except Exception as e:
-            return 0
-
-    def analyze_currency_performance_mv(self, currency_type, funds_list):
-        """MV tabanlı performans analizi - Risk Assessment dahil"""
-        print(f"   📈 {len(funds_list)} fon için performans + risk analizi (MV tabanlı)...")
+    def _evaluate_currency_funds(self, funds_list, analysis_days=120):
+        """
+        Fon başına risk değerlendirmesi ve performans metrikleri - her fon yalnızca bir kez.
+        MV metrikleri olmayan fonlar ortak fiyat matrisinden birlikte hesaplanır.
         
-        performance_results = []
-        successful = 0
-        high_risk_count = 0
-        extreme_risk_count = 0
+        Returns:
+            dict: {fcode: {'risk': risk_assessment, 'performance': dict veya None}}
+        """
+        unique_funds = {}
+        for fund_info in funds_list:
+            unique_funds.setdefault(fund_info['fcode'], fund_info)
         
-        for i, fund_info in enumerate(funds_list, 1):
-            fcode = fund_info['fcode']
-            
-            if i % 10 == 0:
-                print(f"   [{i}/{len(funds_list)}] işlendi...")
-            
+        missing = [fcode for fcode, info in unique_funds.items() if info.get('annual_return') is None]
+        panel_metrics = pd.DataFrame()
+        if missing:
+            try:
+                price_panel = self.db.get_price_panel(missing, analysis_days)
+                if not price_panel.empty:
+                    panel_metrics = PerformanceAnalyzer.calculate_panel_metrics(price_panel)
+                    panel_metrics = panel_metrics[panel_metrics['data_points'] >= 30]
+            except Exception as e:
+                self.logger.warning(f"Döviz fonları fiyat matrisi alınamadı: {e}")
+        
+        evaluations = {}
+        for fcode, fund_info in unique_funds.items():
             try:
                 # Risk değerlendirmesi
                 risk_data = {
@@ -715,58 +687,73 @@ class CurrencyInflationAnalyzer:
                     'days_since_last_trade': fund_info.get('days_since_last_trade', 0),
                     'investorcount': fund_info['investors']
                 }
-                
                 risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
                 
-                # Risk sayacları
-                if risk_assessment['risk_level'] == 'HIGH':
-                    high_risk_count += 1
-                elif risk_assessment['risk_level'] == 'EXTREME':
-                    extreme_risk_count += 1
-                
-                # MV'den gelen performans verilerini kullan
+                performance = None
                 if fund_info.get('annual_return') is not None:
                     # MV verileri mevcut
-                    annual_return = fund_info['annual_return']
                     volatility = fund_info.get('volatility', 20)
-                    sharpe = fund_info.get('sharpe_ratio', 0)
-                    win_rate = fund_info.get('win_rate', 50)
-                    
-                    # Max drawdown tahmini (volatilite bazlı)
-                    max_drawdown = min(volatility * 2, 50)
-                    
-                else:
-                    # MV verileri yoksa hesapla
-                    data = self.db.get_fund_price_history(fcode, 120)
-                    
-                    if len(data) < 30:
-                        continue
-                    
-                    prices = data.set_index('pdate')['price'].sort_index()
-                    returns = prices.pct_change().dropna()
-                    
-                    # Temel metrikler
-                    total_return = (prices.iloc[-1] / prices.iloc[0] - 1) * 100
-                    annual_return = total_return * (252 / len(prices))
-                    volatility = returns.std() * np.sqrt(252) * 100
-                    
-                    # Sharpe ratio
-                    if volatility > 0:
-                        sharpe = (annual_return - 15) / volatility
-                    else:
-                        sharpe = 0
-                    
-                    win_rate = (returns > 0).sum() / len(returns) * 100
-                    
-                    # Max drawdown
-                    cumulative = (1 + returns).cumprod()
-                    running_max = cumulative.expanding().max()
-                    drawdown = (cumulative - running_max) / running_max
-                    max_drawdown = abs(drawdown.min()) * 100
+                    performance = {
+                        'annual_return': fund_info['annual_return'],
+                        'volatility': volatility,
+                        'sharpe_ratio': fund_info.get('sharpe_ratio', 0),
+                        'win_rate': fund_info.get('win_rate', 50),
+                        # Max drawdown tahmini (volatilite bazlı)
+                        'max_drawdown': min(volatility * 2, 50)
+                    }
+                elif fcode in panel_metrics.index:
+                    # MV verileri yoksa fiyat matrisinden
+                    metrics = panel_metrics.loc[fcode]
+                    performance = {
+                        'annual_return': float(metrics['annual_return']),
+                        'volatility': float(metrics['volatility']),
+                        'sharpe_ratio': float(metrics['sharpe_ratio']),
+                        'win_rate': float(metrics['win_rate']),
+                        'max_drawdown': float(metrics['max_drawdown'])
+                    }
                 
+                evaluations[fcode] = {'risk': risk_assessment, 'performance': performance}
+                
+            except Exception as e:
+                continue
+        
+        return evaluations
+
+    def analyze_currency_performance_mv(self, currency_type, funds_list, evaluations=None):
+        """MV tabanlı performans analizi - Risk Assessment dahil"""
+        print(f"   📈 {len(funds_list)} fon için performans + risk analizi (MV tabanlı)...")
+        
+        if evaluations is None:
+            evaluations = self._evaluate_currency_funds(funds_list)
+        
+        performance_results = []
+        successful = 0
+        high_risk_count = 0
+        extreme_risk_count = 0
+        
+        for fund_info in funds_list:
+            fcode = fund_info['fcode']
+            evaluation = evaluations.get(fcode)
+            if evaluation is None:
+                continue
+            
+            risk_assessment = evaluation['risk']
+            
+            # Risk sayacları
+            if risk_assessment['risk_level'] == 'HIGH':
+                high_risk_count += 1
+            elif risk_assessment['risk_level'] == 'EXTREME':
+                extreme_risk_count += 1
+            
+            perf = evaluation['performance']
+            if perf is None:
+                continue
+            
+            try:
                 # Döviz/Enflasyon özel skor
                 currency_score = self.calculate_currency_score(
-                    annual_return, volatility, sharpe, win_rate, currency_type, max_drawdown
+                    perf['annual_return'], perf['volatility'], perf['sharpe_ratio'],
+                    perf['win_rate'], currency_type, perf['max_drawdown']
                 )
                 
                 fund_result = {
@@ -776,12 +763,12 @@ class CurrencyInflationAnalyzer:
                     'investors': fund_info['investors'],
                     'current_price': fund_info['current_price'],
                     'portfolio_score': fund_info['portfolio_score'],
-                    'total_return': annual_return / 2,  # 6 aylık tahmin
-                    'annual_return': annual_return,
-                    'volatility': volatility,
-                    'sharpe_ratio': sharpe,
-                    'win_rate': win_rate,
-                    'max_drawdown': max_drawdown,
+                    'total_return': perf['annual_return'] / 2,  # 6 aylık tahmin
+                    'annual_return': perf['annual_return'],
+                    'volatility': perf['volatility'],
+                    'sharpe_ratio': perf['sharpe_ratio'],
+                    'win_rate': perf['win_rate'],
+                    'max_drawdown': perf['max_drawdown'],
                     'currency_score': currency_score,
                     # Risk Assessment verileri
                     'risk_level': risk_assessment['risk_level'],
@@ -930,21 +917,19 @@ class CurrencyInflationAnalyzer:
             return []
         
         try:
-            # SQL LIKE koşulları oluştur
-            like_conditions = []
-            for keyword in keywords:
-                like_conditions.append(f"UPPER(f.ftitle) LIKE '%{keyword}%'")
-            
-            where_clause = " OR ".join(like_conditions)
+            # Anahtar kelimeler önce başlık indeksinden fon kodlarına çözülür
+            fcodes = self.title_index.search(keywords)
+            if not fcodes:
+                return []
             
-            # Ana sorgu
-            query = f"""
+            # Ana sorgu - fiyat tablosu yalnızca eşleşen fonlar için
+            query = """
             WITH currency_funds AS (
-                SELECT DISTINCT f.fcode, f.ftitle as fund_name, f.fcapacity, 
+                SELECT f.fcode, f.ftitle as fund_name, f.fcapacity, 
                     f.investorcount, f.price, f.pdate,
                     ROW_NUMBER() OVER (PARTITION BY f.fcode ORDER BY f.pdate DESC) as rn
                 FROM tefasfunds f
-                WHERE ({where_clause})
+                WHERE f.fcode = ANY(:fcodes)
                 AND f.pdate >= CURRENT_DATE - INTERVAL '30 days'
                 AND f.price > 0
                 AND f.investorcount > 25  -- Minimum yatırımcı filtresi
@@ -955,7 +940,7 @@ class CurrencyInflationAnalyzer:
             ORDER BY fcapacity DESC NULLS LAST
             """
             
-            result = self.db.execute_query(query)
+            result = self.db.execute_query(query, {'fcodes': fcodes})
             
             funds_list = []
             for _, row in result.iterrows():
@@ -1352,18 +1337,35 @@ class CurrencyInflationAnalyzer:
         currency_types = ['usd', 'eur', 'hedge_funds']
         comparison_results = {}
         
+        # Tüm sınıfların adayları tek sorguda
+        try:
+            frame, members = self._load_currency_universe(currency_types)
+        except Exception as e:
+            print(f"   ❌ MV sorgu hatası: {e}")
+            frame, members = pd.DataFrame(), {}
+        
+        class_funds = {}
         for currency_type in currency_types:
-            print(f"   📊 {currency_type.upper()} analizi...")
-            
-            # MV tabanlı arama
-            funds = self._find_currency_funds_mv(currency_type)
+            funds = []
+            if not frame.empty:
+                funds = self._currency_funds_from_frame(frame, members[currency_type], currency_type)
             if not funds:
                 # Fallback
                 funds = self.find_currency_funds_sql(currency_type)
+            class_funds[currency_type] = funds[:30]
+        
+        # Birden çok sınıfta geçen fonlar tek kez değerlendirilir
+        evaluations = self._evaluate_currency_funds(
+            [fund for funds in class_funds.values() for fund in funds]
+        )
+        
+        for currency_type in currency_types:
+            print(f"   📊 {currency_type.upper()} analizi...")
+            funds = class_funds[currency_type]
                 
             if funds:
                 # MV tabanlı performans analizi
-                performance = self.analyze_currency_performance_mv(currency_type, funds[:30])
+                performance = self.analyze_currency_performance_mv(currency_type, funds, evaluations)
                 
                 if performance:
                     # Risk istatistikleri
@@ -1680,50 +1682,14 @@ def analyze_currency_portfolio_distribution(db_manager, fcode):
 
 def calculate_currency_exposure(portfolio_data):
     """Portföy verilerinden döviz exposure hesapla"""
-    
-    # USD exposure
-    usd_exposure = (
-        float(portfolio_data.get('foreignequity', 0) or 0) +
-        float(portfolio_data.get('foreigndebtinstruments', 0) or 0) +
-        float(portfolio_data.get('foreigncurrencybills', 0) or 0) * 0.7  # USD payı tahmini
-    )
-    
-    # EUR exposure
-    eur_exposure = (
-        float(portfolio_data.get('foreigncurrencybills', 0) or 0) * 0.3  # EUR payı tahmini
-    )
-    
-    # TL exposure
-    tl_exposure = (
-        float(portfolio_data.get('stock', 0) or 0) +
-        float(portfolio_data.get('governmentbond', 0) or 0) +
-        float(portfolio_data.get('treasurybill', 0) or 0) +
-        float(portfolio_data.get('termdeposittl', 0) or 0) +
-        float(portfolio_data.get('participationaccounttl', 0) or 0)
-    )
-    
-    # Precious metals (inflation hedge)
-    precious_exposure = (
-        float(portfolio_data.get('preciousmetals', 0) or 0) +
-        float(portfolio_data.get('preciousmetalsbyf', 0) or 0) +
-        float(portfolio_data.get('preciousmetalskba', 0) or 0) +
-        float(portfolio_data.get('preciousmetalskks', 0) or 0)
-    )
-    
-    # Hedge instruments
-    hedge_exposure = (
-        float(portfolio_data.get('derivatives', 0) or 0) +
-        float(portfolio_data.get('futurescashcollateral', 0) or 0)
-    )
-    
-    return {
-        'usd_exposure': usd_exposure,
-        'eur_exposure': eur_exposure,
-        'tl_exposure': tl_exposure,
-        'precious_metals_exposure': precious_exposure,
-        'hedge_exposure': hedge_exposure,
-        'total_foreign': usd_exposure + eur_exposure
-    }
+    # Tek fon için CurrencyExposureMatrix ile aynı kova ağırlıkları
+    exposures = {}
+    for bucket, weights in EXPOSURE_BUCKETS.items():
+        exposures[bucket] = sum(
+            float(portfolio_data.get(column, 0) or 0) * weight
+            for column, weight in weights.items()
+        )
+    return exposures
 
 # =============================================================
 # CURRENCY RISK MANAGEMENT
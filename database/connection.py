@@ -1,9 +1,12 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
+import numpy as np
 import pandas as pd
 from typing import Optional, Dict, List
 import logging
+import time
+import io
 from config.config import Config
 
 Base = declarative_base()
@@ -14,6 +17,13 @@ class DatabaseManager:
         self.engine = None
         self.Session = None
         self.logger = logging.getLogger(__name__)
+        
+        # Veri sürümü (son pdate) ve ona bağlı önbellekler
+        self._versions = {}
+        self.data_version_ttl = 300  # saniye
+        self._panel_cache = {}
+        self._factor_index_store = None
+        
         self._initialize_connection()
 
     def _initialize_connection(self):
@@ -81,6 +91,48 @@ class DatabaseManager:
         except Exception as e:
             print(f"Query execution error: {e}")
             raise e
+
+    def execute_statement(self, statement: str, params: Optional[Dict] = None) -> None:
+        """Sonuç döndürmeyen SQL (DDL/DML) çalıştır"""
+        with self.engine.begin() as conn:
+            conn.execute(text(statement), params or {})
+
+    def bulk_upsert(self, table: str, frame: pd.DataFrame, key_columns: List[str]) -> int:
+        """
+        DataFrame'i COPY ile geçici tabloya yükleyip tek INSERT ... ON CONFLICT
+        ile hedef tabloya yaz. Satır satır INSERT yerine tek round-trip.
+        """
+        if frame.empty:
+            return 0
+        
+        columns = list(frame.columns)
+        column_list = ', '.join(columns)
+        staging = f"_staging_{table}"
+        updates = ', '.join(f"{col} = EXCLUDED.{col}" for col in columns if col not in key_columns)
+        conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        
+        raw_conn = self.engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+                f"ON CONFLICT ({', '.join(key_columns)}) {conflict_action}"
+            )
+            raw_conn.commit()
+            return len(frame)
+        except Exception as e:
+            raw_conn.rollback()
+            self.logger.error(f"Bulk upsert error ({table}): {e}")
+            raise
+        finally:
+            raw_conn.close()
+
     # --- TEFASFUNDS ---
 
     def get_fund_data(self, 
@@ -127,6 +179,172 @@ class DatabaseManager:
         params = {'fcode': fund_code, 'days': days}
         result = self.execute_query(query, params)
         return result
+
+    def _get_version(self, name: str, query: str, force_refresh: bool = False):
+        """Tek değerli sürüm sorgusunu en fazla data_version_ttl saniyede bir çalıştır"""
+        now = time.time()
+        value, checked_at = self._versions.get(name, (None, 0.0))
+        if force_refresh or value is None or now - checked_at > self.data_version_ttl:
+            result = self.execute_query(query)
+            value = result.iloc[0, 0] if not result.empty else None
+            self._versions[name] = (value, now)
+        return value
+
+    def get_data_version(self, force_refresh: bool = False):
+        """
+        tefasfunds içindeki son fiyat tarihi. Önbelleklerin anahtarı olarak kullanılır;
+        sorgu en fazla data_version_ttl saniyede bir tekrarlanır.
+        """
+        return self._get_version('prices', "SELECT MAX(pdate) AS last_date FROM tefasfunds", force_refresh)
+
+    def get_portfolio_version(self, force_refresh: bool = False):
+        """Son portföy dağılımı tarihi (mv_fund_details_latest) - portföy önbelleklerinin anahtarı"""
+        return self._get_version('portfolio', "SELECT MAX(fdate) AS last_date FROM mv_fund_details_latest", force_refresh)
+
+    def get_price_panel(self, fund_codes: Optional[List[str]] = None, days: int = 252) -> pd.DataFrame:
+        """
+        Tüm fonlar için tarih x fon fiyat matrisi (index=pdate, columns=fcode).
+        Son `days` işlem günü tek sorguyla çekilir ve veri sürümü başına önbelleklenir.
+        """
+        version = self.get_data_version()
+        key = ('prices', version, days)
+        panel = self._panel_cache.get(key)
+        
+        if panel is None:
+            # İşlem günü -> takvim günü payı (hafta sonu/tatiller)
+            lookback = int(days * 1.5) + 10
+            query = """
+            SELECT pdate, fcode, price
+            FROM tefasfunds
+            WHERE pdate >= (SELECT MAX(pdate) FROM tefasfunds) - :lookback * INTERVAL '1 day'
+              AND investorcount > 10
+              AND price > 0
+            """
+            rows = self.execute_query(query, {'lookback': lookback})
+            if rows.empty:
+                return pd.DataFrame()
+            
+            rows['pdate'] = pd.to_datetime(rows['pdate'])
+            panel = rows.pivot_table(index='pdate', columns='fcode', values='price', aggfunc='last')
+            panel = panel.sort_index().tail(days).astype('float64')
+            panel.columns.name = None
+            
+            # Eski sürümlere ait panelleri bırak
+            self._panel_cache = {k: v for k, v in self._panel_cache.items() if k[1] == version}
+            self._panel_cache[key] = panel
+        
+        if fund_codes is not None:
+            return panel[[fcode for fcode in fund_codes if fcode in panel.columns]]
+        return panel
+
+    def get_fund_titles(self, days: int = 30) -> pd.DataFrame:
+        """
+        Son `days` günde fiyatı olan fonların (fcode, ftitle, son görülme tarihi) kataloğu.
+        Başlık aramaları fiyat tablosunu taramak yerine bu küçük tabloyu kullanır;
+        veri sürümü başına bir kez çekilir.
+        """
+        version = self.get_data_version()
+        key = ('titles', version, days)
+        catalog = self._panel_cache.get(key)
+        
+        if catalog is None:
+            query = """
+            SELECT DISTINCT ON (fcode) fcode, ftitle, pdate
+            FROM tefasfunds
+            WHERE pdate >= (SELECT MAX(pdate) FROM tefasfunds) - :days * INTERVAL '1 day'
+            ORDER BY fcode, pdate DESC
+            """
+            catalog = self.execute_query(query, {'days': days})
+            catalog['ftitle'] = catalog['ftitle'].fillna('')
+            self._panel_cache = {k: v for k, v in self._panel_cache.items() if k[1] == version}
+            self._panel_cache[key] = catalog
+        
+        return catalog
+
+    def _load_fund_meta(self) -> Dict[str, object]:
+        """
+        Fon meta sözlüğü: fcode -> başlık, tip, kategori, şirket, son büyüklük/yatırımcı/fiyat.
+        mv_latest_fund_data + mv_fund_details_latest'ten tek sorguyla okunur, veri sürümü
+        başına bir kez kompakt dizilere alınır.
+        """
+        # Döngüsel import olmaması için yerel import
+        from analysis.fund_classification import FundClassificationIndex, PORTFOLIO_COLUMNS, UNKNOWN_CLASSIFICATION
+        from analysis.fund_title_index import normalize_title
+        
+        version = self.get_data_version()
+        key = ('meta', version)
+        meta = self._panel_cache.get(key)
+        
+        if meta is None:
+            ratio_columns = ', '.join(f"fd.{column}" for column in PORTFOLIO_COLUMNS)
+            query = f"""
+            SELECT lf.fcode, lf.ftitle, lf.fcapacity, lf.investorcount, lf.price, lf.pdate,
+                   fd.fcode AS detail_fcode, {ratio_columns}
+            FROM mv_latest_fund_data lf
+            LEFT JOIN mv_fund_details_latest fd ON lf.fcode = fd.fcode
+            """
+            rows = self.execute_query(query).drop_duplicates('fcode')
+            
+            classified = FundClassificationIndex.classify(rows)
+            has_details = rows['detail_fcode'].notna().to_numpy()
+            fund_type = np.where(has_details, classified['fund_type'].to_numpy(), UNKNOWN_CLASSIFICATION[0])
+            fund_category = np.where(has_details, classified['fund_category'].to_numpy(), UNKNOWN_CLASSIFICATION[1])
+            
+            # Şirket: başlığın "... PORTFÖY" önekine kadar olan kısmı
+            titles = rows['ftitle'].fillna('').to_numpy(dtype=object)
+            companies = np.empty(len(titles), dtype=object)
+            for i, title in enumerate(titles):
+                normalized = normalize_title(title)
+                end = normalized.find('PORTFOY')
+                companies[i] = normalized[:end + len('PORTFOY')] if end > 0 else None
+            
+            meta = {
+                'index': pd.Index(rows['fcode'].to_numpy()),
+                'fund_name': titles,
+                'fund_type': fund_type.astype(object),
+                'fund_category': fund_category.astype(object),
+                'company': companies,
+                'fcapacity': pd.to_numeric(rows['fcapacity'], errors='coerce').to_numpy(dtype=float),
+                'investorcount': pd.to_numeric(rows['investorcount'], errors='coerce').to_numpy(dtype=float),
+                'price': pd.to_numeric(rows['price'], errors='coerce').to_numpy(dtype=float),
+                'pdate': rows['pdate'].to_numpy()
+            }
+            self._panel_cache = {k: v for k, v in self._panel_cache.items() if k[1] == version}
+            self._panel_cache[key] = meta
+        
+        return meta
+
+    def get_fund_meta(self, fcodes: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        Toplu fon meta bilgisi: {fcode: {'fund_name', 'fund_type', 'fund_category', 'company',
+        'fcapacity', 'investorcount', 'price', 'pdate'}}. Bilinmeyen fonlar sonuçta yer almaz.
+        Döngü içinde get_fund_details yerine tek çağrı.
+        """
+        meta = self._load_fund_meta()
+        fields = [name for name in meta if name != 'index']
+        
+        if fcodes is None:
+            positions = np.arange(len(meta['index']))
+        else:
+            positions = meta['index'].get_indexer(list(fcodes))
+            positions = positions[positions >= 0]
+        
+        return {
+            meta['index'][pos]: {name: meta[name][pos] for name in fields}
+            for pos in positions
+        }
+
+    def get_factor_index_store(self):
+        """
+        Paylaşılan faktör endeksi deposu. Analizörler ve beta job aynı örneği
+        kullanır; endeksler veri sürümü başına bir kez okunur/kurulur.
+        """
+        if self._factor_index_store is None:
+            # analysis.factor_index -> database.factor_index_job -> database.connection döngüsü
+            from analysis.factor_index import FactorIndexStore
+            self._factor_index_store = FactorIndexStore(self)
+        return self._factor_index_store
+
     # --- TEFAS_FUNDDETAILS ---
 
     def get_fund_details(self, fcode: str) -> dict:
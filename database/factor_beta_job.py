@@ -0,0 +1,238 @@
+# database/factor_beta_job.py
+"""
+Fon faktör duyarlılıkları - fund_factor_betas.
+
+MacroeconomicAnalyzer faiz, seçim ve jeopolitik sorularında fonları başlık
+anahtar kelimeleriyle seçip her soruda tefasfunds üzerinde iki DISTINCT ON
+taraması yapıyordu. Bu job gecelik olarak faktör serilerini (altın, döviz,
+hisse ve para piyasası; factor_index_levels büyüklük ağırlıklı endeksleri,
+endeks yoksa vekil fonların eşit ağırlıklı günlük getirileri) alır ve tüm
+fonların bu serilere duyarlılığını tek bir toplu en küçük kareler çözümüyle
+(fon başına eksik gün maskeli normal denklemler) hesaplayıp tabloya yazar.
+
+Regresyon para piyasası endeksine göre fazla getiriler üzerinde sabitlidir:
+y - mm = alfa + Σ β_f (f - mm). Neredeyse sabit para piyasası serisi sabit
+terimin yerine geçmez; fonun ortalama getiri farkı alfa kolonuna gider.
+beta_money_market örtük nakit payıdır (1 - Σ β_f), yani yalnızca riskli
+faktör betalarından gelir, taşıma getirisini içermez.
+
+Kullanım:
+    python -m database.factor_beta_job
+"""
+import logging
+import warnings
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from analysis.fund_classification import FundClassificationIndex
+from config.config import Config
+from database.connection import DatabaseManager
+
+BETA_TABLE = 'fund_factor_betas'
+FACTORS = ('gold', 'usd', 'equity', 'money_market')
+# Fazla getiri regresyonunun taşıyıcı faktörü; betası diğerlerinden türetilir
+CARRY_FACTOR = 'money_market'
+RISK_FACTORS = tuple(factor for factor in FACTORS if factor != CARRY_FACTOR)
+WINDOW_DAYS = 252
+MIN_OBSERVATIONS = 60
+
+# Faktör -> factor_index_levels endeksi
+FACTOR_INDEXES = {'gold': 'gold', 'usd': 'fx', 'equity': 'equity', 'money_market': 'money_market'}
+# Endeks yoksa vekil: faktör -> AnalysisConfig.benchmarks adı; para piyasası config'de tanımlı değil
+FACTOR_BENCHMARKS = {'gold': 'gold', 'usd': 'usd', 'equity': 'bist100'}
+MONEY_MARKET_PROXY = {
+    'fund_codes': [],
+    'asset_columns': ['reverserepo', 'repo', 'termdeposit', 'termdeposittl', 'tmm'],
+    'min_ratio': 80
+}
+
+BETA_DDL = f"""
+CREATE TABLE IF NOT EXISTS {BETA_TABLE} (
+    fcode VARCHAR(10) PRIMARY KEY,
+    as_of DATE NOT NULL,
+    n_obs INTEGER,
+    alpha DOUBLE PRECISION,
+    beta_gold DOUBLE PRECISION,
+    beta_usd DOUBLE PRECISION,
+    beta_equity DOUBLE PRECISION,
+    beta_money_market DOUBLE PRECISION,
+    r_squared DOUBLE PRECISION,
+    residual_vol DOUBLE PRECISION,
+    volatility DOUBLE PRECISION,
+    return_30d DOUBLE PRECISION
+)
+"""
+# Sabitsiz regresyon döneminde kurulmuş tablolar için
+BETA_MIGRATION = f"ALTER TABLE {BETA_TABLE} ADD COLUMN IF NOT EXISTS alpha DOUBLE PRECISION"
+
+BETA_COLUMNS = ['fcode', 'as_of', 'n_obs', 'alpha'] + [f"beta_{factor}" for factor in FACTORS] + [
+    'r_squared', 'residual_vol', 'volatility', 'return_30d'
+]
+
+
+def factor_specs(benchmarks: Dict) -> Dict[str, Dict]:
+    """Faktör -> vekil üye kuralı (fund_codes, asset_columns, min_ratio)"""
+    specs = {factor: benchmarks[name] for factor, name in FACTOR_BENCHMARKS.items() if name in benchmarks}
+    specs['money_market'] = MONEY_MARKET_PROXY
+    return specs
+
+
+def daily_returns(panel: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ardışık günler arası günlük getiri; fiyatı olmayan günler ve boşluk sonrası
+    ilk gün NaN (boşluğun toplam getirisi tek günlük faktör getirisine eşlenmez).
+    """
+    return (panel / panel.shift(1) - 1).where(panel.notna() & panel.shift(1).notna())
+
+
+def build_factor_returns(returns: pd.DataFrame, ratios: pd.DataFrame, specs: Dict[str, Dict]) -> pd.DataFrame:
+    """
+    Tarih x faktör vekil getirileri: üye fonların (fund_codes + oran toplamı eşiği
+    geçenler) eşit ağırlıklı günlük getiri ortalaması.
+    """
+    factors = {}
+    for factor, spec in specs.items():
+        columns = [c for c in spec['asset_columns'] if c in ratios.columns]
+        ratio_sum = ratios[columns].sum(axis=1) if columns else pd.Series(0.0, index=ratios.index)
+        members = set(ratio_sum.index[ratio_sum >= spec['min_ratio']]) | set(spec.get('fund_codes', []))
+        members = [fcode for fcode in returns.columns if fcode in members]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            factors[factor] = (np.nanmean(returns[members].to_numpy(), axis=1)
+                               if members else np.full(len(returns), np.nan))
+    return pd.DataFrame(factors, index=returns.index).reindex(columns=list(FACTORS))
+
+
+def index_factor_returns(db_manager, dates: pd.Index) -> pd.DataFrame:
+    """
+    Tarih x faktör getirileri faktör endekslerinden. Herhangi bir endeks eksikse
+    veya tarihlerin yarısını kapsamıyorsa boş DataFrame döner.
+    """
+    store = db_manager.get_factor_index_store()
+    factors = {}
+    for factor, index_name in FACTOR_INDEXES.items():
+        returns = store.get_returns(index_name)
+        if returns is None:
+            return pd.DataFrame()
+        factors[factor] = returns.reindex(dates)
+    frame = pd.DataFrame(factors, index=dates).reindex(columns=list(FACTORS))
+    if frame.notna().all(axis=1).sum() < len(dates) / 2:
+        return pd.DataFrame()
+    return frame
+
+
+def compute_factor_betas(panel: pd.DataFrame, factor_returns: pd.DataFrame,
+                         min_obs: int = MIN_OBSERVATIONS) -> pd.DataFrame:
+    """
+    Tüm fonların faktör betaları tek toplu çözümle: fon n için
+    (Σ_t m_tn x_t x_tᵀ) β_n = Σ_t m_tn x_t y_tn, m_tn fonun o gün gözlemi olup olmadığı,
+    x_t = [1, f_t - mm_t], y_tn = r_tn - mm_t.
+    Alfa, volatilite ve artık volatilite yıllık %, return_30d son ~30 günün getirisi (%).
+    """
+    if panel.empty:
+        return pd.DataFrame(columns=BETA_COLUMNS)
+
+    returns = daily_returns(panel).iloc[1:]
+    factor_returns = factor_returns.reindex(returns.index)
+    complete = factor_returns.notna().all(axis=1).to_numpy()
+    carry = factor_returns[CARRY_FACTOR].to_numpy(dtype=np.float64)[complete]
+    excess = factor_returns[list(RISK_FACTORS)].to_numpy(dtype=np.float64)[complete] - carry[:, None]
+    x = np.column_stack([np.ones(len(carry)), excess])                     # T x (K+1)
+    y = returns.to_numpy(dtype=np.float64)[complete]                        # T x N
+    observed = ~np.isnan(y)
+    y0 = np.where(observed, y - carry[:, None], 0.0)
+    mask = observed.astype(np.float64)
+
+    xtx = np.einsum('tn,ti,tj->nij', mask, x, x)                           # N x K+1 x K+1
+    xty = np.einsum('ti,tn->ni', x, y0)                                     # N x K+1
+    coefs = np.einsum('nij,nj->ni', np.linalg.pinv(xtx), xty)               # N x K+1
+    betas = dict(zip(RISK_FACTORS, coefs[:, 1:].T))
+    betas[CARRY_FACTOR] = 1 - coefs[:, 1:].sum(axis=1)
+
+    n_obs = observed.sum(axis=0)
+    residuals = np.where(observed, y0 - x @ coefs.T, 0.0)
+    sse = (residuals ** 2).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        # Sabitli regresyon: toplam getirinin merkezlenmiş R²'si (fazla getiri ile aynı artıklar)
+        sst = np.nansum((y - np.nanmean(y, axis=0)) ** 2, axis=0)
+        r_squared = np.where(sst > 0, 1 - sse / sst, np.nan)
+        residual_vol = np.sqrt(sse / np.maximum(n_obs - x.shape[1], 1)) * np.sqrt(252) * 100
+        volatility = np.nanstd(returns.to_numpy(dtype=np.float64), axis=0, ddof=1) * np.sqrt(252) * 100
+
+    # ~30 gün önceki fiyat: 25 gün öncesine kadar görülen son fiyat (eski 25-35 gün penceresi)
+    filled = panel.ffill()
+    as_of = panel.index.max()
+    month_ago = filled[filled.index <= as_of - pd.Timedelta(days=25)]
+    return_30d = np.full(panel.shape[1], np.nan)
+    if not month_ago.empty:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return_30d = (filled.iloc[-1].to_numpy() / month_ago.iloc[-1].to_numpy() - 1) * 100
+
+    result = pd.DataFrame({
+        'fcode': panel.columns,
+        'as_of': as_of.date(),
+        'n_obs': n_obs,
+        'alpha': coefs[:, 0] * 252 * 100,
+        **{f"beta_{factor}": betas[factor] for factor in FACTORS},
+        'r_squared': r_squared,
+        'residual_vol': residual_vol,
+        'volatility': volatility,
+        'return_30d': return_30d
+    })
+    return result[result['n_obs'] >= min_obs].reset_index(drop=True)[BETA_COLUMNS]
+
+
+def estimate_factor_betas(db_manager, benchmarks: Dict, window_days: int = WINDOW_DAYS) -> pd.DataFrame:
+    """Fiyat matrisi + güncel portföy oranlarından uçtan uca beta tablosu"""
+    panel = db_manager.get_price_panel(days=window_days + 1)
+    if panel.empty:
+        return pd.DataFrame(columns=BETA_COLUMNS)
+    try:
+        factors = index_factor_returns(db_manager, panel.index)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Faktör endeksleri okunamadı, vekil fonlar kullanılacak: {e}")
+        factors = pd.DataFrame()
+    if factors.empty:
+        ratios = FundClassificationIndex(db_manager).get_frame()
+        factors = build_factor_returns(daily_returns(panel), ratios, factor_specs(benchmarks))
+    return compute_factor_betas(panel, factors)
+
+
+class FactorBetaJob:
+    """fund_factor_betas tablosunu gecelik yeniden hesaplayan job"""
+
+    def __init__(self, db_manager: DatabaseManager, config: Config):
+        self.db = db_manager
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    def ensure_tables(self):
+        self.db.execute_statement(BETA_DDL)
+        self.db.execute_statement(BETA_MIGRATION)
+
+    def run(self) -> Dict:
+        self.ensure_tables()
+
+        betas = estimate_factor_betas(self.db, self.config.analysis.benchmarks)
+        written = self.db.bulk_upsert(BETA_TABLE, betas, ['fcode'])
+
+        # Artık yeterli gözlemi olmayan fonların eski satırları
+        if not betas.empty:
+            self.db.execute_statement(
+                f"DELETE FROM {BETA_TABLE} WHERE as_of < :as_of", {'as_of': betas['as_of'].iloc[0]}
+            )
+
+        self.logger.info(f"Faktör betaları güncellendi: {len(betas)} fon, {written} satır")
+        return {
+            'funds': len(betas),
+            'rows_written': written
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    print(FactorBetaJob(DatabaseManager(config), config).run())
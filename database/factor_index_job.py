@@ -0,0 +1,244 @@
+# database/factor_index_job.py
+"""
+Faktör endeksleri - factor_index_levels.
+
+Hisse, altın, döviz, tahvil, para piyasası ve katılım fonlarından fon
+büyüklüğü (fcapacity) ağırlıklı günlük endeks serileri. Üyelik güncel portföy
+oranlarından (mv_fund_details_latest) belirlenir; günlük endeks getirisi
+üyelerin bir önceki günkü büyüklükleriyle ağırlıklandırılmış getirisidir
+(tüm endeksler tek matris çarpımıyla). Seviyeler 100 tabanından zincirlenir.
+
+Job veri yüklemesinden sonra çalıştırılır; yalnızca son kayıtlı tarihten
+sonraki günleri hesaplayıp mevcut seviyeye ekler. Analizler endeks serisini
+analysis/factor_index.py üzerinden bellekten alır.
+
+Kullanım:
+    python -m database.factor_index_job
+"""
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.fund_classification import FundClassificationIndex
+from config.config import Config
+from database.connection import DatabaseManager
+
+FACTOR_INDEX_TABLE = 'factor_index_levels'
+INDEX_BASE = 100.0
+HISTORY_YEARS = 5
+# Artımlı güncellemede üyelerin önceki fiyat/büyüklüğü için geriye bakış (takvim günü)
+OVERLAP_DAYS = 10
+
+# Endeks -> üyelik kuralı: asset_columns oran toplamı (%) min_ratio ve üstü
+INDEX_SPECS: Dict[str, Dict] = {
+    'equity': {
+        'asset_columns': ['stock'],
+        'min_ratio': 80
+    },
+    'gold': {
+        'asset_columns': ['preciousmetals', 'preciousmetalsbyf', 'preciousmetalskba', 'preciousmetalskks'],
+        'min_ratio': 80
+    },
+    'fx': {
+        'asset_columns': ['foreigncurrencybills', 'eurobonds', 'governmentbondsandbillsfx', 'fxpayablebills',
+                          'foreigndebtinstruments', 'foreigndomesticdebtinstruments',
+                          'foreignprivatesectordebtinstruments'],
+        'min_ratio': 60
+    },
+    'bond': {
+        'asset_columns': ['governmentbond', 'treasurybill', 'privatesectorbond', 'publicdomesticdebtinstruments'],
+        'min_ratio': 60
+    },
+    'money_market': {
+        'asset_columns': ['reverserepo', 'repo', 'termdeposit', 'termdeposittl', 'tmm'],
+        'min_ratio': 80
+    },
+    'participation': {
+        'asset_columns': ['participationaccount', 'participationaccountau', 'participationaccountd',
+                          'participationaccounttl', 'governmentleasecertificates',
+                          'governmentleasecertificatesd', 'governmentleasecertificatestl',
+                          'governmentleasecertificatesforeign', 'privatesectorleasecertificates',
+                          'privatesectorinternationalleasecertificate'],
+        'min_ratio': 60
+    }
+}
+INDEX_NAMES = list(INDEX_SPECS)
+
+FACTOR_INDEX_DDL = f"""
+CREATE TABLE IF NOT EXISTS {FACTOR_INDEX_TABLE} (
+    index_name VARCHAR(20) NOT NULL,
+    pdate DATE NOT NULL,
+    level DOUBLE PRECISION,
+    daily_return DOUBLE PRECISION,
+    n_members INTEGER,
+    total_capacity DOUBLE PRECISION,
+    PRIMARY KEY (index_name, pdate)
+)
+"""
+
+INDEX_COLUMNS = ['index_name', 'pdate', 'level', 'daily_return', 'n_members', 'total_capacity']
+
+
+def fetch_rows(db_manager, since=None, years: int = HISTORY_YEARS) -> pd.DataFrame:
+    """since tarihinden (yoksa son `years` yıldan) itibaren fiyat ve büyüklük satırları"""
+    if since is None:
+        where = "pdate >= (SELECT MAX(pdate) FROM tefasfunds) - :years * INTERVAL '1 year'"
+        params = {'years': years}
+    else:
+        where = "pdate >= :since"
+        params = {'since': since}
+    query = f"""
+    SELECT pdate, fcode, price, fcapacity
+    FROM tefasfunds
+    WHERE {where}
+      AND investorcount > 10
+      AND price > 0
+    """
+    rows = db_manager.execute_query(query, params)
+    if not rows.empty:
+        rows['pdate'] = pd.to_datetime(rows['pdate'])
+    return rows
+
+
+def membership_matrix(fcodes: pd.Index, ratios: pd.DataFrame,
+                      specs: Dict[str, Dict] = INDEX_SPECS) -> np.ndarray:
+    """fon x endeks 0/1 üyelik matrisi"""
+    aligned = ratios.reindex(fcodes)
+    members = np.zeros((len(fcodes), len(specs)))
+    for k, spec in enumerate(specs.values()):
+        columns = [c for c in spec['asset_columns'] if c in aligned.columns]
+        if columns:
+            ratio_sum = aligned[columns].apply(pd.to_numeric, errors='coerce').fillna(0).sum(axis=1)
+            members[:, k] = (ratio_sum >= spec['min_ratio']).to_numpy()
+    return members
+
+
+def compute_index_returns(rows: pd.DataFrame, ratios: pd.DataFrame,
+                          specs: Dict[str, Dict] = INDEX_SPECS) -> pd.DataFrame:
+    """
+    Tarih x endeks büyüklük ağırlıklı günlük getiriler (uzun format).
+    Fon getirisi ardışık günler arasıdır; fiyat boşluğundan sonraki ilk gün
+    getirisi (boşluğun toplamı) endekse girmez. Ağırlık fonun bir önceki
+    gözlemdeki büyüklüğüdür, o gün getirisi olmayan üyeler o günün ağırlığına girmez.
+    """
+    if rows.empty:
+        return pd.DataFrame(columns=['index_name', 'pdate', 'daily_return', 'n_members', 'total_capacity'])
+
+    prices = rows.pivot_table(index='pdate', columns='fcode', values='price', aggfunc='last').sort_index()
+    capacity = (rows.pivot_table(index='pdate', columns='fcode', values='fcapacity', aggfunc='last')
+                .reindex(index=prices.index, columns=prices.columns))
+
+    fund_returns = (prices / prices.shift(1) - 1).where(prices.notna() & prices.shift(1).notna())
+    fund_returns = fund_returns.to_numpy(dtype=np.float64)
+    weights = capacity.ffill().shift(1).to_numpy(dtype=np.float64)
+    observed = np.isfinite(fund_returns) & np.isfinite(weights) & (weights > 0)
+    weights = np.where(observed, weights, 0.0)
+
+    members = membership_matrix(prices.columns, ratios, specs)
+    numerator = np.where(observed, fund_returns, 0.0) * weights @ members
+    total_capacity = weights @ members
+    n_members = observed.astype(np.float64) @ members
+    with np.errstate(invalid='ignore', divide='ignore'):
+        index_returns = np.where(total_capacity > 0, numerator / total_capacity, np.nan)
+
+    names = list(specs)
+    dates = prices.index
+    frame = pd.DataFrame({
+        'index_name': np.repeat(names, len(dates)),
+        'pdate': np.tile(dates.to_numpy(), len(names)),
+        'daily_return': index_returns.T.ravel(),
+        'n_members': n_members.T.ravel().astype(np.int64),
+        'total_capacity': total_capacity.T.ravel()
+    })
+    # İlk tarihin önceki gözlemi yok
+    return frame[frame['pdate'] > dates.min()].reset_index(drop=True)
+
+
+def chain_levels(returns: pd.DataFrame, base_levels: Optional[Dict[str, tuple]] = None) -> pd.DataFrame:
+    """
+    Günlük getirileri seviyeye zincirle. base_levels endeks -> (son tarih, seviye):
+    verilirse yalnızca o tarihten sonraki günler o seviyeden devam eder.
+    Getirisi hesaplanamayan günlerde seviye değişmez.
+    """
+    base_levels = base_levels or {}
+    frames = []
+    for name, group in returns.groupby('index_name', sort=False):
+        group = group.sort_values('pdate')
+        base_date, base_level = base_levels.get(name, (None, INDEX_BASE))
+        if base_date is not None:
+            group = group[group['pdate'] > pd.Timestamp(base_date)]
+        if group.empty:
+            continue
+        growth = np.cumprod(1 + np.nan_to_num(group['daily_return'].to_numpy(dtype=np.float64)))
+        frames.append(group.assign(level=base_level * growth))
+    if not frames:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[INDEX_COLUMNS]
+
+
+def build_factor_indexes(db_manager, base_levels: Optional[Dict[str, tuple]] = None) -> pd.DataFrame:
+    """
+    Seviye tablosunun eksik kısmı: base_levels yoksa son HISTORY_YEARS yıl baştan,
+    varsa en eski son tarihten OVERLAP_DAYS önceden itibaren okunup devam ettirilir.
+    """
+    since = None
+    if base_levels:
+        since = (min(pd.Timestamp(d) for d, _ in base_levels.values()) - pd.Timedelta(days=OVERLAP_DAYS)).date()
+    rows = fetch_rows(db_manager, since)
+    ratios = FundClassificationIndex(db_manager).get_frame()
+    return chain_levels(compute_index_returns(rows, ratios), base_levels)
+
+
+def stored_base_levels(db_manager) -> Dict[str, tuple]:
+    """Her endeksin tablodaki son (tarih, seviye) kaydı"""
+    query = f"""
+    SELECT DISTINCT ON (index_name) index_name, pdate, level
+    FROM {FACTOR_INDEX_TABLE}
+    ORDER BY index_name, pdate DESC
+    """
+    last = db_manager.execute_query(query)
+    return {row.index_name: (row.pdate, float(row.level)) for row in last.itertuples()}
+
+
+class FactorIndexJob:
+    """factor_index_levels tablosunu artımlı güncelleyen job"""
+
+    def __init__(self, db_manager: DatabaseManager, config: Config):
+        self.db = db_manager
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    def ensure_tables(self):
+        self.db.execute_statement(FACTOR_INDEX_DDL)
+
+    def run(self) -> Dict:
+        self.ensure_tables()
+
+        base_levels = stored_base_levels(self.db)
+        # Tabloda olmayan endeksler (yeni eklenen tanımlar) baştan kurulur
+        missing = sorted(set(INDEX_NAMES) - set(base_levels))
+        if base_levels and missing:
+            self.logger.info(f"Yeni endeksler baştan kurulacak: {missing}")
+            full = build_factor_indexes(self.db)
+            levels = pd.concat([
+                build_factor_indexes(self.db, base_levels),
+                full[full['index_name'].isin(missing)]
+            ], ignore_index=True)
+        else:
+            levels = build_factor_indexes(self.db, base_levels or None)
+
+        written = self.db.bulk_upsert(FACTOR_INDEX_TABLE, levels, ['index_name', 'pdate'])
+        self.logger.info(f"Faktör endeksleri güncellendi: {written} satır ({'artımlı' if base_levels else 'tam'})")
+        return {
+            'indexes': levels['index_name'].nunique() if not levels.empty else 0,
+            'rows_written': written,
+            'incremental': bool(base_levels)
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    print(FactorIndexJob(DatabaseManager(config), config).run())
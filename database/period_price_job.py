@@ -0,0 +1,161 @@
+# database/period_price_job.py
+"""
+Dönem sonu fiyat tablosu - fund_period_prices.
+
+Her fon için hafta (W) ve ay (M) başına ilk/son fiyat, tarih, gözlem sayısı ve
+dönem sonu yatırımcı/büyüklük bilgisi tutulur. "Son N ay/hafta" getirileri,
+aylık liderler ve YTD soruları tefasfunds taraması yerine bu küçük tablodan
+(analysis/period_return_index.py) cevaplanır.
+
+Job veri yüklemesinden sonra çalıştırılır; yalnızca son kayıtlı haftanın ve
+ayın başından itibaren yeniden toplar, kapanmış dönemlere dokunmaz.
+
+Kullanım:
+    python -m database.period_price_job
+"""
+import logging
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+from database.connection import DatabaseManager
+
+PERIOD_TABLE = 'fund_period_prices'
+PERIOD_TYPES = ('W', 'M')
+
+PERIOD_DDL = f"""
+CREATE TABLE IF NOT EXISTS {PERIOD_TABLE} (
+    fcode VARCHAR(10) NOT NULL,
+    period_type CHAR(1) NOT NULL,
+    period_start DATE NOT NULL,
+    first_pdate DATE,
+    first_price NUMERIC,
+    last_pdate DATE,
+    last_price NUMERIC,
+    obs_count INTEGER,
+    investorcount BIGINT,
+    fcapacity NUMERIC,
+    PRIMARY KEY (fcode, period_type, period_start)
+)
+"""
+
+PERIOD_INDEX_DDL = f"CREATE INDEX IF NOT EXISTS idx_{PERIOD_TABLE}_start ON {PERIOD_TABLE} (period_type, period_start)"
+
+
+def period_start(pdates: pd.Series, period_type: str) -> pd.Series:
+    """Dönem başlangıcı: hafta için pazartesi (DATE_TRUNC('week')), ay için ayın ilk günü"""
+    pdates = pd.to_datetime(pdates)
+    if period_type == 'W':
+        return pdates.dt.normalize() - pd.to_timedelta(pdates.dt.weekday, unit='D')
+    return pdates.dt.to_period('M').dt.start_time
+
+
+def refresh_starts(last_pdate) -> Dict[str, pd.Timestamp]:
+    """Son kayıtlı tarihin haftası ve ayı - bu tarihlerden önceki dönemler kapanmıştır"""
+    last = pd.Series([pd.Timestamp(last_pdate)])
+    return {period_type: period_start(last, period_type).iloc[0] for period_type in PERIOD_TYPES}
+
+
+def aggregate_period_prices(prices: pd.DataFrame,
+                            starts: Optional[Dict[str, pd.Timestamp]] = None) -> pd.DataFrame:
+    """
+    Günlük fiyatlardan hafta/ay satırları üret.
+    starts verilirse her dönem tipi yalnızca kendi başlangıcından sonraki fiyatlarla toplanır.
+    """
+    columns = ['fcode', 'period_type', 'period_start', 'first_pdate', 'first_price',
+               'last_pdate', 'last_price', 'obs_count', 'investorcount', 'fcapacity']
+    prices = prices[pd.to_numeric(prices['price'], errors='coerce') > 0]
+    if prices.empty:
+        return pd.DataFrame(columns=columns)
+
+    prices = prices.assign(pdate=pd.to_datetime(prices['pdate']))
+    prices = prices.drop_duplicates(['fcode', 'pdate'], keep='last').sort_values(['fcode', 'pdate'])
+
+    frames = []
+    for period_type in PERIOD_TYPES:
+        rows = prices
+        if starts is not None:
+            rows = rows[rows['pdate'] >= starts[period_type]]
+        if rows.empty:
+            continue
+        grouped = rows.assign(period_start=period_start(rows['pdate'], period_type)).groupby(
+            ['fcode', 'period_start'], sort=False
+        )
+        frame = grouped.agg(
+            first_pdate=('pdate', 'first'),
+            first_price=('price', 'first'),
+            last_pdate=('pdate', 'last'),
+            last_price=('price', 'last'),
+            obs_count=('price', 'size'),
+            investorcount=('investorcount', 'last'),
+            fcapacity=('fcapacity', 'last')
+        ).reset_index()
+        frame['period_type'] = period_type
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    result = pd.concat(frames, ignore_index=True)[columns]
+    for column in ['period_start', 'first_pdate', 'last_pdate']:
+        result[column] = result[column].dt.date
+    result['investorcount'] = pd.to_numeric(result['investorcount']).fillna(0).astype(np.int64)
+    return result
+
+
+def fetch_prices(db_manager: DatabaseManager, since) -> pd.DataFrame:
+    query = """
+    SELECT fcode, pdate, price, investorcount, fcapacity
+    FROM tefasfunds
+    WHERE pdate >= :since AND price > 0
+    """
+    return db_manager.execute_query(query, {'since': since})
+
+
+class PeriodPriceJob:
+    """fund_period_prices tablosunu artımlı güncelleyen job"""
+
+    def __init__(self, db_manager: DatabaseManager, config: Config):
+        self.db = db_manager
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.bootstrap_days = 3 * 365   # 2 yıllık dönem sorguları + pencere payı
+
+    def ensure_tables(self):
+        self.db.execute_statement(PERIOD_DDL)
+        self.db.execute_statement(PERIOD_INDEX_DDL)
+
+    def run(self) -> Dict:
+        """Açık hafta/ay dönemlerini yeniden topla ve tabloya yaz"""
+        self.ensure_tables()
+
+        stored = self.db.execute_query(f"SELECT MAX(last_pdate) AS last_pdate FROM {PERIOD_TABLE}")
+        last_pdate = stored.iloc[0, 0] if not stored.empty else None
+
+        if last_pdate is None or pd.isna(last_pdate):
+            starts = None
+            since = date.today() - pd.Timedelta(days=self.bootstrap_days)
+            self.logger.info(f"İlk çalıştırma: {self.bootstrap_days} günlük fiyat toplanıyor")
+        else:
+            starts = refresh_starts(last_pdate)
+            since = min(starts.values()).date()
+
+        prices = fetch_prices(self.db, since)
+        periods = aggregate_period_prices(prices, starts)
+        written = self.db.bulk_upsert(PERIOD_TABLE, periods, ['fcode', 'period_type', 'period_start'])
+
+        self.logger.info(f"Dönem fiyatları güncellendi: {len(prices)} fiyat, {written} dönem satırı")
+        return {
+            'prices_read': len(prices),
+            'periods_written': written,
+            'since': since
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    print(PeriodPriceJob(DatabaseManager(config), config).run())
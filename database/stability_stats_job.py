@@ -0,0 +1,193 @@
+# database/stability_stats_job.py
+"""
+Uzun dönem istikrar istatistikleri - fund_stability_stats.
+
+handle_long_term_stability her çağrıda 5 yıllık tefasfunds'ı LAG penceresi ve
+fon başına iki alt sorguyla tarıyordu. Bu job gecelik olarak 5 yıllık fiyat
+matrisini tek sorguda okur; 1/3/5 yıllık yıllık getiri, günlük getiri
+standart sapması, pozitif gün oranı ve gerçek maksimum düşüşü (running max)
+NumPy ile tüm fonlar için birlikte hesaplar ve tabloya yazar.
+
+Kullanım:
+    python -m database.stability_stats_job
+"""
+import logging
+import warnings
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+from database.connection import DatabaseManager
+
+STABILITY_TABLE = 'fund_stability_stats'
+HORIZONS = (1, 3, 5)
+
+STABILITY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {STABILITY_TABLE} (
+    fcode VARCHAR(10) NOT NULL,
+    horizon_years SMALLINT NOT NULL,
+    as_of DATE NOT NULL,
+    start_date DATE,
+    end_date DATE,
+    total_days INTEGER,
+    first_price NUMERIC,
+    current_price NUMERIC,
+    total_return DOUBLE PRECISION,
+    annual_return DOUBLE PRECISION,
+    avg_daily_return DOUBLE PRECISION,
+    daily_return_std DOUBLE PRECISION,
+    annual_volatility DOUBLE PRECISION,
+    sharpe_like_ratio DOUBLE PRECISION,
+    consistency_score DOUBLE PRECISION,
+    max_drawdown DOUBLE PRECISION,
+    PRIMARY KEY (fcode, horizon_years)
+)
+"""
+
+STABILITY_INDEX_DDL = (
+    f"CREATE INDEX IF NOT EXISTS idx_{STABILITY_TABLE}_rank "
+    f"ON {STABILITY_TABLE} (horizon_years, consistency_score, annual_volatility)"
+)
+
+
+def fetch_price_panel(db_manager: DatabaseManager, years: int = max(HORIZONS),
+                      min_investors: int = 100) -> pd.DataFrame:
+    """Son `years` yılın tarih x fon fiyat matrisi (yatırımcı filtresi satır bazında)"""
+    query = """
+    SELECT pdate, fcode, price
+    FROM tefasfunds
+    WHERE pdate >= (SELECT MAX(pdate) FROM tefasfunds) - :years * INTERVAL '1 year'
+      AND investorcount > :min_investors
+      AND price > 0
+    """
+    rows = db_manager.execute_query(query, {'years': years, 'min_investors': min_investors})
+    if rows.empty:
+        return pd.DataFrame()
+    rows['pdate'] = pd.to_datetime(rows['pdate'])
+    panel = rows.pivot_table(index='pdate', columns='fcode', values='price', aggfunc='last')
+    panel.columns.name = None
+    return panel.sort_index().astype('float64')
+
+
+def compute_stability_stats(panel: pd.DataFrame, horizons: Iterable[int] = HORIZONS,
+                            min_days_per_year: int = 200) -> pd.DataFrame:
+    """
+    Fiyat matrisinden ufuk başına istikrar istatistikleri.
+    Günlük getiriler fonun ardışık gözlemleri arasında hesaplanır (eksik günler atlanır);
+    maksimum düşüş koşan zirveye göre en derin düşüştür. Getiri/oranlar ondalık, skor yüzde.
+    """
+    columns = ['fcode', 'horizon_years', 'as_of', 'start_date', 'end_date', 'total_days',
+               'first_price', 'current_price', 'total_return', 'annual_return', 'avg_daily_return',
+               'daily_return_std', 'annual_volatility', 'sharpe_like_ratio', 'consistency_score',
+               'max_drawdown']
+    if panel.empty:
+        return pd.DataFrame(columns=columns)
+
+    as_of = panel.index.max()
+    frames = []
+    for years in horizons:
+        window = panel[panel.index >= as_of - pd.DateOffset(years=years)]
+        prices = window.to_numpy(dtype=float)
+        dates = window.index.to_numpy()
+        observed = ~np.isnan(prices)
+        n_obs = observed.sum(axis=0)
+        keep = n_obs >= min_days_per_year * years
+        if not keep.any():
+            continue
+        prices, observed, n_obs = prices[:, keep], observed[:, keep], n_obs[keep]
+        fcodes = window.columns[keep]
+
+        # Fonun ilk/son gözlem satırları
+        first_row = np.argmax(observed, axis=0)
+        last_row = len(dates) - 1 - np.argmax(observed[::-1], axis=0)
+        cols = np.arange(prices.shape[1])
+        first_price = prices[first_row, cols]
+        current_price = prices[last_row, cols]
+        start_date, end_date = dates[first_row], dates[last_row]
+
+        # Önceki gözlem fiyatı (ileri doldurma) -> ardışık gözlemler arası getiri
+        filled = pd.DataFrame(prices).ffill().to_numpy()
+        previous = np.vstack([np.full((1, prices.shape[1]), np.nan), filled[:-1]])
+        daily = np.where(observed & ~np.isnan(previous), prices / previous - 1, np.nan)
+        n_returns = (~np.isnan(daily)).sum(axis=0)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            avg_daily = np.nanmean(daily, axis=0)
+            daily_std = np.nanstd(daily, axis=0, ddof=1)
+
+            # Gerçek maksimum düşüş: koşan zirveye göre
+            running_max = np.fmax.accumulate(filled, axis=0)
+            max_drawdown = np.nanmin(filled / running_max - 1, axis=0)
+
+        elapsed = (end_date - start_date).astype('timedelta64[D]').astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            annual_return = np.where(elapsed > 0, np.power(current_price / first_price, 365.0 / elapsed) - 1, np.nan)
+            annual_volatility = daily_std * np.sqrt(252)
+            sharpe_like = np.where(daily_std > 0, (avg_daily * 252) / annual_volatility, 0.0)
+            positive_ratio = np.where(
+                n_returns > 0, (np.nan_to_num(daily) > 0).sum(axis=0) / np.maximum(n_returns, 1), np.nan
+            )
+
+        frames.append(pd.DataFrame({
+            'fcode': fcodes,
+            'horizon_years': years,
+            'as_of': as_of.date(),
+            'start_date': pd.to_datetime(start_date).date,
+            'end_date': pd.to_datetime(end_date).date,
+            'total_days': n_obs,
+            'first_price': first_price,
+            'current_price': current_price,
+            'total_return': current_price / first_price - 1,
+            'annual_return': annual_return,
+            'avg_daily_return': avg_daily,
+            'daily_return_std': daily_std,
+            'annual_volatility': annual_volatility,
+            'sharpe_like_ratio': sharpe_like,
+            'consistency_score': positive_ratio * 100,
+            'max_drawdown': max_drawdown
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+class StabilityStatsJob:
+    """fund_stability_stats tablosunu gecelik yeniden hesaplayan job"""
+
+    def __init__(self, db_manager: DatabaseManager, config: Config):
+        self.db = db_manager
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    def ensure_tables(self):
+        self.db.execute_statement(STABILITY_DDL)
+        self.db.execute_statement(STABILITY_INDEX_DDL)
+
+    def run(self) -> Dict:
+        self.ensure_tables()
+
+        panel = fetch_price_panel(self.db)
+        stats = compute_stability_stats(panel)
+        written = self.db.bulk_upsert(STABILITY_TABLE, stats, ['fcode', 'horizon_years'])
+
+        # Artık eşiği geçemeyen fonların eski satırları
+        if not stats.empty:
+            self.db.execute_statement(
+                f"DELETE FROM {STABILITY_TABLE} WHERE as_of < :as_of", {'as_of': stats['as_of'].iloc[0]}
+            )
+
+        self.logger.info(f"İstikrar istatistikleri güncellendi: {panel.shape[1] if not panel.empty else 0} fon, {written} satır")
+        return {
+            'funds': panel.shape[1] if not panel.empty else 0,
+            'rows_written': written
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    print(StabilityStatsJob(DatabaseManager(config), config).run())
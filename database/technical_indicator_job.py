@@ -0,0 +1,406 @@
+# database/technical_indicator_job.py
+"""
+Teknik indikatörlerin artımlı hesaplanması - mv_fund_technical_indicators yerine.
+
+MV, RSI'ı son 15 satırın basit ortalamasıyla yaklaşıklar ve her refresh'te
+90 günlük tefasfunds üzerinde üç pencere taraması yapar. Bu job her fon için
+Wilder RSI, EMA tabanlı MACD ve son fiyat tamponunu (SMA/Bollinger/Stochastic)
+fund_indicator_state tablosunda saklar; her yeni fiyat durumu O(1) günceller.
+Sonuçlar COPY ile MV ile aynı kolonlara sahip fund_technical_indicators
+tablosuna yazılır.
+
+Kullanım:
+    python -m database.technical_indicator_job              # artımlı güncelleme
+    python -m database.technical_indicator_job --install-views
+"""
+import argparse
+import logging
+import warnings
+from datetime import date
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+from database.connection import DatabaseManager
+
+STATE_TABLE = 'fund_indicator_state'
+INDICATOR_TABLE = 'fund_technical_indicators'
+
+STATE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+    fcode VARCHAR(10) PRIMARY KEY,
+    last_pdate DATE NOT NULL,
+    last_price NUMERIC,
+    investorcount BIGINT,
+    fcapacity NUMERIC,
+    obs_count INTEGER NOT NULL,
+    change_count INTEGER NOT NULL,
+    avg_gain DOUBLE PRECISION,
+    avg_loss DOUBLE PRECISION,
+    ema_fast DOUBLE PRECISION,
+    ema_slow DOUBLE PRECISION,
+    macd_signal DOUBLE PRECISION,
+    recent_prices DOUBLE PRECISION[]
+)
+"""
+
+INDICATOR_DDL = f"""
+CREATE TABLE IF NOT EXISTS {INDICATOR_TABLE} (
+    fcode VARCHAR(10) PRIMARY KEY,
+    last_update DATE,
+    current_price NUMERIC,
+    investorcount BIGINT,
+    fcapacity NUMERIC,
+    sma_10 NUMERIC,
+    sma_20 NUMERIC,
+    sma_50 NUMERIC,
+    std_20 NUMERIC,
+    bb_upper NUMERIC,
+    bb_lower NUMERIC,
+    bb_position NUMERIC,
+    stochastic_14 NUMERIC,
+    rsi_14 NUMERIC,
+    macd_line NUMERIC,
+    price_vs_sma20 NUMERIC,
+    data_points BIGINT,
+    rsi_data_points BIGINT,
+    days_since_last_trade INTEGER
+)
+"""
+
+# MV'ler aynı isimle tablo üzerindeki görünümlere çevrilir; okuyan sorgular değişmez
+VIEW_DDL = [
+    "DROP MATERIALIZED VIEW IF EXISTS mv_technical_signals",
+    "DROP MATERIALIZED VIEW IF EXISTS mv_fund_technical_indicators",
+    f"CREATE OR REPLACE VIEW mv_fund_technical_indicators AS SELECT * FROM {INDICATOR_TABLE}",
+    """
+    CREATE OR REPLACE VIEW mv_technical_signals AS
+    SELECT ti.*,
+        pp.return_30d,
+        pp.return_90d,
+        pp.volatility_30d,
+        lf.ftitle AS fund_name,
+        CASE
+            WHEN ti.rsi_14 < 30 AND ti.bb_position < 0.3 THEN 'STRONG_BUY'
+            WHEN ti.rsi_14 > 70 AND ti.bb_position > 0.7 THEN 'STRONG_SELL'
+            WHEN ti.macd_line > 0 AND ti.price_vs_sma20 > 0 THEN 'BUY'
+            WHEN ti.macd_line < 0 AND ti.price_vs_sma20 < 0 THEN 'SELL'
+            ELSE 'NEUTRAL'
+        END AS signal_type,
+        (CASE WHEN ti.rsi_14 < 30 THEN 2 ELSE 0 END
+         + CASE WHEN ti.macd_line > 0 THEN 1 ELSE -1 END
+         + CASE WHEN ti.bb_position < 0.3 THEN 1 ELSE 0 END
+         + CASE WHEN ti.price_vs_sma20 > 0 THEN 1 ELSE -1 END) AS technical_score
+    FROM mv_fund_technical_indicators ti
+    LEFT JOIN mv_fund_period_performance pp ON ti.fcode = pp.fcode
+    LEFT JOIN mv_latest_fund_data lf ON ti.fcode = lf.fcode
+    """
+]
+
+
+class TechnicalIndicatorJob:
+    """Fon başına indikatör durumunu artımlı güncelleyen ve tabloya yazan job"""
+
+    def __init__(self, db_manager: DatabaseManager, config: Config):
+        self.db = db_manager
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+        cfg = config.analysis.technical_indicators
+        self.rsi_period = cfg['rsi_period']
+        self.bollinger_period = cfg['bollinger_period']
+        self.bollinger_std = cfg['bollinger_std']
+        self.fast_alpha = 2.0 / (cfg['macd_fast'] + 1)
+        self.slow_alpha = 2.0 / (cfg['macd_slow'] + 1)
+        self.signal_alpha = 2.0 / (cfg['macd_signal'] + 1)
+
+        self.buffer_size = max(50, self.bollinger_period, 14)
+        self.bootstrap_days = 400   # İlk çalıştırmada EMA/RSI ısınması için
+        self.min_data_points = 20   # MV ile aynı filtre
+        self.data_points_days = 90  # MV'deki data_points sayım penceresi
+        self.max_stale_days = 30    # MV'deki latest_data penceresi
+
+    def ensure_tables(self):
+        self.db.execute_statement(STATE_DDL)
+        self.db.execute_statement(INDICATOR_DDL)
+
+    def install_views(self):
+        """mv_fund_technical_indicators / mv_technical_signals MV'lerini tablo üzerindeki görünümlerle değiştir"""
+        self.ensure_tables()
+        for statement in VIEW_DDL:
+            self.db.execute_statement(statement)
+        self.logger.info("Teknik indikatör görünümleri kuruldu")
+
+    # --- DURUM ---
+
+    def _empty_state(self, fcodes: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(fcodes)
+        return {
+            'fcode': fcodes,
+            'last_pdate': np.full(n, None, dtype=object),
+            'last_price': np.full(n, np.nan),
+            'investorcount': np.zeros(n),
+            'fcapacity': np.zeros(n),
+            'obs_count': np.zeros(n, dtype=np.int64),
+            'change_count': np.zeros(n, dtype=np.int64),
+            'avg_gain': np.zeros(n),
+            'avg_loss': np.zeros(n),
+            'ema_fast': np.full(n, np.nan),
+            'ema_slow': np.full(n, np.nan),
+            'macd_signal': np.full(n, np.nan),
+            'buffer': np.full((n, self.buffer_size), np.nan),
+            'buffer_pos': np.zeros(n, dtype=np.int64)
+        }
+
+    def load_state(self, fcodes: np.ndarray, stored: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Kayıtlı durumu verilen fon sırasına göre dizilere yükle"""
+        state = self._empty_state(fcodes)
+        if stored.empty:
+            return state
+
+        position = pd.Index(fcodes).get_indexer(stored['fcode'])
+        stored = stored[position >= 0]
+        position = position[position >= 0]
+
+        state['last_pdate'][position] = stored['last_pdate'].to_numpy()
+        for column in ['last_price', 'investorcount', 'fcapacity', 'obs_count',
+                       'change_count', 'avg_gain', 'avg_loss', 'ema_fast', 'ema_slow', 'macd_signal']:
+            state[column][position] = pd.to_numeric(stored[column]).to_numpy()
+
+        # Tampon kronolojik saklanır; sola hizalanıp yazma imleci sona konur
+        for pos, prices in zip(position, stored['recent_prices']):
+            prices = np.asarray(prices or [], dtype=float)[-self.buffer_size:]
+            state['buffer'][pos, :len(prices)] = prices
+            state['buffer_pos'][pos] = len(prices) % self.buffer_size
+
+        return state
+
+    def _ordered_buffer(self, state: Dict[str, np.ndarray]) -> np.ndarray:
+        """Halka tamponu kronolojik sıraya çevir (son fiyat en sağda, eksikler NaN)"""
+        order = (state['buffer_pos'][:, None] + np.arange(self.buffer_size)) % self.buffer_size
+        return np.take_along_axis(state['buffer'], order, axis=1)
+
+    # --- GÜNCELLEME ---
+
+    def _fetch_new_prices(self, since: date) -> pd.DataFrame:
+        query = """
+        SELECT fcode, pdate, price, investorcount, fcapacity
+        FROM tefasfunds
+        WHERE pdate > :since AND price > 0
+        ORDER BY pdate
+        """
+        return self.db.execute_query(query, {'since': since})
+
+    def _fetch_window_counts(self, today: date) -> pd.Series:
+        """Son data_points_days takvim günündeki fiyat sayısı (MV'deki data_points)"""
+        query = """
+        SELECT fcode, COUNT(*) AS data_points
+        FROM tefasfunds
+        WHERE pdate >= :since AND price > 0
+        GROUP BY fcode
+        """
+        since = (pd.Timestamp(today) - pd.Timedelta(days=self.data_points_days)).date()
+        counts = self.db.execute_query(query, {'since': since})
+        if counts.empty:
+            return pd.Series(dtype=np.int64)
+        return counts.set_index('fcode')['data_points']
+
+    def update_state(self, state: Dict[str, np.ndarray], prices: pd.DataFrame) -> int:
+        """
+        Yeni fiyatları tarih sırasıyla uygula. Her tarih tüm fonlar için tek
+        vektörel adımdır; fon başına maliyet fiyat başına O(1).
+        """
+        fund_index = pd.Index(state['fcode'])
+        prices = prices.drop_duplicates(['fcode', 'pdate'], keep='last')
+        prices = prices.assign(pos=fund_index.get_indexer(prices['fcode']))
+
+        # Sadece fonun son durumundan sonraki fiyatlar (yeni fonlar için hepsi)
+        last_seen = pd.to_datetime(pd.Series(state['last_pdate'])).to_numpy()[prices['pos'].to_numpy()]
+        is_new = np.isnat(last_seen) | (pd.to_datetime(prices['pdate']).to_numpy() > last_seen)
+        prices = prices[is_new]
+        if prices.empty:
+            return 0
+
+        period = self.rsi_period
+        for pdate, day in prices.groupby('pdate', sort=True):
+            pos = day['pos'].to_numpy()
+            price = day['price'].to_numpy(dtype=float)
+            first = state['obs_count'][pos] == 0
+
+            # Wilder RSI: ilk `period` değişim basit ortalama, sonrası (n-1)/n yumuşatma
+            moved = pos[~first]
+            change = price[~first] - state['last_price'][moved]
+            gain = np.maximum(change, 0.0)
+            loss = np.maximum(-change, 0.0)
+            state['change_count'][moved] += 1
+            n_changes = state['change_count'][moved]
+            seeding = n_changes <= period
+            for key, value in (('avg_gain', gain), ('avg_loss', loss)):
+                current = state[key][moved]
+                state[key][moved] = np.where(
+                    seeding,
+                    current + (value - current) / n_changes,
+                    (current * (period - 1) + value) / period
+                )
+
+            # EMA tabanlı MACD
+            for key, alpha in (('ema_fast', self.fast_alpha), ('ema_slow', self.slow_alpha)):
+                current = state[key][pos]
+                state[key][pos] = np.where(first, price, current + alpha * (price - current))
+            macd_line = state['ema_fast'][pos] - state['ema_slow'][pos]
+            current = state['macd_signal'][pos]
+            state['macd_signal'][pos] = np.where(first, macd_line, current + self.signal_alpha * (macd_line - current))
+
+            # SMA/Bollinger/Stochastic için halka tampon
+            state['buffer'][pos, state['buffer_pos'][pos]] = price
+            state['buffer_pos'][pos] = (state['buffer_pos'][pos] + 1) % self.buffer_size
+
+            state['obs_count'][pos] += 1
+            state['last_price'][pos] = price
+            state['last_pdate'][pos] = pdate
+            state['investorcount'][pos] = pd.to_numeric(day['investorcount']).to_numpy(dtype=float)
+            state['fcapacity'][pos] = pd.to_numeric(day['fcapacity']).to_numpy(dtype=float)
+
+        return len(prices)
+
+    # --- ÇIKTI ---
+
+    def build_indicator_frame(self, state: Dict[str, np.ndarray], today: date = None,
+                              window_counts: pd.Series = None) -> pd.DataFrame:
+        """
+        Durumdan MV ile aynı kolonlara sahip indikatör tablosunu üret.
+        window_counts verilirse data_points MV'deki gibi son 90 günün fiyat sayısıdır;
+        verilmezse durumdaki toplam gözlem sayısı kullanılır.
+        """
+        today = today or date.today()
+        recent = self._ordered_buffer(state)
+        current = state['last_price']
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Tamamen boş pencerelerde nanmean/nanstd uyarıları beklenen durum
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                sma_10 = np.nanmean(recent[:, -10:], axis=1)
+                sma_20 = np.nanmean(recent[:, -20:], axis=1)
+                sma_50 = np.nanmean(recent[:, -50:], axis=1)
+                bb_middle = np.nanmean(recent[:, -self.bollinger_period:], axis=1)
+                std_20 = np.nanstd(recent[:, -self.bollinger_period:], axis=1, ddof=1)
+                min_14 = np.nanmin(recent[:, -14:], axis=1)
+                max_14 = np.nanmax(recent[:, -14:], axis=1)
+
+            bb_upper = bb_middle + self.bollinger_std * std_20
+            bb_lower = bb_middle - self.bollinger_std * std_20
+            band = bb_upper - bb_lower
+            bb_position = np.where(band > 0, (current - bb_lower) / band, 0.5)
+            stochastic = np.where(max_14 - min_14 > 0, (current - min_14) / (max_14 - min_14) * 100, 50.0)
+
+            avg_gain, avg_loss = state['avg_gain'], state['avg_loss']
+            rsi = np.select(
+                [state['change_count'] == 0, avg_loss == 0, avg_gain == 0],
+                [np.nan, 100.0, 0.0],
+                default=100 - 100 / (1 + avg_gain / avg_loss)
+            )
+            price_vs_sma20 = np.where(sma_20 > 0, (current / sma_20 - 1) * 100, 0.0)
+
+        last_update = pd.to_datetime(pd.Series(state['last_pdate']))
+        days_since = (pd.Timestamp(today) - last_update).dt.days
+        if window_counts is None:
+            data_points = state['obs_count']
+        else:
+            data_points = window_counts.reindex(state['fcode']).fillna(0).to_numpy(dtype=np.int64)
+
+        frame = pd.DataFrame({
+            'fcode': state['fcode'],
+            'last_update': last_update.dt.date,
+            'current_price': current,
+            'investorcount': np.nan_to_num(state['investorcount']).astype(np.int64),
+            'fcapacity': state['fcapacity'],
+            'sma_10': sma_10,
+            'sma_20': sma_20,
+            'sma_50': sma_50,
+            'std_20': std_20,
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+            'bb_position': bb_position,
+            'stochastic_14': stochastic,
+            'rsi_14': rsi,
+            'macd_line': state['ema_fast'] - state['ema_slow'],
+            'price_vs_sma20': price_vs_sma20,
+            'data_points': data_points,
+            'rsi_data_points': state['change_count'],
+            'days_since_last_trade': days_since
+        })
+
+        keep = (frame['data_points'] >= self.min_data_points) & (frame['days_since_last_trade'] <= self.max_stale_days)
+        return frame[keep.to_numpy()]
+
+    def build_state_frame(self, state: Dict[str, np.ndarray]) -> pd.DataFrame:
+        recent = self._ordered_buffer(state)
+        arrays = [
+            '{' + ','.join(repr(float(p)) for p in row[np.isfinite(row)]) + '}'
+            for row in recent
+        ]
+        frame = pd.DataFrame({
+            column: state[column]
+            for column in ['fcode', 'last_pdate', 'last_price', 'investorcount', 'fcapacity', 'obs_count',
+                           'change_count', 'avg_gain', 'avg_loss', 'ema_fast', 'ema_slow', 'macd_signal']
+        })
+        frame['investorcount'] = np.nan_to_num(frame['investorcount'].to_numpy(dtype=float)).astype(np.int64)
+        frame['recent_prices'] = arrays
+        return frame[state['obs_count'] > 0]
+
+    def run(self) -> Dict:
+        """Artımlı güncelleme: yeni fiyatları uygula, durum ve indikatör tablolarını yaz"""
+        self.ensure_tables()
+
+        stored = self.db.execute_query(f"SELECT * FROM {STATE_TABLE}")
+        if stored.empty:
+            since = date.today() - pd.Timedelta(days=self.bootstrap_days)
+            self.logger.info(f"İlk çalıştırma: {self.bootstrap_days} günlük ısınma verisi yükleniyor")
+        else:
+            # İşlem görmeyi bırakmış fonlar okuma penceresini geriye çekmesin
+            last_dates = pd.to_datetime(stored['last_pdate'])
+            active = last_dates >= last_dates.max() - pd.Timedelta(days=self.max_stale_days)
+            since = last_dates[active].min().date()
+
+        prices = self._fetch_new_prices(since)
+        fcodes = np.array(sorted(set(stored['fcode']) | set(prices['fcode'])), dtype=object)
+
+        state = self.load_state(fcodes, stored)
+        applied = self.update_state(state, prices) if not prices.empty else 0
+
+        today = date.today()
+        indicators = self.build_indicator_frame(state, today, self._fetch_window_counts(today))
+        self.db.bulk_upsert(STATE_TABLE, self.build_state_frame(state), ['fcode'])
+        self.db.bulk_upsert(INDICATOR_TABLE, indicators, ['fcode'])
+
+        # Filtreden düşen (işlem görmeyen / az verili) fonların eski satırları;
+        # aksi halde görünüm ölü fonları eski days_since_last_trade ile aktif gösterir
+        if not indicators.empty:
+            self.db.execute_statement(
+                f"DELETE FROM {INDICATOR_TABLE} WHERE NOT (fcode = ANY(:fcodes))",
+                {'fcodes': indicators['fcode'].tolist()}
+            )
+
+        self.logger.info(f"Teknik indikatörler güncellendi: {applied} yeni fiyat, {len(indicators)} fon")
+        return {
+            'new_prices': applied,
+            'funds_written': len(indicators),
+            'since': since
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Artımlı teknik indikatör job')
+    parser.add_argument('--install-views', action='store_true',
+                        help='MV\'leri fund_technical_indicators üzerindeki görünümlerle değiştir')
+    args = parser.parse_args()
+
+    config = Config()
+    job = TechnicalIndicatorJob(DatabaseManager(config), config)
+    if args.install_views:
+        job.install_views()
+    print(job.run())
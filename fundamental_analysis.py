@@ -57,14 +57,16 @@ class FundamentalAnalysisEnhancement:
                 result = self.coordinator.db.execute_query(query)
                 print(f"   📊 SQL sorgusu: {len(result)} BENZERSIZ büyük fon bulundu")
                 
+                # Tüm sonuçların meta bilgisi tek çağrıda
+                fund_meta = self.coordinator.db.get_fund_meta(result['fcode'].tolist())
+                
                 for _, row in result.iterrows():
                     fcode = row['fcode']
                     capacity = float(row['fcapacity'])
                     price = float(row['price']) if pd.notna(row['price']) else 0
                     investors = int(row['investorcount']) if pd.notna(row['investorcount']) else 0
                     
-                    details = self.coordinator.db.get_fund_details(fcode)
-                    fund_name = details.get('fund_name', 'N/A') if details else 'N/A'
+                    fund_name = fund_meta.get(fcode, {}).get('fund_name') or 'N/A'
                     
                     large_funds.append({
                         'fcode': fcode,
@@ -141,16 +143,18 @@ class FundamentalAnalysisEnhancement:
             
             print(f"   📊 SQL sorgusu: {len(result)} BENZERSIZ fon bulundu")
             
+            fund_meta = self.coordinator.db.get_fund_meta(result['fcode'].tolist())
+            
             for _, row in result.iterrows():
                 fcode = row['fcode']
                 investors = int(row['investorcount']) if pd.notna(row['investorcount']) else 0
                 price = float(row['price']) if pd.notna(row['price']) else 0
                 capacity = float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0
                 
-                # Fund details'den isim al
-                details = self.coordinator.db.get_fund_details(fcode)
-                fund_name = details.get('fund_name', 'N/A') if details else 'N/A'
-                fund_type = details.get('fund_type', 'N/A') if details else 'N/A'
+                # Meta sözlüğünden isim ve tür
+                meta = fund_meta.get(fcode, {})
+                fund_name = meta.get('fund_name') or 'N/A'
+                fund_type = meta.get('fund_type') or 'N/A'
                 
                 popular_funds.append({
                     'fcode': fcode,
@@ -178,15 +182,17 @@ class FundamentalAnalysisEnhancement:
                 result = self.coordinator.db.execute_query(fallback_query)
                 print(f"   📊 Fallback sorgusu: {len(result)} fon bulundu")
                 
+                fund_meta = self.coordinator.db.get_fund_meta(result['fcode'].tolist())
+                
                 for _, row in result.iterrows():
                     fcode = row['fcode']
                     investors = int(row['investorcount']) if pd.notna(row['investorcount']) else 0
                     price = float(row['price']) if pd.notna(row['price']) else 0
                     capacity = float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0
                     
-                    details = self.coordinator.db.get_fund_details(fcode)
-                    fund_name = details.get('fund_name', 'N/A') if details else 'N/A'
-                    fund_type = details.get('fund_type', 'N/A') if details else 'N/A'
+                    meta = fund_meta.get(fcode, {})
+                    fund_name = meta.get('fund_name') or 'N/A'
+                    fund_type = meta.get('fund_type') or 'N/A'
                     
                     popular_funds.append({
                         'fcode': fcode,
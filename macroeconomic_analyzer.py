@@ -10,6 +10,8 @@ import numpy as np
 from datetime import datetime, timedelta
 import re
 from typing import Dict, List, Tuple
+from analysis.factor_sensitivity import FactorSensitivityIndex, FACTOR_FUND_TYPES, FACTOR_LABELS
+from database.factor_beta_job import FACTORS
 
 class MacroeconomicAnalyzer:
     """Makroekonomik olayların TEFAS fonlarına etkisini analiz eden sınıf"""
@@ -18,34 +20,7 @@ class MacroeconomicAnalyzer:
         self.db = db_manager
         self.config = config
         self.coordinator = coordinator
-        
-        # Makroekonomik kategoriler ve ilgili fon türleri
-        self.macro_fund_mapping = {
-            'faiz_duyarlı': {
-                'keywords': ['faiz', 'interest rate', 'tcmb', 'merkez bankası'],
-                'fund_types': ['Borçlanma Araçları', 'Para Piyasası', 'Tahvil', 'Hazine Bonosu'],
-                'fund_keywords': ['tahvil', 'bono', 'borçlanma', 'para piyasası', 'likit', 'kısa vadeli'],
-                'sensitivity': 'high'
-            },
-            'hisse_bazlı': {
-                'keywords': ['seçim', 'election', 'politik', 'political'],
-                'fund_types': ['Hisse Senedi', 'Değişken', 'Karma'],
-                'fund_keywords': ['hisse', 'değişken', 'karma', 'serbest', 'büyüme'],
-                'sensitivity': 'very_high'
-            },
-            'döviz_korumalı': {
-                'keywords': ['jeopolitik', 'geopolitical', 'savaş', 'kriz', 'risk'],
-                'fund_types': ['Döviz', 'Eurobond', 'Uluslararası'],
-                'fund_keywords': ['döviz', 'euro', 'dolar', 'usd', 'eur', 'altın', 'kıymetli maden'],
-                'sensitivity': 'medium'
-            },
-            'enflasyon_korumalı': {
-                'keywords': ['enflasyon', 'inflation', 'tüfe'],
-                'fund_types': ['Altın', 'Kıymetli Madenler', 'Endeks'],
-                'fund_keywords': ['altın', 'gümüş', 'kıymetli', 'emtia', 'endeks', 'tüfe'],
-                'sensitivity': 'high'
-            }
-        }
+        self.sensitivity_index = FactorSensitivityIndex(db_manager, config.analysis.benchmarks)
         
     def is_macroeconomic_question(self, question: str) -> bool:
         """Sorunun makroekonomik analiz gerektirip gerektirmediğini kontrol eder"""
@@ -101,9 +76,10 @@ class MacroeconomicAnalyzer:
             response = f"\n💹 FAİZ {scenario.upper()} ETKİ ANALİZİ\n"
             response += f"{'='*50}\n\n"
             
-            # SQL ile ilgili fon türlerini bul
+            # Saklı faktör betalarından senaryoya duyarlı fonlar
+            screen = 'rate_cut' if is_rate_cut else 'rate_hike' if is_rate_hike else 'rate'
             try:
-                relevant_funds = self._find_macro_sensitive_funds('faiz_duyarlı')
+                relevant_funds = self._find_macro_sensitive_funds(screen)
             except Exception as e:
                 print(f"_find_macro_sensitive_funds hatası: {e}")
                 traceback.print_exc()
@@ -149,7 +125,7 @@ class MacroeconomicAnalyzer:
             
             # Spesifik fon önerileri - DÜZELTME BURADA
             if relevant_funds:
-                response += f"\n📊 İLGİLİ FONLAR (Veritabanından):\n\n"
+                response += f"\n📊 İLGİLİ FONLAR (Faktör duyarlılığına göre):\n\n"
                 
                 # Dictionary'yi listeye çevir ve ilk 10'u al
                 fund_items = list(relevant_funds.items())[:10]
@@ -158,6 +134,11 @@ class MacroeconomicAnalyzer:
                     response += f"   📈 Son 30 gün getiri: %{fund_info.get('return_30d', 0):.2f}\n"
                     response += f"   📉 Volatilite: %{fund_info.get('volatility', 0):.2f}\n"
                     response += f"   🏷️ Tür: {fund_info.get('fund_type', 'N/A')}\n"
+                    betas = fund_info.get('betas', {})
+                    if betas:
+                        response += "   🔗 Beta: " + ", ".join(
+                            f"{FACTOR_LABELS[factor]} {betas[factor]:.2f}" for factor in FACTORS
+                        ) + "\n"
                     response += f"\n"
             
             # AI yorumu ekle
@@ -200,7 +181,7 @@ class MacroeconomicAnalyzer:
         response += f"   3. **Küçük Şirket Fonları**\n"
         response += f"   4. **Uzun Vadeli Tahvil Fonları**\n\n"
         
-        # SQL ile volatilitesi düşük fonları bul
+        # Saklı faktör betalarından volatilitesi düşük, hisse betası düşük fonlar
         safe_election_funds = self._find_low_volatility_funds()
         
         if safe_election_funds:
@@ -213,6 +194,7 @@ class MacroeconomicAnalyzer:
                 response += f"   📉 Volatilite: %{metrics.get('volatility', 0):.2f} (düşük)\n"
                 response += f"   📈 30 gün getiri: %{metrics.get('return_30d', 0):.2f}\n"
                 response += f"   🛡️ Risk skoru: {metrics.get('risk_score', 0)}/10\n"
+                response += f"   🔗 Hisse betası: {metrics.get('beta_equity', 0):.2f}\n"
                 response += f"\n"
         
         response += f"💡 SEÇİM STRATEJİSİ ÖNERİLERİ:\n"
@@ -267,6 +249,7 @@ class MacroeconomicAnalyzer:
                 response += f"   🏷️ Tür: {info.get('fund_type', 'N/A')}\n"
                 response += f"   📈 30 gün getiri: %{info.get('return_30d', 0):.2f}\n"
                 response += f"   💰 Kapasite: {info.get('capacity', 0)/1e6:.1f}M TL\n"
+                response += f"   🔗 Beta: Altın {info.get('beta_gold', 0):.2f}, USD {info.get('beta_usd', 0):.2f}\n"
                 response += f"\n"
         
         response += f"🎯 JEOPOLİTİK RİSK YÖNETİM STRATEJİSİ:\n\n"
@@ -405,79 +388,32 @@ class MacroeconomicAnalyzer:
         
         return response
     
-    def _find_macro_sensitive_funds(self, category: str) -> Dict:
-        """Makroekonomik olaylara duyarlı fonları bulur"""
+    def _screen_sensitive_funds(self, screen: str) -> pd.DataFrame:
+        """Saklı faktör betalarından olay taraması + toplu fon meta bilgisi"""
+        result = self.sensitivity_index.screen(screen)
+        if result.empty:
+            return result
+        meta = self.db.get_fund_meta(list(result.index))
+        result = result.copy()
+        result['fund_name'] = [meta.get(fcode, {}).get('fund_name', fcode) for fcode in result.index]
+        result['capacity'] = [meta.get(fcode, {}).get('fcapacity', 0) or 0 for fcode in result.index]
+        return result
+    
+    def _find_macro_sensitive_funds(self, screen: str) -> Dict:
+        """Makroekonomik olaylara duyarlı fonları saklı faktör betalarından bulur"""
         try:
-            mapping = self.macro_fund_mapping.get(category, {})
-            keywords = mapping.get('fund_keywords', [])
-            
-            if not keywords:
-                return {}
-            
-            # SQL sorgusu - düzeltilmiş versiyon
-            keyword_conditions = " OR ".join([f"LOWER(ftitle) LIKE '%{kw}%'" for kw in keywords])
-            
-            query = f"""
-            WITH latest_prices AS (
-                SELECT DISTINCT ON (fcode) 
-                    fcode, ftitle, price as latest_price, pdate
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '7 days'
-                ORDER BY fcode, pdate DESC
-            ),
-            month_ago_prices AS (
-                SELECT DISTINCT ON (fcode) 
-                    fcode, price as price_30d_ago
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '35 days'
-                AND pdate <= CURRENT_DATE - INTERVAL '25 days'
-                ORDER BY fcode, pdate DESC
-            )
-            SELECT DISTINCT 
-                lp.fcode, 
-                lp.ftitle,
-                lp.latest_price,
-                map.price_30d_ago,
-                CASE 
-                    WHEN map.price_30d_ago > 0 THEN 
-                        ((lp.latest_price - map.price_30d_ago) / map.price_30d_ago * 100)
-                    ELSE 0 
-                END as return_30d
-            FROM latest_prices lp
-            LEFT JOIN month_ago_prices map ON lp.fcode = map.fcode
-            WHERE ({keyword_conditions})
-            AND lp.latest_price IS NOT NULL 
-            AND map.price_30d_ago IS NOT NULL
-            ORDER BY return_30d DESC
-            LIMIT 20
-            """
-            
-            result = self.db.execute_query(query)
+            result = self._screen_sensitive_funds(screen)
             
             funds = {}
-            for _, row in result.iterrows():
-                try:
-                    # Fund details al
-                    details = self.db.get_fund_details(row['fcode'])
-                    
-                    # Volatilite hesapla
-                    hist = self.db.get_fund_price_history(row['fcode'], 30)
-                    volatility = 0
-                    if not hist.empty and len(hist) > 1:
-                        prices = hist.set_index('pdate')['price'].sort_index()
-                        returns = prices.pct_change().dropna()
-                        if len(returns) > 0:
-                            volatility = returns.std() * 100
-                    
-                    funds[row['fcode']] = {
-                        'fund_name': row['ftitle'],
-                        'return_30d': float(row['return_30d']) if pd.notna(row['return_30d']) else 0,
-                        'volatility': volatility,
-                        'fund_type': details.get('fund_type', 'N/A') if details else 'N/A'
-                    }
-                except Exception as e:
-                    print(f"Fon detay hatası {row['fcode']}: {e}")
-                    continue
+            for fcode, row in result.iterrows():
+                funds[fcode] = {
+                    'fund_name': row['fund_name'],
+                    'return_30d': float(row['return_30d']) if pd.notna(row['return_30d']) else 0,
+                    'volatility': float(row['volatility']) if pd.notna(row['volatility']) else 0,
+                    'fund_type': FACTOR_FUND_TYPES[row['dominant_factor']],
+                    'betas': {factor: float(row[f"beta_{factor}"]) for factor in FACTORS},
+                    'score': float(row['score'])
+                }
             
             return funds
             
@@ -488,79 +424,19 @@ class MacroeconomicAnalyzer:
             return {}
         
     def _find_low_volatility_funds(self) -> Dict:
-        """Düşük volatiliteli fonları bulur (seçim dönemi için)"""
+        """Düşük volatiliteli, hisse betası düşük fonları bulur (seçim dönemi için)"""
         try:
-            query = """
-            WITH price_data AS (
-                SELECT 
-                    fcode,
-                    price,
-                    pdate,
-                    LAG(price) OVER (PARTITION BY fcode ORDER BY pdate) as prev_price
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '60 days'
-                AND price > 0
-            ),
-            returns_calc AS (
-                SELECT 
-                    fcode,
-                    CASE 
-                        WHEN prev_price > 0 THEN (price - prev_price) / prev_price 
-                        ELSE 0 
-                    END as daily_return
-                FROM price_data
-                WHERE prev_price IS NOT NULL
-            ),
-            volatility_calc AS (
-                SELECT 
-                    fcode,
-                    STDDEV(daily_return) * SQRT(252) * 100 as volatility,
-                    COUNT(*) as data_points
-                FROM returns_calc
-                GROUP BY fcode
-                HAVING COUNT(*) >= 20
-            ),
-            latest_prices AS (
-                SELECT DISTINCT ON (fcode) 
-                    fcode, price as latest_price
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '7 days'
-                ORDER BY fcode, pdate DESC
-            ),
-            month_ago_prices AS (
-                SELECT DISTINCT ON (fcode) 
-                    fcode, price as price_30d_ago
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '35 days'
-                AND pdate <= CURRENT_DATE - INTERVAL '25 days'
-                ORDER BY fcode, pdate DESC
-            )
-            SELECT 
-                v.fcode, 
-                v.volatility,
-                CASE 
-                    WHEN m.price_30d_ago > 0 THEN 
-                        ((l.latest_price - m.price_30d_ago) / m.price_30d_ago * 100)
-                    ELSE 0 
-                END as return_30d
-            FROM volatility_calc v
-            JOIN latest_prices l ON v.fcode = l.fcode
-            JOIN month_ago_prices m ON v.fcode = m.fcode
-            WHERE v.volatility < 5  -- Düşük volatilite
-            ORDER BY v.volatility ASC
-            LIMIT 15
-            """
-            
-            result = self.db.execute_query(query)
+            result = self._screen_sensitive_funds('election')
             
             funds = {}
-            for _, row in result.iterrows():
+            for fcode, row in result.iterrows():
                 risk_score = min(10, max(1, float(row['volatility']) * 2))  # 1-10 arası risk skoru
                 
-                funds[row['fcode']] = {
+                funds[fcode] = {
                     'volatility': float(row['volatility']),
                     'return_30d': float(row['return_30d']) if pd.notna(row['return_30d']) else 0,
-                    'risk_score': round(risk_score, 1)
+                    'risk_score': round(risk_score, 1),
+                    'beta_equity': float(row['beta_equity'])
                 }
             
             return funds
@@ -572,73 +448,19 @@ class MacroeconomicAnalyzer:
             return {}
     
     def _find_safe_haven_funds(self) -> Dict:
-        """Güvenli liman fonları bulur (altın, döviz)"""
+        """Güvenli liman fonları bulur - altın/USD betası yüksek fonlar"""
         try:
-            query = """
-            WITH latest_data AS (
-                SELECT DISTINCT ON (fcode) 
-                    fcode, ftitle, fcapacity, price as latest_price, pdate
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '7 days'
-                AND (
-                    LOWER(ftitle) LIKE '%altın%' OR
-                    LOWER(ftitle) LIKE '%döviz%' OR
-                    LOWER(ftitle) LIKE '%dolar%' OR
-                    LOWER(ftitle) LIKE '%euro%' OR
-                    LOWER(ftitle) LIKE '%usd%' OR
-                    LOWER(ftitle) LIKE '%eur%' OR
-                    LOWER(ftitle) LIKE '%kıymetli maden%'
-                )
-                ORDER BY fcode, pdate DESC
-            ),
-            month_ago_data AS (
-                SELECT DISTINCT ON (fcode) 
-                    fcode, price as price_30d_ago
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '35 days'
-                AND pdate <= CURRENT_DATE - INTERVAL '25 days'
-                ORDER BY fcode, pdate DESC
-            )
-            SELECT 
-                l.fcode, 
-                l.ftitle, 
-                l.fcapacity,
-                l.latest_price,
-                m.price_30d_ago,
-                CASE 
-                    WHEN m.price_30d_ago > 0 THEN 
-                        ((l.latest_price - m.price_30d_ago) / m.price_30d_ago * 100)
-                    ELSE 0 
-                END as return_30d
-            FROM latest_data l
-            LEFT JOIN month_ago_data m ON l.fcode = m.fcode
-            WHERE l.fcapacity > 0
-            ORDER BY l.fcapacity DESC
-            LIMIT 20
-            """
-            
-            result = self.db.execute_query(query)
+            result = self._screen_sensitive_funds('geopolitical')
             
             funds = {}
-            for _, row in result.iterrows():
-                # Fund type belirleme
-                title_lower = row['ftitle'].lower() if row['ftitle'] else ''
-                if 'altın' in title_lower:
-                    fund_type = 'Altın Fonu'
-                elif any(curr in title_lower for curr in ['dolar', 'usd']):
-                    fund_type = 'USD Fonu'
-                elif any(curr in title_lower for curr in ['euro', 'eur']):
-                    fund_type = 'EUR Fonu'
-                elif 'döviz' in title_lower:
-                    fund_type = 'Döviz Fonu'
-                else:
-                    fund_type = 'Kıymetli Maden'
-                
-                funds[row['fcode']] = {
-                    'fund_name': row['ftitle'],
-                    'fund_type': fund_type,
+            for fcode, row in result.iterrows():
+                funds[fcode] = {
+                    'fund_name': row['fund_name'],
+                    'fund_type': FACTOR_FUND_TYPES[row['dominant_factor']],
                     'return_30d': float(row['return_30d']) if pd.notna(row['return_30d']) else 0,
-                    'capacity': float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0
+                    'capacity': float(row['capacity']),
+                    'beta_gold': float(row['beta_gold']),
+                    'beta_usd': float(row['beta_usd'])
                 }
             
             return funds
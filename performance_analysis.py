@@ -653,6 +653,10 @@ class PerformanceAnalyzerMain:
         
         top_gainers = []
         risky_gainers = []
+        try:
+            fund_meta = self.coordinator.db.get_fund_meta(self.active_funds[:50])
+        except Exception:
+            fund_meta = {}
         
         for fcode in self.active_funds[:50]:  # İlk 50 fonu kontrol et
             try:
@@ -665,8 +669,7 @@ class PerformanceAnalyzerMain:
                     prices = data['price']
                     total_return = (prices.iloc[-1] / prices.iloc[0] - 1) * 100
                     
-                    details = self.coordinator.db.get_fund_details(fcode)
-                    fund_name = details.get('fund_name', 'N/A') if details else 'N/A'
+                    fund_name = fund_meta.get(fcode, {}).get('fund_name') or 'N/A'
                     
                     gainer_data = {
                         'fcode': fcode,
@@ -770,16 +773,16 @@ class PerformanceAnalyzerMain:
             
             # Fund details al (sadece gösterilecek fonlar için)
             fund_details = {}
+            try:
+                fund_meta = self.coordinator.db.get_fund_meta([row_dict['fcode'] for row_dict in top_safe_results])
+            except Exception:
+                fund_meta = {}
             for row_dict in top_safe_results:
-                fcode = row_dict['fcode']
-                try:
-                    details = self.coordinator.db.get_fund_details(fcode)
-                    fund_details[fcode] = {
-                        'name': details.get('fund_name', 'N/A') if details else 'N/A',
-                        'type': details.get('fund_type', 'N/A') if details else 'N/A'
-                    }
-                except:
-                    fund_details[fcode] = {'name': 'N/A', 'type': 'N/A'}
+                meta = fund_meta.get(row_dict['fcode'], {})
+                fund_details[row_dict['fcode']] = {
+                    'name': meta.get('fund_name') or 'N/A',
+                    'type': meta.get('fund_type') or 'N/A'
+                }
             
             # Sonuçları formatla
             response = f"\n🛡️ RİSK KONTROLLÜ EN GÜVENLİ {len(top_safe_results)} FON\n"
@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from risk_assessment import RiskAssessment
+from analysis.fund_screener import FundScreener, TOLERANCE_RISK_LEVELS
+from analysis.goal_projection import GoalProjectionEngine
 
 class PersonalFinanceAnalyzer:
     """Kişisel finans hedeflerine özel fon analiz sistemi"""
@@ -16,6 +18,13 @@ class PersonalFinanceAnalyzer:
         self.coordinator = coordinator
         self.active_funds = active_funds
         self.db = coordinator.db
+        self.screener = FundScreener(self.db)
+        analysis_config = coordinator.config.analysis
+        self.goal_engine = GoalProjectionEngine(
+            self.db,
+            history_days=analysis_config.stress_history_days,
+            n_scenarios=analysis_config.monte_carlo_simulations
+        )
         if hasattr(coordinator, 'ai_provider'):
             from ai_personalized_advisor import AIPersonalizedAdvisor
             self.ai_advisor = AIPersonalizedAdvisor(coordinator, coordinator.ai_provider)
@@ -24,10 +33,9 @@ class PersonalFinanceAnalyzer:
         """AI destekli kişiselleştirilmiş planlama"""
         
         # AI Advisor varsa kullan
-        if hasattr(self.coordinator, 'ai_provider'):
-            from ai_personalized_advisor import AIPersonalizedAdvisor
-            advisor = AIPersonalizedAdvisor(self.coordinator, self.coordinator.ai_provider)
-            return advisor.analyze_from_question(question)
+        # Aday kümeleri ve açıklama önbelleği danışman örneğinde tutulur
+        if hasattr(self, 'ai_advisor'):
+            return self.ai_advisor.analyze_from_question(question)
         else:
             return "AI servisi şu anda kullanılamıyor. Genel tavsiyeler için 'emeklilik planı' yazabilirsiniz."
     
@@ -108,6 +116,7 @@ class PersonalFinanceAnalyzer:
         
         # Risk kontrolü ile fon önerileri
         response += f"\n🎯 ÖNERİLEN FONLAR (RİSK KONTROLÜ İLE):\n\n"
+        equity_funds, bond_funds, money_market_funds = [], [], []
         
         # Hisse senedi fonları
         if distribution["Hisse Senedi Fonları"] > 0:
@@ -177,6 +186,17 @@ class PersonalFinanceAnalyzer:
         response += f"   Beklenen yıllık getiri: %{expected_return*100:.0f}\n"
         response += f"   {years_to_retirement} yıl sonunda tahmini birikim: {future_value:,.0f} TL\n"
         
+        # Önerilen fonlarla olasılıksal projeksiyon
+        allocation = self.goal_engine.build_allocation({
+            'equity': (distribution["Hisse Senedi Fonları"], [f['fcode'] for f in equity_funds]),
+            'bond': (distribution["Borçlanma Araçları"], [f['fcode'] for f in bond_funds]),
+            'money_market': (distribution["Para Piyasası"], [f['fcode'] for f in money_market_funds])
+        })
+        projection = self._project_goal(allocation, monthly_savings, months, targets=[future_value])
+        response += self._format_goal_projection(
+            projection, {future_value: "Tahmini birikime ulaşma olasılığı"}
+        )
+        
         return response
 
     def handle_education_planning(self, question):
@@ -254,6 +274,19 @@ class PersonalFinanceAnalyzer:
         response += f"   Beklenen getiri: %{expected_return*100:.0f} (muhafazakar)\n"
         response += f"   Tahmini birikim: {future_value:,.0f} TL\n\n"
         
+        allocation = self.goal_engine.build_allocation(
+            {'education': (100, [f['fcode'] for f in safe_funds])}, per_sleeve=5
+        )
+        projection = self._project_goal(
+            allocation, monthly_target, years_to_save * 12, targets=[400000, 800000]
+        )
+        response += self._format_goal_projection(projection, {
+            400000: "Devlet üniversitesi (400,000 TL) hedefi",
+            800000: "Özel üniversite (800,000 TL) hedefi"
+        })
+        if projection:
+            response += "\n"
+        
         response += f"💡 EĞİTİM BİRİKİMİ TAVSİYELERİ:\n"
         response += f"   • Çocuk hesabı açın (vergi avantajı)\n"
         response += f"   • Düzenli aylık yatırım yapın\n"
@@ -335,6 +368,16 @@ class PersonalFinanceAnalyzer:
             fv = self._calculate_future_value(monthly, return_rate, years_to_save)
             response += f"   • Aylık {monthly:,} TL → {years_to_save} yıl sonra: {fv:,.0f} TL\n"
         
+        # Aynı senaryolar üzerinde tüm tutarlar için peşinata ulaşma olasılığı
+        allocation = self.goal_engine.build_allocation(
+            {'home': (100, [f['fcode'] for f in safe_funds])}, per_sleeve=5
+        )
+        grid = self._contribution_grid(
+            allocation, [monthly_required] + [monthly for monthly, _ in scenarios],
+            years_to_save * 12, target=down_payment
+        )
+        response += self._format_contribution_grid(grid, years_to_save, down_payment, "peşinat")
+        
         response += f"\n💡 EV ALMA TAVSİYELERİ:\n"
         response += f"   • Kısa vadede güvenlik öncelikli\n"
         response += f"   • Extreme riskli fonlardan kaçının\n"
@@ -400,6 +443,12 @@ class PersonalFinanceAnalyzer:
             fv = self._calculate_future_value(amount, 0.15, 18)  # Daha muhafazakar getiri
             response += f"   • {amount:,} TL/ay → 18 yıl sonra: {fv:,.0f} TL\n"
         
+        allocation = self.goal_engine.build_allocation(
+            {'growth': (100, [f['fcode'] for f in growth_funds])}, per_sleeve=5
+        )
+        grid = self._contribution_grid(allocation, monthly_amounts, 18 * 12, target=1000000)
+        response += self._format_contribution_grid(grid, 18, 1000000, "üniversite hedefi")
+        
         response += f"\n🎁 ÇOCUK HESABI AVANTAJLARI:\n"
         response += f"   • Vergi muafiyeti (belirli limitlerde)\n"
         response += f"   • Düşük komisyon oranları\n"
@@ -543,479 +592,72 @@ class PersonalFinanceAnalyzer:
                 "Döviz/Altın": 10
             }
 
-    def _get_funds_by_type_with_risk_control(self, fund_type, risk_tolerance):
-        """Risk kontrolü ile fon türü filtresi"""
+    def _screen_funds(self, screen_name, error_label, **overrides):
+        """Bildirimsel tarama çalıştır - önbellekteki fon-özellik tablosu, yeni SQL yok"""
         try:
-            query = f"""
-            SELECT DISTINCT
-                pm.fcode,
-                lf.ftitle as fund_name,
-                pm.annual_return as performance,
-                pm.annual_volatility * 100 as volatility,
-                lf.investorcount as investors,
-                pm.current_price,
-                mv.price_vs_sma20,
-                mv.rsi_14,
-                mv.stochastic_14,
-                mv.days_since_last_trade
-            FROM mv_fund_performance_metrics pm
-            JOIN mv_latest_fund_data lf ON pm.fcode = lf.fcode
-            JOIN mv_fund_technical_indicators mv ON pm.fcode = mv.fcode
-            LEFT JOIN tefasfunddetails fd ON pm.fcode = fd.fcode
-            WHERE COALESCE(fd.{fund_type}, 0) > 50
-            AND pm.annual_return > 5
-            AND pm.annual_volatility < 0.5
-            ORDER BY pm.annual_return DESC
-            LIMIT 20
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            # Risk kontrolü uygula
-            safe_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': float(fund.get('stochastic_14', 50)),
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investors', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                # Risk toleransına göre filtrele
-                if self._is_fund_suitable_for_risk_tolerance(risk_assessment, risk_tolerance):
-                    fund_dict = fund.to_dict()
-                    fund_dict['risk_level'] = risk_assessment['risk_level']
-                    fund_dict['risk_factors'] = risk_assessment['risk_factors']
-                    safe_funds.append(fund_dict)
-            
-            return safe_funds
-            
+            return self.screener.screen(screen_name, **overrides).to_dict('records')
         except Exception as e:
-            print(f"Risk kontrolü SQL hatası: {e}")
+            print(f"{error_label}: {e}")
             return []
 
+    def _get_funds_by_type_with_risk_control(self, fund_type, risk_tolerance):
+        """Risk kontrolü ile fon türü filtresi"""
+        return self._screen_funds(
+            'by_type', "Risk kontrolü hatası",
+            asset_min={fund_type: 50},
+            risk_levels=TOLERANCE_RISK_LEVELS.get(risk_tolerance, [])
+        )
+
     def _get_low_risk_funds_with_risk_control(self):
-        """Risk kontrolü ile düşük riskli fonlar"""
-        try:
-            query = """
-            WITH fund_risk AS (
-                SELECT f.fcode, 
-                    MAX(f.ftitle) as fund_name,
-                    CASE
-                        WHEN MIN(f.price) > 0 THEN (MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100
-                        ELSE 0
-                    END as performance,
-                    CASE
-                        WHEN AVG(f.price) > 0 THEN STDDEV(f.price) / AVG(f.price) * 100
-                        ELSE 0
-                    END as volatility,
-                    MAX(f.price) as current_price,
-                    MAX(f.investorcount) as investors
-                FROM tefasfunds f
-                WHERE f.pdate >= CURRENT_DATE - INTERVAL '90 days'
-                AND f.investorcount > 500
-                AND f.price > 0
-                GROUP BY f.fcode
-                HAVING COUNT(*) >= 60
-                AND MIN(f.price) > 0
-            )
-            SELECT fr.*, 
-                mv.price_vs_sma20,
-                mv.rsi_14,
-                mv.stochastic_14,
-                mv.days_since_last_trade
-            FROM fund_risk fr
-            JOIN mv_fund_technical_indicators mv ON fr.fcode = mv.fcode
-            WHERE fr.volatility < 5 AND fr.volatility > 0
-            ORDER BY fr.performance DESC
-            LIMIT 15
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            # Risk kontrolü uygula
-            safe_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': float(fund.get('stochastic_14', 50)),
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investors', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                # Sadece LOW ve MEDIUM risk kabul et
-                if risk_assessment['risk_level'] in ['LOW', 'MEDIUM']:
-                    fund_dict = fund.to_dict()
-                    fund_dict['risk_level'] = risk_assessment['risk_level']
-                    safe_funds.append(fund_dict)
-            
-            return safe_funds
-            
-        except Exception as e:
-            print(f"Para piyasası risk kontrolü hatası: {e}")
-            return []
+        """Risk kontrolü ile düşük riskli fonlar (sadece LOW ve MEDIUM)"""
+        return self._screen_funds('low_risk', "Para piyasası risk kontrolü hatası")
 
     def _get_balanced_funds_for_education_with_risk(self):
-        """Risk kontrolü ile eğitim fonları"""
-        try:
-            query = """
-            WITH balanced_funds AS (
-                SELECT f.fcode, 
-                    MAX(f.ftitle) as fund_name,
-                    CASE
-                        WHEN MIN(f.price) > 0 THEN (MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100
-                        ELSE 0
-                    END as performance,
-                    CASE
-                        WHEN AVG(f.price) > 0 THEN STDDEV(f.price) / AVG(f.price) * 100
-                        ELSE 0
-                    END as volatility,
-                    MAX(f.investorcount) as investors,
-                    COUNT(DISTINCT f.pdate) as trading_days
-                FROM tefasfunds f
-                WHERE f.pdate >= CURRENT_DATE - INTERVAL '365 days'
-                AND f.investorcount > 200
-                AND f.price > 0
-                GROUP BY f.fcode
-                HAVING COUNT(*) >= 200
-                AND MIN(f.price) > 0
-                AND AVG(f.price) > 0
-            )
-            SELECT bf.*, 
-                mv.price_vs_sma20,
-                mv.rsi_14,
-                mv.stochastic_14,
-                mv.days_since_last_trade
-            FROM balanced_funds bf
-            JOIN mv_fund_technical_indicators mv ON bf.fcode = mv.fcode
-            WHERE bf.volatility > 0 AND bf.volatility < 15
-            AND bf.performance > 10
-            ORDER BY 
-                CASE 
-                    WHEN bf.volatility > 0 THEN bf.performance / bf.volatility 
-                    ELSE 0 
-                END DESC
-            LIMIT 15
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            # Risk kontrolü uygula
-            safe_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': float(fund.get('stochastic_14', 50)),
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investors', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                # Eğitim için LOW, MEDIUM, HIGH kabul et ama EXTREME değil
-                if risk_assessment['risk_level'] in ['LOW', 'MEDIUM', 'HIGH']:
-                    fund_dict = fund.to_dict()
-                    fund_dict['risk_level'] = risk_assessment['risk_level']
-                    safe_funds.append(fund_dict)
-            
-            return safe_funds
-            
-        except Exception as e:
-            print(f"Eğitim fonları risk kontrolü hatası: {e}")
-            return []
+        """Risk kontrolü ile eğitim fonları (EXTREME hariç)"""
+        return self._screen_funds('education', "Eğitim fonları risk kontrolü hatası")
 
     def _get_home_purchase_funds_with_risk(self, years_to_save):
-        """Risk kontrolü ile ev alma fonları"""
+        """Risk kontrolü ile ev alma fonları (sadece LOW ve MEDIUM)"""
         max_volatility = 10 if years_to_save <= 2 else 15
-        
-        try:
-            query = f"""
-            WITH stable_funds AS (
-                SELECT f.fcode, 
-                    MAX(f.ftitle) as fund_name,
-                    CASE
-                        WHEN MIN(f.price) > 0 THEN (MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100
-                        ELSE 0
-                    END as performance,
-                    CASE
-                        WHEN AVG(f.price) > 0 THEN STDDEV(f.price) / AVG(f.price) * 100
-                        ELSE 0
-                    END as volatility,
-                    MAX(f.price) as current_price,
-                    MAX(f.investorcount) as investors
-                FROM tefasfunds f
-                WHERE f.pdate >= CURRENT_DATE - INTERVAL '180 days'
-                AND f.investorcount > 300
-                AND f.price > 0
-                GROUP BY f.fcode
-                HAVING MIN(f.price) > 0
-                AND AVG(f.price) > 0
-            )
-            SELECT sf.*, 
-                mv.price_vs_sma20,
-                mv.rsi_14,
-                mv.stochastic_14,
-                mv.days_since_last_trade
-            FROM stable_funds sf
-            JOIN mv_fund_technical_indicators mv ON sf.fcode = mv.fcode
-            WHERE sf.volatility > 0 AND sf.volatility < {max_volatility}
-            AND sf.performance > 5
-            ORDER BY sf.volatility ASC, sf.performance DESC
-            LIMIT 15
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            # Risk kontrolü uygula
-            safe_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': float(fund.get('stochastic_14', 50)),
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investors', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                # Ev alma için sadece LOW ve MEDIUM risk
-                if risk_assessment['risk_level'] in ['LOW', 'MEDIUM']:
-                    fund_dict = fund.to_dict()
-                    fund_dict['risk_level'] = risk_assessment['risk_level']
-                    safe_funds.append(fund_dict)
-            
-            return safe_funds
-            
-        except Exception as e:
-            print(f"Ev alma fonları risk kontrolü hatası: {e}")
-            return []
+        return self._screen_funds(
+            'home_purchase', "Ev alma fonları risk kontrolü hatası",
+            bounds={'volatility': (0, max_volatility), 'performance': (5, None)}
+        )
 
     def _get_child_savings_funds_with_risk(self):
-        """Risk kontrolü ile çocuk birikimleri fonları"""
-        try:
-            query = """
-            WITH growth_funds AS (
-                SELECT f.fcode, 
-                    MAX(f.ftitle) as fund_name,
-                    CASE
-                        WHEN MIN(f.price) > 0 THEN (MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100
-                        ELSE 0
-                    END as performance,
-                    CASE
-                        WHEN AVG(f.price) > 0 THEN STDDEV(f.price) / AVG(f.price) * 100
-                        ELSE 0
-                    END as volatility,
-                    MAX(f.investorcount) as investors,
-                    CASE
-                        WHEN STDDEV(f.price) > 0 AND AVG(f.price) > 0 AND MIN(f.price) > 0 THEN
-                            ((MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100) / 
-                            (STDDEV(f.price) / AVG(f.price) * 100)
-                        ELSE 0
-                    END as sharpe_proxy
-                FROM tefasfunds f
-                WHERE f.pdate >= CURRENT_DATE - INTERVAL '1825 days'
-                AND f.investorcount > 500
-                AND f.price > 0
-                GROUP BY f.fcode
-                HAVING COUNT(*) >= 1000
-                AND MIN(f.price) > 0
-            )
-            SELECT gf.*, 
-                mv.price_vs_sma20,
-                mv.rsi_14,
-                mv.stochastic_14,
-                mv.days_since_last_trade,
-                CASE 
-                    WHEN gf.performance > 100 AND gf.volatility > 0 AND gf.volatility < 25 THEN 90
-                    WHEN gf.performance > 50 AND gf.volatility > 0 AND gf.volatility < 20 THEN 80
-                    WHEN gf.performance > 30 AND gf.volatility > 0 AND gf.volatility < 15 THEN 70
-                    ELSE 50
-                END as score
-            FROM growth_funds gf
-            JOIN mv_fund_technical_indicators mv ON gf.fcode = mv.fcode
-            WHERE gf.performance > 0
-            ORDER BY score DESC, gf.sharpe_proxy DESC
-            LIMIT 15
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            # Risk kontrolü uygula
-            safe_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': float(fund.get('stochastic_14', 50)),
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investors', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                # Çocuk birikimleri için EXTREME hariç tümü kabul
-                if risk_assessment['risk_level'] != 'EXTREME':
-                    fund_dict = fund.to_dict()
-                    fund_dict['risk_level'] = risk_assessment['risk_level']
-                    safe_funds.append(fund_dict)
-            
-            return safe_funds
-            
-        except Exception as e:
-            print(f"Çocuk birikimleri risk kontrolü hatası: {e}")
-            return []
+        """Risk kontrolü ile çocuk birikimleri fonları (EXTREME hariç)"""
+        return self._screen_funds('child_savings', "Çocuk birikimleri risk kontrolü hatası")
 
     def _get_versatile_funds_with_risk(self):
-        """Risk kontrolü ile çok amaçlı fonlar"""
-        try:
-            query = """
-            WITH versatile_funds AS (
-                SELECT f.fcode, 
-                    MAX(f.ftitle) as fund_name,
-                    CASE
-                        WHEN MIN(f.price) > 0 THEN (MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100
-                        ELSE 0
-                    END as performance,
-                    CASE
-                        WHEN AVG(f.price) > 0 THEN STDDEV(f.price) / AVG(f.price) * 100
-                        ELSE 0
-                    END as volatility,
-                    CASE
-                        WHEN STDDEV(f.price) > 0 AND AVG(f.price) > 0 AND MIN(f.price) > 0 THEN
-                            ((MAX(f.price) - MIN(f.price)) / MIN(f.price) * 100) /
-                            (STDDEV(f.price) / AVG(f.price) * 100)
-                        ELSE 0
-                    END as sharpe,
-                    MAX(f.investorcount) as investors
-                FROM tefasfunds f
-                WHERE f.pdate >= CURRENT_DATE - INTERVAL '365 days'
-                AND f.investorcount > 1000
-                AND f.price > 0
-                GROUP BY f.fcode
-                HAVING COUNT(*) >= 200
-                AND MIN(f.price) > 0
-                AND AVG(f.price) > 0
-            )
-            SELECT vf.*, 
-                mv.price_vs_sma20,
-                mv.rsi_14,
-                mv.stochastic_14,
-                mv.days_since_last_trade
-            FROM versatile_funds vf
-            JOIN mv_fund_technical_indicators mv ON vf.fcode = mv.fcode
-            WHERE vf.volatility > 5 AND vf.volatility < 20
-            AND vf.performance > 15
-            ORDER BY vf.sharpe DESC
-            LIMIT 15
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            # Risk kontrolü uygula
-            safe_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': float(fund.get('stochastic_14', 50)),
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investors', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                # Çok amaçlı için EXTREME hariç kabul
-                if risk_assessment['risk_level'] != 'EXTREME':
-                    fund_dict = fund.to_dict()
-                    fund_dict['risk_level'] = risk_assessment['risk_level']
-                    safe_funds.append(fund_dict)
-            
-            return safe_funds
-            
-        except Exception as e:
-            print(f"Çok amaçlı fonlar risk kontrolü hatası: {e}")
-            return []
+        """Risk kontrolü ile çok amaçlı fonlar (EXTREME hariç)"""
+        return self._screen_funds('versatile', "Çok amaçlı fonlar risk kontrolü hatası")
 
     def _get_blocked_high_risk_funds(self):
         """Yüksek riskli engellenen fonları listele"""
-        try:
-            query = """
-            SELECT mv.fcode, mv.rsi_14, mv.price_vs_sma20, mv.days_since_last_trade, mv.investorcount
-            FROM mv_fund_technical_indicators mv
-            WHERE mv.investorcount > 100
-            ORDER BY mv.rsi_14 DESC
-            LIMIT 50
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return []
-            
-            blocked_funds = []
-            for _, fund in result.iterrows():
-                risk_data = {
-                    'fcode': fund['fcode'],
-                    'price_vs_sma20': float(fund.get('price_vs_sma20', 0)),
-                    'rsi_14': float(fund.get('rsi_14', 50)),
-                    'stochastic_14': 50,  # Default değer
-                    'days_since_last_trade': int(fund.get('days_since_last_trade', 0)),
-                    'investorcount': int(fund.get('investorcount', 0))
-                }
-                
-                risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                
-                if risk_assessment['risk_level'] in ['HIGH', 'EXTREME']:
-                    reason = ', '.join([f['factor'] for f in risk_assessment['risk_factors'][:2]])
-                    blocked_funds.append({
-                        'fcode': fund['fcode'],
-                        'risk_level': risk_assessment['risk_level'],
-                        'reason': reason
-                    })
-            
-            return blocked_funds[:10]
-            
-        except Exception as e:
-            print(f"Bloke fonlar listesi hatası: {e}")
-            return []
+        blocked = self._screen_funds('blocked_high_risk', "Bloke fonlar listesi hatası")[:10]
+        
+        # Gerekçe metni yalnızca listelenen fonlar için
+        blocked_funds = []
+        for fund in blocked:
+            risk_assessment = RiskAssessment.assess_fund_risk({
+                'fcode': fund['fcode'],
+                'price_vs_sma20': float(fund['price_vs_sma20']),
+                'rsi_14': float(fund['rsi_14']),
+                'stochastic_14': 50,  # Default değer
+                'days_since_last_trade': int(fund['days_since_last_trade']),
+                'investorcount': int(fund['investorcount'])
+            })
+            blocked_funds.append({
+                'fcode': fund['fcode'],
+                'risk_level': fund['risk_level'],
+                'reason': ', '.join([f['factor'] for f in risk_assessment['risk_factors'][:2]])
+            })
+        
+        return blocked_funds
 
     def _is_fund_suitable_for_risk_tolerance(self, risk_assessment, risk_tolerance):
         """Risk toleransına uygunluk kontrolü"""
-        risk_level = risk_assessment['risk_level']
-        
-        if risk_tolerance == 'conservative':
-            return risk_level in ['LOW', 'MEDIUM']
-        elif risk_tolerance == 'moderate':
-            return risk_level in ['LOW', 'MEDIUM', 'HIGH']
-        elif risk_tolerance == 'aggressive':
-            return risk_level != 'EXTREME'  # EXTREME hariç her şey kabul
-        
-        return False
+        return risk_assessment['risk_level'] in TOLERANCE_RISK_LEVELS.get(risk_tolerance, [])
 
     def _get_risk_indicator(self, risk_level):
         """Risk seviyesi göstergesi"""
@@ -1039,6 +681,69 @@ class PersonalFinanceAnalyzer:
         future_value = monthly_payment * (((1 + monthly_rate)**months - 1) / monthly_rate)
         return future_value
     
+    def _project_goal(self, allocation, monthly_payment, months, targets=()):
+        """Önerilen dağılımla olasılıksal projeksiyon - veri yetersizse boş sözlük"""
+        if not allocation:
+            return {}
+        try:
+            return self.goal_engine.project(allocation, monthly_payment, months, targets=targets)
+        except Exception as e:
+            print(f"❌ Hedef projeksiyonu hatası: {e}")
+            return {}
+    
+    def _contribution_grid(self, allocation, amounts, months, target):
+        """Birden fazla aylık tutar için aynı senaryolarla projeksiyon"""
+        if not allocation:
+            return pd.DataFrame()
+        try:
+            return self.goal_engine.contribution_grid(allocation, amounts, months, targets=[target])
+        except Exception as e:
+            print(f"❌ Hedef projeksiyonu hatası: {e}")
+            return pd.DataFrame()
+    
+    def _format_goal_projection(self, projection, target_labels):
+        """Olasılıksal projeksiyon bölümü (P10/P50/P90 + hedef olasılıkları)"""
+        if not projection:
+            return ""
+        final = projection['final']
+        years = projection['months'] // 12
+        text = f"\n🎲 OLASILIKSAL PROJEKSİYON ({projection['n_scenarios']:,} senaryo, önerilen fonların geçmiş aylık getirileri):\n"
+        text += f"   Toplam katkı: {projection['total_contributed']:,.0f} TL\n"
+        text += f"   Kötümser (P10): {final['p10']:,.0f} TL\n"
+        text += f"   Medyan (P50): {final['p50']:,.0f} TL\n"
+        text += f"   İyimser (P90): {final['p90']:,.0f} TL\n"
+        text += f"   Medyan yıllık getiri: %{projection['median_annual_return']*100:.1f}\n"
+        for target, label in target_labels.items():
+            probability = projection['success'].get(float(target))
+            if probability is not None:
+                text += f"   {label}: %{probability*100:.0f}\n"
+        
+        # Yıl sonu bantları (en fazla ~5 satır)
+        bands = projection['bands']
+        step = max(1, years // 5)
+        for year in range(step, years + 1, step):
+            row = bands.loc[year * 12]
+            text += f"   • {year}. yıl: {row['p10']:,.0f} - {row['p90']:,.0f} TL (medyan {row['p50']:,.0f})\n"
+        if projection['coverage'] < 0.999:
+            text += f"   ℹ️ Dağılımın %{projection['coverage']*100:.0f}'i için yeterli fiyat geçmişi var\n"
+        text += f"   ⚠️ Tutarlar nominal TL'dir; geçmiş dönem enflasyonu getirilere dahildir\n"
+        return text
+    
+    def _format_contribution_grid(self, grid, years, target, target_label):
+        """Aylık tutar başına medyan, P10-P90 bandı ve hedefe ulaşma olasılığı"""
+        if grid.empty:
+            return ""
+        text = f"\n🎲 OLASILIKSAL PROJEKSİYON ({years} yıl, önerilen fonların geçmiş aylık getirileri):\n"
+        success_column = f"success_{target:.0f}"
+        for monthly, row in grid.iterrows():
+            text += (f"   • Aylık {monthly:,.0f} TL → medyan {row['p50']:,.0f} TL "
+                     f"(P10 {row['p10']:,.0f} - P90 {row['p90']:,.0f}), "
+                     f"{target_label} ({target:,.0f} TL) olasılığı: %{row[success_column]*100:.0f}\n")
+        if grid.attrs.get('coverage', 1.0) < 0.999:
+            text += f"   ℹ️ Dağılımın %{grid.attrs['coverage']*100:.0f}'i için yeterli fiyat geçmişi var\n"
+        text += f"   ⚠️ Tutarlar nominal TL'dir; geçmiş dönem enflasyonu getirilere dahildir\n"
+        return text
+    
     @staticmethod
     def get_examples():
         """Kişisel finans örnekleri"""
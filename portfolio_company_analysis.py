@@ -7,12 +7,17 @@ import time
 import numpy as np
 import pandas as pd
 from risk_assessment import RiskAssessment
+from analysis.fund_title_index import FundTitleIndex
+from analysis.performance import PerformanceAnalyzer
 
 class EnhancedPortfolioCompanyAnalyzer:
     """Gelişmiş Portföy Şirketi Analiz Sistemi - Risk Kontrolü İle"""
     
     def __init__(self, coordinator):
         self.coordinator = coordinator
+        self.title_index = FundTitleIndex(coordinator.db)
+        # (şirket, analiz günü, veri sürümü) -> detaylı analiz sonucu
+        self._company_cache = {}
         
         # 🎯 GELİŞTİRİLMİŞ Şirket keyword mapping
         self.company_keywords = {
@@ -54,39 +59,28 @@ class EnhancedPortfolioCompanyAnalyzer:
                 print(f"   ⚠️ {company_name} için keyword bulunamadı")
                 return []
             
-            for keyword in keywords:
-                try:
-                    # 🚀 LİMİTSİZ SORGU - Tüm fonları bul
-                    query = f"""
-                        SELECT 
-                            fcode,
-                            fund_name,
-                            fcapacity,
-                            investorcount,
-                            current_price
-                        FROM mv_portfolio_company_summary
-                        WHERE company_name = %s
-                        ORDER BY fcapacity DESC NULLS LAST
-"""
-                    
-                    result = self.coordinator.db.execute_query(query)
-                    
-                    for _, row in result.iterrows():
-                        fund_info = {
-                            'fcode': row['fcode'],
-                            'fund_name': row['fund_name'],
-                            'capacity': float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0,
-                            'investors': int(row['investorcount']) if pd.notna(row['investorcount']) else 0,
-                            'current_price': float(row['price']) if pd.notna(row['price']) else 0
-                        }
-                        
-                        # Duplicate kontrolü
-                        if not any(f['fcode'] == fund_info['fcode'] for f in company_funds):
-                            company_funds.append(fund_info)
-                            
-                except Exception as e:
-                    print(f"   ⚠️ Keyword '{keyword}' sorgu hatası: {e}")
-                    continue
+            # 🚀 LİMİTSİZ - keyword'ler başlık indeksinden fon kodlarına çözülür
+            fcodes = self.title_index.search(keywords, days=7)
+            if not fcodes:
+                print(f"   ✅ 0 FON BULUNDU")
+                return []
+            
+            query = """
+                SELECT fcode, ftitle as fund_name, fcapacity, investorcount, price
+                FROM mv_latest_fund_data
+                WHERE fcode = ANY(:fcodes)
+                ORDER BY fcapacity DESC NULLS LAST
+            """
+            result = self.coordinator.db.execute_query(query, {'fcodes': fcodes})
+            
+            for _, row in result.iterrows():
+                company_funds.append({
+                    'fcode': row['fcode'],
+                    'fund_name': row['fund_name'],
+                    'capacity': float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0,
+                    'investors': int(row['investorcount']) if pd.notna(row['investorcount']) else 0,
+                    'current_price': float(row['price']) if pd.notna(row['price']) else 0
+                })
             
             print(f"   ✅ {len(company_funds)} FON BULUNDU")
             return company_funds
@@ -578,9 +572,14 @@ class EnhancedPortfolioCompanyAnalyzer:
         print(f"\n⚖️ {company1} vs {company2} - KAPSAMLI KARŞILAŞTIRMA (RİSK KONTROLÜ İLE)")
         print("="*75)
         
-        # Her iki şirket için analiz
-        results1 = self.analyze_company_detailed_data_with_risk(company1, analysis_days)
-        results2 = self.analyze_company_detailed_data_with_risk(company2, analysis_days)
+        # Her iki şirket tek veri çekimiyle birlikte analiz edilir
+        try:
+            results = self.analyze_companies([company1, company2], analysis_days)
+        except Exception as e:
+            print(f"   ❌ Karşılaştırma analiz hatası: {e}")
+            return f"❌ Karşılaştırma için yeterli veri yok."
+        results1 = results[company1]
+        results2 = results[company2]
         
         if not results1['success'] or not results2['success']:
             return f"❌ Karşılaştırma için yeterli veri yok."
@@ -718,88 +717,177 @@ class EnhancedPortfolioCompanyAnalyzer:
         
         return response
 
+    def build_company_fund_frame(self, analysis_days=252, companies=None):
+        """
+        Şirket - fon tablosu: üyelik, performans ve risk tek seferde.
+        Fon listesi başlık indeksinden, fon bilgisi + teknik göstergeler tek sorgudan,
+        performans metrikleri ortak fiyat matrisinden hesaplanır.
+        
+        Not: mv_fund_performance_metrics burada bilinçli olarak kullanılmaz. MV'de
+        calculate_comprehensive_performance'ın okuduğu calmar_ratio / data_points
+        kolonları yok (calmar_ratio_approx / trading_days var); MV dalı her fonda
+        KeyError ile düşüp fiyat geçmişi hesabına geçiyordu. Sıralamaya giren sayılar
+        bu fiyat hesabıdır; calculate_panel_metrics aynı formülleri aynı
+        (investorcount > 10) fiyatlar üzerinde tüm fonlar için birlikte uygular.
+        """
+        companies = list(companies) if companies is not None else list(self.company_keywords)
+        membership = [
+            (company, fcode)
+            for company in companies
+            for fcode in self.title_index.search(self.company_keywords.get(company, []), days=7)
+        ]
+        if not membership:
+            return pd.DataFrame()
+        
+        membership = pd.DataFrame(membership, columns=['company', 'fcode'])
+        fcodes = membership['fcode'].unique().tolist()
+        db = self.coordinator.db
+        
+        query = """
+            SELECT lf.fcode, lf.ftitle as fund_name, lf.fcapacity,
+                   lf.investorcount as fund_investors,
+                   ti.price_vs_sma20, ti.rsi_14, ti.stochastic_14,
+                   ti.days_since_last_trade, ti.investorcount
+            FROM mv_latest_fund_data lf
+            LEFT JOIN mv_fund_technical_indicators ti ON lf.fcode = ti.fcode
+            WHERE lf.fcode = ANY(:fcodes)
+            ORDER BY lf.fcapacity DESC NULLS LAST
+        """
+        funds = db.execute_query(query, {'fcodes': fcodes}).drop_duplicates('fcode').set_index('fcode')
+        funds['capacity'] = pd.to_numeric(funds['fcapacity'], errors='coerce').fillna(0).astype(float)
+        funds['investors'] = pd.to_numeric(funds['fund_investors'], errors='coerce').fillna(0).astype(int)
+        
+        # Risk: teknik gösterge satırı olmayan fonlar UNKNOWN
+        risk = RiskAssessment.assess_risk_frame(funds)
+        funds['risk_level'] = risk['risk_level'].where(
+            funds[['days_since_last_trade', 'investorcount']].notna().all(axis=1), 'UNKNOWN'
+        )
+        funds['risk_score'] = risk['risk_score']
+        
+        # Performans: en az 10 gözlem ve hesaplanabilir volatilite
+        price_panel = db.get_price_panel(fcodes, analysis_days)
+        if price_panel.empty:
+            metrics = pd.DataFrame()
+        else:
+            metrics = PerformanceAnalyzer.calculate_panel_metrics(price_panel)
+            usable = (metrics['data_points'] >= 10) & np.isfinite(metrics['volatility']) & (metrics['volatility'] > 0)
+            metrics = metrics[usable].replace([np.inf, -np.inf], np.nan).fillna(0)
+        
+        frame = membership.join(
+            funds[['fund_name', 'capacity', 'investors', 'risk_level', 'risk_score']], on='fcode', how='inner'
+        )
+        # Şirket içi sıra fon büyüklüğüne göre (eski sorgu sırası)
+        frame = frame.sort_values(['company', 'capacity'], ascending=[True, False], kind='stable')
+        frame = frame.join(metrics, on='fcode')
+        frame['has_performance'] = frame['data_points'].notna()
+        return frame.reset_index(drop=True)
+    
+    def aggregate_company_stats(self, frame):
+        """Şirket bazında istatistikler ve başarı skoru (groupby)"""
+        total_funds = frame.groupby('company').size().rename('total_funds')
+        analyzed = frame[frame['has_performance']]
+        
+        risk_counts = (pd.crosstab(analyzed['company'], analyzed['risk_level'])
+                       .reindex(columns=['LOW', 'MEDIUM', 'HIGH', 'EXTREME'], fill_value=0)
+                       .rename(columns={'LOW': 'low_risk', 'MEDIUM': 'medium_risk',
+                                        'HIGH': 'high_risk', 'EXTREME': 'extreme_risk'}))
+        
+        # EXTREME fonlar ortalamalara katılmaz
+        eligible = analyzed[analyzed['risk_level'] != 'EXTREME']
+        stats = eligible.groupby('company').agg(
+            total_capacity=('capacity', 'sum'),
+            total_investors=('investors', 'sum'),
+            avg_return=('annual_return', 'mean'),
+            avg_sharpe=('sharpe_ratio', 'mean'),
+            avg_volatility=('volatility', 'mean')
+        )
+        stats = stats.join(total_funds).join(risk_counts).fillna(0)
+        
+        for column in ['total_funds', 'total_investors', 'low_risk', 'medium_risk', 'high_risk', 'extreme_risk']:
+            stats[column] = stats[column].astype(int)
+        
+        safe_funds = stats['low_risk'] + stats['medium_risk']
+        stats['safe_fund_ratio'] = safe_funds / stats['total_funds'] * 100
+        stats['risk_score'] = (stats['safe_fund_ratio'] / 10 - stats['extreme_risk'] * 0.5).clip(0, 10)
+        
+        # BAŞARI SKORU (çok boyutlu) - RİSK DAHİL, extreme fon başına -2 puan
+        stats['success_score'] = (
+            stats['avg_sharpe'] * 30 +
+            (stats['avg_return'] / 100) * 25 +
+            (stats['safe_fund_ratio'] / 100) * 20 +
+            (stats['total_funds'] / 10) * 10 +
+            (stats['total_capacity'] / 1000000000).clip(upper=5) * 10 +
+            (stats['risk_score'] / 10) * 15
+        ) - stats['extreme_risk'] * 2
+        
+        return stats
+    
+    def _company_result(self, company_name, frame, stats):
+        """Şirket satırını eski sözlük formatına çevir"""
+        if company_name not in stats.index:
+            return {'success': False}
+        
+        row = stats.loc[company_name]
+        funds = frame[(frame['company'] == company_name) & frame['has_performance']
+                      & (frame['risk_level'] != 'EXTREME')]
+        funds = funds.sort_values('sharpe_ratio', ascending=False, kind='stable')
+        fund_columns = ['fcode', 'fund_name', 'capacity', 'investors', 'risk_level',
+                        'total_return', 'annual_return', 'volatility', 'sharpe_ratio',
+                        'sortino_ratio', 'calmar_ratio', 'win_rate', 'max_drawdown',
+                        'data_points', 'current_price']
+        performance_results = funds[fund_columns].to_dict('records')
+        for fund in performance_results:
+            fund['data_points'] = int(fund['data_points'])
+        
+        return {
+            'success': True,
+            'stats': {
+                'total_funds': int(row['total_funds']),
+                'total_capacity': float(row['total_capacity']),
+                'total_investors': int(row['total_investors']),
+                'avg_return': float(row['avg_return']),
+                'avg_sharpe': float(row['avg_sharpe']),
+                'avg_volatility': float(row['avg_volatility']),
+                'safe_fund_ratio': float(row['safe_fund_ratio']),
+                'risk_score': float(row['risk_score'])
+            },
+            'risk_stats': {
+                'low_risk': int(row['low_risk']),
+                'medium_risk': int(row['medium_risk']),
+                'high_risk': int(row['high_risk']),
+                'extreme_risk': int(row['extreme_risk'])
+            },
+            'success_score': float(row['success_score']),
+            'top_funds': performance_results[:5],
+            'all_funds': performance_results
+        }
+    
+    def analyze_companies(self, company_names, analysis_days=252):
+        """
+        Birden çok şirketin detaylı analizi. Önbellekte olmayan şirketlerin fonları
+        tek seferde çekilir, şirket sonuçları bu ortak tablodan hazırlanır ve
+        (şirket, analysis_days, veri sürümü) anahtarıyla önbelleğe alınır.
+        """
+        version = self.coordinator.db.get_data_version()
+        if any(key[2] != version for key in self._company_cache):
+            self._company_cache = {k: v for k, v in self._company_cache.items() if k[2] == version}
+        
+        missing = [name for name in dict.fromkeys(company_names)
+                   if (name, analysis_days, version) not in self._company_cache]
+        
+        if missing:
+            frame = self.build_company_fund_frame(analysis_days, companies=missing)
+            stats = self.aggregate_company_stats(frame) if not frame.empty else pd.DataFrame()
+            
+            for name in missing:
+                self._company_cache[(name, analysis_days, version)] = self._company_result(name, frame, stats)
+        
+        return {name: self._company_cache[(name, analysis_days, version)] for name in company_names}
+    
     def analyze_company_detailed_data_with_risk(self, company_name, analysis_days=252):
         """Şirket için detaylı veri analizi (karşılaştırma için) - RİSK DAHİL"""
         try:
-            company_funds = self.get_all_company_funds_unlimited(company_name)
-            
-            if not company_funds:
-                return {'success': False}
-            
-            performance_results = []
-            risk_stats = {'low_risk': 0, 'medium_risk': 0, 'high_risk': 0, 'extreme_risk': 0}
-            
-            for fund_info in company_funds:
-                perf = self.calculate_comprehensive_performance(fund_info['fcode'], analysis_days)
-                if perf:
-                    # Risk değerlendirmesi
-                    risk_data = self._get_fund_risk_data(fund_info['fcode'])
-                    
-                    if risk_data:
-                        risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-                        risk_level = risk_assessment['risk_level']
-                    else:
-                        risk_level = 'UNKNOWN'
-                    
-                    fund_result = {
-                        'fcode': fund_info['fcode'],
-                        'fund_name': fund_info['fund_name'],
-                        'capacity': fund_info['capacity'],
-                        'investors': fund_info['investors'],
-                        'risk_level': risk_level,
-                        **perf
-                    }
-                    
-                    # Sadece EXTREME olmayan fonları dahil et
-                    if risk_level != 'EXTREME':
-                        performance_results.append(fund_result)
-                    
-                    # Risk istatistiklerini güncelle
-                    if risk_level == 'LOW':
-                        risk_stats['low_risk'] += 1
-                    elif risk_level == 'MEDIUM':
-                        risk_stats['medium_risk'] += 1
-                    elif risk_level == 'HIGH':
-                        risk_stats['high_risk'] += 1
-                    elif risk_level == 'EXTREME':
-                        risk_stats['extreme_risk'] += 1
-            
-            if not performance_results:
-                return {'success': False}
-            
-            # İstatistikleri hesapla
-            total_funds = len(company_funds)
-            safe_funds = risk_stats['low_risk'] + risk_stats['medium_risk']
-            total_capacity = sum(r['capacity'] for r in performance_results)
-            total_investors = sum(r['investors'] for r in performance_results)
-            avg_return = sum(r['annual_return'] for r in performance_results) / len(performance_results)
-            avg_sharpe = sum(r['sharpe_ratio'] for r in performance_results) / len(performance_results)
-            avg_volatility = sum(r['volatility'] for r in performance_results) / len(performance_results)
-            
-            # Risk skoru hesapla (10 üzerinden)
-            safe_fund_ratio = (safe_funds / total_funds) * 100
-            risk_score = (safe_fund_ratio / 10) - (risk_stats['extreme_risk'] * 0.5)
-            risk_score = max(0, min(10, risk_score))  # 0-10 arası
-            
-            # En iyi fonları bul (EXTREME hariç)
-            performance_results.sort(key=lambda x: x['sharpe_ratio'], reverse=True)
-            
-            return {
-                'success': True,
-                'stats': {
-                    'total_funds': total_funds,
-                    'total_capacity': total_capacity,
-                    'total_investors': total_investors,
-                    'avg_return': avg_return,
-                    'avg_sharpe': avg_sharpe,
-                    'avg_volatility': avg_volatility,
-                    'safe_fund_ratio': safe_fund_ratio,
-                    'risk_score': risk_score
-                },
-                'risk_stats': risk_stats,
-                'top_funds': performance_results[:5],
-                'all_funds': performance_results
-            }
+            return self.analyze_companies([company_name], analysis_days)[company_name]
             
         except Exception as e:
             print(f"   ❌ {company_name} detaylı analiz hatası: {e}")
@@ -810,49 +898,28 @@ class EnhancedPortfolioCompanyAnalyzer:
         print(f"\n🏆 EN BAŞARILI PORTFÖY ŞİRKETİ ANALİZİ - TÜM ŞİRKETLER (RİSK KONTROLÜ İLE)")
         print("="*75)
         
-        company_results = []
-        total_companies = len(self.company_keywords)
+        try:
+            # Tüm şirketler tek tabloda; skorlar groupby ile
+            all_results = self.analyze_companies(list(self.company_keywords), analysis_days=180)  # 6 ay
+        except Exception as e:
+            print(f"   ❌ Hata: {e}")
+            return "❌ Hiçbir şirket analiz edilemedi."
         
-        for i, company_name in enumerate(self.company_keywords.keys(), 1):
-            print(f"\n📊 [{i}/{total_companies}] {company_name} analizi...")
-            
-            try:
-                result = self.analyze_company_detailed_data_with_risk(company_name, analysis_days=180)  # 6 ay
-                
-                if result['success']:
-                    stats = result['stats']
-                    risk_stats = result['risk_stats']
-                    
-                    # BAŞARI SKORU hesaplama (çok boyutlu) - RİSK DAHİL
-                    success_score = (
-                        stats['avg_sharpe'] * 30 +          # Risk-ayarlı getiri 
-                        (stats['avg_return'] / 100) * 25 +   # Mutlak getiri 
-                        (stats['safe_fund_ratio'] / 100) * 20 +  # Güvenlik oranı (YENİ)
-                        (stats['total_funds'] / 10) * 10 +   # Fon çeşitliliği
-                        min(stats['total_capacity'] / 1000000000, 5) * 10 +  # Büyüklük
-                        (stats['risk_score'] / 10) * 15      # Risk skoru (YENİ)
-                    )
-                    
-                    # Extreme risk cezası
-                    if risk_stats['extreme_risk'] > 0:
-                        success_score -= risk_stats['extreme_risk'] * 2  # Her extreme fon için -2 puan
-                    
-                    company_results.append({
-                        'company': company_name,
-                        'success_score': success_score,
-                        'risk_stats': risk_stats,
-                        **stats,
-                        'best_fund': result['top_funds'][0] if result['top_funds'] else None
-                    })
-                    
-                    print(f"   ✅ Başarı Skoru: {success_score:.2f} (Risk dahil)")
-                    print(f"   🛡️ Güvenli: {risk_stats['low_risk']+risk_stats['medium_risk']}/{stats['total_funds']}")
-                else:
-                    print(f"   ❌ Veri yetersiz")
-                    
-            except Exception as e:
-                print(f"   ❌ Hata: {e}")
+        company_results = []
+        for company_name, result in all_results.items():
+            if not result['success']:
+                print(f"   ❌ {company_name}: Veri yetersiz")
                 continue
+            
+            company_results.append({
+                'company': company_name,
+                'success_score': result['success_score'],
+                'risk_stats': result['risk_stats'],
+                **result['stats'],
+                'best_fund': result['top_funds'][0] if result['top_funds'] else None
+            })
+        
+        print(f"   ✅ {len(company_results)}/{len(self.company_keywords)} şirket skorlandı")
         
         if not company_results:
             return "❌ Hiçbir şirket analiz edilemedi."
@@ -10,6 +10,23 @@ from datetime import datetime, timedelta
 import re
 from typing import Dict, List, Optional, Tuple
 
+# Kural tabanlı tahmin tablosu ızgarası: tam sayı hedef değerler x ay bazlı ufuklar.
+# Kuralı olan senaryolarda bu noktalara düşen sorular tablodan cevaplanır (AI çağrısı yapılmaz).
+GRID_TARGETS = np.arange(0, 201, dtype=np.float64)
+GRID_HORIZON_DAYS = np.arange(30, 361, 30)
+
+# Enflasyon senaryosunda kategori bazlı temel etki (%), hedef çarpanıyla ölçeklenir
+INFLATION_IMPACT_BASE = {
+    'para_piyasası': -10,
+    'tahvil': -8,
+    'altın': 25,
+    'hisse': 15,
+    'döviz': 20
+}
+SCENARIO_TYPES = ['enflasyon', 'döviz', 'faiz', 'borsa', 'genel']
+# Kategori etki kuralı tanımlı senaryolar; diğerleri AI'a gider
+RULE_SCENARIO_TYPES = ['enflasyon']
+
 class PredictiveScenarioAnalyzer:
     """AI destekli gelecek senaryo tahminleri"""
     
@@ -44,6 +61,17 @@ class PredictiveScenarioAnalyzer:
                 'low': {'threshold': 30, 'multiplier': 1.0}
             }
         }
+        
+        # Veri sürümü başına senaryo anlık görüntüleri ve fon listeleri
+        self._cache_version = None
+        self._snapshot_cache = {}
+        self._funds_cache = {}
+        
+        # Senaryo -> (hedef x ufuk) kural tahmin tablosu; veriden bağımsız, bir kez kurulur
+        self._prediction_table = {
+            scenario_type: self._rule_prediction_arrays(scenario_type, GRID_TARGETS, GRID_HORIZON_DAYS)
+            for scenario_type in RULE_SCENARIO_TYPES
+        }
     
     def is_predictive_question(self, question):
         """Tahmin sorusu mu kontrolü"""
@@ -73,17 +101,21 @@ class PredictiveScenarioAnalyzer:
         
         print(f"🔮 Prediktif Analiz: {scenario_type} - {time_period['label']} - Hedef: {target_value}")
         
-        # Mevcut durumu analiz et
-        current_state = self._analyze_current_state(scenario_type)
-        
-        # Tarihsel trendi analiz et
-        historical_trend = self._analyze_historical_trend(scenario_type, time_period['days'])
+        # Mevcut durum ve tarihsel trend (veri sürümü başına önbellekli)
+        current_state, historical_trend = self._get_scenario_snapshot(scenario_type, time_period['days'])
         
-        # AI tahminlerini al
-        ai_predictions = self._get_ai_predictions(
-            scenario_type, target_value, time_period, 
-            current_state, historical_trend, question
-        )
+        if scenario_type in self._prediction_table and self._is_on_grid(target_value, time_period['days']):
+            # Kuralı olan senaryoda ızgaradaki sorular hazır tablodan: AI çağrısı yok
+            print("⚡ Tahmin ızgarasından cevaplanıyor")
+            ai_predictions = self._generate_rule_based_predictions(
+                scenario_type, target_value, time_period, current_state, historical_trend
+            )
+        else:
+            # AI tahminlerini al
+            ai_predictions = self._get_ai_predictions(
+                scenario_type, target_value, time_period, 
+                current_state, historical_trend, question
+            )
         
         # Sonuçları formatla
         return self._format_predictive_results(
@@ -91,6 +123,99 @@ class PredictiveScenarioAnalyzer:
             current_state, historical_trend, ai_predictions
         )
     
+    def _refresh_cache_version(self):
+        """Veri sürümü değiştiyse senaryo önbelleklerini temizle"""
+        version = self.db.get_data_version()
+        if version != self._cache_version:
+            self._snapshot_cache = {}
+            self._funds_cache = {}
+            self._cache_version = version
+    
+    def _get_scenario_snapshot(self, scenario_type, days):
+        """
+        Senaryo tipi için (mevcut durum, tarihsel trend) çifti. Sorgular ufuktan
+        bağımsız olduğundan anahtar yalnızca senaryo tipidir.
+        """
+        self._refresh_cache_version()
+        snapshot = self._snapshot_cache.get(scenario_type)
+        if snapshot is None:
+            snapshot = (
+                self._analyze_current_state(scenario_type),
+                self._analyze_historical_trend(scenario_type, days)
+            )
+            self._snapshot_cache[scenario_type] = snapshot
+        return snapshot
+    
+    def _get_scenario_funds(self, scenario_type):
+        """Senaryoya uygun fonlar (veri sürümü başına önbellekli; boş sonuç saklanmaz)"""
+        self._refresh_cache_version()
+        funds = self._funds_cache.get(scenario_type)
+        if funds is None:
+            funds = self._get_scenario_relevant_funds_simple(scenario_type)
+            if funds:
+                self._funds_cache[scenario_type] = funds
+        return funds
+    
+    @staticmethod
+    def _is_on_grid(target_value, days):
+        """Hedef (veya belirtilmemiş) ve ufuk tahmin ızgarasında mı"""
+        target_on_grid = target_value is None or (
+            float(target_value).is_integer() and GRID_TARGETS[0] <= target_value <= GRID_TARGETS[-1]
+        )
+        return target_on_grid and days in GRID_HORIZON_DAYS
+    
+    @staticmethod
+    def _rule_prediction_arrays(scenario_type, targets, days):
+        """
+        Kural tahminleri hedef ve ufuk dizileri üzerinde vektörel:
+        etki (hedef x kategori), olasılık (hedef) ve zaman çizelgesi (ufuk x 3, gün).
+        Belirtilmemiş hedef NaN'dır; NaN karşılaştırmaları eşiği geçmez.
+        """
+        targets = np.atleast_1d(np.asarray(targets, dtype=np.float64))
+        days = np.atleast_1d(np.asarray(days, dtype=np.int64))
+        
+        if scenario_type == 'enflasyon':
+            categories = list(INFLATION_IMPACT_BASE)
+            multiplier = np.where(targets > 80, 1.5, 1.2)
+            impacts = multiplier[:, None] * np.array(list(INFLATION_IMPACT_BASE.values()), dtype=np.float64)[None, :]
+            probability = np.where(targets > 70, 70, 50)
+        else:
+            # Diğer senaryolar için kategori etkisi tanımlı değil
+            categories = []
+            impacts = np.zeros((len(targets), 0))
+            probability = np.zeros(len(targets), dtype=np.int64)
+        
+        timeline = np.column_stack([np.maximum(days // 10, 7), days // 2, days * 2])
+        return {
+            'categories': categories,
+            'impacts': impacts,
+            'probability': probability,
+            'timeline': timeline
+        }
+    
+    def _lookup_rule_predictions(self, scenario_type, target_value, days):
+        """Kural tahmininin (etki, olasılık, zaman çizelgesi) tablo satırı; ızgara dışıysa anlık hesap"""
+        if scenario_type in self._prediction_table and self._is_on_grid(target_value, days):
+            table = self._prediction_table[scenario_type]
+            # Belirtilmemiş hedef hiçbir eşiği geçmez: en düşük ızgara satırıyla aynı
+            t = 0 if target_value is None else int(target_value - GRID_TARGETS[0])
+            h = int(np.searchsorted(GRID_HORIZON_DAYS, days))
+        else:
+            target = np.nan if target_value is None else float(target_value)
+            table = self._rule_prediction_arrays(scenario_type, [target], [days])
+            t, h = 0, 0
+        
+        first, peak, recovery = table['timeline'][h]
+        return {
+            'impact_analysis': dict(zip(table['categories'], table['impacts'][t].tolist())),
+            'probability': int(table['probability'][t]),
+            'timeline': {
+                'ilk_etki': f"{first} gün",
+                'maksimum_etki': f"{peak} gün",
+                'toparlanma': f"{recovery} gün"
+            }
+        }
+    
     def _identify_scenario_type(self, question_lower):
         """Senaryo tipini belirle"""
         if any(word in question_lower for word in ['enflasyon', 'tüfe', 'üfe']):
@@ -245,7 +370,7 @@ class PredictiveScenarioAnalyzer:
             )
         
         # Gerçek fonları al
-        affected_funds = self._get_scenario_relevant_funds_simple(scenario_type)
+        affected_funds = self._get_scenario_funds(scenario_type)
         
         # En iyi fonları seç
         top_funds = {
@@ -527,7 +652,7 @@ class PredictiveScenarioAnalyzer:
         """Kural tabanlı tahminler - GERÇEK FONLARLA"""
         
         # Gerçek fonları al
-        real_funds = self._get_scenario_relevant_funds_simple(scenario_type)
+        real_funds = self._get_scenario_funds(scenario_type)
         
         if not real_funds:
             return {
@@ -543,29 +668,19 @@ class PredictiveScenarioAnalyzer:
 
     Lütfen daha sonra tekrar deneyin.
     """,
-                'parsed': False
+                'parsed': False,
+                'rule_based': True
             }
         
+        # Etki, olasılık ve zaman çizelgesi tahmin tablosundan
         predictions = {
-            'impact_analysis': {},
+            **self._lookup_rule_predictions(scenario_type, target_value, time_period['days']),
             'protection_funds': [],
-            'timeline': {},
-            'probability': 0,
             'action_plan': []
         }
         
-        # Senaryo tipine göre tahminler
+        # Senaryo tipine göre koruma fonları
         if scenario_type == 'enflasyon':
-            impact_multiplier = 1.5 if target_value and target_value > 80 else 1.2
-            
-            predictions['impact_analysis'] = {
-                'para_piyasası': -10 * impact_multiplier,
-                'tahvil': -8 * impact_multiplier,
-                'altın': 25 * impact_multiplier,
-                'hisse': 15 * impact_multiplier,
-                'döviz': 20 * impact_multiplier
-            }
-            
             # Fonları kategorize et (eğer MV'den geldiyse type bilgisi var)
             gold_funds = [f for f in real_funds if f.get('type') == 'ALTIN']
             fx_funds = [f for f in real_funds if f.get('type') == 'DOVIZ']
@@ -594,18 +709,9 @@ class PredictiveScenarioAnalyzer:
                 predictions['protection_funds'].append(
                     (equity_funds[0]['fcode'], f"Aktif işlem gören fon")
                 )
-            
-            predictions['probability'] = 70 if target_value and target_value > 70 else 50
         
         # Diğer senaryolar benzer şekilde...
         
-        # Zaman çizelgesi
-        predictions['timeline'] = {
-            'ilk_etki': f"{max(time_period['days'] // 10, 7)} gün",
-            'maksimum_etki': f"{time_period['days'] // 2} gün",
-            'toparlanma': f"{time_period['days'] * 2} gün"
-        }
-        
         # Aksiyon planı
         predictions['action_plan'] = [
             'Portföyü gözden geçir',
@@ -616,7 +722,8 @@ class PredictiveScenarioAnalyzer:
         
         return {
             'raw_prediction': self._format_rule_based_predictions(predictions, scenario_type, time_period),
-            'parsed': False
+            'parsed': False,
+            'rule_based': True
         }
     def _format_rule_based_predictions(self, predictions, scenario_type, time_period):
         """Kural tabanlı tahminleri formatla"""
@@ -627,6 +734,8 @@ class PredictiveScenarioAnalyzer:
         for category, impact in predictions['impact_analysis'].items():
             icon = "📈" if impact > 0 else "📉"
             response += f"   {icon} {category.title()}: %{impact:+.1f}\n"
+        if not predictions['impact_analysis']:
+            response += f"   ℹ️ Bu senaryo için kategori etki kuralı tanımlı değil\n"
         
         response += f"\n2️⃣ KORUNMA SAĞLAYACAK FONLAR:\n"
         for i, (fund, reason) in enumerate(predictions['protection_funds'][:5], 1):
@@ -643,7 +752,10 @@ class PredictiveScenarioAnalyzer:
         response += f"   🔄 Toparlanma: {predictions['timeline']['toparlanma']}\n"
         
         response += f"\n4️⃣ OLASILIK ANALİZİ:\n"
-        response += f"   📊 Gerçekleşme olasılığı: %{predictions['probability']}\n"
+        if predictions['impact_analysis']:
+            response += f"   📊 Gerçekleşme olasılığı: %{predictions['probability']}\n"
+        else:
+            response += f"   📊 Gerçekleşme olasılığı: kural tanımlı değil\n"
         response += f"   ⚠️ Risk faktörleri: Küresel gelişmeler, TCMB kararları\n"
         response += f"   👁️ İzlenecek: TÜFE, Dolar/TL, Altın fiyatları\n"
         
@@ -678,15 +790,16 @@ class PredictiveScenarioAnalyzer:
         response += f"   • Volatilite: %{historical_trend['return_volatility']:.2f}\n"
         response += f"   • Veri Sayısı: {historical_trend['fund_count']} fon\n\n"
         
-        # AI tahminleri
-        response += f"🤖 AI TAHMİNLERİ:\n"
+        # AI veya kural tabanlı tahminler
+        rule_based = ai_predictions.get('rule_based', False)
+        response += "📊 KURAL TABANLI TAHMİNLER:\n" if rule_based else "🤖 AI TAHMİNLERİ:\n"
         response += f"{'='*60}\n"
         response += ai_predictions['raw_prediction']
         response += f"\n{'='*60}\n"
         
         # Risk uyarıları
         response += f"\n⚠️ ÖNEMLİ UYARILAR:\n"
-        response += f"   • Bu tahminler tarihsel verilere ve AI analizine dayanır\n"
+        response += f"   • Bu tahminler tarihsel verilere ve {'sabit kurallara' if rule_based else 'AI analizine'} dayanır\n"
         response += f"   • Piyasa koşulları ani değişebilir\n"
         response += f"   • Kesin sonuç garantisi verilmez\n"
         response += f"   • Yatırım kararlarında profesyonel destek alın\n"
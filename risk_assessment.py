@@ -1,5 +1,8 @@
 # utils.py veya yeni bir risk_assessment.py dosyasına ekleyin
 
+import numpy as np
+import pandas as pd
+
 class RiskAssessment:
     """Ekstrem durum ve risk değerlendirmesi"""
     
@@ -127,6 +130,48 @@ class RiskAssessment:
             'requires_research': risk_score >= 25  # 30'dan 25'e düşürüldü
         }
     
+    @staticmethod
+    def assess_risk_frame(frame):
+        """
+        assess_fund_risk kurallarının çok fonlu (vektörel) hali.
+        
+        Args:
+            frame: price_vs_sma20, rsi_14, stochastic_14, days_since_last_trade,
+                   investorcount (ve opsiyonel volatility) kolonlu DataFrame
+            
+        Returns:
+            DataFrame with risk_score, risk_level (aynı index)
+        """
+        def column(name, default):
+            if name not in frame.columns:
+                return np.full(len(frame), float(default))
+            return pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=float)
+        
+        price_vs_sma20 = column('price_vs_sma20', 0)
+        rsi = column('rsi_14', 50)
+        stoch = column('stochastic_14', 50)
+        days_inactive = column('days_since_last_trade', 0)
+        investors = column('investorcount', 0)
+        volatility = column('volatility', 0)
+        
+        divergence = np.abs(rsi - stoch) > 80
+        risk_score = (
+            np.select([price_vs_sma20 < -70, price_vs_sma20 < -30], [40, 25], 0)
+            + np.select([divergence & (stoch > 90) & (rsi < 10),
+                         divergence & (stoch < 10) & (rsi > 90)], [30, 20], 0)
+            + np.select([days_inactive > 20, days_inactive > 10], [35, 15], 0)
+            + np.select([investors < 50, investors < 100], [30, 15], 0)
+            + np.select([volatility > 40, volatility > 25], [25, 15], 0)
+        )
+        
+        risk_level = np.select(
+            [risk_score >= 40, risk_score >= 25, risk_score >= 15],
+            ["EXTREME", "HIGH", "MEDIUM"],
+            default="LOW"
+        )
+        
+        return pd.DataFrame({'risk_score': risk_score, 'risk_level': risk_level}, index=frame.index)
+    
     @staticmethod
     def format_risk_warning(risk_assessment):
         """Risk uyarısını formatla"""
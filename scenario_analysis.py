@@ -10,6 +10,7 @@ import numpy as np
 from datetime import datetime
 import re
 from risk_assessment import RiskAssessment
+from analysis.scenario_engine import FactorScenarioEngine, FACTOR_COLUMNS, FACTOR_LABELS, currency_shock
 
 class ScenarioAnalyzer:
     """Senaryo bazlı analiz ve öneriler - Gerçek fon verileriyle + Risk kontrolü"""
@@ -28,15 +29,10 @@ class ScenarioAnalyzer:
         }
         
         # Yatırım alanı kolonları (tefasfunddetails'den)
-        self.investment_columns = {
-            'gold': ['preciousmetals', 'preciousmetalskba', 'preciousmetalskks'],
-            'equity': ['stock', 'foreignequity'],
-            'fx': ['foreigncurrencybills', 'eurobonds', 'foreigndebtinstruments', 
-                   'foreigndomesticdebtinstruments', 'foreignprivatesectordebtinstruments'],
-            'bond': ['governmentbond', 'governmentbondsandbillsfx', 'treasurybill',
-                     'governmentleasecertificates', 'privatesectorbond'],
-            'money_market': ['reverserepo', 'repo', 'termdeposit', 'termdeposittl']
-        }
+        self.investment_columns = FACTOR_COLUMNS
+        
+        # Fon x faktör exposure matrisi - tüm fonların şok projeksiyonu tek matris çarpımı
+        self.factor_engine = FactorScenarioEngine(self.db, coordinator.config.analysis.usd_try_rate)
     
     def is_scenario_question(self, question):
         """Senaryo sorusu mu kontrolü"""
@@ -94,6 +90,12 @@ class ScenarioAnalyzer:
         # GERÇEK FON ANALİZİ
         inflation_funds = self._analyze_funds_for_inflation()
         
+        # Tüm aday fonlar için tek sorguda risk kontrolü
+        risk_checks = self._check_funds_risk(
+            fund['fcode'] for key in ('gold_funds', 'equity_funds', 'fx_funds')
+            for fund in inflation_funds[key][:8]
+        )
+        
         # ✅ RİSK KONTROLÜ - ALTIN FONLARI
         if inflation_funds['gold_funds']:
             response += f"🥇 ALTIN/KIYMETLİ MADEN FONLARI (En İyi Koruma):\n\n"
@@ -104,7 +106,7 @@ class ScenarioAnalyzer:
             
             for fund in inflation_funds['gold_funds'][:8]:  # Daha fazla al, filtreleyeceğiz
                 # Risk değerlendirmesi
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe:
                     safe_gold_funds.append(fund)
@@ -137,7 +139,7 @@ class ScenarioAnalyzer:
             risky_equity_funds = []
             
             for fund in inflation_funds['equity_funds'][:8]:
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe:
                     safe_equity_funds.append(fund)
@@ -166,7 +168,7 @@ class ScenarioAnalyzer:
             risky_fx_funds = []
             
             for fund in inflation_funds['fx_funds'][:8]:
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe:
                     safe_fx_funds.append(fund)
@@ -212,6 +214,13 @@ class ScenarioAnalyzer:
         response += f"   Beklenen Nominal Getiri: %{estimated_return['nominal']:.1f}\n"
         response += f"   Enflasyon Sonrası Reel Getiri: %{estimated_return['real']:.1f}\n"
         
+        # FAKTÖR MODELİ - tüm fonlar + şok büyüklüğü duyarlılığı
+        response += self._format_factor_projection(
+            'inflation', inflation_rate,
+            sorted({max(10, inflation_rate - 20), inflation_rate, inflation_rate + 20}),
+            portfolio, label=lambda m: f"%{m:.0f} enflasyon"
+        )
+        
         # RİSK UYARILARI
         response += f"\n⚠️ ÖNEMLİ UYARILAR:\n"
         response += f"   • Bu tahminler geçmiş verilere dayanır\n"
@@ -234,6 +243,11 @@ class ScenarioAnalyzer:
         # Defansif fonları analiz et
         defensive_funds = self._analyze_defensive_funds()
         
+        risk_checks = self._check_funds_risk(
+            [fund['fcode'] for fund in defensive_funds['money_market'][:10]] +
+            [fund['fcode'] for fund in defensive_funds['bond_funds'][:8]]
+        )
+        
         # ✅ RİSK KONTROLÜ - PARA PİYASASI FONLARI
         if defensive_funds['money_market']:
             response += f"💵 PARA PİYASASI FONLARI (En Güvenli):\n\n"
@@ -242,7 +256,7 @@ class ScenarioAnalyzer:
             risky_mm_funds = []
             
             for fund in defensive_funds['money_market'][:10]:  # Daha fazla kontrol et
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe and risk_assessment and risk_assessment['risk_level'] in ['LOW', 'MEDIUM']:
                     verified_safe_funds.append(fund)
@@ -277,7 +291,7 @@ class ScenarioAnalyzer:
             risky_bond_funds = []
             
             for fund in defensive_funds['bond_funds'][:8]:
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe:
                     safe_bond_funds.append(fund)
@@ -309,6 +323,14 @@ class ScenarioAnalyzer:
         
         crisis_portfolio = self._create_crisis_portfolio(safe_defensive_funds, crash_rate)
         
+        # Portföy verisi olan fonlarda beklenen kayıp faktör modelinden
+        projected = self.factor_engine.project(
+            {'stock_crash': crash_rate}, [item['fcode'] for item in crisis_portfolio]
+        )
+        for item in crisis_portfolio:
+            if item['fcode'] in projected.index:
+                item['expected_loss'] = float(projected[item['fcode']])
+        
         for item in crisis_portfolio:
             response += f"• {item['fcode']} - %{item['weight']} ✅\n"
             response += f"  {item['reason']}\n"
@@ -323,6 +345,14 @@ class ScenarioAnalyzer:
         response += f"   4. Nakit oranını %20-30'a çıkarın\n"
         response += f"   5. Tüm öneriler risk değerlendirmesinden geçirilmiştir\n"
         
+        response += self._format_historical_replay(crisis_portfolio, driver='bist100')
+        
+        response += self._format_factor_projection(
+            'stock_crash', crash_rate,
+            sorted({max(5, crash_rate - 15), crash_rate, crash_rate + 15}),
+            crisis_portfolio, label=lambda m: f"%{m:.0f} düşüş"
+        )
+        
         return response
     
     def _analyze_currency_scenario(self, question):
@@ -340,6 +370,11 @@ class ScenarioAnalyzer:
         # Gerçek döviz fonlarını analiz et
         fx_funds = self._analyze_fx_funds()
         
+        risk_checks = self._check_funds_risk(
+            [fund['fcode'] for fund in fx_funds['high_fx'][:8]] +
+            [fund['fcode'] for fund in fx_funds['mixed'][:6]]
+        )
+        
         # ✅ RİSK KONTROLÜ - YÜKSEK DÖVİZ İÇERİKLİ FONLAR
         if fx_funds['high_fx']:
             response += f"💵 YÜKSEK DÖVİZ İÇERİKLİ FONLAR:\n\n"
@@ -348,7 +383,7 @@ class ScenarioAnalyzer:
             risky_high_fx = []
             
             for fund in fx_funds['high_fx'][:8]:
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe:
                     safe_high_fx.append(fund)
@@ -378,7 +413,7 @@ class ScenarioAnalyzer:
             risky_mixed = []
             
             for fund in fx_funds['mixed'][:6]:
-                is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+                is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
                 
                 if is_safe:
                     safe_mixed.append(fund)
@@ -415,56 +450,138 @@ class ScenarioAnalyzer:
             response += f"  {item['reason']}\n"
             response += f"  Risk kontrolü: Onaylandı\n\n"
         
+        # Kur seviyesi -> baz kura göre yüzde değişim; seviye yoksa %10/%25/%50 artış
+        base_rate = self.factor_engine.base_usd_try
+        levels = ([currency_level * 0.9, currency_level, currency_level * 1.1] if currency_level
+                  else [base_rate * 1.10, base_rate * 1.25, base_rate * 1.50])
+        shocks = [currency_shock(level, base_rate) for level in levels]
+        response += self._format_factor_projection(
+            'currency', shocks[1], shocks, fx_portfolio,
+            label=lambda m: f"USD/TRY {base_rate * (1 + m / 100):.1f}"
+        )
+        response += f"   (Baz kur: {base_rate:.2f} TL)\n"
+        
         return response
     
-    def _check_fund_risk(self, fcode):
+    def _check_funds_risk(self, fcodes):
         """
-        Fon için risk kontrolü yap
+        Fonlar için risk kontrolü - tek sorgu + vektörel risk kuralları
         
         Returns:
-            tuple: (is_safe, risk_assessment, risk_warning)
+            dict: fcode -> (is_safe, risk_assessment, risk_warning)
         """
+        fcodes = list(dict.fromkeys(fcodes))
+        results = {fcode: (True, None, "") for fcode in fcodes}  # Veri yoksa güvenli say
+        if not fcodes:
+            return results
+        
         try:
-            mv_query = f"""
+            mv_query = """
             SELECT 
                 fcode,
-                current_price,
                 price_vs_sma20,
                 rsi_14,
                 stochastic_14,
                 days_since_last_trade,
                 investorcount
             FROM mv_fund_technical_indicators 
-            WHERE fcode = '{fcode}'
+            WHERE fcode = ANY(:fcodes)
             """
-            
-            mv_data = self.coordinator.db.execute_query(mv_query)
-            
+            mv_data = self.db.execute_query(mv_query, {'fcodes': fcodes})
             if mv_data.empty:
-                return True, None, ""  # Veri yoksa güvenli say
-            
-            row = mv_data.iloc[0]
+                return results
             
-            risk_data = {
-                'fcode': fcode,
-                'price_vs_sma20': float(row['price_vs_sma20']) if pd.notna(row['price_vs_sma20']) else 0,
-                'rsi_14': float(row['rsi_14']) if pd.notna(row['rsi_14']) else 50,
-                'stochastic_14': float(row['stochastic_14']) if pd.notna(row['stochastic_14']) else 50,
-                'days_since_last_trade': int(row['days_since_last_trade']) if pd.notna(row['days_since_last_trade']) else 0,
-                'investorcount': int(row['investorcount']) if pd.notna(row['investorcount']) else 0
-            }
-            
-            risk_assessment = RiskAssessment.assess_fund_risk(risk_data)
-            risk_warning = RiskAssessment.format_risk_warning(risk_assessment)
-            
-            # EXTREME risk fonları güvenli değil
-            is_safe = risk_assessment['risk_level'] not in ['EXTREME']
-            
-            return is_safe, risk_assessment, risk_warning
+            mv_data = mv_data.drop_duplicates('fcode').set_index('fcode').fillna({
+                'price_vs_sma20': 0, 'rsi_14': 50, 'stochastic_14': 50,
+                'days_since_last_trade': 0, 'investorcount': 0
+            })
+            risk = RiskAssessment.assess_risk_frame(mv_data)
             
+            for fcode, row in risk.iterrows():
+                risk_assessment = {'risk_level': row['risk_level'], 'risk_score': int(row['risk_score'])}
+                # EXTREME risk fonları güvenli değil
+                results[fcode] = (row['risk_level'] != 'EXTREME', risk_assessment, "")
+        
         except Exception as e:
-            print(f"Risk kontrolü hatası ({fcode}): {e}")
-            return True, None, ""  # Hata durumunda güvenli say
+            print(f"Toplu risk kontrolü hatası: {e}")
+        
+        return results
+    
+    def _format_factor_projection(self, scenario, magnitude, magnitudes, portfolio=None,
+                                  label=str, top_n=5):
+        """Faktör modeli bölümü: tüm fonlardan en iyi projeksiyonlar + şok büyüklüğü duyarlılığı"""
+        try:
+            shocks = {scenario: magnitude}
+            candidates = self.factor_engine.top_funds(shocks, n=top_n * 6)
+            risk_checks = self._check_funds_risk(candidates.index)
+            safe = [fcode for fcode in candidates.index if risk_checks[fcode][0]][:top_n]
+            if not safe:
+                return ""
+            
+            meta = self.db.get_fund_meta(safe)
+            exposures = self.factor_engine.get_exposures(safe)
+            
+            text = f"\n🧮 FAKTÖR MODELİ PROJEKSİYONU ({label(magnitude)}) - TÜM FONLAR:\n\n"
+            for i, fcode in enumerate(safe, 1):
+                name = meta.get(fcode, {}).get('fund_name') or 'N/A'
+                main_factor = exposures.loc[fcode].idxmax()
+                text += f"{i}. {fcode} - {name[:35]}\n"
+                text += f"   📈 Projeksiyon: %{candidates[fcode]:+.1f} "
+                text += f"({FACTOR_LABELS[main_factor]} %{exposures.loc[fcode, main_factor] * 100:.0f})\n"
+            
+            if portfolio:
+                weights = {}
+                for item in portfolio:
+                    weights[item['fcode']] = weights.get(item['fcode'], 0) + item['weight']
+                grid = self.factor_engine.sweep(scenario, magnitudes, fcodes=weights)
+                if not grid.empty:
+                    w = np.array([weights[fcode] for fcode in grid.index], dtype=float)
+                    projected = w @ grid.to_numpy() / w.sum()
+                    text += f"\n📐 PORTFÖY DUYARLILIĞI (portföy verisi olan %{w.sum():.0f} ağırlık):\n"
+                    for m, value in zip(magnitudes, projected):
+                        text += f"   {label(m)}: %{value:+.1f}\n"
+            
+            return text
+        
+        except Exception as e:
+            print(f"   ❌ Faktör modeli hatası: {e}")
+            return ""
+    
+    def _format_historical_replay(self, portfolio, driver='bist100', window_days=20, n_windows=3):
+        """Portföyü geçmişin en kötü pencerelerindeki gerçek fon getirileriyle yeniden oynat"""
+        try:
+            weights = {}
+            for item in portfolio:
+                weights[item['fcode']] = weights.get(item['fcode'], 0) + item['weight']
+            
+            # Öneri yer tutucuları (SAFE_*) fiyat panelinde yok - medyanla doldurulmasın
+            panel_codes = self.db.get_price_panel(days=self.coordinator.monte_carlo_analyzer.stress_history_days).columns
+            weights = {fcode: w for fcode, w in weights.items() if fcode in panel_codes}
+            if not weights:
+                return ""
+            
+            replay = self.coordinator.monte_carlo_analyzer.historical_stress_replay(
+                list(weights), list(weights.values()), driver=driver,
+                window_days=window_days, n_windows=n_windows
+            )
+            if not replay:
+                return ""
+            
+            driver_label = {'bist100': 'Hisse endeksi', 'usd': 'Döviz endeksi', 'market': 'Piyasa medyanı'}.get(driver, driver)
+            text = f"\n📜 TARİHSEL KRİZ TEKRARI (en kötü {window_days} günlük {n_windows} dönem):\n"
+            stress_returns = replay['portfolio']['stress_returns']
+            for (_, window), (label, value) in zip(replay['windows'].iterrows(), stress_returns.items()):
+                text += f"   {label}: {driver_label} %{window['driver_return'] * 100:+.1f} → Portföy %{value * 100:+.1f}\n"
+            
+            var = replay['portfolio']['historical_var']
+            if var:
+                text += f"   Tarihsel {window_days} günlük VaR(95): %{var.get('var_95', 0) * 100:.1f} "
+                text += f"({replay['portfolio']['n_windows']} pencere)\n"
+            return text
+        
+        except Exception as e:
+            print(f"   ❌ Tarihsel stres tekrarı hatası: {e}")
+            return ""
     
     def _analyze_funds_for_inflation(self):
         """Enflasyona dayanıklı gerçek fonları bul ve analiz et - MV VERSİYONU"""
@@ -1115,12 +1232,18 @@ class ScenarioAnalyzer:
         return portfolio
     
     def _estimate_portfolio_return(self, portfolio, inflation_rate):
-        """Portföy getiri tahmini"""
-        # Basit tahmin modeli
+        """Portföy getiri tahmini - faktör modeli, portföy verisi olmayan kalemlerde basit kurallar"""
         nominal_return = 0
         
+        projected = self.factor_engine.project(
+            {'inflation': inflation_rate}, [item['fcode'] for item in portfolio]
+        )
+        
         for item in portfolio:
-            if 'altın' in item['reason'].lower() or 'gold' in item['reason'].lower():
+            if item['fcode'] in projected.index:
+                # Fonun altın/hisse/döviz/tahvil/para piyasası exposure'ları üzerinden
+                nominal_return += item['weight'] * projected[item['fcode']] / 100
+            elif 'altın' in item['reason'].lower() or 'gold' in item['reason'].lower():
                 # Altın genelde enflasyonu yakalar
                 nominal_return += item['weight'] * inflation_rate * 0.9 / 100
             elif 'hisse' in item['reason'].lower() or 'equity' in item['reason'].lower():
@@ -1136,7 +1259,7 @@ class ScenarioAnalyzer:
         real_return = nominal_return - inflation_rate
         
         return {
-            'nominal': nominal_return * 100,  # Yüzde olarak
+            'nominal': nominal_return,  # Yüzde olarak (ağırlıklar toplamı 100)
             'real': real_return
         }
     
@@ -1151,13 +1274,18 @@ class ScenarioAnalyzer:
         # Defansif fonları kullan
         defensive_funds = self._analyze_defensive_funds()
         
+        risk_checks = self._check_funds_risk(
+            fund['fcode'] for key in ('money_market', 'bond_funds')
+            for fund in defensive_funds.get(key, [])[:5]
+        )
+        
         response += f"🛡️ RESESYONA DAYANIKLI FONLAR:\n\n"
         
         # Para piyasası ve tahvil fonlarını birleştir - Risk kontrolü ile
         all_defensive = []
         
         for fund in defensive_funds.get('money_market', [])[:5]:
-            is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+            is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
             if is_safe:
                 fund['type'] = 'Para Piyasası'
                 fund['resilience'] = 'Çok Yüksek'
@@ -1165,7 +1293,7 @@ class ScenarioAnalyzer:
                 all_defensive.append(fund)
         
         for fund in defensive_funds.get('bond_funds', [])[:5]:
-            is_safe, risk_assessment, risk_warning = self._check_fund_risk(fund['fcode'])
+            is_safe, risk_assessment, risk_warning = risk_checks[fund['fcode']]
             if is_safe:
                 fund['type'] = 'Tahvil'
                 fund['resilience'] = 'Yüksek'
@@ -1197,6 +1325,17 @@ class ScenarioAnalyzer:
         response += f"   • Uzun vadeli bakış açısı\n"
         response += f"   • Tüm öneriler risk değerlendirmesinden geçirilmiştir\n"
         
+        # Gösterilen defansif fonlar eşit ağırlıkla gerçek kriz pencerelerinde
+        response += self._format_historical_replay(
+            [{'fcode': fund['fcode'], 'weight': 1} for fund in all_defensive[:8]], driver='market'
+        )
+        
+        # Resesyon: borsa düşüşü şoku (soruda yüzde yoksa %20)
+        response += self._format_factor_projection(
+            'stock_crash', self._extract_percentage(question, default=20), [10, 20, 30],
+            label=lambda m: f"%{m:.0f} borsa düşüşü"
+        )
+        
         return response
     
     def _general_scenario_analysis(self, question):
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import re
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+
+from analysis.advisor_candidates import SLEEVES, SleeveCandidateIndex, candidate_query
+
+MV_DIR = os.path.join(os.path.dirname(__file__), '..', 'database', 'mvs')
+
+
+def mv_output_columns(name: str) -> set:
+    """MV tanımındaki en dış SELECT'in çıktı kolon adları"""
+    with open(os.path.join(MV_DIR, name), encoding='utf-8') as f:
+        sql = f.read()
+
+    # Parantez derinliği 0 olan son SELECT ... FROM aralığı
+    depth, select_at, list_range = 0, None, None
+    for match in re.finditer(r"\(|\)|\bSELECT\b|\bFROM\b", sql, flags=re.IGNORECASE):
+        token = match.group(0).upper()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token == 'SELECT':
+            select_at = match.end()
+        elif depth == 0 and token == 'FROM' and select_at is not None:
+            list_range = (select_at, match.start())
+            select_at = None
+    select_list = sql[list_range[0]:list_range[1]]
+
+    items, depth, start = [], 0, 0
+    for i, char in enumerate(select_list):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            items.append(select_list[start:i])
+            start = i + 1
+    items.append(select_list[start:])
+
+    columns = set()
+    for item in items:
+        item = re.sub(r"^\s*DISTINCT\s+ON\s*\(.*?\)", '', item, flags=re.IGNORECASE | re.DOTALL).strip()
+        alias = re.search(r"\bAS\s+(\w+)\s*$", item, flags=re.IGNORECASE)
+        columns.add(alias.group(1) if alias else re.split(r"[.\s]", item)[-1])
+    return columns
+
+
+class TestSleeveCandidates(unittest.TestCase):
+    """Danışman dilim aday sorgusu ve kuralları (veritabanı gerektirmez)"""
+
+    def test_query_columns_exist_in_mvs(self):
+        query = candidate_query()
+        aliases = {alias: mv for mv, alias in re.findall(r"\b(?:FROM|JOIN)\s+(mv_\w+)\s+(\w+)", query)}
+        self.assertEqual(set(aliases), {'pm', 'lf', 'fd'})
+
+        references = re.findall(r"\b(pm|lf|fd)\.(\w+)", query)
+        self.assertTrue(references)
+        for alias, column in references:
+            with self.subTest(column=f"{alias}.{column}"):
+                self.assertIn(column, mv_output_columns(aliases[alias]))
+
+    def test_return_thresholds_use_decimal_returns(self):
+        funds = pd.DataFrame({
+            'fcode': ['AAA', 'BBB', 'CCC'],
+            'fund_name': ['ALTIN FONU', 'DOLAR FONU', 'HISSE FONU'],
+            'annual_return': [0.35, 0.10, 0.18],
+            'annual_volatility': [0.12, 0.04, 0.08],
+            'sharpe_ratio': [1.2, 0.3, 0.9],
+            'fcapacity': [5e8, 2e8, 1e8],
+            'investorcount': [5000, 2000, 800]
+        })
+        protection = SleeveCandidateIndex._select(funds, SLEEVES['inflation_protection'])
+        self.assertEqual(protection['fcode'].tolist(), ['AAA'])
+        self.assertAlmostEqual(protection['annual_return'].iloc[0], 35.0)
+        self.assertAlmostEqual(protection['size_million_tl'].iloc[0], 500.0)
+
+        conservative = SleeveCandidateIndex._select(funds, SLEEVES['conservative'])
+        self.assertEqual(conservative['fcode'].tolist(), ['CCC'])
+        self.assertTrue(np.isfinite(conservative['volatility']).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -105,6 +105,30 @@ class TestAnalysisFramework(unittest.TestCase):
                 
         except Exception as e:
             self.fail(f"Technical analysis failed: {e}")
+    
+    def test_technical_panel_scan(self):
+        """Panel teknik tarama testi"""
+        try:
+            fund_codes = self.coordinator.db.get_all_fund_codes()[:5]
+            
+            if fund_codes:
+                analyzer = self.coordinator.technical_analyzer
+                result = analyzer.batch_technical_scan(fund_codes, days=100)
+                
+                self.assertIn('summary_report', result)
+                self.assertIn('latest_values', result)
+                
+                single = analyzer.analyze_fund_technical(fund_codes[0], days=100)
+                if single:
+                    panel_price = result['latest_values'].loc[fund_codes[0], 'price']
+                    self.assertAlmostEqual(panel_price, single['latest_values']['price'], places=6)
+                
+                print(f"✅ Technical panel scan test passed for {result['total_funds_analyzed']} funds")
+            else:
+                self.skipTest("No funds available for panel testing")
+        
+        except Exception as e:
+            self.fail(f"Technical panel scan failed: {e}")
 
 def run_comprehensive_test():
     """Kapsamlı test çalıştırma"""
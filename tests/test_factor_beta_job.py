@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+
+from database.factor_beta_job import compute_factor_betas, daily_returns
+
+
+class TestFactorBetaJob(unittest.TestCase):
+    """Sentetik fiyatlarla faktör beta regresyonu (veritabanı gerektirmez)"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = 300
+        self.dates = pd.bdate_range('2025-01-01', periods=n)
+        self.factors = pd.DataFrame({
+            'gold': rng.normal(0.001, 0.01, n),
+            'usd': rng.normal(0.0008, 0.005, n),
+            'equity': rng.normal(0.001, 0.015, n),
+            'money_market': np.full(n, 0.0015)
+        }, index=self.dates)
+        mm = self.factors['money_market'].to_numpy()
+        self.gold_returns = mm + 0.9 * (self.factors['gold'].to_numpy() - mm) + rng.normal(0, 0.002, n)
+
+    def _prices(self, returns):
+        returns = np.asarray(returns, dtype=np.float64).copy()
+        returns[0] = 0
+        return pd.Series(100 * np.cumprod(1 + returns), index=self.dates)
+
+    def test_gap_return_is_masked(self):
+        prices = self._prices(self.gold_returns)
+        gapped = prices.copy()
+        gapped.iloc[100:120] = np.nan
+
+        returns = daily_returns(pd.DataFrame({'GAP': gapped}))['GAP']
+        self.assertTrue(np.isnan(returns.iloc[120]))
+        self.assertAlmostEqual(returns.iloc[121], self.gold_returns[121])
+
+        betas = compute_factor_betas(pd.DataFrame({'FULL': prices, 'GAP': gapped}), self.factors).set_index('fcode')
+        self.assertAlmostEqual(betas.loc['GAP', 'beta_gold'], betas.loc['FULL', 'beta_gold'], delta=0.05)
+        self.assertAlmostEqual(betas.loc['GAP', 'alpha'], betas.loc['FULL', 'alpha'], delta=2)
+
+    def test_carry_goes_to_alpha(self):
+        mm = self.factors['money_market'].to_numpy()
+        rng = np.random.default_rng(3)
+        panel = pd.DataFrame({
+            'LOW': self._prices(mm + rng.normal(0, 1e-5, len(mm))),
+            'HIGH': self._prices(mm + 0.0004 + rng.normal(0, 1e-5, len(mm)))
+        })
+        betas = compute_factor_betas(panel, self.factors).set_index('fcode')
+        # Getiri farkı money_market betasına değil alfaya gider
+        self.assertAlmostEqual(betas.loc['LOW', 'beta_money_market'], 1.0, delta=0.01)
+        self.assertAlmostEqual(betas.loc['HIGH', 'beta_money_market'], 1.0, delta=0.01)
+        self.assertGreater(betas.loc['HIGH', 'alpha'] - betas.loc['LOW', 'alpha'], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
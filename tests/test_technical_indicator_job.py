@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+from database.technical_indicator_job import TechnicalIndicatorJob
+
+
+class TestTechnicalIndicatorJob(unittest.TestCase):
+    """Artımlı indikatör güncellemesinin tam yeniden hesapla karşılaştırılması (veritabanı gerektirmez)"""
+
+    def setUp(self):
+        self.job = TechnicalIndicatorJob(None, Config())
+        rng = np.random.default_rng(42)
+        dates = pd.bdate_range('2024-01-01', periods=120)
+        rows = []
+        for fcode, start in (('AAA', 0), ('BBB', 30)):
+            prices = 10 * np.cumprod(1 + rng.normal(0, 0.01, len(dates) - start))
+            rows += [{'fcode': fcode, 'pdate': d.date(), 'price': p, 'investorcount': 100, 'fcapacity': 1e6}
+                     for d, p in zip(dates[start:], prices)]
+        self.prices = pd.DataFrame(rows)
+        self.fcodes = np.array(['AAA', 'BBB'], dtype=object)
+
+    def _reference(self, prices: pd.Series) -> dict:
+        """Wilder RSI ve EMA/MACD'nin tüm seri üzerinden doğrudan hesabı"""
+        period = self.job.rsi_period
+        change = prices.diff().dropna().to_numpy()
+        gain, loss = np.maximum(change, 0), np.maximum(-change, 0)
+        avg_gain, avg_loss = gain[:period].mean(), loss[:period].mean()
+        for g, l in zip(gain[period:], loss[period:]):
+            avg_gain = (avg_gain * (period - 1) + g) / period
+            avg_loss = (avg_loss * (period - 1) + l) / period
+
+        cfg = self.job.config.analysis.technical_indicators
+        ema_fast = prices.ewm(span=cfg['macd_fast'], adjust=False).mean()
+        ema_slow = prices.ewm(span=cfg['macd_slow'], adjust=False).mean()
+        signal = (ema_fast - ema_slow).ewm(span=cfg['macd_signal'], adjust=False).mean()
+        return {
+            'rsi': 100 - 100 / (1 + avg_gain / avg_loss),
+            'ema_fast': ema_fast.iloc[-1],
+            'ema_slow': ema_slow.iloc[-1],
+            'macd_signal': signal.iloc[-1]
+        }
+
+    def _run_in_batches(self, cutoffs) -> dict:
+        """Fiyatları parçalar halinde uygula; parçalar arasında durum tablo formatından geri yüklenir"""
+        stored = pd.DataFrame()
+        state = None
+        bounds = [None] + list(cutoffs) + [None]
+        for lower, upper in zip(bounds[:-1], bounds[1:]):
+            batch = self.prices
+            if lower is not None:
+                batch = batch[batch['pdate'] > lower]
+            if upper is not None:
+                batch = batch[batch['pdate'] <= upper]
+            state = self.job.load_state(self.fcodes, stored)
+            self.job.update_state(state, batch)
+            stored = self.job.build_state_frame(state)
+            stored['recent_prices'] = stored['recent_prices'].map(
+                lambda text: [float(p) for p in text.strip('{}').split(',') if p]
+            )
+        return state
+
+    def test_incremental_matches_full_recompute(self):
+        dates = sorted(self.prices['pdate'].unique())
+        state = self._run_in_batches([dates[20], dates[50], dates[51], dates[90]])
+        frame = self.job.build_indicator_frame(state, today=dates[-1]).set_index('fcode')
+
+        for k, fcode in enumerate(self.fcodes):
+            series = self.prices[self.prices['fcode'] == fcode].set_index('pdate')['price']
+            expected = self._reference(series)
+            self.assertAlmostEqual(frame.loc[fcode, 'rsi_14'], expected['rsi'], places=9)
+            for key in ('ema_fast', 'ema_slow', 'macd_signal'):
+                self.assertAlmostEqual(state[key][k], expected[key], places=9)
+            self.assertAlmostEqual(frame.loc[fcode, 'macd_line'],
+                                   expected['ema_fast'] - expected['ema_slow'], places=9)
+            self.assertAlmostEqual(frame.loc[fcode, 'sma_20'], series.iloc[-20:].mean(), places=9)
+
+    def test_incremental_matches_single_pass(self):
+        dates = sorted(self.prices['pdate'].unique())
+        batched = self._run_in_batches([dates[10], dates[70]])
+        single = self._run_in_batches([])
+        for key in ('avg_gain', 'avg_loss', 'ema_fast', 'ema_slow', 'macd_signal', 'last_price'):
+            np.testing.assert_allclose(batched[key], single[key], rtol=1e-12)
+        np.testing.assert_array_equal(batched['change_count'], single['change_count'])
+
+    def test_window_counts_filter_funds(self):
+        dates = sorted(self.prices['pdate'].unique())
+        state = self._run_in_batches([])
+        counts = pd.Series({'AAA': 60, 'BBB': 5})
+        frame = self.job.build_indicator_frame(state, today=dates[-1], window_counts=counts)
+        self.assertEqual(frame['fcode'].tolist(), ['AAA'])
+        self.assertEqual(int(frame['data_points'].iloc[0]), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,9 @@ import re
 from datetime import datetime, timedelta
 from database.connection import DatabaseManager
 from config.config import Config
+from analysis.fund_classification import FundClassificationIndex
+from analysis.fund_title_index import FundTitleIndex
+from analysis.performance import PerformanceAnalyzer
         # if any(word in question_lower for word in [
         #     'teknoloji fonları', 'bilişim fonları', 'digital fonlar',
         #     'esg fonları', 'sürdürülebilir fonlar', 'yeşil fonlar', 'çevre fonları',
@@ -50,6 +53,11 @@ class ThematicFundAnalyzer:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
+        # Portföy tarihi başına bir kez hesaplanan fon tipi/kategori indeksi
+        self.fund_classification = FundClassificationIndex(db_manager)
+        # Başlık anahtar kelimeleri -> fon kodu indeksi
+        self.title_index = FundTitleIndex(db_manager)
+        
         # 🎯 TETATİK FON KEYWORD MAPPING
         self.thematic_keywords = {
             'teknoloji': {
@@ -191,76 +199,9 @@ class ThematicFundAnalyzer:
         return False
     
     def determine_fund_type_from_portfolio(self, fcode):
-        """Portföy dağılımından fon tipini belirle"""
+        """Portföy dağılımından fon tipini belirle (bellek içi sınıflandırma indeksinden)"""
         try:
-            # En son portföy dağılımını al
-            query = f"""
-            SELECT * FROM tefasfunddetails 
-            WHERE fcode = '{fcode}' 
-            ORDER BY fdate DESC 
-            LIMIT 1
-            """
-            
-            result = self.db.execute_query(query)
-            if result.empty:
-                return "Bilinmeyen", "Genel"
-            
-            row = result.iloc[0]
-            
-            # Hisse oranı
-            stock_ratio = float(row.get('stock', 0) or 0)
-            # Yabancı hisse oranı
-            foreign_equity_ratio = float(row.get('foreignequity', 0) or 0)
-            # Devlet tahvili oranı  
-            gov_bond_ratio = float(row.get('governmentbond', 0) or 0)
-            # Özel sektör tahvili
-            private_bond_ratio = float(row.get('privatesectorbond', 0) or 0)
-            # Altın/kıymetli maden
-            precious_metals_ratio = float(row.get('preciousmetals', 0) or 0)
-            # ETF oranı
-            etf_ratio = float(row.get('exchangetradedfund', 0) or 0)
-            # Gayrimenkul sertifikası
-            real_estate_ratio = float(row.get('realestatecertificate', 0) or 0)
-            # Fon katılım belgesi
-            fund_participation_ratio = float(row.get('fundparticipationcertificate', 0) or 0)
-            
-            total_equity = stock_ratio + foreign_equity_ratio
-            total_bonds = gov_bond_ratio + private_bond_ratio
-            
-            # Fon tipini belirle
-            if total_equity > 80:
-                fund_type = "Hisse Senedi Fonu"
-                if foreign_equity_ratio > stock_ratio:
-                    fund_category = "Yabancı Hisse Senedi"
-                else:
-                    fund_category = "Yerli Hisse Senedi"
-            elif total_equity > 40:
-                fund_type = "Karma Fon"
-                fund_category = "Esnek Karma"
-            elif total_bonds > 60:
-                fund_type = "Borçlanma Araçları Fonu"
-                if gov_bond_ratio > private_bond_ratio:
-                    fund_category = "Devlet Tahvili"
-                else:
-                    fund_category = "Karma Borçlanma"
-            elif precious_metals_ratio > 50:
-                fund_type = "Kıymetli Madenler Fonu"
-                fund_category = "Altın Fonu"
-            elif etf_ratio > 50:
-                fund_type = "Fon Sepeti Fonu"
-                fund_category = "ETF Fonu"
-            elif real_estate_ratio > 50:
-                fund_type = "Gayrimenkul Fonu"
-                fund_category = "Emlak Sertifikası"
-            elif fund_participation_ratio > 50:
-                fund_type = "Fon Sepeti Fonu"
-                fund_category = "Fon Portföyü"
-            else:
-                fund_type = "Para Piyasası Fonu"
-                fund_category = "Kısa Vadeli"
-            
-            return fund_type, fund_category
-            
+            return self.fund_classification.get(fcode)
         except Exception as e:
             self.logger.warning(f"Fon tipi belirlenemedi {fcode}: {e}")
             return "Bilinmeyen", "Genel"
@@ -326,21 +267,19 @@ class ThematicFundAnalyzer:
             return []
         
         try:
-            # SQL LIKE koşulları oluştur
-            like_conditions = []
-            for keyword in keywords:
-                like_conditions.append(f"UPPER(f.ftitle) LIKE '%{keyword}%'")
-            
-            where_clause = " OR ".join(like_conditions)
+            # Anahtar kelimeleri önce başlık indeksinden fon kodlarına çöz
+            fcodes = self.title_index.search(keywords)
+            if not fcodes:
+                return []
             
-            # TÜM VERİTABANI SORGUSU
-            query = f"""
+            # Fiyat tablosu yalnızca eşleşen fonlar için okunur
+            query = """
             WITH thematic_funds AS (
-                SELECT DISTINCT f.fcode, f.ftitle as fund_name, f.fcapacity, 
+                SELECT f.fcode, f.ftitle as fund_name, f.fcapacity, 
                     f.investorcount, f.price, f.pdate,
                     ROW_NUMBER() OVER (PARTITION BY f.fcode ORDER BY f.pdate DESC) as rn
                 FROM tefasfunds f
-                WHERE ({where_clause})
+                WHERE f.fcode = ANY(:fcodes)
                 AND f.pdate >= CURRENT_DATE - INTERVAL '30 days'
                 AND f.price > 0
                 AND f.investorcount > 50  -- Minimum yatırımcı filtresi
@@ -351,21 +290,28 @@ class ThematicFundAnalyzer:
             ORDER BY fcapacity DESC NULLS LAST
             """
             
-            result = self.db.execute_query(query)
+            result = self.db.execute_query(query, {'fcodes': fcodes})
+            
+            # Fon tiplerini tek seferde portföy sınıflandırma indeksinden al
+            try:
+                classes = self.fund_classification.get_many(result['fcode'])
+                fund_types = classes['fund_type'].tolist()
+                fund_categories = classes['fund_category'].tolist()
+            except Exception as e:
+                self.logger.warning(f"Fon sınıflandırma indeksi okunamadı: {e}")
+                fund_types = ["Bilinmeyen"] * len(result)
+                fund_categories = ["Genel"] * len(result)
             
             funds_list = []
-            for _, row in result.iterrows():
-                # Fon tipini portföy dağılımından belirle
-                fund_type, fund_category = self.determine_fund_type_from_portfolio(row['fcode'])
-                
+            for i, (_, row) in enumerate(result.iterrows()):
                 funds_list.append({
                     'fcode': row['fcode'],
                     'fund_name': row['fund_name'],
                     'capacity': float(row['fcapacity']) if pd.notna(row['fcapacity']) else 0,
                     'investors': int(row['investorcount']) if pd.notna(row['investorcount']) else 0,
                     'current_price': float(row['price']) if pd.notna(row['price']) else 0,
-                    'fund_type': fund_type,
-                    'fund_category': fund_category
+                    'fund_type': fund_types[i],
+                    'fund_category': fund_categories[i]
                 })
             
             return funds_list
@@ -374,76 +320,64 @@ class ThematicFundAnalyzer:
             print(f"   ❌ SQL sorgu hatası: {e}")
             return []
     
-    def analyze_thematic_performance(self, funds_list, theme, analysis_days=180):
-        """Tematik fonlar performans analizi"""
+    def calculate_panel_performance(self, fcodes, analysis_days=180, min_points=30):
+        """
+        Fonların performans metriklerini ortak fiyat matrisi üzerinden tek seferde hesapla.
+        Her fon kendi geçerli gözlemleri üzerinden değerlendirilir (eksik günler atlanır).
+        """
+        price_panel = self.db.get_price_panel(list(fcodes), analysis_days)
+        if price_panel.empty:
+            return pd.DataFrame()
+        
+        metrics = PerformanceAnalyzer.calculate_panel_metrics(price_panel)
+        return metrics[metrics['data_points'] >= min_points]
+    
+    def analyze_thematic_performance(self, funds_list, theme, analysis_days=180, metrics=None):
+        """Tematik fonlar performans analizi (ortak fiyat matrisi üzerinden)"""
         print(f"   📈 {len(funds_list)} fon için performans analizi...")
         
+        try:
+            if metrics is None:
+                metrics = self.calculate_panel_performance(
+                    [fund['fcode'] for fund in funds_list], analysis_days
+                )
+        except Exception as e:
+            self.logger.error(f"Tematik performans hesaplanamadı ({theme}): {e}")
+            return []
+        
         performance_results = []
-        successful = 0
         
-        for i, fund_info in enumerate(funds_list, 1):
+        for fund_info in funds_list:
             fcode = fund_info['fcode']
+            if fcode not in metrics.index:
+                continue
             
-            if i % 10 == 0:
-                print(f"   [{i}/{len(funds_list)}] işlendi...")
+            row = metrics.loc[fcode]
             
-            try:
-                # Performans verilerini hesapla
-                data = self.db.get_fund_price_history(fcode, analysis_days)
-                
-                if len(data) >= 30:  # En az 30 gün veri
-                    prices = data.set_index('pdate')['price'].sort_index()
-                    returns = prices.pct_change().dropna()
-                    
-                    # Temel metrikler
-                    total_return = (prices.iloc[-1] / prices.iloc[0] - 1) * 100
-                    annual_return = total_return * (252 / len(prices))
-                    volatility = returns.std() * np.sqrt(252) * 100
-                    
-                    # Sharpe ratio
-                    if volatility > 0:
-                        sharpe = (annual_return - 15) / volatility
-                    else:
-                        sharpe = 0
-                    
-                    win_rate = (returns > 0).sum() / len(returns) * 100
-                    
-                    # Max drawdown
-                    cumulative = (1 + returns).cumprod()
-                    running_max = cumulative.expanding().max()
-                    drawdown = (cumulative - running_max) / running_max
-                    max_drawdown = abs(drawdown.min()) * 100
-                    
-                    # Tematik skor (tema özel)
-                    thematic_score = self.calculate_thematic_score(
-                        annual_return, volatility, sharpe, win_rate, theme
-                    )
-                    
-                    fund_result = {
-                        'fcode': fcode,
-                        'fund_name': fund_info['fund_name'],
-                        'capacity': fund_info['capacity'],
-                        'investors': fund_info['investors'],
-                        'fund_type': fund_info['fund_type'],
-                        'fund_category': fund_info['fund_category'],
-                        'current_price': fund_info['current_price'],
-                        'total_return': total_return,
-                        'annual_return': annual_return,
-                        'volatility': volatility,
-                        'sharpe_ratio': sharpe,
-                        'win_rate': win_rate,
-                        'max_drawdown': max_drawdown,
-                        'thematic_score': thematic_score,
-                        'data_points': len(prices)
-                    }
-                    
-                    performance_results.append(fund_result)
-                    successful += 1
-                    
-            except Exception as e:
-                continue
-        
-        print(f"   ✅ {successful}/{len(funds_list)} fon başarıyla analiz edildi")
+            # Tematik skor (tema özel)
+            thematic_score = self.calculate_thematic_score(
+                row['annual_return'], row['volatility'], row['sharpe_ratio'], row['win_rate'], theme
+            )
+            
+            performance_results.append({
+                'fcode': fcode,
+                'fund_name': fund_info['fund_name'],
+                'capacity': fund_info['capacity'],
+                'investors': fund_info['investors'],
+                'fund_type': fund_info['fund_type'],
+                'fund_category': fund_info['fund_category'],
+                'current_price': fund_info['current_price'],
+                'total_return': float(row['total_return']),
+                'annual_return': float(row['annual_return']),
+                'volatility': float(row['volatility']),
+                'sharpe_ratio': float(row['sharpe_ratio']),
+                'win_rate': float(row['win_rate']),
+                'max_drawdown': float(row['max_drawdown']),
+                'thematic_score': thematic_score,
+                'data_points': int(row['data_points'])
+            })
+        
+        print(f"   ✅ {len(performance_results)}/{len(funds_list)} fon başarıyla analiz edildi")
         return performance_results
     
     def calculate_thematic_score(self, annual_return, volatility, sharpe, win_rate, theme):
@@ -637,11 +571,23 @@ class ThematicFundAnalyzer:
         
         theme_results = {}
         
+        # Tüm temaların fonları tek fiyat matrisi üzerinden birlikte hesaplanır
+        theme_funds = {theme: self.find_thematic_funds_sql(theme) for theme in themes}
+        all_fcodes = list(dict.fromkeys(
+            fund['fcode'] for funds in theme_funds.values() for fund in funds
+        ))
+        
+        try:
+            metrics = self.calculate_panel_performance(all_fcodes, 120)  # 4 ay
+        except Exception as e:
+            self.logger.error(f"Tema karşılaştırma metrikleri hesaplanamadı: {e}")
+            metrics = pd.DataFrame()
+        
         for theme in themes:
             print(f"   📊 {theme} analizi...")
-            funds = self.find_thematic_funds_sql(theme)
-            if funds:
-                performance = self.analyze_thematic_performance(funds, theme, 120)  # 4 ay
+            funds = theme_funds[theme]
+            if funds and not metrics.empty:
+                performance = self.analyze_thematic_performance(funds, theme, 120, metrics=metrics)
                 if performance:
                     # Özet istatistikler
                     avg_return = sum(f['annual_return'] for f in performance) / len(performance)
@@ -751,7 +697,15 @@ class ThematicFundAnalyzer:
 
     def get_portfolio_distribution_summary(self, fcode):
         """Fonun portföy dağılımını detaylı getir"""
+        columns = ['stock', 'foreignequity', 'governmentbond', 'privatesectorbond',
+                   'preciousmetals', 'exchangetradedfund', 'realestatecertificate',
+                   'fundparticipationcertificate', 'tmm', 'termdeposit', 'repo',
+                   'participationaccount', 'other']
         try:
+            frame = self.fund_classification.get_frame()
+            if fcode in frame.index:
+                return frame.loc[fcode, columns].to_dict()
+            
             query = f"""
             SELECT 
                 stock, foreignequity, governmentbond, privatesectorbond,
@@ -11,6 +11,10 @@ import numpy as np
 from datetime import datetime, timedelta
 import re
 
+from analysis.period_return_index import PeriodReturnIndex
+from analysis.weekly_price_cube import WeeklyPriceCube
+from database.stability_stats_job import STABILITY_TABLE, compute_stability_stats, fetch_price_panel
+
 class TimeBasedAnalyzer:
     """Zaman bazlı fon analizleri"""
     
@@ -18,6 +22,9 @@ class TimeBasedAnalyzer:
         self.coordinator = coordinator
         self.active_funds = active_funds
         self.db = coordinator.db
+        # Hafta/ay sonu fiyatları - dönem soruları ham fiyat tablosunu taramaz
+        self.period_index = PeriodReturnIndex(self.db)
+        self.weekly_cube = WeeklyPriceCube(self.db)
         
     def analyze_time_based_question(self, question):
         """Zaman bazlı soruları analiz et ve yönlendir"""
@@ -74,53 +81,11 @@ class TimeBasedAnalyzer:
         is_top_losers = 'düşen' in question_lower or 'kaybettiren' in question_lower
         
         try:
-            # SQL ile hızlı analiz
-            query = f"""
-            WITH period_data AS (
-                SELECT DISTINCT ON (fcode) fcode, price as end_price, pdate as end_date
-                FROM tefasfunds 
-                WHERE pdate >= CURRENT_DATE - INTERVAL '7 days'
-                AND investorcount > 50
-                ORDER BY fcode, pdate DESC
-            ),
-            start_data AS (
-                SELECT DISTINCT ON (fcode) fcode, price as start_price, pdate as start_date
-                FROM tefasfunds 
-                WHERE pdate >= CURRENT_DATE - INTERVAL '{days} days' - INTERVAL '7 days'
-                AND pdate <= CURRENT_DATE - INTERVAL '{days} days' + INTERVAL '7 days'
-                AND investorcount > 50
-                ORDER BY fcode, pdate ASC
-            ),
-            performance AS (
-                SELECT 
-                    p.fcode,
-                    p.end_price,
-                    s.start_price,
-                    p.end_date,
-                    s.start_date,
-                    ((p.end_price / s.start_price) - 1) * 100 as return_pct,
-                    p.end_date - s.start_date as actual_days
-                FROM period_data p
-                JOIN start_data s ON p.fcode = s.fcode
-                WHERE s.start_price > 0 AND p.end_price > 0
-                AND p.end_date - s.start_date >= {days * 0.8}  -- En az %80 veri
+            # Dönem getirisi indeksinden vektörel arama + argpartition ile ilk 20
+            performance = self.period_index.period_returns(days, min_investors=50)
+            result = self.period_index.top_k(
+                performance, 'return_pct', 20, largest=is_top_gainers or not is_top_losers
             )
-            SELECT 
-                pf.*, 
-                f.investorcount,
-                f.fcapacity
-            FROM performance pf
-            JOIN (
-                SELECT DISTINCT ON (fcode) fcode, investorcount, fcapacity
-                FROM tefasfunds 
-                WHERE pdate >= CURRENT_DATE - INTERVAL '7 days'
-                ORDER BY fcode, pdate DESC
-            ) f ON pf.fcode = f.fcode
-            ORDER BY return_pct {'DESC' if is_top_gainers or not is_top_losers else 'ASC'}
-            LIMIT 20
-            """
-            
-            result = self.coordinator.db.execute_query(query)
             
             if result.empty:
                 return f"❌ Son {period_name} için yeterli veri bulunamadı."
@@ -210,77 +175,22 @@ class TimeBasedAnalyzer:
             # Son 8 haftalık veriyi al
             weeks_to_analyze = 8
             
-            query = f"""
-            WITH weekly_data AS (
-                SELECT 
-                    fcode,
-                    DATE_TRUNC('week', pdate) as week_start,
-                    AVG(price) as avg_price,
-                    MAX(price) as max_price,
-                    MIN(price) as min_price,
-                    COUNT(*) as data_points
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '{weeks_to_analyze} weeks'
-                AND investorcount > 100
-                GROUP BY fcode, DATE_TRUNC('week', pdate)
-                HAVING COUNT(*) >= 3  -- Haftada en az 3 gün veri
-            ),
-            weekly_changes AS (
-                SELECT 
-                    fcode,
-                    week_start,
-                    avg_price,
-                    LAG(avg_price) OVER (PARTITION BY fcode ORDER BY week_start) as prev_week_price,
-                    ROW_NUMBER() OVER (PARTITION BY fcode ORDER BY week_start) as week_num
-                FROM weekly_data
-            ),
-            trend_analysis AS (
-                SELECT 
-                    fcode,
-                    COUNT(*) as weeks_with_data,
-                    -- Pozitif hafta sayısı
-                    SUM(CASE WHEN avg_price > prev_week_price THEN 1 ELSE 0 END) as positive_weeks,
-                    -- Trend skoru (linear regression slope)
-                    REGR_SLOPE(avg_price, week_num) as trend_slope,
-                    -- Haftalık ortalama değişim
-                    AVG(CASE 
-                        WHEN prev_week_price > 0 THEN ((avg_price - prev_week_price) / prev_week_price) * 100 
-                        ELSE NULL 
-                    END) as avg_weekly_change,
-                    -- Volatilite
-                    STDDEV(avg_price) / NULLIF(AVG(avg_price), 0) * 100 as weekly_volatility,
-                    -- İlk ve son hafta fiyatları
-                    MIN(CASE WHEN week_num = 1 THEN avg_price END) as first_week_price,
-                    MAX(CASE WHEN week_num = (SELECT MAX(week_num) FROM weekly_changes wc2 WHERE wc2.fcode = wc.fcode) 
-                        THEN avg_price END) as last_week_price
-                FROM weekly_changes wc
-                WHERE prev_week_price IS NOT NULL OR week_num = 1
-                GROUP BY fcode
-                HAVING COUNT(*) >= {weeks_to_analyze - 2}  -- En az 6 hafta veri
-            ),
-            final_analysis AS (
-                SELECT 
-                    ta.*,
-                    -- Toplam değişim yüzdesi
-                    CASE 
-                        WHEN first_week_price > 0 THEN 
-                            ((last_week_price - first_week_price) / first_week_price) * 100 
-                        ELSE 0 
-                    END as total_change_pct,
-                    -- Güncel fiyat
-                    (SELECT price FROM tefasfunds WHERE fcode = ta.fcode ORDER BY pdate DESC LIMIT 1) as current_price,
-                    -- Güncel yatırımcı sayısı
-                    (SELECT investorcount FROM tefasfunds WHERE fcode = ta.fcode ORDER BY pdate DESC LIMIT 1) as current_investors
-                FROM trend_analysis ta
-            )
-            SELECT *
-            FROM final_analysis
-            WHERE trend_slope IS NOT NULL
-            ORDER BY trend_slope DESC
-            LIMIT 20
-            """
+            # Haftalık küpten vektörel trend metrikleri (veri sürümü başına bir kez kurulur)
+            trend = self.weekly_cube.trend_metrics(weeks_to_analyze, min_days=3)
+            if not trend.empty:
+                trend = trend[(trend['weeks_with_data'] >= weeks_to_analyze - 2) & trend['trend_slope'].notna()]
+                
+                # Güncel yatırımcı sayısı dönem indeksinden
+                investors = self.period_index.latest(max_age_days=weeks_to_analyze * 7)
+                investors = investors[investors['investorcount'] > 100][['fcode', 'investorcount']]
+                trend = trend.merge(investors.rename(columns={'investorcount': 'current_investors'}), on='fcode')
+                
+                # "3 hafta üst üste yükselen" gibi seri filtreleri
+                streak_match = re.search(r'(\d+)\s*hafta\s*(?:üst üste|art arda|ardışık)', question.lower())
+                if streak_match:
+                    trend = trend[trend['up_streak'] >= int(streak_match.group(1))]
             
-            result = self.coordinator.db.execute_query(query)
+            result = trend.nlargest(20, 'trend_slope') if not trend.empty else trend
             
             if result.empty:
                 return "❌ Haftalık trend analizi için yeterli veri bulunamadı."
@@ -334,6 +244,7 @@ class TimeBasedAnalyzer:
                 response += f"   📈 {weeks_to_analyze} Haftalık Değişim: %{total_change:+.2f}\n"
                 response += f"   📊 Haftalık Ortalama: %{avg_weekly_change:+.2f}\n"
                 response += f"   ✅ Pozitif Hafta: {positive_weeks}/{weeks_with_data}\n"
+                response += f"   🔁 Art Arda Yükselen: {int(row['up_streak'])} hafta\n"
                 response += f"   📉 Haftalık Volatilite: %{volatility:.2f}\n"
                 response += f"   💰 Güncel Fiyat: {current_price:.4f} TL\n"
                 response += f"   👥 Yatırımcı: {investors:,} kişi\n"
@@ -391,46 +302,9 @@ class TimeBasedAnalyzer:
         print("📊 Aylık liderler analiz ediliyor...")
         
         try:
-            # Son 12 ayın liderleri
-            query = """
-            WITH monthly_performance AS (
-                SELECT 
-                    fcode,
-                    DATE_TRUNC('month', pdate) as month,
-                    FIRST_VALUE(price) OVER (PARTITION BY fcode, DATE_TRUNC('month', pdate) ORDER BY pdate) as month_start_price,
-                    LAST_VALUE(price) OVER (PARTITION BY fcode, DATE_TRUNC('month', pdate) ORDER BY pdate 
-                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) as month_end_price,
-                    COUNT(*) OVER (PARTITION BY fcode, DATE_TRUNC('month', pdate)) as days_in_month
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '12 months'
-                AND investorcount > 100
-            ),
-            monthly_returns AS (
-                SELECT DISTINCT
-                    fcode,
-                    month,
-                    ((month_end_price / month_start_price) - 1) * 100 as monthly_return,
-                    days_in_month
-                FROM monthly_performance
-                WHERE month_start_price > 0 AND month_end_price > 0
-                AND days_in_month >= 15  -- En az 15 gün veri
-            ),
-            leaders AS (
-                SELECT 
-                    month,
-                    fcode,
-                    monthly_return,
-                    ROW_NUMBER() OVER (PARTITION BY month ORDER BY monthly_return DESC) as rank_desc,
-                    ROW_NUMBER() OVER (PARTITION BY month ORDER BY monthly_return ASC) as rank_asc
-                FROM monthly_returns
-            )
-            SELECT *
-            FROM leaders
-            WHERE rank_desc <= 3 OR rank_asc <= 1  -- Her ay için top 3 ve en kötü
-            ORDER BY month DESC, rank_desc
-            """
-            
-            result = self.coordinator.db.execute_query(query)
+            # Son 12 ayın liderleri - her ay için top 3 ve en kötü
+            result = self.period_index.monthly_leaders(months=12, top_n=3, bottom_n=1,
+                                                       min_days=15, min_investors=100)
             
             if result.empty:
                 return "❌ Aylık lider analizi için veri bulunamadı."
@@ -486,47 +360,11 @@ class TimeBasedAnalyzer:
         print("📊 Yıl başından bu yana (YTD) analiz yapılıyor...")
         
         current_year = datetime.now().year
-        year_start = f"{current_year}-01-01"
         
         try:
-            query = f"""
-            WITH ytd_start AS (
-                SELECT DISTINCT ON (fcode) fcode, price as start_price, pdate as start_date
-                FROM tefasfunds
-                WHERE pdate >= '{year_start}'::date
-                AND pdate <= '{year_start}'::date + INTERVAL '7 days'
-                AND investorcount > 50
-                ORDER BY fcode, pdate ASC
-            ),
-            ytd_current AS (
-                SELECT DISTINCT ON (fcode) fcode, price as current_price, pdate as current_date,
-                    investorcount, fcapacity
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '7 days'
-                ORDER BY fcode, pdate DESC
-            ),
-            ytd_performance AS (
-                SELECT 
-                    c.fcode,
-                    s.start_price,
-                    c.current_price,
-                    s.start_date,
-                    c.current_date,
-                    ((c.current_price / s.start_price) - 1) * 100 as ytd_return,
-                    c.investorcount,
-                    c.fcapacity,
-                    c.current_date - s.start_date as days_elapsed
-                FROM ytd_current c
-                JOIN ytd_start s ON c.fcode = s.fcode
-                WHERE s.start_price > 0 AND c.current_price > 0
-            )
-            SELECT *
-            FROM ytd_performance
-            ORDER BY ytd_return DESC
-            LIMIT 25
-            """
-            
-            result = self.coordinator.db.execute_query(query)
+            # Ocak ayı ilk fiyatı -> son fiyat, indeksten ilk 25
+            ytd = self.period_index.ytd_returns(current_year, min_investors=50)
+            result = self.period_index.top_k(ytd, 'ytd_return', 25)
             
             if result.empty:
                 return f"❌ {current_year} yılı başından bu yana veri bulunamadı."
@@ -614,80 +452,38 @@ class TimeBasedAnalyzer:
             print(f"❌ YTD analizi hatası: {e}")
             return f"❌ YTD analizi hatası: {e}"
     
+    def _get_stability_ranking(self, horizon_years=5, limit=20):
+        """
+        fund_stability_stats'tan istikrar sıralaması (tutarlılık / volatilite).
+        Tablo henüz kurulmadıysa aynı hesap fiyat matrisinden bellekte yapılır.
+        """
+        query = f"""
+        SELECT *
+        FROM {STABILITY_TABLE}
+        WHERE horizon_years = :horizon_years
+        AND annual_volatility > 0
+        ORDER BY consistency_score / annual_volatility DESC
+        LIMIT :limit
+        """
+        try:
+            result = self.db.execute_query(query, {'horizon_years': horizon_years, 'limit': limit})
+            if not result.empty:
+                return result
+        except Exception as e:
+            print(f"⚠️ {STABILITY_TABLE} okunamadı, istatistikler hesaplanıyor: {e}")
+        
+        stats = compute_stability_stats(fetch_price_panel(self.db, horizon_years), horizons=[horizon_years])
+        stats = stats[stats['annual_volatility'] > 0]
+        stats = stats.assign(stability=stats['consistency_score'] / stats['annual_volatility'])
+        return stats.nlargest(limit, 'stability').drop(columns='stability').reset_index(drop=True)
+    
     def handle_long_term_stability(self, question):
         """Uzun dönem istikrar analizi (5 yıl)"""
         print("📊 Uzun dönem istikrar analizi yapılıyor...")
         
         try:
-            # Son 5 yıl = 1260 işlem günü
-            query = """
-            WITH long_term_data AS (
-                SELECT 
-                    fcode,
-                    price,
-                    pdate,
-                    LAG(price) OVER (PARTITION BY fcode ORDER BY pdate) as prev_price
-                FROM tefasfunds
-                WHERE pdate >= CURRENT_DATE - INTERVAL '5 years'
-                AND investorcount > 100
-            ),
-            fund_stats AS (
-                SELECT 
-                    fcode,
-                    COUNT(*) as total_days,
-                    MIN(pdate) as start_date,
-                    MAX(pdate) as end_date,
-                    MIN(price) as min_price,
-                    MAX(price) as max_price,
-                    AVG(price) as avg_price,
-                    STDDEV(price) as price_std,
-                    -- Günlük getiriler
-                    AVG(CASE WHEN prev_price > 0 THEN (price - prev_price) / prev_price ELSE NULL END) as avg_daily_return,
-                    STDDEV(CASE WHEN prev_price > 0 THEN (price - prev_price) / prev_price ELSE NULL END) as daily_return_std,
-                    -- Pozitif gün oranı
-                    SUM(CASE WHEN price > prev_price THEN 1 ELSE 0 END)::float / 
-                        NULLIF(SUM(CASE WHEN prev_price IS NOT NULL THEN 1 ELSE 0 END), 0) as positive_days_ratio,
-                    -- Toplam getiri
-                    (SELECT price FROM tefasfunds WHERE fcode = ltd.fcode ORDER BY pdate DESC LIMIT 1) as current_price,
-                    (SELECT price FROM tefasfunds WHERE fcode = ltd.fcode ORDER BY pdate ASC LIMIT 1) as first_price
-                FROM long_term_data ltd
-                GROUP BY fcode
-                HAVING COUNT(*) >= 1000  -- En az 4 yıllık veri
-            ),
-            stability_scores AS (
-                SELECT 
-                    fcode,
-                    total_days,
-                    start_date,
-                    end_date,
-                    current_price,
-                    first_price,
-                    ((current_price / first_price) - 1) * 100 as total_return,
-                    -- Yıllık getiri
-                    POWER((current_price / first_price), 365.0 / (end_date - start_date)) - 1 as annual_return,
-                    -- Volatilite (yıllık)
-                    daily_return_std * SQRT(252) as annual_volatility,
-                    -- Sharpe benzeri oran
-                    CASE 
-                        WHEN daily_return_std > 0 THEN 
-                            (avg_daily_return * 252) / (daily_return_std * SQRT(252))
-                        ELSE 0 
-                    END as sharpe_like_ratio,
-                    -- İstikrar skoru (düşük volatilite + tutarlı getiri)
-                    positive_days_ratio * 100 as consistency_score,
-                    -- Maksimum düşüş yaklaşımı
-                    ((max_price - min_price) / max_price) * 100 as price_range_pct
-                FROM fund_stats
-                WHERE first_price > 0 AND current_price > 0
-            )
-            SELECT *
-            FROM stability_scores
-            WHERE annual_volatility > 0
-            ORDER BY (consistency_score / NULLIF(annual_volatility, 1)) DESC  -- İstikrar = tutarlılık / volatilite
-            LIMIT 20
-            """
-            
-            result = self.coordinator.db.execute_query(query)
+            # Gecelik hesaplanan 5 yıllık istikrar tablosundan indeksli okuma
+            result = self._get_stability_ranking(horizon_years=5, limit=20)
             
             if result.empty:
                 return "❌ 5 yıllık istikrar analizi için yeterli veri bulunamadı."
@@ -720,11 +516,12 @@ class TimeBasedAnalyzer:
             for i, (_, row) in enumerate(result.head(10).iterrows(), 1):
                 fcode = row['fcode']
                 total_days = int(row['total_days'])
-                total_return = float(row['total_return'])
+                total_return = float(row['total_return']) * 100
                 annual_return = float(row['annual_return']) * 100
                 annual_volatility = float(row['annual_volatility']) * 100
                 consistency_score = float(row['consistency_score'])
                 sharpe_ratio = float(row['sharpe_like_ratio'])
+                max_drawdown = float(row['max_drawdown']) * 100 if pd.notna(row['max_drawdown']) else 0
                 current_price = float(row['current_price'])
                 
                 fund_info = fund_details_dict.get(fcode, {'name': 'N/A', 'type': 'N/A'})
@@ -742,6 +539,7 @@ class TimeBasedAnalyzer:
                 response += f"    📊 Yıllık Ortalama: %{annual_return:+.2f}\n"
                 response += f"    📉 Yıllık Volatilite: %{annual_volatility:.2f}\n"
                 response += f"    ⚡ Sharpe Oranı: {sharpe_ratio:.3f}\n"
+                response += f"    📉 Maksimum Düşüş: %{max_drawdown:.2f}\n"
                 response += f"    ✅ Pozitif Gün Oranı: %{consistency_score:.1f}\n"
                 response += f"    📅 Veri Süresi: {total_days} gün ({total_days/252:.1f} yıl)\n"
                 response += f"    💰 Güncel Fiyat: {current_price:.4f} TL\n"